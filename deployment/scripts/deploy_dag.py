@@ -0,0 +1,238 @@
+"""
+Pharmacy2U Demo - Deployment Dependency Graph
+Purpose: Run deployment steps as a DAG, with independent steps running concurrently
+Method: Thread pool over ready nodes; failures skip their dependents; critical path from measured times
+
+Most deployment work is waiting on Snowflake: ``snow sql`` subprocesses,
+generator INSERTs and COPYs. Threads are enough to overlap it. A node
+starts as soon as all of its dependencies have succeeded, up to
+``max_workers`` at once. When a node fails, every node downstream of it is
+skipped, not run against missing objects. Nodes marked
+``runs_after_failures`` still run once their dependencies have finished
+(for example, final validation). Nodes with an ``unchanged_reason``, which
+the incremental plan sets, are not run. They count as succeeded, so their
+dependents can still run. The end-of-run summary shows the critical path,
+which is the chain of measured step times that bounds the wall clock.
+Each node that runs is a "step" span on the active ``deploy_trace`` tracer.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from deploy_trace import trace_span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+# Statuses a node can end in; "ok" and "unchanged" let dependents run
+NODE_STATUSES = ("ok", "unchanged", "failed", "error", "skipped")
+SUCCESS_STATUSES = ("ok", "unchanged")
+
+
+@dataclass
+class DeployNode:
+    """One deployment step and the steps it waits for"""
+    name: str
+    action: Callable[[], bool]
+    depends_on: Tuple[str, ...] = ()
+    required: bool = True
+    runs_after_failures: bool = False
+    fingerprint: Optional[str] = None
+    unchanged_reason: Optional[str] = None
+
+
+@dataclass
+class NodeResult:
+    """Outcome and timing of one node (times are seconds from the start of the run)"""
+    name: str
+    status: str
+    started: float = 0.0
+    finished: float = 0.0
+    reason: Optional[str] = None
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class DagResult:
+    """Outcome of ``run_dag``"""
+    nodes: Dict[str, DeployNode]
+    results: Dict[str, NodeResult]
+    wall_seconds: float
+    max_workers: int = DEFAULT_MAX_WORKERS
+    order: List[str] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> bool:
+        """True when every required node succeeded"""
+        return all(self.results[name].status in SUCCESS_STATUSES
+                   for name, node in self.nodes.items() if node.required)
+
+    @property
+    def summed_seconds(self) -> float:
+        """Time the steps would take one after another"""
+        return sum(result.elapsed_seconds for result in self.results.values())
+
+    def status_of(self, name: str) -> str:
+        return self.results[name].status
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        Longest chain of measured step times through the graph
+
+        Returns:
+            (node names from first to last, summed seconds along the chain)
+        """
+        best: Dict[str, Tuple[float, Optional[str]]] = {}
+        for name in self.order:
+            upstream = [(best[dep][0], dep) for dep in self.nodes[name].depends_on]
+            length, previous = max(upstream, default=(0.0, None))
+            best[name] = (length + self.results[name].elapsed_seconds, previous)
+        if not best:
+            return [], 0.0
+        last = max(best, key=lambda name: best[name][0])
+        total = best[last][0]
+        path = []
+        while last is not None:
+            path.append(last)
+            last = best[last][1]
+        return path[::-1], total
+
+
+def topological_order(nodes: Sequence[DeployNode]) -> List[str]:
+    """
+    Order node names so every node follows its dependencies (declaration order breaks ties)
+
+    Raises:
+        ValueError: On duplicate names, unknown dependencies or a cycle
+    """
+    by_name: Dict[str, DeployNode] = {}
+    for node in nodes:
+        if node.name in by_name:
+            raise ValueError(f"Duplicate deployment step '{node.name}'")
+        by_name[node.name] = node
+    for node in nodes:
+        unknown = [dep for dep in node.depends_on if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Step '{node.name}' depends on unknown step(s): {', '.join(unknown)}")
+
+    order: List[str] = []
+    placed = set()
+    remaining = [node.name for node in nodes]
+    while remaining:
+        ready = [name for name in remaining if all(dep in placed for dep in by_name[name].depends_on)]
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {', '.join(remaining)}")
+        order.extend(ready)
+        placed.update(ready)
+        remaining = [name for name in remaining if name not in placed]
+    return order
+
+
+def run_dag(
+    nodes: Sequence[DeployNode],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_result: Optional[Callable[[NodeResult], None]] = None
+) -> DagResult:
+    """
+    Run nodes concurrently as their dependencies complete
+
+    A node whose action returns False ends "failed"; one that raises ends
+    "error". Dependents of a node that did not succeed are "skipped", unless
+    they are marked ``runs_after_failures``. Nodes with an ``unchanged_reason``
+    end "unchanged" without running.
+
+    Args:
+        nodes: Deployment steps; dependencies refer to other nodes by name
+        max_workers: Maximum steps running at once
+        on_result: Called on the coordinating thread as each node finishes (e.g. to save state)
+
+    Returns:
+        DagResult with per-node status and timings
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be >= 1")
+    order = topological_order(nodes)
+    by_name = {node.name: node for node in nodes}
+    results: Dict[str, NodeResult] = {}
+    running: Dict[Future, str] = {}
+    pending = list(order)
+    start = time.perf_counter()
+
+    def finish(result: NodeResult) -> None:
+        results[result.name] = result
+        if on_result is not None:
+            on_result(result)
+
+    def settle_ready() -> List[str]:
+        """Settle nodes that won't run (skipped or unchanged); return the ones that can start now"""
+        ready = []
+        for name in list(pending):
+            node = by_name[name]
+            if any(dep not in results for dep in node.depends_on):
+                continue
+            failed = [dep for dep in node.depends_on if results[dep].status not in SUCCESS_STATUSES]
+            now = time.perf_counter() - start
+            if failed and not node.runs_after_failures:
+                finish(NodeResult(name, "skipped", now, now,
+                                  reason=f"dependency {failed[0]} {results[failed[0]].status}"))
+                logger.warning(f"   ⏭️  Skipping {name}: {results[name].reason}")
+                pending.remove(name)
+            elif node.unchanged_reason is not None:
+                finish(NodeResult(name, "unchanged", now, now, reason=node.unchanged_reason))
+                pending.remove(name)
+            else:
+                ready.append(name)
+        return ready
+
+    def run_node(name: str) -> NodeResult:
+        started = time.perf_counter() - start
+        with trace_span(name, "step") as span:
+            try:
+                status, reason = ("ok", None) if by_name[name].action() else ("failed", None)
+            except Exception as e:
+                status, reason = "error", str(e)
+                logger.error(f"   ❌ {name} raised: {reason}")
+            span["status"] = status
+        return NodeResult(name, status, started, time.perf_counter() - start, reason)
+
+    to_run = sum(1 for node in nodes if node.unchanged_reason is None)
+    logger.info(f"🕸️  Running {to_run} of {len(order)} deployment steps on up to {max_workers} worker(s)")
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deploy") as executor:
+        while pending or running:
+            # pending is in topological order, so one pass also skips transitive dependents
+            for name in settle_ready():
+                if len(running) >= max_workers:
+                    break
+                pending.remove(name)
+                running[executor.submit(run_node, name)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future.result())
+                del running[future]
+
+    return DagResult(by_name, results, time.perf_counter() - start, max_workers, order)
+
+
+def log_dag_summary(result: DagResult) -> None:
+    """Log per-step status and the critical path"""
+    icons = {"ok": "✅", "unchanged": "💤", "failed": "❌", "error": "💥", "skipped": "⏭️ "}
+    logger.info("📋 Deployment steps:")
+    for name in sorted(result.order, key=lambda step: result.results[step].started):
+        step = result.results[name]
+        detail = f" ({step.reason})" if step.reason else ""
+        logger.info(f"   {icons[step.status]} {name:<40} {step.elapsed_seconds:8.2f}s  "
+                    f"[{step.started:7.2f}s → {step.finished:7.2f}s]{detail}")
+
+    path, path_seconds = result.critical_path()
+    logger.info(f"🧭 Critical path ({path_seconds:.2f}s): {' → '.join(path)}")
+    logger.info(f"   ⏱️  Wall clock: {result.wall_seconds:.2f}s | Summed step time: {result.summed_seconds:.2f}s "
+                f"| Workers: {result.max_workers}")
@@ -4,13 +4,24 @@ Purpose: Automated deployment of complete demo environment
 Follows: Demo Builder Phase 3B deployment workflow
 """
 
-import subprocess
+import argparse
+import importlib
+import inspect
+import os
+import re
 import sys
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
+from typing import Callable, Dict, List, Optional
 import time
 
+from deploy_dag import DEFAULT_MAX_WORKERS, SUCCESS_STATUSES, DeployNode, log_dag_summary, run_dag
+from deploy_state import DeployState, apply_plan, fingerprint, log_plan, plan_steps, state_file_for
+from deploy_trace import DEFAULT_TOP_SPANS, TRACE_DIR, Tracer, load_trace, log_trace_report, set_tracer, trace_span
+from sql_backend import SqlScriptResult, open_sql_backend
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,63 +29,173 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# COPY for compressed NDJSON chunks; PATTERN lets Snowflake spread the files across load threads
+COPY_MARKETING_CHUNKS_SQL = """
+USE DATABASE PHARMACY2U_BRONZE;
+USE SCHEMA RAW_DATA;
+
+COPY INTO RAW_MARKETING_EVENTS (EVENT_DATA, INGESTION_TIMESTAMP, SOURCE_SYSTEM)
+FROM (
+    SELECT $1, CURRENT_TIMESTAMP(), 'ADLS_GEN2'
+    FROM @MARKETING_STAGE/chunks/
+)
+PATTERN = '.*marketing_events_.*[.]ndjson[.](gz|zst)'
+FILE_FORMAT = (TYPE = 'JSON' COMPRESSION = AUTO)
+ON_ERROR = 'CONTINUE';
+"""
+
+PATIENT_RECORDS = 100000
+PRESCRIPTION_RECORDS = 500000
+MARKETING_EVENT_RECORDS = 1000000
+
+# Setup scripts and the setup scripts they need: databases and warehouses are
+# independent; tables need both; grants need the tables
+SETUP_SCRIPTS = {
+    '00_database_setup.sql': (),
+    '01_warehouse_configuration.sql': (),
+    '02_schema_creation.sql': ('00_database_setup.sql', '01_warehouse_configuration.sql'),
+    '03_permissions.sql': ('02_schema_creation.sql',),
+}
+
+# Section banner in the feature SQL files: a "-- ===" rule, one title line, another rule
+SQL_SECTION_BANNER = re.compile(r'^-- =+\n-- (.+)\n-- =+\n', re.MULTILINE)
+MODULE_IMPORT = re.compile(r'^\s*(?:from|import)\s+(\w+)', re.MULTILINE)
+DYNAMIC_TABLE_NAME = re.compile(r'CREATE OR REPLACE DYNAMIC TABLE\s+[\w.]*?(\w+)\s', re.IGNORECASE)
+
+
+def split_dynamic_table_sections(sql_text: str) -> Dict[str, str]:
+    """
+    Split a dynamic table script into one runnable script per table
+    
+    Each "Dynamic Table: ..." section gets the script's preamble (USE ROLE / USE
+    WAREHOUSE) prepended; other sections (validation queries) are left out.
+    
+    Returns:
+        Table name (e.g. PRESCRIPTIONS) to SQL text, in file order
+    """
+    parts = SQL_SECTION_BANNER.split(sql_text)
+    preamble = parts[0]
+    sections = {}
+    for title, body in zip(parts[1::2], parts[2::2]):
+        match = DYNAMIC_TABLE_NAME.search(body)
+        if title.startswith('Dynamic Table:') and match:
+            sections[match.group(1).upper()] = preamble + body
+    return sections
+
 
 class DemoDeployer:
     """Automated deployment orchestrator for Pharmacy2U demo"""
     
-    def __init__(self, connection_name: str = 'pharmacy2u_demo_connection'):
+    def __init__(self, connection_name: str = 'pharmacy2u_demo_connection', marketing_pipeline: bool = True,
+                 max_workers: int = DEFAULT_MAX_WORKERS, sql_backend: Optional[str] = None,
+                 force: Optional[List[str]] = None, state_file: Optional[Path] = None,
+                 trace_file: Optional[Path] = None, compare_trace: Optional[Path] = None,
+                 trace_top: int = DEFAULT_TOP_SPANS):
         self.connection_name = connection_name
         self.project_root = Path(__file__).parent.parent.parent
         self.sql_dir = self.project_root / 'sql'
+        self.data_gen_dir = self.project_root / 'src' / 'python' / 'data_generation'
+        self.marketing_pipeline = marketing_pipeline
+        self.max_workers = max_workers
+        self.sql_backend_name = sql_backend
+        self._sql_backend = None
+        self._sql_backend_lock = threading.Lock()
+        # Incremental deployment: steps whose fingerprints match their last success are skipped
+        self.force = force or []
+        self.state = DeployState(state_file or state_file_for(connection_name))
+        # Span trace of each run; the previous run's trace is kept for comparison
+        self.trace_file = trace_file or TRACE_DIR / f'deploy_{connection_name}.json'
+        self.compare_trace = compare_trace
+        self.trace_top = trace_top
         self.deployment_start = datetime.now()
+        # Step metrics from the deployer and the in-process generators land in one file
+        os.environ.setdefault('PHARMACY2U_METRICS_FILE',
+                              str(self.project_root / 'data' / 'metrics' / 'query_metrics.jsonl'))
         
-    def run_sql_file(self, sql_file: Path) -> bool:
-        """Execute SQL file using Snowflake CLI"""
+    def step_metrics(self, step: str):
+        """Start a metrics record for one deployer step (emitted as a JSON line)"""
+        return self.import_data_generation('query_metrics').StepMetrics('DemoDeployer', step)
+    
+    def run_step(self, step: str, action) -> bool:
+        """Run one deployment phase and emit its metrics line"""
+        metrics = self.step_metrics(step)
         try:
-            logger.info(f"📄 Executing: {sql_file.name}")
-            
-            cmd = [
-                'snow', 'sql',
-                '--filename', str(sql_file),
-                '--connection', self.connection_name
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            logger.info(f"   ✅ Completed: {sql_file.name}")
+            succeeded = action()
+        except BaseException:
+            metrics.emit(status="error")
+            raise
+        metrics.emit(status="ok" if succeeded else "failed")
+        return succeeded
+    
+    @property
+    def sql(self):
+        """SQL backend for this deployment (in-process connector, or snow sql fallback), opened on first use"""
+        with self._sql_backend_lock:
+            if self._sql_backend is None:
+                self._sql_backend = open_sql_backend(self.connection_name, self.sql_backend_name)
+            return self._sql_backend
+    
+    def record_sql_result(self, result: SqlScriptResult) -> bool:
+        """Log a script result and emit its metrics line"""
+        StatementMetrics = self.import_data_generation('query_metrics').StatementMetrics
+        metrics = self.step_metrics(f"sql:{result.name}")
+        metrics.extra['sql_backend'] = result.backend
+        for statement in result.statements:
+            metrics.add_statement(StatementMetrics(query_id=statement.query_id, rows=statement.rowcount,
+                                                   elapsed_seconds=statement.elapsed_seconds,
+                                                   label=f"line {statement.line}"))
+        if result.ok:
+            logger.info(f"   ✅ Completed: {result.name} ({result.elapsed_seconds:.2f}s)")
+            metrics.emit()
             return True
-            
-        except subprocess.CalledProcessError as e:
-            logger.error(f"   ❌ Failed: {sql_file.name}")
-            logger.error(f"   Error: {e.stderr}")
-            return False
+        
+        logger.error(f"   ❌ Failed: {result.name}")
+        logger.error(f"   Error: {result.error}")
+        metrics.extra['error_line'] = result.error_line
+        metrics.emit(status="failed")
+        return False
     
-    def run_python_script(self, script_path: Path, *args) -> bool:
-        """Execute Python script"""
+    def run_sql_file(self, sql_file: Path) -> bool:
+        """Execute a SQL file on the deployment's SQL backend"""
+        logger.info(f"📄 Executing: {sql_file.name}")
+        return self.record_sql_result(self.sql.run_file(sql_file))
+    
+    def import_data_generation(self, module_name: str):
+        """Import a data generation module in-process (the generators are flat scripts)"""
+        if str(self.data_gen_dir) not in sys.path:
+            sys.path.insert(0, str(self.data_gen_dir))
+        return importlib.import_module(module_name)
+    
+    def module_sources(self, *module_names: str) -> List[Path]:
+        """Data generation modules and the sibling modules they import (transitively), sorted by name"""
+        found: Dict[str, Path] = {}
+        pending = list(module_names)
+        while pending:
+            name = pending.pop()
+            path = self.data_gen_dir / f'{name}.py'
+            if name in found or not path.exists():
+                continue
+            found[name] = path
+            pending.extend(MODULE_IMPORT.findall(path.read_text()))
+        return [found[name] for name in sorted(found)]
+    
+    def run_snowpark_generator(self, module_name: str, function_name: str, target_records: int, **options) -> bool:
+        """Run a Snowpark generator in this process on the shared, cached session"""
         try:
-            logger.info(f"🐍 Executing: {script_path.name}")
+            logger.info(f"🐍 Executing: {module_name}.{function_name}")
             
-            cmd = [sys.executable, str(script_path), self.connection_name] + list(args)
+            # Generators on parallel DAG workers share one session; get_session logs in once under a lock
+            session = self.import_data_generation('snowpark_session').get_session(self.connection_name)
+            generator = getattr(self.import_data_generation(module_name), function_name)
+            with trace_span(f"{module_name}.{function_name}", "generator", records=target_records):
+                generator(session, target_records, **options)
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            logger.info(result.stdout)
-            logger.info(f"   ✅ Completed: {script_path.name}")
+            logger.info(f"   ✅ Completed: {module_name}.{function_name}")
             return True
             
-        except subprocess.CalledProcessError as e:
-            logger.error(f"   ❌ Failed: {script_path.name}")
-            logger.error(f"   Error: {e.stderr}")
+        except Exception as e:
+            logger.error(f"   ❌ Failed: {module_name}.{function_name}")
+            logger.error(f"   Error: {str(e)}")
             return False
     
     def validate_connection(self) -> bool:
@@ -83,105 +204,88 @@ class DemoDeployer:
         
         try:
             # Test basic connectivity with a simple query (don't validate database/schema)
-            cmd = [
-                'snow', 'sql',
-                '--query', 'SELECT CURRENT_ACCOUNT(), CURRENT_USER(), CURRENT_ROLE();',
-                '--connection', self.connection_name
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            rows = self.sql.query('SELECT CURRENT_ACCOUNT() AS ACCOUNT, CURRENT_USER() AS USER_NAME, '
+                                  'CURRENT_ROLE() AS ROLE_NAME')
             logger.info(f"   ✅ Connection validated successfully")
-            logger.info(f"   Account: {self.connection_name}")
+            if rows:
+                logger.info(f"   Account: {rows[0].get('ACCOUNT')} | User: {rows[0].get('USER_NAME')} "
+                            f"| Role: {rows[0].get('ROLE_NAME')}")
             return True
-        except subprocess.CalledProcessError as e:
-            logger.error(f"   ❌ Connection test failed: {e.stderr}")
+        except Exception as e:
+            logger.error(f"   ❌ Connection test failed: {getattr(e, 'stderr', None) or str(e)}")
             logger.error(f"   💡 Verify connection exists: snow connection list")
             return False
     
-    def deploy_infrastructure(self) -> bool:
-        """Deploy database infrastructure (Phase 1)"""
-        logger.info("=" * 80)
-        logger.info("PHASE 1: INFRASTRUCTURE DEPLOYMENT")
-        logger.info("=" * 80)
-        
-        setup_scripts = [
-            self.sql_dir / 'setup' / '00_database_setup.sql',
-            self.sql_dir / 'setup' / '01_warehouse_configuration.sql',
-            self.sql_dir / 'setup' / '02_schema_creation.sql',
-            self.sql_dir / 'setup' / '03_permissions.sql',
-        ]
-        
-        for script in setup_scripts:
-            if not script.exists():
-                logger.warning(f"   ⚠️  Script not found: {script}")
-                continue
-            
-            if not self.run_sql_file(script):
-                return False
-        
-        logger.info("✅ Infrastructure deployment completed")
-        return True
+    def sql_file_step(self, sql_file: Path) -> Callable[[], bool]:
+        """Deployment step running one SQL file (a missing optional script is logged and passed)"""
+        def step() -> bool:
+            if not sql_file.exists():
+                logger.warning(f"   ⚠️  Script not found: {sql_file}")
+                return True
+            return self.run_sql_file(sql_file)
+        return step
     
-    def generate_synthetic_data(self) -> bool:
-        """Generate synthetic data using Snowpark Python (Phase 2)"""
-        logger.info("=" * 80)
-        logger.info("PHASE 2: SYNTHETIC DATA GENERATION")
-        logger.info("=" * 80)
-        
-        data_gen_dir = self.project_root / 'src' / 'python' / 'data_generation'
-        
-        # Generate prescriptions (500K records)
-        logger.info("💊 Generating prescription data (500K records)...")
-        prescription_gen = data_gen_dir / 'prescription_generator.py'
-        if prescription_gen.exists():
-            if not self.run_python_script(prescription_gen, '500000'):
-                logger.warning("⚠️ Prescription generation had issues, continuing...")
-        
-        # Generate patients (100K records)
-        logger.info("👥 Generating patient data (100K records)...")
-        patient_gen = data_gen_dir / 'patient_generator.py'
-        if patient_gen.exists():
-            if not self.run_python_script(patient_gen, '100000'):
-                logger.warning("⚠️ Patient generation had issues, continuing...")
-        
-        # Generate marketing events (1M records)
-        logger.info("📧 Generating marketing events (1M records)...")
-        marketing_gen = data_gen_dir / 'marketing_events_generator.py'
-        if marketing_gen.exists():
-            if not self.run_python_script(marketing_gen, '1000000'):
-                logger.warning("⚠️ Marketing events generation had issues, continuing...")
-        
-        logger.info("✅ Synthetic data generation completed")
-        return True
+    def generate_marketing_events(self) -> bool:
+        """Generate marketing event files locally for the PUT/COPY load (--no-pipeline)"""
+        logger.info(f"📧 Generating marketing events ({MARKETING_EVENT_RECORDS:,} records)...")
+        try:
+            marketing = self.import_data_generation('marketing_events_generator')
+            marketing.generate_marketing_events(MARKETING_EVENT_RECORDS, str(self.project_root / 'data' / 'synthetic'))
+            return True
+        except Exception as e:
+            logger.error(f"   Error: {str(e)}")
+            return False
+    
+    def deploy_dynamic_table(self, table_name: str, sql_text: str) -> bool:
+        """Create one silver dynamic table from its section of bronze_to_silver.sql"""
+        return self.run_sql_script(sql_text, f'dynamic_table_{table_name.lower()}')
+    
+    def run_sql_script(self, sql_text: str, script_name: str) -> bool:
+        """Execute generated SQL text (in-process, or through a temporary file for snow sql)"""
+        logger.info(f"📄 Executing: {script_name}")
+        return self.record_sql_result(self.sql.run_script(sql_text, script_name))
     
     def load_marketing_events_to_snowflake(self) -> bool:
         """Load generated marketing events JSON to Snowflake"""
         logger.info("📤 Loading marketing events to Snowflake...")
         
         try:
-            # PUT file to stage
-            json_file = self.project_root / 'data' / 'synthetic' / 'marketing_events.json'
-            if not json_file.exists():
-                logger.warning("⚠️ Marketing events JSON file not found, skipping...")
-                return True
+            synthetic_dir = self.project_root / 'data' / 'synthetic'
+            if any(synthetic_dir.glob('marketing_events*.parquet')):
+                return self.load_marketing_events_parquet(synthetic_dir)
+            if any(synthetic_dir.glob('marketing_events_*.ndjson.gz')) or \
+                    any(synthetic_dir.glob('marketing_events_*.ndjson.zst')):
+                return self.load_marketing_events_chunks(synthetic_dir)
+            
+            # PUT file to stage (sharded part files, append-mode deltas, then streaming NDJSON,
+            # then the legacy JSON array). COPY load metadata skips deltas that are already loaded.
+            json_file = synthetic_dir / 'marketing_events.ndjson'
+            if any(synthetic_dir.glob('marketing_events_part_*.ndjson')):
+                json_file = synthetic_dir / 'marketing_events_part_*.ndjson'
+            elif any(synthetic_dir.glob('marketing_events_delta_*.ndjson')):
+                json_file = synthetic_dir / 'marketing_events_delta_*.ndjson'
+            elif not json_file.exists():
+                json_file = synthetic_dir / 'marketing_events.json'
+                if not json_file.exists():
+                    logger.warning("⚠️ Marketing events JSON file not found, skipping...")
+                    return True
             
             put_cmd = f"""
             USE DATABASE PHARMACY2U_BRONZE;
             USE SCHEMA RAW_DATA;
-            PUT file://{json_file} @MARKETING_STAGE AUTO_COMPRESS=TRUE OVERWRITE=TRUE;
+            PUT file://{json_file} @MARKETING_STAGE/json/ AUTO_COMPRESS=TRUE OVERWRITE=TRUE PARALLEL=8;
             
-            COPY INTO RAW_MARKETING_EVENTS
-            FROM @MARKETING_STAGE
+            COPY INTO RAW_MARKETING_EVENTS (EVENT_DATA, INGESTION_TIMESTAMP, SOURCE_SYSTEM)
+            FROM (
+                SELECT $1, CURRENT_TIMESTAMP(), 'ADLS_GEN2'
+                FROM @MARKETING_STAGE/json/
+            )
             FILE_FORMAT = (TYPE = 'JSON')
             ON_ERROR = 'CONTINUE';
             """
             
-            # Write to temp SQL file and execute
-            temp_sql = self.project_root / 'deployment' / 'temp_load_marketing.sql'
-            temp_sql.parent.mkdir(exist_ok=True)
-            temp_sql.write_text(put_cmd)
-            
-            self.run_sql_file(temp_sql)
-            temp_sql.unlink()  # Clean up
+            if not self.run_sql_script(put_cmd, 'load_marketing'):
+                return False
             
             logger.info("✅ Marketing events loaded to Snowflake")
             return True
@@ -190,26 +294,74 @@ class DemoDeployer:
             logger.error(f"❌ Error loading marketing events: {str(e)}")
             return False
     
-    def deploy_features(self) -> bool:
-        """Deploy P0 features (Phase 3)"""
-        logger.info("=" * 80)
-        logger.info("PHASE 3: FEATURE DEPLOYMENT (P0)")
-        logger.info("=" * 80)
+    def stream_marketing_events_to_snowflake(self, target_records: int = 1000000) -> bool:
+        """Generate, compress and upload marketing events concurrently, then COPY the chunks"""
+        logger.info(f"🔀 Streaming {target_records:,} marketing events to Snowflake (overlapped pipeline)...")
         
-        feature_scripts = [
-            self.sql_dir / 'features' / 'dynamic_tables' / 'bronze_to_silver.sql',
-            self.sql_dir / 'features' / 'governance' / 'access_policies.sql',
-        ]
-        
-        for script in feature_scripts:
-            if not script.exists():
-                logger.warning(f"   ⚠️  Script not found: {script}")
-                continue
+        try:
+            generate_and_upload_marketing_events = self.import_data_generation(
+                'marketing_events_generator').generate_and_upload_marketing_events
+            SnowflakeStageUploader = self.import_data_generation('marketing_events_pipeline').SnowflakeStageUploader
             
-            if not self.run_sql_file(script):
-                logger.warning(f"   ⚠️  Feature deployment had issues: {script.name}")
+            chunk_dir = self.project_root / 'data' / 'synthetic' / 'pipeline'
+            # PUT each chunk through the deployment's SQL backend (pooled connector, or snow sql fallback)
+            sql = self.sql
+            uploader = SnowflakeStageUploader(self.connection_name, sql=sql)
+            put_chunk = uploader.upload
+            
+            def traced_upload(path: Path) -> None:
+                with trace_span(f"PUT {path.name}", "upload", backend=sql.name):
+                    put_chunk(path)
+            uploader.upload = traced_upload
+            result = generate_and_upload_marketing_events(target_records, str(chunk_dir), uploader)
+            if result.failed:
+                logger.error(f"❌ {len(result.failed)} chunk(s) failed to upload - see the manifest in {chunk_dir}")
+                return False
+            
+            return self.run_sql_script(COPY_MARKETING_CHUNKS_SQL, 'copy_marketing_chunks')
+            
+        except Exception as e:
+            logger.error(f"❌ Error streaming marketing events: {str(e)}")
+            return False
+    
+    def load_marketing_events_chunks(self, synthetic_dir: Path, parallel: int = 16) -> bool:
+        """Load pre-compressed NDJSON chunks so COPY can spread files across threads"""
+        logger.info("🗜️  Loading compressed marketing event chunks (parallel COPY)...")
+        
+        # Chunks are already gzip/zstd compressed by the generator, so PUT uploads them as-is
+        load_cmd = f"""
+        USE DATABASE PHARMACY2U_BRONZE;
+        USE SCHEMA RAW_DATA;
+        PUT file://{synthetic_dir / 'marketing_events_*.ndjson.*'} @MARKETING_STAGE/chunks/ AUTO_COMPRESS=FALSE SOURCE_COMPRESSION=AUTO_DETECT OVERWRITE=TRUE PARALLEL={parallel};
+        """ + COPY_MARKETING_CHUNKS_SQL
+        
+        if not self.run_sql_script(load_cmd, 'load_marketing_chunks'):
+            return False
         
-        logger.info("✅ Feature deployment completed")
+        logger.info("✅ Compressed marketing event chunks loaded to Snowflake")
+        return True
+    
+    def load_marketing_events_parquet(self, synthetic_dir: Path) -> bool:
+        """Load columnar Parquet marketing events into the typed bronze table"""
+        logger.info("📦 Loading Parquet marketing events into RAW_MARKETING_EVENTS_TYPED...")
+        
+        # Parquet is already compressed internally, so skip PUT's gzip pass
+        load_cmd = f"""
+        USE DATABASE PHARMACY2U_BRONZE;
+        USE SCHEMA RAW_DATA;
+        PUT file://{synthetic_dir / 'marketing_events*.parquet'} @MARKETING_STAGE/parquet/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=8;
+        
+        COPY INTO RAW_MARKETING_EVENTS_TYPED
+        FROM @MARKETING_STAGE/parquet/
+        FILE_FORMAT = (FORMAT_NAME = 'PHARMACY2U_BRONZE.RAW_DATA.PARQUET_FORMAT')
+        MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+        ON_ERROR = 'CONTINUE';
+        """
+        
+        if not self.run_sql_script(load_cmd, 'load_marketing_parquet'):
+            return False
+        
+        logger.info("✅ Parquet marketing events loaded to Snowflake")
         return True
     
     def validate_deployment(self) -> bool:
@@ -236,46 +388,168 @@ class DemoDeployer:
         FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS;
         """
         
-        temp_sql = self.project_root / 'deployment' / 'temp_validation.sql'
-        temp_sql.write_text(validation_sql)
-        
-        result = self.run_sql_file(temp_sql)
-        temp_sql.unlink()
+        return self.run_sql_script(validation_sql, 'validation')
+    
+    def build_deploy_graph(self) -> List[DeployNode]:
+        """
+        Describe the deployment as steps and their dependencies
         
-        return result
+        Generators, marketing events and the silver dynamic tables only wait
+        for what they read, so independent steps run side by side. Prescriptions
+        are told the patient count up front rather than counting RAW_PATIENTS,
+        so they don't wait for the patient generator.
+        """
+        def step(name: str, action: Callable[[], bool]) -> Callable[[], bool]:
+            return lambda: self.run_step(name, action)
+        
+        # Steps without a fingerprint always run (connection check, validation)
+        nodes = [DeployNode('validate_connection', step('validate_connection', self.validate_connection))]
+        
+        # Infrastructure: required, as a failure here leaves nothing to deploy into
+        for script, setup_deps in SETUP_SCRIPTS.items():
+            script_path = self.sql_dir / 'setup' / script
+            nodes.append(DeployNode(f'sql:{script}', self.sql_file_step(script_path),
+                                    tuple(f'sql:{dep}' for dep in setup_deps) or ('validate_connection',),
+                                    fingerprint=fingerprint(script_path)))
+        tables_ready = ('sql:02_schema_creation.sql',)
+        
+        # Bronze data: a failed generator or load skips only the silver table built from it.
+        # Fingerprints cover the generator source (with its helper modules) and parameters.
+        nodes.append(DeployNode('generate_patients', step('generate_patients', lambda: self.run_snowpark_generator(
+            'patient_generator', 'generate_patient_data', PATIENT_RECORDS)), tables_ready, required=False,
+            fingerprint=fingerprint(*self.module_sources('patient_generator'), {'records': PATIENT_RECORDS})))
+        nodes.append(DeployNode('generate_prescriptions', step('generate_prescriptions', lambda: self.run_snowpark_generator(
+            'prescription_generator', 'generate_prescription_data', PRESCRIPTION_RECORDS,
+            patient_count=PATIENT_RECORDS)), tables_ready, required=False,
+            fingerprint=fingerprint(*self.module_sources('prescription_generator'),
+                                    {'records': PRESCRIPTION_RECORDS, 'patient_count': PATIENT_RECORDS})))
+        marketing_inputs = {'records': MARKETING_EVENT_RECORDS}
+        if self.marketing_pipeline:
+            # Overlapped generate/upload pipeline, then COPY
+            marketing_loaded = 'stream_marketing_events'
+            nodes.append(DeployNode(marketing_loaded, step(marketing_loaded, self.stream_marketing_events_to_snowflake),
+                                    tables_ready, required=False,
+                                    fingerprint=fingerprint(*self.module_sources('marketing_events_generator',
+                                                                                 'marketing_events_pipeline'),
+                                                            COPY_MARKETING_CHUNKS_SQL, marketing_inputs)))
+        else:
+            # Local generation needs nothing from Snowflake, so it overlaps the infrastructure scripts
+            marketing_loaded = 'load_marketing_events'
+            nodes.append(DeployNode('generate_marketing_events',
+                                    step('generate_marketing_events', self.generate_marketing_events), required=False,
+                                    fingerprint=fingerprint(*self.module_sources('marketing_events_generator'),
+                                                            marketing_inputs)))
+            load_methods = (self.load_marketing_events_to_snowflake, self.load_marketing_events_chunks,
+                            self.load_marketing_events_parquet)
+            nodes.append(DeployNode(marketing_loaded, step(marketing_loaded, self.load_marketing_events_to_snowflake),
+                                    ('generate_marketing_events',) + tables_ready, required=False,
+                                    fingerprint=fingerprint(*[inspect.getsource(method) for method in load_methods],
+                                                            COPY_MARKETING_CHUNKS_SQL)))
+        
+        # Silver dynamic tables: one step per table, each waiting only for its own bronze table
+        bronze_sources = {'PRESCRIPTIONS': 'generate_prescriptions', 'PATIENTS': 'generate_patients',
+                          'MARKETING_EVENTS': marketing_loaded}
+        silver_script = self.sql_dir / 'features' / 'dynamic_tables' / 'bronze_to_silver.sql'
+        if silver_script.exists():
+            for table_name, sql_text in split_dynamic_table_sections(silver_script.read_text()).items():
+                name = f'dynamic_table:{table_name}'
+                nodes.append(DeployNode(
+                    name, step(name, lambda table_name=table_name, sql_text=sql_text:
+                               self.deploy_dynamic_table(table_name, sql_text)),
+                    (bronze_sources[table_name],) if table_name in bronze_sources else tuple(bronze_sources.values()),
+                    required=False, fingerprint=fingerprint(sql_text)))
+        else:
+            logger.warning(f"   ⚠️  Script not found: {silver_script}")
+        
+        # Governance needs only the grants
+        policies_script = self.sql_dir / 'features' / 'governance' / 'access_policies.sql'
+        nodes.append(DeployNode('sql:access_policies.sql', self.sql_file_step(policies_script),
+                                ('sql:03_permissions.sql',), required=False, fingerprint=fingerprint(policies_script)))
+        
+        # Validation reports on whatever was deployed, so it runs even when earlier steps failed
+        nodes.append(DeployNode('validate_deployment', step('validate_deployment', self.validate_deployment),
+                                tuple([node.name for node in nodes if node.name != 'validate_connection']),
+                                required=False, runs_after_failures=True))
+        return nodes
+    
+    def write_trace(self, tracer: Tracer) -> None:
+        """Save the run's Chrome trace, log its slowest spans and regressions against the previous trace"""
+        previous = None
+        baseline = self.compare_trace
+        if baseline is None and self.trace_file.exists():
+            baseline = self.trace_file.with_name(f'{self.trace_file.stem}.previous.json')
+            os.replace(self.trace_file, baseline)
+        if baseline is not None:
+            try:
+                previous = load_trace(baseline)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"⚠️  Could not read previous trace {baseline}: {str(e)}")
+        
+        tracer.export_chrome_trace(self.trace_file)
+        logger.info(f"🧵 Trace: {self.trace_file} (open in https://ui.perfetto.dev)")
+        log_trace_report(tracer.spans, self.trace_top, previous)
     
     def deploy(self) -> bool:
-        """Execute complete deployment workflow"""
+        """Execute complete deployment workflow (independent steps run in parallel)"""
         logger.info("🚀 Starting Pharmacy2U Demo Deployment")
         logger.info(f"   Connection: {self.connection_name}")
         logger.info(f"   Project Root: {self.project_root}")
         logger.info("")
         
-        # Step 1: Validate connection
-        if not self.validate_connection():
-            return False
-        
-        # Step 2: Deploy infrastructure
-        if not self.deploy_infrastructure():
-            logger.error("❌ Infrastructure deployment failed")
-            return False
+        metrics = self.step_metrics('deploy')
+        # Trace steps, SQL files and statements, and the generators' statements via their metrics lines
+        tracer = Tracer(f'deploy {self.connection_name}')
+        query_metrics = self.import_data_generation('query_metrics')
+        set_tracer(tracer)
+        query_metrics.add_step_listener(tracer.record_step_metrics)
+        try:
+            with trace_span('deploy', 'deploy', connection=self.connection_name):
+                with trace_span('plan', 'deploy'):
+                    nodes = self.build_deploy_graph()
+                    by_name = {node.name: node for node in nodes}
+                    
+                    # Incremental plan: skip steps whose inputs and upstream steps are unchanged
+                    plans = plan_steps(nodes, self.state, self.force)
+                    apply_plan(nodes, plans)
+                log_plan(plans)
+                logger.info(f"   📁 State: {self.state.path}")
+                
+                result = run_dag(nodes, self.max_workers,
+                                 on_result=lambda step: self.state.record_result(by_name[step.name], step))
+                
+                # Release the shared generation session and the pooled SQL connections
+                if 'snowpark_session' in sys.modules:
+                    self.import_data_generation('snowpark_session').close_sessions()
+                if self._sql_backend is not None:
+                    self._sql_backend.close()
+        finally:
+            query_metrics.remove_step_listener(tracer.record_step_metrics)
+            set_tracer(None)
         
-        # Step 3: Generate synthetic data
-        if not self.generate_synthetic_data():
-            logger.error("❌ Data generation failed")
+        logger.info("=" * 80)
+        log_dag_summary(result)
+        self.write_trace(tracer)
+        critical_path, critical_seconds = result.critical_path()
+        metrics.extra.update({
+            'max_workers': self.max_workers,
+            'trace_file': str(self.trace_file),
+            'critical_path': critical_path,
+            'critical_path_seconds': round(critical_seconds, 3),
+            'summed_step_seconds': round(result.summed_seconds, 3),
+            'steps': {name: step.status for name, step in result.results.items()},
+            'forced': self.force,
+        })
+        metrics.emit(status="ok" if result.succeeded else "failed")
+        
+        if not result.succeeded:
+            failed = [name for name, node in result.nodes.items()
+                      if node.required and result.status_of(name) not in SUCCESS_STATUSES]
+            logger.error(f"❌ Deployment failed - required step(s) did not complete: {', '.join(failed)}")
             return False
         
-        # Step 4: Load marketing events
-        if not self.load_marketing_events_to_snowflake():
-            logger.warning("⚠️ Marketing events load had issues, continuing...")
-        
-        # Step 5: Deploy features
-        if not self.deploy_features():
-            logger.warning("⚠️ Feature deployment had issues, continuing...")
-        
-        # Step 6: Validate deployment
-        if not self.validate_deployment():
-            logger.warning("⚠️ Validation had issues, please check manually")
+        not_ok = [name for name, step in result.results.items() if step.status not in SUCCESS_STATUSES]
+        if not_ok:
+            logger.warning(f"⚠️ Some steps had issues, continuing: {', '.join(not_ok)}")
         
         # Calculate deployment time
         deployment_duration = (datetime.now() - self.deployment_start).total_seconds()
@@ -298,9 +572,30 @@ class DemoDeployer:
 def main():
     """Main execution function"""
     try:
-        connection_name = sys.argv[1] if len(sys.argv) > 1 else 'pharmacy2u_demo_connection'
-        
-        deployer = DemoDeployer(connection_name)
+        parser = argparse.ArgumentParser(description="Deploy the Pharmacy2U demo environment")
+        parser.add_argument('connection_name', nargs='?', default='pharmacy2u_demo_connection')
+        parser.add_argument('--no-pipeline', action='store_true',
+                            help="Generate marketing events first, then PUT/COPY the files")
+        parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS,
+                            help="Deployment steps running at once; 1 runs the graph sequentially (default: %(default)s)")
+        parser.add_argument('--sql-backend', choices=('auto', 'connector', 'cli'), default=None,
+                            help="In-process SQL (default auto) or one snow sql subprocess per script")
+        parser.add_argument('--force', action='append', default=[], metavar='STEP',
+                            help="Run STEP (and what depends on it) even if unchanged; repeatable, 'all' for everything")
+        parser.add_argument('--state-file', type=Path, default=None,
+                            help="Incremental deployment state (default: deployment/state/<connection>.json)")
+        parser.add_argument('--trace-file', type=Path, default=None,
+                            help="Chrome trace-event JSON of the run (default: data/traces/deploy_<connection>.json)")
+        parser.add_argument('--compare-trace', type=Path, default=None, metavar='TRACE',
+                            help="Report regressions against TRACE (default: the previous run's trace)")
+        parser.add_argument('--trace-top', type=int, default=DEFAULT_TOP_SPANS,
+                            help="Slowest spans listed after the run (default: %(default)s)")
+        args = parser.parse_args()
+        
+        deployer = DemoDeployer(args.connection_name, marketing_pipeline=not args.no_pipeline,
+                                max_workers=args.workers, sql_backend=args.sql_backend,
+                                force=args.force, state_file=args.state_file, trace_file=args.trace_file,
+                                compare_trace=args.compare_trace, trace_top=args.trace_top)
         success = deployer.deploy()
         
         sys.exit(0 if success else 1)
@@ -0,0 +1,180 @@
+"""
+Pharmacy2U Demo - Incremental Deployment State
+Purpose: Skip deployment steps whose inputs and upstream steps are unchanged since their last success
+Method: SHA-256 fingerprint per step (SQL text, generator source and parameters, app files) in a JSON state file
+
+Every step with a fingerprint has it recorded with its outcome once it
+finishes. The next run plans each step in dependency order. A step runs
+when any of these hold:
+- it is forced
+- it has no successful record
+- its fingerprint changed
+- a fingerprinted step upstream of it runs
+
+Otherwise it is reported as unchanged and not executed. Steps without a
+fingerprint (connection check, validation) always run, and because they
+have no fingerprint they never cause downstream steps to rerun.
+
+State is kept per connection (and per deployer script) under
+``deployment/state/`` because each connection is a separate account.
+Delete the file or use ``--force all`` after objects have been changed
+outside the deployer (e.g. reset_demo.sql).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from deploy_dag import DeployNode, NodeResult, topological_order
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path(__file__).resolve().parent.parent / 'state'
+STATE_VERSION = 1
+FORCE_ALL = 'all'
+
+
+def state_file_for(connection_name: str, scope: str = "demo") -> Path:
+    """Default state file for a connection; each deployer script has its own scope"""
+    return STATE_DIR / f"{connection_name}_{scope}.json"
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    SHA-256 over a step's inputs
+
+    Paths contribute their name and contents ("missing" when absent); bytes and
+    strings as-is; anything else as sorted JSON.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, Path):
+            digest.update(part.name.encode())
+            digest.update(part.read_bytes() if part.exists() else b"<missing>")
+        elif isinstance(part, bytes):
+            digest.update(part)
+        elif isinstance(part, str):
+            digest.update(part.encode())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DeployState:
+    """Fingerprint and outcome of each step's last run, persisted as JSON"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+                if data.get("version") == STATE_VERSION:
+                    self.steps = data.get("steps", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️  Ignoring unreadable deployment state {self.path}: {str(e)}")
+
+    def get(self, step: str) -> Optional[Dict[str, Any]]:
+        return self.steps.get(step)
+
+    def record(self, step: str, step_fingerprint: str, status: str) -> None:
+        """Record a step's outcome and write the file (atomically, so a crash never leaves half a file)"""
+        with self._lock:
+            self.steps[step] = {
+                "fingerprint": step_fingerprint,
+                "status": status,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps({"version": STATE_VERSION, "steps": self.steps}, indent=2, sort_keys=True))
+            os.replace(temp_path, self.path)
+
+    def is_unchanged(self, step: str, step_fingerprint: str) -> bool:
+        """True when the step last succeeded with the same fingerprint"""
+        previous = self.get(step)
+        return bool(previous) and previous.get("status") == "ok" and previous.get("fingerprint") == step_fingerprint
+
+    def record_result(self, node: DeployNode, result: NodeResult) -> None:
+        """Record a finished DAG node (unchanged and skipped nodes keep their previous record)"""
+        if node.fingerprint is not None and result.status in ("ok", "failed", "error"):
+            self.record(node.name, node.fingerprint, result.status)
+
+
+@dataclass
+class StepPlan:
+    """Whether a step runs this time, and why"""
+    name: str
+    runs: bool
+    reason: str
+
+
+def check_force(nodes: Sequence[DeployNode], force: Iterable[str]) -> set:
+    """Validate ``--force`` names against the graph (``all`` forces every step)"""
+    force = set(force)
+    if FORCE_ALL in force:
+        return {node.name for node in nodes}
+    unknown = force - {node.name for node in nodes}
+    if unknown:
+        raise ValueError(f"Unknown step(s) to force: {', '.join(sorted(unknown))} - "
+                         f"expected one of: {', '.join(node.name for node in nodes)}")
+    return force
+
+
+def plan_steps(nodes: Sequence[DeployNode], state: DeployState, force: Iterable[str] = ()) -> List[StepPlan]:
+    """
+    Decide which steps run, in dependency order
+
+    Args:
+        nodes: Deployment graph, with fingerprints on the steps that can be skipped
+        state: Previous outcomes
+        force: Step names to run regardless (``all`` for every step)
+
+    Returns:
+        One StepPlan per node, in topological order
+    """
+    by_name = {node.name: node for node in nodes}
+    forced = check_force(nodes, force)
+    plans: Dict[str, StepPlan] = {}
+    for name in topological_order(nodes):
+        node = by_name[name]
+        previous = state.get(name)
+        rerun_upstream = [dep for dep in node.depends_on if plans[dep].runs and by_name[dep].fingerprint is not None]
+        if name in forced:
+            plan = StepPlan(name, True, "forced")
+        elif node.fingerprint is None:
+            plan = StepPlan(name, True, "always runs")
+        elif previous is None:
+            plan = StepPlan(name, True, "no previous run")
+        elif previous.get("status") != "ok":
+            plan = StepPlan(name, True, f"previous run {previous.get('status')}")
+        elif previous.get("fingerprint") != node.fingerprint:
+            plan = StepPlan(name, True, "inputs changed")
+        elif rerun_upstream:
+            plan = StepPlan(name, True, f"upstream {rerun_upstream[0]} runs")
+        else:
+            plan = StepPlan(name, False, f"unchanged since {previous.get('finished_at')}")
+        plans[name] = plan
+    return list(plans.values())
+
+
+def apply_plan(nodes: Sequence[DeployNode], plans: Sequence[StepPlan]) -> None:
+    """Mark planned-out nodes unchanged so ``run_dag`` passes over them"""
+    skipped = {plan.name: plan.reason for plan in plans if not plan.runs}
+    for node in nodes:
+        node.unchanged_reason = skipped.get(node.name)
+
+
+def log_plan(plans: Sequence[StepPlan]) -> None:
+    running = [plan for plan in plans if plan.runs]
+    logger.info(f"🗺️  Deployment plan: {len(running)} of {len(plans)} steps run")
+    for plan in plans:
+        logger.info(f"   {'▶️ ' if plan.runs else '💤'} {plan.name:<40} {plan.reason}")
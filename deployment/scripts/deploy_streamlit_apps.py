@@ -4,10 +4,15 @@ Purpose: Deploy Streamlit in Snowflake applications
 Follows: Demo Builder critical deployment patterns
 """
 
+import argparse
 import subprocess
 import sys
 import logging
 from pathlib import Path
+from typing import List, Optional
+
+from deploy_state import FORCE_ALL, DeployState, fingerprint, state_file_for
+from sql_backend import open_sql_backend
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,9 +21,28 @@ logger = logging.getLogger(__name__)
 class StreamlitDeployer:
     """Automated Streamlit application deployer"""
     
-    def __init__(self, connection_name: str = 'pharmacy2u_demo_connection'):
+    def __init__(self, connection_name: str = 'pharmacy2u_demo_connection', sql_backend: Optional[str] = None,
+                 force: Optional[List[str]] = None, state_file: Optional[Path] = None):
         self.connection_name = connection_name
         self.project_root = Path(__file__).parent.parent.parent
+        self.sql_backend_name = sql_backend
+        self._sql_backend = None
+        # Apps whose files and deploy SQL are unchanged since their last successful deploy are skipped
+        self.force = force or []
+        self.state = DeployState(state_file or state_file_for(connection_name, 'streamlit'))
+    
+    @property
+    def sql(self):
+        """SQL backend (in-process connector, or snow sql fallback), opened on first use"""
+        if self._sql_backend is None:
+            self._sql_backend = open_sql_backend(self.connection_name, self.sql_backend_name)
+        return self._sql_backend
+    
+    def close(self) -> None:
+        """Close the SQL backend's connections"""
+        if self._sql_backend is not None:
+            self._sql_backend.close()
+            self._sql_backend = None
     
     def deploy_patient_360_dashboard(self) -> bool:
         """Deploy Patient 360 Dashboard Streamlit app"""
@@ -27,6 +51,8 @@ class StreamlitDeployer:
         app_dir = self.project_root / 'src' / 'streamlit_apps' / 'patient_360_dashboard'
         app_file = app_dir / 'app.py'
         env_file = app_dir / 'environment.yml'
+        # app.py imports its sibling modules (query layer), so every module is uploaded
+        app_modules = sorted(app_dir.glob('*.py'))
         
         if not app_file.exists():
             logger.error(f"❌ App file not found: {app_file}")
@@ -37,6 +63,9 @@ class StreamlitDeployer:
         
         try:
             # Create deployment SQL
+            put_modules = "\n".join(
+                f"PUT file://{module} @PHARMACY2U_STREAMLIT_STAGE/patient_360/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE;"
+                for module in app_modules)
             deploy_sql = f"""
             USE ROLE ACCOUNTADMIN;
             USE DATABASE PHARMACY2U_DEMO_DB;
@@ -44,7 +73,7 @@ class StreamlitDeployer:
             USE WAREHOUSE PHARMACY2U_ANALYTICS_WH;
             
             -- Upload files to stage
-            PUT file://{app_file} @PHARMACY2U_STREAMLIT_STAGE/patient_360/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE;
+            {put_modules}
             PUT file://{env_file} @PHARMACY2U_STREAMLIT_STAGE/patient_360/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE;
             
             -- Drop existing app if it exists
@@ -61,15 +90,21 @@ class StreamlitDeployer:
             GRANT USAGE ON STREAMLIT PATIENT_360_DASHBOARD TO ROLE PUBLIC;
             """
             
-            # Write to temp file and execute
-            temp_sql = self.project_root / 'deployment' / 'temp_streamlit_deploy.sql'
-            temp_sql.parent.mkdir(exist_ok=True)
-            temp_sql.write_text(deploy_sql)
-            
-            cmd = ['snow', 'sql', '--filename', str(temp_sql), '--connection', self.connection_name]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            # Skip the PUTs and DROP/CREATE when nothing that would be uploaded has changed
+            step = 'streamlit:PATIENT_360_DASHBOARD'
+            step_fingerprint = fingerprint(*app_modules, env_file, deploy_sql)
+            forced = step in self.force or FORCE_ALL in self.force
+            if not forced and self.state.is_unchanged(step, step_fingerprint):
+                logger.info(f"💤 Patient 360 Dashboard unchanged since {self.state.get(step)['finished_at']} "
+                            f"- skipping (--force {step} to redeploy)")
+                return True
             
-            temp_sql.unlink()  # Clean up
+            # Execute on the SQL backend (no temp file or CLI start-up in-process)
+            result = self.sql.run_script(deploy_sql, 'streamlit_deploy')
+            self.state.record(step, step_fingerprint, "ok" if result.ok else "failed")
+            if not result.ok:
+                logger.error(f"❌ Deployment failed: {result.error}")
+                return False
             
             # Get app URL
             url_cmd = ['snow', 'streamlit', 'get-url', 'PATIENT_360_DASHBOARD', '--connection', self.connection_name]
@@ -81,8 +116,8 @@ class StreamlitDeployer:
             
             return True
             
-        except subprocess.CalledProcessError as e:
-            logger.error(f"❌ Deployment failed: {e.stderr}")
+        except Exception as e:
+            logger.error(f"❌ Deployment failed: {str(e)}")
             return False
     
     def deploy_all(self) -> bool:
@@ -108,10 +143,19 @@ class StreamlitDeployer:
 def main():
     """Main execution function"""
     try:
-        connection_name = sys.argv[1] if len(sys.argv) > 1 else 'pharmacy2u_demo_connection'
+        parser = argparse.ArgumentParser(description="Deploy the Pharmacy2U Streamlit apps")
+        parser.add_argument('connection_name', nargs='?', default='pharmacy2u_demo_connection')
+        parser.add_argument('--sql-backend', choices=('auto', 'connector', 'cli'), default=None,
+                            help="In-process SQL (default auto) or one snow sql subprocess")
+        parser.add_argument('--force', action='append', default=[], metavar='STEP',
+                            help="Redeploy an unchanged app (e.g. streamlit:PATIENT_360_DASHBOARD, or 'all')")
+        parser.add_argument('--state-file', type=Path, default=None,
+                            help="Incremental deployment state (default: deployment/state/<connection>_streamlit.json)")
+        args = parser.parse_args()
         
-        deployer = StreamlitDeployer(connection_name)
+        deployer = StreamlitDeployer(args.connection_name, args.sql_backend, args.force, args.state_file)
         success = deployer.deploy_all()
+        deployer.close()
         
         sys.exit(0 if success else 1)
         
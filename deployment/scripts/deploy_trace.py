@@ -0,0 +1,330 @@
+"""
+Pharmacy2U Demo - Deployment Tracing
+Purpose: Span timings for every deployment step, SQL file, statement and generator chunk
+Method: Thread-aware span recorder; Chrome trace-event JSON export; top-N report; comparison with a previous trace
+
+The step summary says which step was slow. The trace says why: which file,
+which statement (by line), which insert chunk or PUT. Spans come from three
+places:
+- ``trace_span`` blocks around DAG steps, SQL files, statements and generators
+- ``query_metrics`` step lines, whose statements carry start times
+- wrapped subprocess calls, such as ``snow sql`` and the chunk PUTs
+
+The connector backend adds one span per statement. The ``snow sql``
+backend only has per-file spans, because the CLI runs a whole file as one
+call.
+
+The trace is written as Chrome trace-event JSON: open it in
+https://ui.perfetto.dev or chrome://tracing. Each worker thread is a track,
+and overlapping chunks of one step are spread over extra tracks. The end
+of a deployment logs the N slowest spans, with self time (the span minus
+its nested spans, as in a flame graph). When a previous trace exists, it
+also logs the spans that got slower.
+
+    python deployment/scripts/deploy_trace.py data/traces/deploy_<connection>.json --compare previous.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_DIR = Path(__file__).resolve().parent.parent.parent / 'data' / 'traces'
+DEFAULT_TOP_SPANS = 10
+# A span regresses when it is this much slower (relative and absolute) than in the previous trace
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+DEFAULT_REGRESSION_MIN_SECONDS = 0.5
+
+
+@dataclass
+class Span:
+    """One timed span; ``start`` is seconds from the start of the trace"""
+    name: str
+    category: str
+    start: float
+    duration: float
+    track: str = "main"
+    args: Dict[str, Any] = field(default_factory=dict)
+    self_seconds: Optional[float] = None
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+@dataclass
+class SpanChange:
+    """Total time of one (category, name) in two traces"""
+    category: str
+    name: str
+    previous_seconds: float
+    current_seconds: float
+
+    @property
+    def delta_seconds(self) -> float:
+        return self.current_seconds - self.previous_seconds
+
+    @property
+    def ratio(self) -> float:
+        return self.current_seconds / self.previous_seconds if self.previous_seconds > 0 else float("inf")
+
+
+class Tracer:
+    """Collects spans from any thread (times are ``time.perf_counter`` based)"""
+
+    def __init__(self, name: str = "deploy"):
+        self.name = name
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, category: str, start: float, duration: float,
+                 track: Optional[str] = None, **args: Any) -> Span:
+        """Record a finished span; ``start`` is a ``time.perf_counter()`` value"""
+        span = Span(name, category, start - self.origin, max(duration, 0.0),
+                    track or threading.current_thread().name, {k: v for k, v in args.items() if v is not None})
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time the enclosed block as a span on the current thread's track
+
+        Yields the span's args dict, so the block can add details (status,
+        query ID). An exception is recorded in ``error`` and re-raised.
+        """
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args.setdefault("error", str(e) or type(e).__name__)
+            raise
+        finally:
+            self.add_span(name, category, start, time.perf_counter() - start, **args)
+
+    def record_step_metrics(self, metrics: Any) -> None:
+        """
+        ``query_metrics`` listener: one span per statement that carries a start time
+
+        Statements of one step that overlap (concurrent insert chunks) go on
+        numbered tracks under the emitting thread, as one track can't hold
+        overlapping spans.
+        """
+        statements = sorted((statement for statement in metrics.statements
+                             if getattr(statement, "started_at", None) is not None),
+                            key=lambda statement: statement.started_at)
+        thread_name = threading.current_thread().name
+        lane_ends: List[float] = []
+        for statement in statements:
+            lane = next((i for i, end in enumerate(lane_ends) if end <= statement.started_at), len(lane_ends))
+            end = statement.started_at + statement.elapsed_seconds
+            if lane == len(lane_ends):
+                lane_ends.append(end)
+            else:
+                lane_ends[lane] = end
+            label = statement.label or statement.query_id or "statement"
+            self.add_span(f"{metrics.step} {label}", "statement", statement.started_at, statement.elapsed_seconds,
+                          track=f"{thread_name} {metrics.step} #{lane + 1}", component=metrics.component,
+                          query_id=statement.query_id, rows=statement.rows)
+
+    def export_chrome_trace(self, path: Path) -> Path:
+        """Write the spans as Chrome trace-event JSON (complete "X" events, one thread per track)"""
+        return write_chrome_trace(self.spans, path, self.name, self.started_at)
+
+
+# The tracer of the deployment in progress; None disables ``trace_span``
+_active_tracer: Optional[Tracer] = None
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _active_tracer
+    _active_tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _active_tracer
+
+
+@contextmanager
+def trace_span(name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """Span on the active tracer; a plain pass-through when none is set"""
+    tracer = _active_tracer
+    if tracer is None:
+        yield args
+        return
+    with tracer.span(name, category, **args) as span_args:
+        yield span_args
+
+
+def write_chrome_trace(spans: Sequence[Span], path: Path, name: str = "deploy",
+                       started_at: Optional[datetime] = None) -> Path:
+    """Write spans as Chrome trace-event JSON (microsecond timestamps)"""
+    pid = os.getpid()
+    tracks: Dict[str, int] = {}
+    for span in sorted(spans, key=lambda span: span.start):
+        tracks.setdefault(span.track, len(tracks) + 1)
+    events: List[Dict[str, Any]] = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}]
+    events.extend({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": track}}
+                  for track, tid in tracks.items())
+    events.extend({"name": span.name, "cat": span.category, "ph": "X", "pid": pid, "tid": tracks[span.track],
+                   "ts": round(span.start * 1e6), "dur": round(span.duration * 1e6), "args": span.args}
+                  for span in spans)
+    trace = {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"name": name, "started_at": (started_at or datetime.now()).isoformat(timespec="seconds")},
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(trace, default=str))
+    return path
+
+
+def load_trace(path: Path) -> List[Span]:
+    """Read the complete events of a Chrome trace-event file back into spans"""
+    data = json.loads(Path(path).read_text())
+    events = data.get("traceEvents", []) if isinstance(data, dict) else data
+    tracks = {(event.get("pid"), event.get("tid")): event.get("args", {}).get("name")
+              for event in events if event.get("ph") == "M" and event.get("name") == "thread_name"}
+    return [Span(event["name"], event.get("cat", ""), event["ts"] / 1e6, event.get("dur", 0) / 1e6,
+                 tracks.get((event.get("pid"), event.get("tid"))) or str(event.get("tid")), event.get("args", {}))
+            for event in events if event.get("ph") == "X"]
+
+
+def compute_self_times(spans: Sequence[Span]) -> None:
+    """Set ``self_seconds``: each span's duration minus its direct children on the same track"""
+    by_track: Dict[str, List[Span]] = {}
+    for span in spans:
+        by_track.setdefault(span.track, []).append(span)
+    for track_spans in by_track.values():
+        # Parents first: earlier start, then longer duration
+        track_spans.sort(key=lambda span: (span.start, -span.duration))
+        stack: List[Span] = []
+        for span in track_spans:
+            span.self_seconds = span.duration
+            while stack and span.start >= stack[-1].end:
+                stack.pop()
+            if stack:
+                stack[-1].self_seconds -= span.duration
+            stack.append(span)
+    for span in spans:
+        span.self_seconds = max(span.self_seconds or 0.0, 0.0)
+
+
+def top_spans(spans: Sequence[Span], n: int = DEFAULT_TOP_SPANS) -> List[Span]:
+    """The ``n`` longest spans (with self times filled in)"""
+    compute_self_times(spans)
+    return sorted(spans, key=lambda span: span.duration, reverse=True)[:n]
+
+
+def format_top_spans(spans: Sequence[Span], n: int = DEFAULT_TOP_SPANS) -> List[str]:
+    """Text report of the ``n`` slowest spans and of total self time per category"""
+    if not spans:
+        return ["(no spans recorded)"]
+    lines = [f"{'total':>9} {'self':>9}  {'category':<10} span"]
+    for span in top_spans(spans, n):
+        lines.append(f"{span.duration:8.2f}s {span.self_seconds:8.2f}s  {span.category:<10} {span.name}")
+    by_category: Dict[str, float] = {}
+    for span in spans:
+        by_category[span.category] = by_category.get(span.category, 0.0) + (span.self_seconds or 0.0)
+    lines.append("self time by category: " + ", ".join(
+        f"{category} {seconds:.2f}s" for category, seconds in sorted(by_category.items(), key=lambda item: -item[1])))
+    return lines
+
+
+def _totals(spans: Sequence[Span]) -> Dict[Tuple[str, str], float]:
+    totals: Dict[Tuple[str, str], float] = {}
+    for span in spans:
+        key = (span.category, span.name)
+        totals[key] = totals.get(key, 0.0) + span.duration
+    return totals
+
+
+def compare_traces(
+    previous: Sequence[Span],
+    current: Sequence[Span],
+    threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+    min_seconds: float = DEFAULT_REGRESSION_MIN_SECONDS
+) -> List[SpanChange]:
+    """
+    Spans that got slower than in a previous trace
+
+    Spans are matched by category and name, with repeated spans summed.
+    Spans that appear in only one trace are ignored, e.g. steps skipped as
+    unchanged.
+
+    Args:
+        previous: Spans of the baseline trace
+        current: Spans of this trace
+        threshold: Relative slowdown that counts as a regression (0.2 = 20% slower)
+        min_seconds: Absolute slowdown below which changes are noise
+
+    Returns:
+        Regressions, largest slowdown first
+    """
+    before, after = _totals(previous), _totals(current)
+    changes = [SpanChange(category, name, before[(category, name)], seconds)
+               for (category, name), seconds in after.items() if (category, name) in before]
+    regressions = [change for change in changes
+                   if change.delta_seconds >= min_seconds and change.current_seconds >= change.previous_seconds * (1 + threshold)]
+    return sorted(regressions, key=lambda change: change.delta_seconds, reverse=True)
+
+
+def format_regressions(regressions: Sequence[SpanChange]) -> List[str]:
+    if not regressions:
+        return ["no regressions"]
+    return [f"🔺 {change.category:<10} {change.name}: {change.previous_seconds:.2f}s → {change.current_seconds:.2f}s "
+            f"(+{change.delta_seconds:.2f}s, x{change.ratio:.2f})" for change in regressions]
+
+
+def log_trace_report(spans: Sequence[Span], top: int = DEFAULT_TOP_SPANS,
+                     previous: Optional[Sequence[Span]] = None) -> List[SpanChange]:
+    """Log the top-N report and, given a previous trace, its regressions"""
+    logger.info(f"🔥 Slowest {min(top, len(spans))} of {len(spans)} spans:")
+    for line in format_top_spans(spans, top):
+        logger.info(f"   {line}")
+    if previous is None:
+        return []
+    regressions = compare_traces(previous, spans)
+    logger.info(f"🆚 Compared with the previous trace: {len(regressions)} regression(s)")
+    for line in format_regressions(regressions):
+        (logger.warning if regressions else logger.info)(f"   {line}")
+    return regressions
+
+
+def main():
+    """Print the report for a saved trace, optionally against a previous one"""
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description="Summarize a deployment trace (Chrome trace-event JSON)")
+    parser.add_argument('trace', type=Path)
+    parser.add_argument('--compare', type=Path, default=None, metavar='PREVIOUS', help="Baseline trace to diff against")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_SPANS, help="Slowest spans to list (default: %(default)s)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="Relative slowdown reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    spans = load_trace(args.trace)
+    log_trace_report(spans, args.top)
+    if args.compare is not None:
+        regressions = compare_traces(load_trace(args.compare), spans, args.threshold)
+        logger.info(f"🆚 Compared with {args.compare}: {len(regressions)} regression(s)")
+        for line in format_regressions(regressions):
+            logger.info(f"   {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
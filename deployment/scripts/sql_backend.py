@@ -0,0 +1,418 @@
+"""
+Pharmacy2U Demo - SQL Script Execution Backends
+Purpose: Run deployment SQL in-process on pooled connector connections, with ``snow sql`` as fallback
+Method: Statement splitter with line numbers; ``execute_stream`` per statement; per-statement errors
+
+Each ``snow sql --filename`` call starts a Python interpreter, imports the
+CLI, parses its config and logs in again, which costs seconds per file
+before any SQL runs. ``ConnectorSqlBackend`` keeps Snowflake connector
+connections open for the whole deployment and runs scripts on them
+directly. Scripts are split into statements here, so a failure is reported
+as ``file:line`` with the failing statement instead of a CLI stack trace.
+
+Connections are pooled, not shared. ``USE ROLE/DATABASE/...`` is session
+state, and parallel deployment steps would otherwise switch each other's
+context. Sequential runs reuse a single connection. When a script changes
+the context, its connection is reset to the connection defaults before it
+goes back into the pool. A connection whose context cannot be restored
+(the default was unset, or the restoring USE failed) is closed instead.
+
+``open_sql_backend`` picks the backend (``PHARMACY2U_SQL_BACKEND`` =
+``auto`` | ``connector`` | ``cli``). ``auto`` falls back to
+``SnowCliSqlBackend`` when the connector is not installed or cannot connect.
+
+Both backends record ``deploy_trace`` spans: one per script, and with the
+connector one per statement (``file:line``).
+"""
+
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from deploy_trace import trace_span
+
+logger = logging.getLogger(__name__)
+
+SQL_BACKEND_ENV = "PHARMACY2U_SQL_BACKEND"
+SQL_BACKENDS = ("auto", "connector", "cli")
+
+# Connection keys that mean the connection authenticates without a browser
+_NON_BROWSER_AUTH_KEYS = ("password", "private_key_file", "private_key_path", "token", "authenticator")
+
+# Connection defaults restored after a script that ran USE statements, in this order
+_CONTEXT_KEYS = ("role", "warehouse", "database", "schema")
+
+# Context each USE form changes (USE DATABASE also resets the schema; unknown forms count as everything)
+_USE_CONTEXT_KEYS = {
+    "ROLE": ("role",),
+    "WAREHOUSE": ("warehouse",),
+    "DATABASE": ("database", "schema"),
+    "SCHEMA": ("database", "schema"),
+}
+
+
+@dataclass
+class SqlStatement:
+    """One statement of a script; ``line`` is the 1-based line it starts on"""
+    text: str
+    line: int
+
+
+@dataclass
+class ExecutedStatement:
+    """Timing and outcome of one executed statement"""
+    line: int
+    query_id: Optional[str]
+    rowcount: Optional[int]
+    elapsed_seconds: float
+
+
+@dataclass
+class SqlScriptResult:
+    """Outcome of running one script"""
+    name: str
+    backend: str
+    statements: List[ExecutedStatement] = field(default_factory=list)
+    error: Optional[str] = None
+    error_line: Optional[int] = None
+    elapsed_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _skip_quoted(sql_text: str, i: int) -> int:
+    """Index just past the quoted string or identifier starting at ``i``"""
+    quote = sql_text[i]
+    j = i + 1
+    while j < len(sql_text):
+        if quote == "'" and sql_text[j] == "\\":
+            j += 2
+            continue
+        if sql_text[j] == quote:
+            if sql_text[j + 1:j + 2] == quote:  # doubled quote escape
+                j += 2
+                continue
+            return j + 1
+        j += 1
+    return len(sql_text)
+
+
+def split_sql_statements(sql_text: str) -> List[SqlStatement]:
+    """
+    Split a script on top-level semicolons
+
+    Semicolons inside quoted strings, quoted identifiers, ``$$`` bodies and
+    ``--`` / ``/* */`` comments don't split. Comment-only or empty statements
+    are dropped.
+
+    Args:
+        sql_text: Script text
+
+    Returns:
+        Statements (without the trailing semicolon) and their starting lines
+    """
+    statements: List[SqlStatement] = []
+    n = len(sql_text)
+    i, line = 0, 1
+    start, start_line = None, 0
+
+    def skip_to(end: int) -> None:
+        nonlocal i, line
+        line += sql_text.count("\n", i, end)
+        i = end
+
+    while i < n:
+        ch = sql_text[i]
+        two = sql_text[i:i + 2]
+        if ch.isspace():
+            skip_to(i + 1)
+        elif two == "--":
+            end = sql_text.find("\n", i)
+            skip_to(n if end < 0 else end)
+        elif two == "/*":
+            end = sql_text.find("*/", i + 2)
+            skip_to(n if end < 0 else end + 2)
+        elif ch == ";":
+            if start is not None:
+                statements.append(SqlStatement(sql_text[start:i].strip(), start_line))
+                start = None
+            skip_to(i + 1)
+        else:
+            if start is None:
+                start, start_line = i, line
+            if ch in "'\"":
+                skip_to(_skip_quoted(sql_text, i))
+            elif two == "$$":
+                end = sql_text.find("$$", i + 2)
+                skip_to(n if end < 0 else end + 2)
+            else:
+                skip_to(i + 1)
+    if start is not None:
+        statements.append(SqlStatement(sql_text[start:].strip(), start_line))
+    return statements
+
+
+def _first_line(statement: str, width: int = 80) -> str:
+    first = statement.splitlines()[0] if statement else ""
+    return first if len(first) <= width else first[:width - 3] + "..."
+
+
+def _context_keys(statements: Iterable[SqlStatement]) -> Set[str]:
+    """Context keys the statements' USE commands change"""
+    keys: Set[str] = set()
+    for statement in statements:
+        words = statement.text.split(None, 2)
+        if words[0].upper() != "USE":
+            continue
+        if len(words) == 2:
+            # USE <database>[.<schema>]
+            keys.update(("database", "schema"))
+        else:
+            keys.update(_USE_CONTEXT_KEYS.get(words[1].upper(), _CONTEXT_KEYS))
+    return keys
+
+
+def connector_config(connection_name: str) -> Dict[str, Any]:
+    """Connector arguments for a Snowflake CLI connection (browser SSO only without other credentials)"""
+    from snowflake.cli.api.config import get_connection
+
+    config = {key: value for key, value in get_connection(connection_name).items() if value is not None}
+    if not any(key in config for key in _NON_BROWSER_AUTH_KEYS):
+        config["authenticator"] = "externalbrowser"
+    # Cache SSO/MFA tokens so pooled connections after the first don't prompt again
+    config.setdefault("client_store_temporary_credential", True)
+    return config
+
+
+class ConnectorSqlBackend:
+    """Runs scripts in-process on a pool of Snowflake connector connections"""
+
+    name = "connector"
+
+    def __init__(self, connection_name: str, connect: Optional[Callable[[], Any]] = None):
+        self.connection_name = connection_name
+        self._connect = connect or self._connect_with_cli_config
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._all: List[Any] = []
+        self._defaults: Dict[int, Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _connect_with_cli_config(self) -> Any:
+        import snowflake.connector
+
+        return snowflake.connector.connect(**connector_config(self.connection_name))
+
+    def _acquire(self) -> Any:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        start = time.perf_counter()
+        with trace_span(f"connect {self.connection_name}", "connect", backend=self.name):
+            connection = self._connect()
+        with self._lock:
+            self._all.append(connection)
+            pool_size = len(self._all)
+        # Remember what the connection started with so USE statements can be undone
+        self._defaults[id(connection)] = {key: getattr(connection, key, None) for key in _CONTEXT_KEYS}
+        logger.info(f"🔌 Opened SQL connection {pool_size} for {self.connection_name} "
+                    f"({time.perf_counter() - start:.2f}s)")
+        return connection
+
+    def _release(self, connection: Any, changed_context: Iterable[str] = ()) -> None:
+        """Return a connection to the pool, restoring the context keys a script changed first"""
+        defaults = self._defaults.get(id(connection), {})
+        changed = set(changed_context)
+        for key in (key for key in _CONTEXT_KEYS if key in changed):
+            value = defaults.get(key)
+            if not value:
+                # Nothing to USE back to, so the script's context would leak into the next one
+                logger.warning(f"⚠️  SQL connection started without a {key} - closing it instead of reusing it")
+                self._discard(connection)
+                return
+            try:
+                connection.cursor().execute(f"USE {key.upper()} {value}").close()
+            except Exception as e:
+                logger.warning(f"⚠️  Could not restore {key} {value} ({str(e)}) - closing the SQL connection")
+                self._discard(connection)
+                return
+        self._idle.put(connection)
+
+    def _discard(self, connection: Any) -> None:
+        with self._lock:
+            if connection in self._all:
+                self._all.remove(connection)
+        self._defaults.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to close SQL connection: {str(e)}")
+
+    def connect(self) -> None:
+        """Open the first pooled connection (raises if the connection cannot be made)"""
+        self._idle.put(self._acquire())
+
+    def run_script(self, sql_text: str, name: str, stop_on_error: bool = True) -> SqlScriptResult:
+        """
+        Run a script statement by statement on one pooled connection
+
+        Args:
+            sql_text: Script text
+            name: File or script name used in logs and error locations
+            stop_on_error: Stop at the first failing statement, like ``snow sql``
+
+        Returns:
+            SqlScriptResult; ``error`` is "name:line: statement: message" for the first failure
+        """
+        result = SqlScriptResult(name, self.name)
+        statements = split_sql_statements(sql_text)
+        start = time.perf_counter()
+        with trace_span(name, "sql_file", backend=self.name, statements=len(statements)) as file_span:
+            try:
+                connection = self._acquire()
+            except Exception as e:
+                result.error = file_span["error"] = f"{name}: could not connect: {str(e)}"
+                return result
+
+            try:
+                for statement in statements:
+                    statement_start = time.perf_counter()
+                    with trace_span(f"{name}:{statement.line}", "statement",
+                                    sql=_first_line(statement.text)) as statement_span:
+                        try:
+                            for cursor in connection.execute_stream(io.StringIO(statement.text),
+                                                                    remove_comments=False):
+                                result.statements.append(ExecutedStatement(
+                                    statement.line, getattr(cursor, "sfqid", None), getattr(cursor, "rowcount", None),
+                                    time.perf_counter() - statement_start))
+                                statement_span["query_id"] = result.statements[-1].query_id
+                                cursor.close()
+                        except Exception as e:
+                            message = getattr(e, "msg", None) or str(e)
+                            error = f"{name}:{statement.line}: {_first_line(statement.text)}: {message}"
+                            logger.error(f"   ❌ {error}")
+                            statement_span["error"] = message
+                            if result.error is None:
+                                result.error, result.error_line = error, statement.line
+                                file_span["error_line"] = statement.line
+                            if stop_on_error:
+                                break
+            finally:
+                self._release(connection, _context_keys(statements))
+        result.elapsed_seconds = time.perf_counter() - start
+        return result
+
+    def run_file(self, sql_file: Path, stop_on_error: bool = True) -> SqlScriptResult:
+        return self.run_script(Path(sql_file).read_text(), Path(sql_file).name, stop_on_error)
+
+    def query(self, sql: str) -> List[Dict[str, Any]]:
+        """Run one query and return its rows as dicts"""
+        with trace_span(_first_line(sql, 60), "query", backend=self.name):
+            return self._query(sql)
+
+    def _query(self, sql: str) -> List[Dict[str, Any]]:
+        connection = self._acquire()
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(sql)
+                columns = [column[0] for column in cursor.description or []]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        finally:
+            self._release(connection)
+
+    def close(self) -> None:
+        """Close every pooled connection"""
+        with self._lock:
+            connections, self._all = self._all, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(f"⚠️  Failed to close SQL connection: {str(e)}")
+        self._idle = queue.LifoQueue()
+        self._defaults.clear()
+
+
+class SnowCliSqlBackend:
+    """Runs scripts with one ``snow sql`` subprocess each (the original path, kept as fallback)"""
+
+    name = "cli"
+
+    def __init__(self, connection_name: str):
+        self.connection_name = connection_name
+
+    def run_file(self, sql_file: Path, stop_on_error: bool = True, name: Optional[str] = None) -> SqlScriptResult:
+        """Run a file with ``snow sql --filename`` (errors are per file, without line numbers)"""
+        result = SqlScriptResult(name or Path(sql_file).name, self.name)
+        start = time.perf_counter()
+        cmd = ['snow', 'sql', '--filename', str(sql_file), '--connection', self.connection_name]
+        with trace_span(result.name, "sql_file", backend=self.name) as file_span:
+            try:
+                subprocess.run(cmd, capture_output=True, text=True, check=True)
+            except subprocess.CalledProcessError as e:
+                result.error = f"{result.name}: {e.stderr}"
+                file_span["error"] = e.stderr
+                logger.error(f"   ❌ {result.error}")
+        result.elapsed_seconds = time.perf_counter() - start
+        return result
+
+    def run_script(self, sql_text: str, name: str, stop_on_error: bool = True) -> SqlScriptResult:
+        """Write the script to a temporary file and run it"""
+        with tempfile.NamedTemporaryFile("w", suffix=".sql", prefix=f"{name}_", delete=False) as temp_sql:
+            temp_sql.write(sql_text)
+        try:
+            return self.run_file(Path(temp_sql.name), stop_on_error, name)
+        finally:
+            os.unlink(temp_sql.name)
+
+    def query(self, sql: str) -> List[Dict[str, Any]]:
+        cmd = ['snow', 'sql', '--query', sql, '--connection', self.connection_name, '--format', 'json']
+        with trace_span(_first_line(sql, 60), "query", backend=self.name):
+            output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        return json.loads(output) if output.strip() else []
+
+    def close(self) -> None:
+        pass
+
+
+def open_sql_backend(connection_name: str, backend: Optional[str] = None):
+    """
+    Open the SQL backend for a deployment
+
+    Args:
+        connection_name: Snowflake CLI connection name
+        backend: 'auto', 'connector' or 'cli' (default: ``PHARMACY2U_SQL_BACKEND``, else 'auto')
+
+    Returns:
+        ConnectorSqlBackend (connected) or SnowCliSqlBackend
+    """
+    backend = backend or os.environ.get(SQL_BACKEND_ENV) or "auto"
+    if backend not in SQL_BACKENDS:
+        raise ValueError(f"Unsupported SQL backend '{backend}' - expected one of {SQL_BACKENDS}")
+    if backend == "cli":
+        return SnowCliSqlBackend(connection_name)
+
+    connector = ConnectorSqlBackend(connection_name)
+    try:
+        connector.connect()
+        logger.info("⚡ Running SQL in-process on pooled connector connections")
+        return connector
+    except Exception as e:
+        if backend == "connector":
+            raise
+        logger.warning(f"⚠️  In-process SQL unavailable ({str(e)}) - falling back to snow sql subprocesses")
+        return SnowCliSqlBackend(connection_name)
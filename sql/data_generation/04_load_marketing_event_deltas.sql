@@ -0,0 +1,48 @@
+-- ============================================================================
+-- Pharmacy2U Demo - Incremental Marketing Event Deltas
+-- Purpose: Load append-mode delta files and inspect the resulting refreshes
+-- Usage: python marketing_events_generator.py 100000 data/synthetic --append
+--        PUT file://data/synthetic/marketing_events_delta_*.ndjson @MARKETING_STAGE/json/ AUTO_COMPRESS=TRUE;
+-- ============================================================================
+
+USE ROLE ACCOUNTADMIN;
+USE DATABASE PHARMACY2U_BRONZE;
+USE SCHEMA RAW_DATA;
+USE WAREHOUSE PHARMACY2U_LOADING_WH;
+
+-- No TRUNCATE here: deltas are appended, and COPY load metadata skips
+-- files that were already loaded, so re-running only picks up new deltas
+COPY INTO RAW_MARKETING_EVENTS (EVENT_DATA, INGESTION_TIMESTAMP, SOURCE_SYSTEM)
+FROM (
+    SELECT $1, CURRENT_TIMESTAMP(), 'ADLS_GEN2'
+    FROM @MARKETING_STAGE/json/
+)
+PATTERN = '.*marketing_events_delta_.*[.]ndjson([.]gz)?'
+FILE_FORMAT = (TYPE = 'JSON')
+ON_ERROR = 'CONTINUE';
+
+-- Confirm the delta continues after the previous high-water mark
+SELECT
+    COUNT(*) AS total_events,
+    MAX(EVENT_DATA:event_id::STRING) AS last_event_id,
+    MAX(EVENT_DATA:event_timestamp::TIMESTAMP_NTZ) AS last_event_timestamp
+FROM RAW_MARKETING_EVENTS;
+
+-- Trigger the downstream refreshes rather than waiting for TARGET_LAG
+ALTER DYNAMIC TABLE PHARMACY2U_SILVER.GOVERNED_DATA.MARKETING_EVENTS REFRESH;
+ALTER DYNAMIC TABLE PHARMACY2U_GOLD.ANALYTICS.PATIENT_360 REFRESH;
+
+-- Refresh mode and cost: deltas should show INCREMENTAL refreshes whose
+-- duration tracks the delta size rather than the full table
+SELECT
+    name,
+    refresh_action,
+    refresh_trigger,
+    state,
+    statistics:numInsertedRows::NUMBER AS rows_inserted,
+    DATEDIFF('millisecond', refresh_start_time, refresh_end_time) AS duration_ms,
+    refresh_start_time
+FROM TABLE(PHARMACY2U_GOLD.INFORMATION_SCHEMA.DYNAMIC_TABLE_REFRESH_HISTORY())
+WHERE name IN ('MARKETING_EVENTS', 'PATIENT_360')
+ORDER BY refresh_start_time DESC
+LIMIT 20;
@@ -0,0 +1,43 @@
+-- ============================================================================
+-- Pharmacy2U Demo - Load Offline Patient & Prescription Shards
+-- Purpose: COPY shards from offline_generator.py instead of generating in-warehouse
+-- Usage: python src/python/data_generation/offline_generator.py all --workers 8
+--        (or --format parquet and the MATCH_BY_COLUMN_NAME variants below)
+-- ============================================================================
+
+USE ROLE ACCOUNTADMIN;
+USE DATABASE PHARMACY2U_BRONZE;
+USE SCHEMA RAW_DATA;
+USE WAREHOUSE PHARMACY2U_LOADING_WH;
+
+-- Clear existing data
+TRUNCATE TABLE IF EXISTS RAW_PATIENTS;
+TRUNCATE TABLE IF EXISTS RAW_PRESCRIPTIONS;
+
+-- Shards are already gzip-compressed; PARALLEL uploads several at once
+PUT file://data/synthetic/offline/patients_part_*.csv.gz @PATIENT_STAGE/offline/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=16;
+PUT file://data/synthetic/offline/prescriptions_part_*.csv.gz @PRESCRIPTION_STAGE/offline/ AUTO_COMPRESS=FALSE OVERWRITE=TRUE PARALLEL=16;
+
+-- One shard per file lets COPY spread the load across warehouse threads
+COPY INTO RAW_PATIENTS
+FROM @PATIENT_STAGE/offline/
+PATTERN = '.*patients_part_.*[.]csv[.]gz'
+FILE_FORMAT = CSV_FORMAT
+ON_ERROR = 'ABORT_STATEMENT';
+
+COPY INTO RAW_PRESCRIPTIONS
+FROM @PRESCRIPTION_STAGE/offline/
+PATTERN = '.*prescriptions_part_.*[.]csv[.]gz'
+FILE_FORMAT = CSV_FORMAT
+ON_ERROR = 'ABORT_STATEMENT';
+
+-- Parquet shards (--format parquet) load by column name instead:
+-- PUT file://data/synthetic/offline/*_part_*.parquet @PATIENT_STAGE/offline_parquet/ AUTO_COMPRESS=FALSE PARALLEL=16;
+-- COPY INTO RAW_PATIENTS FROM @PATIENT_STAGE/offline_parquet/
+--     PATTERN = '.*patients_part_.*[.]parquet'
+--     FILE_FORMAT = PARQUET_FORMAT MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;
+
+-- Validate the load
+SELECT 'RAW_PATIENTS' AS TABLE_NAME, COUNT(*) AS ROW_COUNT FROM RAW_PATIENTS
+UNION ALL
+SELECT 'RAW_PRESCRIPTIONS', COUNT(*) FROM RAW_PRESCRIPTIONS;
@@ -76,21 +76,51 @@ TARGET_LAG = '1 minute'
 WAREHOUSE = PHARMACY2U_DEMO_WH
 AS
 SELECT
-    EVENT_DATA:event_id::VARCHAR AS EVENT_ID,
-    EVENT_DATA:patient_id::VARCHAR AS PATIENT_ID,
-    EVENT_DATA:campaign_id::VARCHAR AS CAMPAIGN_ID,
-    EVENT_DATA:campaign_name::VARCHAR AS CAMPAIGN_NAME,
-    EVENT_DATA:event_type::VARCHAR AS EVENT_TYPE,
-    EVENT_DATA:event_timestamp::TIMESTAMP_NTZ AS EVENT_TIMESTAMP,
-    EVENT_DATA:channel::VARCHAR AS CHANNEL,
-    EVENT_DATA:conversion_flag::BOOLEAN AS CONVERSION_FLAG,
+    EVENT_ID,
+    PATIENT_ID,
+    CAMPAIGN_ID,
+    CAMPAIGN_NAME,
+    EVENT_TYPE,
+    EVENT_TIMESTAMP,
+    CHANNEL,
+    CONVERSION_FLAG,
     CURRENT_TIMESTAMP() AS PROCESSED_TIMESTAMP
-FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS
-WHERE 
-    EVENT_DATA:event_id IS NOT NULL
-    AND EVENT_DATA:patient_id IS NOT NULL;
+FROM (
+    SELECT
+        EVENT_DATA:event_id::VARCHAR AS EVENT_ID,
+        EVENT_DATA:patient_id::VARCHAR AS PATIENT_ID,
+        EVENT_DATA:campaign_id::VARCHAR AS CAMPAIGN_ID,
+        EVENT_DATA:campaign_name::VARCHAR AS CAMPAIGN_NAME,
+        EVENT_DATA:event_type::VARCHAR AS EVENT_TYPE,
+        EVENT_DATA:event_timestamp::TIMESTAMP_NTZ AS EVENT_TIMESTAMP,
+        EVENT_DATA:channel::VARCHAR AS CHANNEL,
+        EVENT_DATA:conversion_flag::BOOLEAN AS CONVERSION_FLAG,
+        2 AS SOURCE_PRIORITY
+    FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS
+    WHERE 
+        EVENT_DATA:event_id IS NOT NULL
+        AND EVENT_DATA:patient_id IS NOT NULL
+    UNION ALL
+    -- Parquet-loaded events are already typed: no VARIANT path extraction on refresh
+    SELECT
+        EVENT_ID,
+        PATIENT_ID,
+        CAMPAIGN_ID,
+        CAMPAIGN_NAME,
+        EVENT_TYPE,
+        EVENT_TIMESTAMP,
+        CHANNEL,
+        CONVERSION_FLAG,
+        1 AS SOURCE_PRIORITY
+    FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS_TYPED
+    WHERE 
+        EVENT_ID IS NOT NULL
+        AND PATIENT_ID IS NOT NULL
+)
+-- Both load paths number events from EVT-0000000001: keep one row per EVENT_ID, preferring the typed load
+QUALIFY ROW_NUMBER() OVER (PARTITION BY EVENT_ID ORDER BY SOURCE_PRIORITY) = 1;
 
-COMMENT ON DYNAMIC TABLE PHARMACY2U_SILVER.GOVERNED_DATA.MARKETING_EVENTS IS 'Automated ELT: Flattened marketing events from JSON';
+COMMENT ON DYNAMIC TABLE PHARMACY2U_SILVER.GOVERNED_DATA.MARKETING_EVENTS IS 'Automated ELT: Flattened marketing events from JSON and typed Parquet';
 
 -- ============================================================================
 -- Validation Queries
@@ -122,6 +152,9 @@ UNION ALL
 SELECT 'BRONZE Marketing Events', COUNT(*) 
 FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS
 UNION ALL
+SELECT 'BRONZE Marketing Events (Parquet)', COUNT(*) 
+FROM PHARMACY2U_BRONZE.RAW_DATA.RAW_MARKETING_EVENTS_TYPED
+UNION ALL
 SELECT 'SILVER Marketing Events', COUNT(*) 
 FROM PHARMACY2U_SILVER.GOVERNED_DATA.MARKETING_EVENTS;
 
@@ -53,6 +53,11 @@ CREATE OR REPLACE FILE FORMAT PHARMACY2U_BRONZE.RAW_DATA.JSON_FORMAT
     STRIP_OUTER_ARRAY = TRUE
     COMMENT = 'JSON file format for marketing events and semi-structured data';
 
+CREATE OR REPLACE FILE FORMAT PHARMACY2U_BRONZE.RAW_DATA.PARQUET_FORMAT
+    TYPE = 'PARQUET'
+    COMPRESSION = AUTO
+    COMMENT = 'Parquet file format for columnar marketing events (snappy/zstd)';
+
 -- Create stages for data loading
 CREATE OR REPLACE STAGE PHARMACY2U_BRONZE.RAW_DATA.PRESCRIPTION_STAGE
     FILE_FORMAT = PHARMACY2U_BRONZE.RAW_DATA.CSV_FORMAT
@@ -58,6 +58,25 @@ CREATE TABLE IF NOT EXISTS RAW_MARKETING_EVENTS (
 
 COMMENT ON TABLE RAW_MARKETING_EVENTS IS 'Raw marketing events in JSON format from ADLS Gen2';
 
+-- Raw marketing events table (typed columns, loaded from Parquet via MATCH_BY_COLUMN_NAME)
+CREATE TABLE IF NOT EXISTS RAW_MARKETING_EVENTS_TYPED (
+    EVENT_ID VARCHAR(50),
+    PATIENT_ID VARCHAR(50),
+    CAMPAIGN_ID VARCHAR(50),
+    CAMPAIGN_NAME VARCHAR(200),
+    EVENT_TYPE VARCHAR(50),
+    EVENT_TIMESTAMP TIMESTAMP_NTZ,
+    CHANNEL VARCHAR(50),
+    CONVERSION_FLAG BOOLEAN,
+    DEVICE_TYPE VARCHAR(20),
+    BROWSER VARCHAR(20),
+    LOCATION VARCHAR(50),
+    INGESTION_TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+    SOURCE_SYSTEM VARCHAR(50) DEFAULT 'ADLS_GEN2'
+);
+
+COMMENT ON TABLE RAW_MARKETING_EVENTS_TYPED IS 'Raw marketing events in columnar Parquet format from ADLS Gen2';
+
 -- ============================================================================
 -- SILVER LAYER - Cleaned and Governed Tables
 -- ============================================================================
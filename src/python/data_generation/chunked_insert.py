@@ -0,0 +1,174 @@
+"""
+Pharmacy2U Demo - Chunked Asynchronous Inserts
+Purpose: Split very large GENERATOR inserts into ID-range chunks run concurrently
+Method: Tier 1 - Snowpark ``collect_nowait()`` jobs with polling and per-chunk retry
+
+One ``INSERT ... GENERATOR(ROWCOUNT => 100000000)`` runs as a single query on
+a single cluster, and a failure near the end throws away all of its work.
+Here the target is cut into chunks that each own a non-overlapping ID range
+(``ROW_NUMBER() OVER (ORDER BY SEQ4()) - 1 + offset``). ``SEQ4()`` alone is
+not gap-free, so a chunk numbered with it could run past its range into the
+next chunk's IDs; the row number covers exactly ``[offset, offset + rows)``.
+Chunks are submitted as asynchronous queries, up to a concurrency limit, so
+a multi-cluster warehouse can scale out across them.
+Each INSERT commits atomically, so a failed chunk has written nothing and is
+simply resubmitted.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from query_metrics import StatementMetrics, rows_affected
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000000
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_POLL_SECONDS = 2.0
+
+
+@dataclass
+class InsertChunk:
+    """One ID range of a chunked insert"""
+    index: int
+    offset: int
+    rows: int
+    attempts: int = 0
+    query_id: Optional[str] = None
+    error: Optional[str] = None
+    done: bool = False
+    rows_inserted: Optional[int] = None
+    submitted_at: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    def statement_metrics(self) -> StatementMetrics:
+        """Metrics for the chunk's last attempt (elapsed is submit to first done poll)"""
+        return StatementMetrics(query_id=self.query_id, rows=self.rows_inserted,
+                                elapsed_seconds=self.elapsed_seconds, label=f"chunk {self.index + 1}",
+                                started_at=self.submitted_at or None)
+
+
+@dataclass
+class ChunkedInsertResult:
+    """Outcome of ``run_chunked_insert``"""
+    chunks: List[InsertChunk]
+    duration_seconds: float
+
+    @property
+    def rows_inserted(self) -> int:
+        """Rows reported by the chunks' DML results (planned rows where no count came back)"""
+        return sum(chunk.rows if chunk.rows_inserted is None else chunk.rows_inserted
+                   for chunk in self.chunks if chunk.done)
+
+    @property
+    def failed_chunks(self) -> List[InsertChunk]:
+        return [chunk for chunk in self.chunks if not chunk.done]
+
+    @property
+    def retries(self) -> int:
+        return sum(max(chunk.attempts - 1, 0) for chunk in self.chunks)
+
+
+def plan_chunks(target_records: int, chunk_size: int, start_offset: int = 0) -> List[InsertChunk]:
+    """
+    Split ``target_records`` into consecutive, non-overlapping ID ranges
+
+    Args:
+        target_records: Total rows to insert
+        chunk_size: Maximum rows per chunk
+        start_offset: ID offset of the first row (0 numbers rows from 0, like the unchunked insert)
+
+    Returns:
+        Chunks covering [start_offset, start_offset + target_records)
+    """
+    if chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    return [
+        InsertChunk(index=index, offset=start_offset + offset, rows=min(chunk_size, target_records - offset))
+        for index, offset in enumerate(range(0, target_records, chunk_size))
+    ]
+
+
+def run_chunked_insert(
+    session: Any,
+    build_sql: Callable[[int, int], str],
+    target_records: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    poll_seconds: float = DEFAULT_POLL_SECONDS,
+    label: str = "rows"
+) -> ChunkedInsertResult:
+    """
+    Run a GENERATOR insert as concurrent asynchronous chunks
+
+    Args:
+        session: Snowpark session (anything whose ``sql(...)`` supports ``collect_nowait()``)
+        build_sql: ``build_sql(rows, id_offset)`` returns the INSERT for one chunk
+        target_records: Total rows to insert
+        chunk_size: Maximum rows per chunk
+        max_concurrency: Maximum chunks running at once
+        max_retries: Resubmissions allowed per failed chunk
+        poll_seconds: Delay between status polls of the running jobs
+        label: Noun used in progress messages
+
+    Returns:
+        ChunkedInsertResult; chunks still failed after their retries have ``done=False``
+    """
+    start_time = time.perf_counter()
+    chunks = plan_chunks(target_records, chunk_size)
+    pending = list(chunks)
+    running = []  # (chunk, async job)
+
+    logger.info(f"📦 Inserting {target_records:,} {label} as {len(chunks)} chunks "
+                f"of up to {chunk_size:,} ({max_concurrency} concurrent)")
+
+    while pending or running:
+        # Top up to the concurrency limit
+        while pending and len(running) < max_concurrency:
+            chunk = pending.pop(0)
+            chunk.attempts += 1
+            chunk.submitted_at = time.perf_counter()
+            job = session.sql(build_sql(chunk.rows, chunk.offset)).collect_nowait()
+            chunk.query_id = getattr(job, "query_id", None)
+            running.append((chunk, job))
+
+        still_running = []
+        for chunk, job in running:
+            if not job.is_done():
+                still_running.append((chunk, job))
+                continue
+            chunk.elapsed_seconds = time.perf_counter() - chunk.submitted_at
+            try:
+                chunk.rows_inserted = rows_affected(job.result())
+            except Exception as e:
+                chunk.error = str(e)
+                if chunk.attempts <= max_retries:
+                    logger.warning(f"⚠️  Chunk {chunk.index + 1}/{len(chunks)} failed "
+                                   f"(attempt {chunk.attempts}), retrying: {chunk.error}")
+                    pending.append(chunk)
+                else:
+                    logger.error(f"❌ Chunk {chunk.index + 1}/{len(chunks)} failed after "
+                                 f"{chunk.attempts} attempts: {chunk.error}")
+                continue
+            chunk.done = True
+            chunk.error = None
+            rows_done = sum(c.rows for c in chunks if c.done)  # planned rows, for progress
+            logger.info(f"   ✅ Chunk {chunk.index + 1}/{len(chunks)} done - "
+                        f"{rows_done:,}/{target_records:,} {label} ({rows_done / target_records:.0%})")
+        running = still_running
+
+        if running:
+            time.sleep(poll_seconds)
+
+    result = ChunkedInsertResult(chunks=chunks, duration_seconds=time.perf_counter() - start_time)
+    if result.failed_chunks:
+        logger.error(f"❌ {len(result.failed_chunks)} of {len(chunks)} chunks failed "
+                     f"({target_records - result.rows_inserted:,} {label} missing)")
+    else:
+        logger.info(f"📦 All {len(chunks)} chunks inserted in {result.duration_seconds:.2f}s "
+                    f"({result.retries} retries)")
+    return result
@@ -0,0 +1,95 @@
+"""
+Pharmacy2U Demo - Weighted Drug Selection Engine
+Purpose: Assign each prescription a BNF drug by prescribing frequency in O(1) per row
+Method: Shared by the Snowpark (SQL) and offline (NumPy) prescription generators
+
+Prescribing weights are turned once into a fixed-size slot table - the
+cumulative weight distribution quantised into equal-probability slots. Every
+slot holds a drug index, and each drug owns a run of slots proportional to
+its weight (largest-remainder rounding, at least one slot per prescribed
+drug). A row picks its drug with one uniform slot draw and
+two array lookups - no per-row sort, no join against a temporary reference
+table - so generation stays O(n) from thousands to billions of rows. The SQL
+and NumPy paths index the same slot table and therefore share one distribution.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from reference_data import DRUG_PRESCRIBING_WEIGHTS, UK_DRUGS
+
+DEFAULT_SLOTS = 1000  # share resolution of 0.1%
+
+
+def _sql_literal(value) -> str:
+    return f"'{value}'" if isinstance(value, str) else repr(value)
+
+
+class DrugSelector:
+    """Slot-table drug sampler with matching SQL and NumPy front ends"""
+
+    def __init__(
+        self,
+        drugs: List[Tuple[str, str, int, float]] = UK_DRUGS,
+        weights: Optional[Dict[str, float]] = None,
+        slots: int = DEFAULT_SLOTS
+    ):
+        """
+        Args:
+            drugs: (BNF code, name, typical quantity, average cost) reference rows
+            weights: Relative prescribing frequency per BNF code (default: DRUG_PRESCRIBING_WEIGHTS;
+                codes without a weight are never selected)
+            slots: Slot table size; each drug's share is rounded to 1/slots
+        """
+        weights = DRUG_PRESCRIBING_WEIGHTS if weights is None else weights
+        self.drugs = list(drugs)
+        self.codes, self.names, self.typical_qty, self.avg_cost = (np.array(column) for column in zip(*self.drugs))
+
+        raw = np.array([weights.get(code, 0.0) for code in self.codes], dtype=float)
+        if raw.sum() <= 0:
+            raise ValueError("At least one drug needs a positive prescribing weight")
+
+        # Largest-remainder allocation of slots, keeping every prescribed drug selectable
+        exact = raw / raw.sum() * slots
+        counts = np.floor(exact).astype(int)
+        counts[(raw > 0) & (counts == 0)] = 1
+        remainder = slots - counts.sum()
+        if remainder > 0:
+            counts[np.argsort(-(exact - np.floor(exact)))[:remainder]] += 1
+        elif remainder < 0:
+            counts[np.argmax(counts)] += remainder
+        self.slot_table = np.repeat(np.arange(len(self.drugs), dtype=np.int16), counts)
+
+    @property
+    def shares(self) -> Dict[str, float]:
+        """Realised selection probability per drug name (slot share)"""
+        counts = np.bincount(self.slot_table, minlength=len(self.drugs))
+        return {name: count / len(self.slot_table) for name, count in zip(self.names.tolist(), counts.tolist())}
+
+    def draw_indices(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Drug index per row for the offline path (one uniform slot draw each)"""
+        return self.slot_table[rng.integers(0, len(self.slot_table), size=size)]
+
+    def sql_lookup_select(self) -> str:
+        """
+        Single-row SELECT of the slot table and per-drug attribute arrays
+
+        Meant for a ``WITH drug_lookup AS (...)`` CTE cross-joined onto the
+        generated rows; arrays are zero-indexed like the slot table.
+        """
+        def array(values) -> str:
+            return "ARRAY_CONSTRUCT(" + ", ".join(_sql_literal(value) for value in values) + ")"
+
+        return (
+            f"SELECT\n"
+            f"            {array(self.slot_table.tolist())} AS SLOTS,\n"
+            f"            {array(self.codes.tolist())} AS CODES,\n"
+            f"            {array(self.names.tolist())} AS NAMES,\n"
+            f"            {array(self.typical_qty.tolist())} AS TYPICAL_QTY,\n"
+            f"            {array(self.avg_cost.tolist())} AS AVG_COST"
+        )
+
+    def sql_index_expression(self, lookup: str = "drug_lookup") -> str:
+        """SQL drug index per row: one UNIFORM slot draw looked up in the slot table"""
+        return f"{lookup}.SLOTS[UNIFORM(0, {len(self.slot_table) - 1}, RANDOM())]::INT"
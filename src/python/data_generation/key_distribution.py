@@ -0,0 +1,172 @@
+"""
+Pharmacy2U Demo - Patient Key Distributions
+Purpose: Shared uniform / Zipf / hot-set patient key draws for every generator
+Method: One inverse-CDF formula per distribution, rendered as SQL, NumPy and per-event Python
+
+Prescriptions and marketing events reference patients by key. Spreading them
+evenly hides the skew that real repeat-prescription data has, and skew is
+what produces spilling aggregates and straggler partitions in the
+PATIENT_360 joins. Keys are 0-based, like the generated patient IDs, so
+key k is ``PT-{k:08d}`` and the key space is the actual patient count.
+
+* ``uniform`` - every patient equally likely
+* ``zipf`` - rank r (0-based) has weight ``(r + 1) ** -s``, drawn from the
+  continuous power-law inverse CDF so no per-key table is needed at 100M keys
+* ``hotset`` - ``hot_share`` of rows go to the first ``hot_fraction`` of ranks
+
+Skewed ranks are scattered over the key space with a multiplicative
+permutation (``rank * m mod n``), so the hottest patients are not one
+contiguous ID range.
+"""
+
+import argparse
+import math
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+KEY_DISTRIBUTIONS = ("uniform", "zipf", "hotset")
+DEFAULT_PATIENT_COUNT = 100000
+DEFAULT_ZIPF_EXPONENT = 1.1
+DEFAULT_HOT_FRACTION = 0.01
+DEFAULT_HOT_SHARE = 0.5
+
+# Knuth's multiplicative hashing constant (prime); bumped if it shares a factor with the key count
+_SCATTER_MULTIPLIER = 2654435761
+
+
+def _scatter_multiplier(key_count: int) -> int:
+    multiplier = _SCATTER_MULTIPLIER
+    while math.gcd(multiplier, key_count) != 1:
+        multiplier += 2
+    return multiplier
+
+
+@dataclass(frozen=True)
+class KeyDistribution:
+    """How generated rows pick patient keys in [0, key_count)"""
+    kind: str = "uniform"
+    key_count: int = DEFAULT_PATIENT_COUNT
+    zipf_exponent: float = DEFAULT_ZIPF_EXPONENT
+    hot_fraction: float = DEFAULT_HOT_FRACTION
+    hot_share: float = DEFAULT_HOT_SHARE
+
+    def __post_init__(self):
+        if self.kind not in KEY_DISTRIBUTIONS:
+            raise ValueError(f"Unsupported key distribution '{self.kind}' - expected one of {KEY_DISTRIBUTIONS}")
+        if self.key_count < 1:
+            raise ValueError(f"key_count must be >= 1, got {self.key_count}")
+        if self.zipf_exponent <= 0:
+            raise ValueError(f"zipf_exponent must be > 0, got {self.zipf_exponent}")
+        if not 0 < self.hot_fraction <= 1 or not 0 <= self.hot_share <= 1:
+            raise ValueError("hot_fraction must be in (0, 1] and hot_share in [0, 1]")
+
+    @property
+    def hot_count(self) -> int:
+        return max(1, round(self.key_count * self.hot_fraction))
+
+    @property
+    def _multiplier(self) -> int:
+        return _scatter_multiplier(self.key_count)
+
+    def _zipf_constants(self):
+        """(a, e) with rank = floor((a * u + 1) ** e) - 1; s == 1 uses (n + 1) ** u instead"""
+        one_minus_s = 1 - self.zipf_exponent
+        return (self.key_count + 1) ** one_minus_s - 1, 1 / one_minus_s
+
+    def describe(self) -> str:
+        if self.kind == "zipf":
+            return f"zipf (s={self.zipf_exponent:g}) over {self.key_count:,} patients"
+        if self.kind == "hotset":
+            return (f"hotset ({self.hot_share:.0%} of rows on {self.hot_count:,} hot patients) "
+                    f"over {self.key_count:,} patients")
+        return f"uniform over {self.key_count:,} patients"
+
+    def draw(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        """Draw ``size`` 0-based patient keys (int64)"""
+        n = self.key_count
+        if self.kind == "uniform":
+            return rng.integers(0, n, size=size, dtype=np.int64)
+        if self.kind == "zipf":
+            u = rng.random(size)
+            if self.zipf_exponent == 1:
+                ranks = np.floor(np.power(float(n + 1), u))
+            else:
+                a, e = self._zipf_constants()
+                ranks = np.floor(np.power(a * u + 1, e))
+            ranks = np.minimum(ranks.astype(np.int64) - 1, n - 1)
+        else:
+            hot = rng.random(size) < self.hot_share
+            ranks = np.where(hot, rng.integers(0, self.hot_count, size=size, dtype=np.int64),
+                             rng.integers(0, n, size=size, dtype=np.int64))
+        return ranks * self._multiplier % n
+
+    def draw_one(self, rng: random.Random) -> int:
+        """Draw one 0-based patient key with a ``random.Random`` (the per-event loop engine)"""
+        n = self.key_count
+        if self.kind == "uniform":
+            return rng.randrange(n)
+        if self.kind == "zipf":
+            u = rng.random()
+            if self.zipf_exponent == 1:
+                rank = math.floor((n + 1) ** u)
+            else:
+                a, e = self._zipf_constants()
+                rank = math.floor((a * u + 1) ** e)
+            rank = min(rank - 1, n - 1)
+        else:
+            rank = rng.randrange(self.hot_count) if rng.random() < self.hot_share else rng.randrange(n)
+        return rank * self._multiplier % n
+
+    def sql_expression(self) -> str:
+        """Snowflake expression drawing one 0-based patient key per row"""
+        n = self.key_count
+        if self.kind == "uniform":
+            return f"UNIFORM(0, {n - 1}, RANDOM())"
+        u = "UNIFORM(0::FLOAT, 1::FLOAT, RANDOM())"
+        if self.kind == "zipf":
+            if self.zipf_exponent == 1:
+                rank = f"FLOOR(POWER({n + 1}, {u}))::INT - 1"
+            else:
+                a, e = self._zipf_constants()
+                rank = f"FLOOR(POWER({a!r} * {u} + 1, {e!r}))::INT - 1"
+            rank = f"LEAST({rank}, {n - 1})"
+        else:
+            rank = (f"IFF({u} < {self.hot_share!r}, UNIFORM(0, {self.hot_count - 1}, RANDOM()), "
+                    f"UNIFORM(0, {n - 1}, RANDOM()))")
+        return f"MOD(({rank}) * {self._multiplier}, {n})"
+
+    def with_key_count(self, key_count: int) -> "KeyDistribution":
+        return KeyDistribution(self.kind, key_count, self.zipf_exponent, self.hot_fraction, self.hot_share)
+
+
+DEFAULT_PATIENT_KEYS = KeyDistribution()
+
+
+def add_key_distribution_arguments(parser: argparse.ArgumentParser, patient_count: bool = True) -> None:
+    """Add the shared ``--key-distribution`` options to a generator's argument parser"""
+    group = parser.add_argument_group("patient key distribution")
+    group.add_argument("--key-distribution", choices=KEY_DISTRIBUTIONS, default="uniform",
+                       help="How rows pick PATIENT_ID (default: %(default)s)")
+    group.add_argument("--zipf-exponent", type=float, default=DEFAULT_ZIPF_EXPONENT,
+                       help="Zipf exponent s; larger is more skewed (default: %(default)s)")
+    group.add_argument("--hot-fraction", type=float, default=DEFAULT_HOT_FRACTION,
+                       help="Fraction of patients in the hot set (default: %(default)s)")
+    group.add_argument("--hot-share", type=float, default=DEFAULT_HOT_SHARE,
+                       help="Fraction of rows that hit the hot set (default: %(default)s)")
+    if patient_count:
+        group.add_argument("--patient-count", type=int, default=DEFAULT_PATIENT_COUNT,
+                           help="Patient key space, i.e. the number of generated patients (default: %(default)s)")
+
+
+def key_distribution_from_args(args: argparse.Namespace, key_count: Optional[int] = None) -> KeyDistribution:
+    """Build the distribution from parsed arguments (``key_count`` overrides ``--patient-count``)"""
+    return KeyDistribution(
+        kind=args.key_distribution,
+        key_count=key_count if key_count is not None else getattr(args, "patient_count", DEFAULT_PATIENT_COUNT),
+        zipf_exponent=args.zipf_exponent,
+        hot_fraction=args.hot_fraction,
+        hot_share=args.hot_share,
+    )
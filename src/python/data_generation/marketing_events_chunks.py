@@ -0,0 +1,188 @@
+"""
+Pharmacy2U Demo - Compressed Chunk Writer for Marketing Events
+Purpose: Roll NDJSON output into stage-ready gzip/zstd chunks of a target size
+Method: Tier 3 - Local Python generation, compression in the same streaming pass
+
+Snowflake parallelises COPY across files, not within one, so a single 1 GB+
+file loads on one thread. Rolling output into ~100-250 MB compressed chunks
+lets the deployer PUT the whole directory with PARALLEL= and COPY with a
+PATTERN, keeping every loading thread busy.
+"""
+
+import gzip
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+CHUNK_COMPRESSIONS = ("gzip", "zstd")
+CHUNK_EXTENSIONS = {"gzip": "gz", "zstd": "zst"}
+DEFAULT_TARGET_CHUNK_MB = 128
+
+
+@dataclass
+class ChunkInfo:
+    """Statistics for one closed, stage-ready chunk file"""
+    path: Path
+    events: int
+    raw_bytes: int
+    compressed_bytes: int
+    compress_seconds: float
+
+
+def chunk_file_name(chunk_index: int, compression: str, prefix: str = "marketing_events_chunk") -> str:
+    """File name for a compressed chunk, e.g. marketing_events_chunk_0003.ndjson.gz"""
+    return f"{prefix}_{chunk_index:04d}.ndjson.{CHUNK_EXTENSIONS[compression]}"
+
+
+class ChunkedCompressedWriter:
+    """
+    Compress NDJSON as it is written and roll to a new file at a target size
+
+    Chunks only ever break between writes, and callers write whole lines, so
+    every chunk is independently loadable NDJSON. The compressed size is
+    measured from the underlying file, so rolling tracks what actually lands
+    on the stage rather than the raw JSON volume.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        compression: str = "gzip",
+        target_chunk_bytes: int = DEFAULT_TARGET_CHUNK_MB * 1024 * 1024,
+        prefix: str = "marketing_events_chunk",
+        level: Optional[int] = None,
+        on_chunk_closed: Optional[Callable[[ChunkInfo], None]] = None
+    ):
+        """
+        Args:
+            output_dir: Directory the chunk files are written to
+            compression: 'gzip' (stdlib) or 'zstd' (requires the zstandard package)
+            target_chunk_bytes: Compressed size at which a chunk is closed
+            prefix: File name prefix for the chunks
+            level: Compression level (default: 6 for gzip, 3 for zstd)
+            on_chunk_closed: Callback invoked with each closed chunk (e.g. to hand it to an uploader)
+        """
+        if compression not in CHUNK_COMPRESSIONS:
+            raise ValueError(f"Unsupported compression '{compression}' - expected one of {CHUNK_COMPRESSIONS}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd chunks require zstandard - install it with: pip install zstandard")
+
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self.target_chunk_bytes = target_chunk_bytes
+        self.prefix = prefix
+        self.level = level
+        self.on_chunk_closed = on_chunk_closed
+        self.chunks: List[ChunkInfo] = []
+
+        self._raw_file: Optional[BinaryIO] = None
+        self._stream: Optional[BinaryIO] = None
+        self._path: Optional[Path] = None
+        self._events = 0
+        self._raw_bytes = 0
+        self._compress_seconds = 0.0
+
+    def _open_chunk(self) -> None:
+        """Start the next chunk file"""
+        self._path = self.output_dir / chunk_file_name(len(self.chunks), self.compression, self.prefix)
+        self._raw_file = open(self._path, 'wb')
+        if self.compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.level if self.level is not None else 3)
+            self._stream = compressor.stream_writer(self._raw_file, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._raw_file, mode='wb',
+                                         compresslevel=self.level if self.level is not None else 6)
+        self._events = 0
+        self._raw_bytes = 0
+        self._compress_seconds = 0.0
+
+    def write(self, data: bytes, events: int) -> None:
+        """
+        Compress a block of whole NDJSON lines into the current chunk
+
+        Args:
+            data: Encoded lines, each terminated by a newline
+            events: Number of events (lines) in ``data``
+        """
+        if self._stream is None:
+            self._open_chunk()
+
+        start = time.perf_counter()
+        self._stream.write(data)
+        self._compress_seconds += time.perf_counter() - start
+        self._events += events
+        self._raw_bytes += len(data)
+
+        if self._raw_file.tell() >= self.target_chunk_bytes:
+            self._close_chunk()
+
+    def _close_chunk(self) -> None:
+        """Finish the current chunk and record its statistics"""
+        start = time.perf_counter()
+        self._stream.close()
+        self._compress_seconds += time.perf_counter() - start
+        self._raw_file.close()
+
+        chunk = ChunkInfo(
+            path=self._path,
+            events=self._events,
+            raw_bytes=self._raw_bytes,
+            compressed_bytes=self._path.stat().st_size,
+            compress_seconds=self._compress_seconds,
+        )
+        self.chunks.append(chunk)
+        self._stream = None
+        self._raw_file = None
+
+        if self.on_chunk_closed is not None:
+            self.on_chunk_closed(chunk)
+
+    def close(self) -> List[ChunkInfo]:
+        """Close the last (possibly partial) chunk and return every chunk written"""
+        if self._stream is not None:
+            self._close_chunk()
+        return self.chunks
+
+    def __enter__(self) -> "ChunkedCompressedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def summarize_chunks(chunks: List[ChunkInfo]) -> Dict[str, Any]:
+    """
+    Compression throughput and chunk-size distribution for a set of chunks
+
+    Returns:
+        Dict with chunk count, total raw/compressed MB, compression ratio,
+        compressor throughput (raw MB/s) and min/median/max chunk size in MB
+    """
+    if not chunks:
+        return {"chunks": 0}
+
+    mb = 1024 * 1024
+    raw_bytes = sum(chunk.raw_bytes for chunk in chunks)
+    compressed_bytes = sum(chunk.compressed_bytes for chunk in chunks)
+    compress_seconds = sum(chunk.compress_seconds for chunk in chunks)
+    sizes_mb = [chunk.compressed_bytes / mb for chunk in chunks]
+
+    return {
+        "chunks": len(chunks),
+        "events": sum(chunk.events for chunk in chunks),
+        "raw_mb": raw_bytes / mb,
+        "compressed_mb": compressed_bytes / mb,
+        "compression_ratio": raw_bytes / compressed_bytes if compressed_bytes else 0,
+        "compress_mb_per_second": raw_bytes / mb / compress_seconds if compress_seconds > 0 else 0,
+        "chunk_mb_min": min(sizes_mb),
+        "chunk_mb_median": statistics.median(sizes_mb),
+        "chunk_mb_max": max(sizes_mb),
+    }
@@ -2,74 +2,102 @@
 Pharmacy2U Demo - Marketing Events Generator
 Purpose: Generate realistic marketing event JSON files for ADLS Gen2 ingestion demo
 Target: 1M+ events in <3 minutes
-Method: Tier 3 - Local Python generation with JSON output
+Method: Tier 3 - Local Python generation with streaming NDJSON, Parquet or legacy JSON array output
 """
 
+import argparse
 import json
 import random
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
 import logging
+import secrets
 import sys
+import tempfile
+
+import numpy as np
+
+from key_distribution import (
+    DEFAULT_PATIENT_KEYS,
+    KeyDistribution,
+    add_key_distribution_arguments,
+    key_distribution_from_args,
+)
+from marketing_events_schema import (
+    BROWSERS,
+    CAMPAIGNS,
+    CONVERSION_PROBABILITIES,
+    DEVICE_TYPES,
+    EVENT_TYPES,
+    LOCATIONS,
+)
+from marketing_events_chunks import (
+    CHUNK_COMPRESSIONS,
+    DEFAULT_TARGET_CHUNK_MB,
+    ChunkedCompressedWriter,
+    ChunkInfo,
+    summarize_chunks,
+)
+from marketing_events_pipeline import DirectoryStageUploader, PipelineResult, StageUploader, UploadPipeline, MANIFEST_FILE
+from marketing_events_parquet import DEFAULT_ROW_GROUP_SIZE, PARQUET_COMPRESSIONS, write_parquet
+from marketing_events_serializers import DEFAULT_SERIALIZER, SERIALIZERS, JsonSerializer, get_serializer
+from marketing_events_stream import STREAM_PROFILES, MarketingEventStream, RateProfile
+from marketing_events_vectorized import EventBatch, generate_append_batches, generate_event_batches
+from marketing_events_watermark import STATE_FILE, Watermark, load_watermark, save_watermark
+from query_metrics import StepMetrics, metrics_step
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Marketing campaign configurations
-CAMPAIGNS = [
-    {"id": "CAMP-001", "name": "Heart Health Month", "channel": "email"},
-    {"id": "CAMP-002", "name": "Flu Season Reminder", "channel": "sms"},
-    {"id": "CAMP-003", "name": "Prescription Refill Alert", "channel": "push"},
-    {"id": "CAMP-004", "name": "Diabetes Awareness", "channel": "email"},
-    {"id": "CAMP-005", "name": "Summer Allergy Relief", "channel": "sms"},
-    {"id": "CAMP-006", "name": "Winter Wellness", "channel": "email"},
-    {"id": "CAMP-007", "name": "Mental Health Support", "channel": "push"},
-    {"id": "CAMP-008", "name": "NHS Prescription Savings", "channel": "email"},
-]
+OUTPUT_FORMATS = ("ndjson", "json", "parquet")
+ENGINES = ("vectorized", "loop")
+DEFAULT_SHARD_SIZE = 1000000
 
-EVENT_TYPES = ["email_open", "click", "conversion", "app_open", "sms_delivered", "push_notification"]
+SeedLike = Union[int, np.random.SeedSequence]
 
 
-def generate_marketing_events(target_records: int = 1000000, output_dir: str = "data/synthetic") -> None:
+def iter_marketing_events(
+    target_records: int,
+    start_date: Optional[datetime] = None,
+    start_index: int = 0,
+    rng: Optional[random.Random] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Iterator[Dict[str, Any]]:
     """
-    Generate realistic marketing event JSON data
+    Yield marketing events one at a time so callers never hold the full set in memory
     
     Args:
-        target_records: Number of events to generate (default 1M)
-        output_dir: Output directory for JSON files
+        target_records: Number of events to yield
+        start_date: Start of the 2-year event window (default: 730 days before now)
+        start_index: Zero-based offset of the first event, used for EVT- numbering
+        rng: Random source (default: the module-level ``random`` state)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
     """
-    logger.info(f"🚀 Starting marketing events generation - Target: {target_records:,} events")
-    start_time = datetime.now()
-    
-    # Create output directory
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-    
-    events = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=730)  # 2 years of data
+    rng = rng or random
+    patient_keys = patient_keys or DEFAULT_PATIENT_KEYS
+    if start_date is None:
+        start_date = datetime.now() - timedelta(days=730)  # 2 years of data
     
-    logger.info(f"📧 Generating {target_records:,} marketing events...")
-    
-    for i in range(target_records):
+    for i in range(start_index, start_index + target_records):
         # Generate random event timestamp
-        random_days = random.randint(0, 730)
-        random_seconds = random.randint(0, 86400)
+        random_days = rng.randint(0, 730)
+        random_seconds = rng.randint(0, 86400)
         event_timestamp = start_date + timedelta(days=random_days, seconds=random_seconds)
         
         # Select campaign and event type
-        campaign = random.choice(CAMPAIGNS)
-        event_type = random.choice(EVENT_TYPES)
+        campaign = rng.choice(CAMPAIGNS)
+        event_type = rng.choice(EVENT_TYPES)
         
         # Determine conversion (higher for certain event types)
-        conversion_probability = 0.15 if event_type == "conversion" else (
-            0.08 if event_type == "click" else 0.02
-        )
-        conversion_flag = random.random() < conversion_probability
+        conversion_flag = rng.random() < CONVERSION_PROBABILITIES[event_type]
         
-        event = {
+        yield {
             "event_id": f"EVT-{i+1:010d}",
-            "patient_id": f"PT-{random.randint(1, 100000):08d}",
+            "patient_id": f"PT-{patient_keys.draw_one(rng):08d}",
             "campaign_id": campaign["id"],
             "campaign_name": campaign["name"],
             "event_type": event_type,
@@ -77,59 +105,937 @@ def generate_marketing_events(target_records: int = 1000000, output_dir: str = "
             "channel": campaign["channel"],
             "conversion_flag": conversion_flag,
             "metadata": {
-                "device_type": random.choice(["mobile", "desktop", "tablet"]),
-                "browser": random.choice(["Chrome", "Safari", "Firefox", "Edge"]),
-                "location": random.choice(["London", "Manchester", "Birmingham", "Leeds", "Glasgow"])
+                "device_type": rng.choice(DEVICE_TYPES),
+                "browser": rng.choice(BROWSERS),
+                "location": rng.choice(LOCATIONS)
             }
         }
-        
-        events.append(event)
+
+
+def iter_ndjson_blocks(
+    events: Iterable[Dict[str, Any]],
+    chunk_events: int = 10000,
+    serializer: Optional[JsonSerializer] = None
+) -> Iterator[Tuple[bytes, int]]:
+    """
+    Serialize events into encoded NDJSON blocks of up to ``chunk_events`` lines
+    
+    Only one block of serialized lines is held at a time, so memory stays flat
+    however many events the iterable produces.
+    
+    Yields:
+        Tuple of (encoded newline-terminated lines, number of events)
+    """
+    return (serializer or JsonSerializer()).iter_record_blocks(events, chunk_events)
+
+
+def _write_blocks(
+    blocks: Iterable[Tuple[bytes, int]],
+    write: Callable[[bytes, int], None],
+    progress_interval: int
+) -> Tuple[int, int]:
+    """Feed NDJSON blocks to a sink, logging bytes written and events/second as it goes"""
+    start = time.perf_counter()
+    events_written = 0
+    bytes_written = 0
+    next_progress = progress_interval
+    
+    for data, events in blocks:
+        write(data, events)
+        events_written += events
+        bytes_written += len(data)
         
         # Progress logging
-        if (i + 1) % 100000 == 0:
-            logger.info(f"   Generated {i+1:,} events...")
+        if events_written >= next_progress:
+            _log_stream_progress(events_written, bytes_written, start)
+            next_progress += progress_interval
+    
+    return events_written, bytes_written
+
+
+def write_ndjson_stream(
+    blocks: Iterable[Tuple[bytes, int]],
+    output_file: Path,
+    progress_interval: int = 100000
+) -> Tuple[int, int]:
+    """
+    Stream encoded NDJSON blocks to a newline-delimited JSON file
+    
+    Only one serialized block is held at once, so peak memory is flat
+    regardless of how many events are written. NDJSON is also the layout
+    Snowflake COPY parallelises best (one VARIANT row per line).
+    
+    Args:
+        blocks: (encoded lines, event count) blocks from ``iter_engine_blocks``
+            or ``iter_ndjson_blocks``
+        output_file: Destination .ndjson path
+        progress_interval: Log bytes written and events/second every N events
+    
+    Returns:
+        Tuple of (events written, bytes written)
+    """
+    with open(output_file, 'wb', buffering=1024 * 1024) as f:
+        return _write_blocks(blocks, lambda data, _: f.write(data), progress_interval)
+
+
+def write_ndjson_chunks(
+    blocks: Iterable[Tuple[bytes, int]],
+    writer: ChunkedCompressedWriter,
+    progress_interval: int = 100000
+) -> Tuple[int, int]:
+    """
+    Stream encoded NDJSON blocks into rolling compressed chunks
+    
+    Serialization and compression happen in the same pass; the writer closes
+    each chunk once it reaches its target compressed size.
+    
+    Args:
+        blocks: (encoded lines, event count) blocks from ``iter_engine_blocks``
+            or ``iter_ndjson_blocks``
+        writer: Open chunk writer (closed by this function)
+        progress_interval: Log bytes written and events/second every N events
+    
+    Returns:
+        Tuple of (events written, uncompressed bytes written)
+    """
+    with writer:
+        return _write_blocks(blocks, writer.write, progress_interval)
+
+
+def _log_stream_progress(events_written: int, bytes_written: int, start: float) -> None:
+    """Log streaming throughput so long runs show bytes written and events/second"""
+    elapsed = time.perf_counter() - start
+    rate = events_written / elapsed if elapsed > 0 else 0
+    logger.info(
+        f"   Written {events_written:,} events "
+        f"({bytes_written / (1024 * 1024):,.1f} MB, {rate:,.0f} events/second)..."
+    )
+
+
+def log_chunk_summary(chunks: List[ChunkInfo]) -> None:
+    """Log compression throughput and the chunk-size distribution"""
+    summary = summarize_chunks(chunks)
+    if not summary["chunks"]:
+        return
+    logger.info(
+        f"   🗜️  {summary['chunks']:,} chunks | {summary['raw_mb']:,.1f} MB -> {summary['compressed_mb']:,.1f} MB "
+        f"({summary['compression_ratio']:.1f}x) | compression {summary['compress_mb_per_second']:,.1f} MB/s"
+    )
+    logger.info(
+        f"   📏 Chunk size MB: min {summary['chunk_mb_min']:.1f} | "
+        f"median {summary['chunk_mb_median']:.1f} | max {summary['chunk_mb_max']:.1f}"
+    )
+
+
+def _engine_output(
+    target_records: int,
+    engine: str,
+    start_date: Optional[datetime],
+    start_index: int,
+    seed: Optional[SeedLike],
+    patient_keys: Optional[KeyDistribution]
+) -> Union[Iterator[Dict[str, Any]], Iterator[EventBatch]]:
+    """
+    Validate the engine and seed it: event dicts from 'loop', column batches from 'vectorized'
+    
+    The single seeding path keeps every caller (events, NDJSON blocks) reproducible in the same way.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine '{engine}' - expected one of {ENGINES}")
+    
+    seed_sequence = np.random.SeedSequence(seed) if isinstance(seed, int) else seed
+    
+    if engine == "loop":
+        rng = random.Random(int(seed_sequence.generate_state(1)[0])) if seed_sequence is not None else None
+        return iter_marketing_events(target_records, start_date, start_index, rng, patient_keys)
+    
+    return generate_event_batches(target_records, start_date=start_date, start_index=start_index,
+                                  rng=np.random.default_rng(seed_sequence), patient_keys=patient_keys)
+
+
+def iter_engine_events(
+    target_records: int,
+    engine: str = "vectorized",
+    start_date: Optional[datetime] = None,
+    start_index: int = 0,
+    seed: Optional[SeedLike] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield event dicts from the selected generation engine
+    
+    Args:
+        target_records: Number of events to yield
+        engine: 'vectorized' draws NumPy column batches and materialises rows
+            only at serialization time; 'loop' is the original per-event loop
+        start_date: Start of the 2-year event window (default: 730 days before now)
+        start_index: Zero-based offset of the first event, used for EVT- numbering
+        seed: Integer or ``np.random.SeedSequence`` for reproducible output (default: random)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    output = _engine_output(target_records, engine, start_date, start_index, seed, patient_keys)
+    if engine == "loop":
+        return output
+    return chain.from_iterable(batch.iter_records() for batch in output)
+
+
+def iter_engine_blocks(
+    target_records: int,
+    engine: str = "vectorized",
+    start_date: Optional[datetime] = None,
+    start_index: int = 0,
+    seed: Optional[SeedLike] = None,
+    serializer: str = DEFAULT_SERIALIZER,
+    chunk_events: int = 10000,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Iterator[Tuple[bytes, int]]:
+    """
+    Yield encoded NDJSON blocks from the selected engine and serializer
+    
+    The vectorized engine hands column batches straight to the serializer, so
+    the fragment serializer never builds per-event dicts; the loop engine's
+    dicts are serialized with ``json.dumps`` (or orjson when selected).
+    
+    Args:
+        target_records: Number of events to encode
+        engine: 'vectorized' or 'loop'
+        start_date: Start of the 2-year event window (default: 730 days before now)
+        start_index: Zero-based offset of the first event, used for EVT- numbering
+        seed: Integer or ``np.random.SeedSequence`` for reproducible output (default: random)
+        serializer: 'fragments', 'orjson' or 'json' (all byte-identical)
+        chunk_events: Events encoded per block
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    encoder = get_serializer(serializer)
+    output = _engine_output(target_records, engine, start_date, start_index, seed, patient_keys)
+    if engine == "loop":
+        return encoder.iter_record_blocks(output, chunk_events)
+    return encoder.iter_batch_blocks(output, chunk_events)
+
+
+def shard_seed(master_seed: int, shard_index: int) -> np.random.SeedSequence:
+    """Derive an independent, reproducible seed for one shard from the master seed"""
+    return np.random.SeedSequence([master_seed, shard_index])
+
+
+def shard_file_name(shard_index: int, extension: str = "ndjson") -> str:
+    """File name for a shard's output, e.g. marketing_events_part_0003.ndjson"""
+    return f"marketing_events_part_{shard_index:04d}.{extension}"
+
+
+def _generate_shard(
+    shard_index: int,
+    shard_start: int,
+    shard_records: int,
+    master_seed: int,
+    start_date: datetime,
+    output_dir: str,
+    engine: str,
+    output_format: str = "ndjson",
+    parquet_options: Optional[Dict[str, Any]] = None,
+    chunk_options: Optional[Dict[str, Any]] = None,
+    serializer: str = DEFAULT_SERIALIZER,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Dict[str, Any]:
+    """
+    Generate one shard in a worker process
+    
+    The shard owns event indices [shard_start, shard_start + shard_records), so
+    EVT- IDs stay globally contiguous across shards. Output depends only on the
+    master seed, shard index and window start - never on the worker count.
     
-    # Write to JSON file
-    output_file = output_path / "marketing_events.json"
-    logger.info(f"💾 Writing events to {output_file}...")
+    Returns:
+        Dict with the shard's output 'files', 'events' and 'bytes' written, plus
+        'chunks' (ChunkInfo list) when compressed chunking is enabled
+    """
+    output_file = Path(output_dir) / shard_file_name(shard_index, output_format)
+    seed = shard_seed(master_seed, shard_index)
+    chunks: List[ChunkInfo] = []
+    if output_format == "parquet":
+        batches = generate_event_batches(shard_records, start_date=start_date, start_index=shard_start,
+                                         rng=np.random.default_rng(seed), patient_keys=patient_keys)
+        events_written, bytes_written = write_parquet(batches, output_file, **(parquet_options or {}))
+        files = [str(output_file)]
+    elif chunk_options:
+        blocks = iter_engine_blocks(shard_records, engine, start_date, shard_start, seed, serializer,
+                                    patient_keys=patient_keys)
+        writer = ChunkedCompressedWriter(Path(output_dir), prefix=f"marketing_events_part_{shard_index:04d}_chunk",
+                                         **chunk_options)
+        events_written, _ = write_ndjson_chunks(blocks, writer, progress_interval=shard_records + 1)
+        chunks = writer.chunks
+        bytes_written = sum(chunk.compressed_bytes for chunk in chunks)
+        files = [str(chunk.path) for chunk in chunks]
+    else:
+        blocks = iter_engine_blocks(shard_records, engine, start_date, shard_start, seed, serializer,
+                                    patient_keys=patient_keys)
+        events_written, bytes_written = write_ndjson_stream(blocks, output_file, progress_interval=shard_records + 1)
+        files = [str(output_file)]
+    return {"files": files, "events": events_written, "bytes": bytes_written, "chunks": chunks}
+
+
+def generate_sharded_marketing_events(
+    target_records: int = 1000000,
+    output_dir: str = "data/synthetic",
+    workers: int = 1,
+    master_seed: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    end_date: Optional[datetime] = None,
+    engine: str = "vectorized",
+    output_format: str = "ndjson",
+    parquet_options: Optional[Dict[str, Any]] = None,
+    chunk_options: Optional[Dict[str, Any]] = None,
+    serializer: str = DEFAULT_SERIALIZER,
+    patient_keys: Optional[KeyDistribution] = None
+) -> List[Path]:
+    """
+    Generate marketing events as NDJSON (or Parquet) shards across worker processes
+    
+    ``target_records`` is split into fixed-size shards; shard i owns the EVT-
+    range [i*shard_size, (i+1)*shard_size) and draws from a seed derived from
+    ``master_seed`` and i. Because shard boundaries and seeds do not depend on
+    ``workers``, the same master seed and end date give byte-identical
+    ``marketing_events_part_XXXX.ndjson`` files for any worker count.
+    
+    Args:
+        target_records: Number of events to generate (default 1M)
+        output_dir: Output directory for the part files
+        workers: Number of worker processes
+        master_seed: Seed all shard seeds are derived from (default: random, logged for reruns)
+        shard_size: Events per shard (the last shard may be smaller)
+        end_date: End of the 2-year event window (default: now, truncated to seconds)
+        engine: 'vectorized' (NumPy column batches) or 'loop' (original per-event loop)
+        output_format: 'ndjson' or 'parquet' (the legacy JSON array cannot be sharded)
+        parquet_options: ``row_group_size`` / ``compression`` passed to ``write_parquet``
+        chunk_options: ``compression`` / ``target_chunk_bytes`` passed to
+            ``ChunkedCompressedWriter`` to roll each shard into compressed chunks
+        serializer: NDJSON serializer, 'fragments', 'orjson' or 'json'
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    
+    Returns:
+        Output files in shard order
+    """
+    _validate_output_options(output_format, engine, (chunk_options or {}).get("compression"))
+    if output_format == "json":
+        raise ValueError("The legacy JSON array format cannot be sharded - use ndjson or parquet")
+    if workers < 1:
+        raise ValueError(f"workers must be >= 1, got {workers}")
+    if shard_size < 1:
+        raise ValueError(f"shard_size must be >= 1, got {shard_size}")
+    
+    if master_seed is None:
+        master_seed = secrets.randbits(32)
+    end_date = (end_date or datetime.now()).replace(microsecond=0)
+    start_date = end_date - timedelta(days=730)  # 2 years of data
+    shard_count = (target_records + shard_size - 1) // shard_size
     
-    with open(output_file, 'w') as f:
-        json.dump(events, f, indent=2)
+    logger.info(f"🚀 Starting sharded marketing events generation - Target: {target_records:,} events")
+    logger.info(f"   🧩 {shard_count:,} shards of up to {shard_size:,} events on {workers} worker(s)")
+    logger.info(f"   🎲 Master seed: {master_seed} | Window end: {end_date.isoformat()}")
+    start = time.perf_counter()
+    metrics = StepMetrics("marketing_events_generator", "generate_sharded_marketing_events")
+    
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * shard_count
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for shard_index in range(shard_count):
+            shard_start = shard_index * shard_size
+            shard_records = min(shard_size, target_records - shard_start)
+            future = executor.submit(_generate_shard, shard_index, shard_start, shard_records,
+                                     master_seed, start_date, str(output_path), engine,
+                                     output_format, parquet_options, chunk_options, serializer, patient_keys)
+            futures[future] = shard_index
+        
+        for completed, future in enumerate(as_completed(futures), start=1):
+            shard_index = futures[future]
+            results[shard_index] = future.result()
+            logger.info(f"   ✅ Shard {shard_index:04d} done ({completed}/{shard_count})")
+    
+    duration = time.perf_counter() - start
+    events_generated = sum(result["events"] for result in results)
+    bytes_written = sum(result["bytes"] for result in results)
+    files = [Path(path) for result in results for path in result["files"]]
+    events_per_second = events_generated / duration if duration > 0 else 0
+    
+    logger.info("✅ Sharded marketing events generation completed!")
+    logger.info(f"   📊 Events generated: {events_generated:,} across {len(files):,} files")
+    logger.info(f"   💾 Total size: {bytes_written / (1024 * 1024):.2f} MB")
+    logger.info(f"   ⏱️  Duration: {duration:.2f} seconds")
+    logger.info(f"   🚀 Performance: {events_per_second:,.0f} events/second "
+                f"({events_per_second / workers:,.0f} per worker)")
+    if chunk_options:
+        log_chunk_summary([chunk for result in results for chunk in result["chunks"]])
+    logger.info(f"   📁 Output directory: {output_path}")
+    
+    metrics.rows = events_generated
+    metrics.extra.update(output_bytes=bytes_written, files=len(files), workers=workers,
+                         output_format=output_format, engine=engine)
+    metrics.emit()
+    return files
+
+
+def _validate_output_options(output_format: str, engine: str, chunk_compression: Optional[str] = None) -> None:
+    """Reject unknown formats and engine/format combinations that cannot work"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}' - expected one of {OUTPUT_FORMATS}")
+    if engine not in ENGINES:
+        raise ValueError(f"Unsupported engine '{engine}' - expected one of {ENGINES}")
+    if output_format == "parquet" and engine != "vectorized":
+        raise ValueError("Parquet output is built from column batches and requires the vectorized engine")
+    if chunk_compression is not None:
+        if chunk_compression not in CHUNK_COMPRESSIONS:
+            raise ValueError(f"Unsupported chunk compression '{chunk_compression}' - "
+                             f"expected one of {CHUNK_COMPRESSIONS}")
+        if output_format != "ndjson":
+            raise ValueError("Compressed chunks are only available for ndjson output")
+
+
+def generate_marketing_events(
+    target_records: int = 1000000,
+    output_dir: str = "data/synthetic",
+    output_format: str = "ndjson",
+    engine: str = "vectorized",
+    seed: Optional[int] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "snappy",
+    chunk_compression: Optional[str] = None,
+    target_chunk_mb: int = DEFAULT_TARGET_CHUNK_MB,
+    serializer: str = DEFAULT_SERIALIZER,
+    patient_keys: Optional[KeyDistribution] = None
+) -> None:
+    """
+    Generate realistic marketing event JSON data
+    
+    Args:
+        target_records: Number of events to generate (default 1M)
+        output_dir: Output directory for JSON files
+        output_format: 'ndjson' streams newline-delimited JSON with flat memory;
+            'json' writes the legacy pretty-printed array (holds every event in memory);
+            'parquet' writes dictionary-encoded columnar Parquet (vectorized engine only)
+        engine: 'vectorized' (NumPy column batches) or 'loop' (original per-event loop)
+        seed: Optional seed for reproducible output
+        row_group_size: Rows per Parquet row group (parquet format only)
+        compression: Parquet compression codec, 'snappy' or 'zstd' (parquet format only)
+        chunk_compression: 'gzip' or 'zstd' to roll NDJSON into stage-ready compressed
+            chunks (ndjson format only); None writes a single uncompressed file
+        target_chunk_mb: Compressed size at which each chunk is closed
+        serializer: NDJSON serializer, 'fragments', 'orjson' or 'json' (ndjson format only)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    _validate_output_options(output_format, engine, chunk_compression)
+    
+    logger.info(f"🚀 Starting marketing events generation - Target: {target_records:,} events")
+    start_time = datetime.now()
+    metrics = StepMetrics("marketing_events_generator", "generate_marketing_events")
+    
+    # Create output directory
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    logger.info(f"📧 Generating {target_records:,} marketing events ({engine} engine)...")
+    
+    if output_format == "parquet":
+        # Columnar mode: engine batches become Arrow record batches without per-row objects
+        output_file = output_path / "marketing_events.parquet"
+        logger.info(f"💾 Writing {compression} Parquet to {output_file} (row groups of {row_group_size:,})...")
+        batches = generate_event_batches(target_records, rng=np.random.default_rng(seed), patient_keys=patient_keys)
+        # No file is created when there are no events, so take the size from the writer
+        events_generated, parquet_bytes = write_parquet(batches, output_file, row_group_size, compression)
+    elif output_format == "ndjson" and chunk_compression:
+        # Chunked mode: serialization and compression in one streaming pass
+        output_file = output_path / "marketing_events_chunk_*"
+        logger.info(f"💾 Streaming {chunk_compression} chunks of ~{target_chunk_mb} MB to {output_path}...")
+        writer = ChunkedCompressedWriter(output_path, chunk_compression, target_chunk_mb * 1024 * 1024)
+        blocks = iter_engine_blocks(target_records, engine, seed=seed, serializer=serializer,
+                                    patient_keys=patient_keys)
+        events_generated, _ = write_ndjson_chunks(blocks, writer)
+        chunks = writer.chunks
+    elif output_format == "ndjson":
+        # Streaming mode: events are serialized and flushed as they are generated
+        output_file = output_path / "marketing_events.ndjson"
+        logger.info(f"💾 Streaming events to {output_file}...")
+        blocks = iter_engine_blocks(target_records, engine, seed=seed, serializer=serializer,
+                                    patient_keys=patient_keys)
+        events_generated, _ = write_ndjson_stream(blocks, output_file)
+    else:
+        event_list = []
+        for event in iter_engine_events(target_records, engine, seed=seed, patient_keys=patient_keys):
+            event_list.append(event)
+            
+            # Progress logging
+            if len(event_list) % 100000 == 0:
+                logger.info(f"   Generated {len(event_list):,} events...")
+        
+        # Write to JSON file
+        output_file = output_path / "marketing_events.json"
+        logger.info(f"💾 Writing events to {output_file}...")
+        
+        with open(output_file, 'w') as f:
+            json.dump(event_list, f, indent=2)
+        events_generated = len(event_list)
     
     # Calculate performance metrics
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
-    events_per_second = len(events) / duration if duration > 0 else 0
-    file_size_mb = output_file.stat().st_size / (1024 * 1024)
+    events_per_second = events_generated / duration if duration > 0 else 0
+    if output_format == "ndjson" and chunk_compression:
+        file_size_mb = sum(chunk.compressed_bytes for chunk in chunks) / (1024 * 1024)
+    elif output_format == "parquet":
+        file_size_mb = parquet_bytes / (1024 * 1024)
+    else:
+        file_size_mb = output_file.stat().st_size / (1024 * 1024)
     
     logger.info(f"✅ Marketing events generation completed!")
-    logger.info(f"   📊 Events generated: {len(events):,}")
+    logger.info(f"   📊 Events generated: {events_generated:,}")
     logger.info(f"   💾 File size: {file_size_mb:.2f} MB")
     logger.info(f"   ⏱️  Duration: {duration:.2f} seconds")
     logger.info(f"   🚀 Performance: {events_per_second:,.0f} events/second")
+    if output_format == "ndjson" and chunk_compression:
+        log_chunk_summary(chunks)
     
     # Benchmark validation (target: 500K+ events in <180 seconds)
-    if duration < 180 and len(events) >= target_records * 0.95:
-        logger.info(f"   ✅ BENCHMARK PASSED: Generated {len(events):,} events in {duration:.2f}s")
+    if duration < 180 and events_generated >= target_records * 0.95:
+        logger.info(f"   ✅ BENCHMARK PASSED: Generated {events_generated:,} events in {duration:.2f}s")
     else:
         logger.warning(f"   ⚠️  BENCHMARK CONCERN: Review performance metrics")
     
     logger.info(f"   📁 Output file: {output_file}")
+    
+    metrics.rows = events_generated
+    metrics.extra.update(output_bytes=round(file_size_mb * 1024 * 1024), output_format=output_format, engine=engine)
+    metrics.emit()
+
+
+def generate_marketing_events_delta(
+    target_records: int = 100000,
+    output_dir: str = "data/synthetic",
+    output_format: str = "ndjson",
+    seed: Optional[int] = None,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "snappy",
+    serializer: str = DEFAULT_SERIALIZER,
+    patient_keys: Optional[KeyDistribution] = None,
+    chunk_compression: Optional[str] = None,
+    target_chunk_mb: int = DEFAULT_TARGET_CHUNK_MB
+) -> Optional[Path]:
+    """
+    Append mode: emit only events after the persisted watermark
+    
+    Event IDs continue from the last emitted EVT- number and timestamps fall
+    strictly between the last emitted timestamp and now, increasing with the
+    IDs. Each run writes its own ``marketing_events_delta_<first id>`` file (or
+    compressed chunks with that prefix), so deltas can be drip-fed into bronze
+    for incremental dynamic table refreshes. The watermark is only advanced
+    once the delta is fully written. Deltas are drawn as time-ordered column
+    batches, so append mode always uses the vectorized engine.
+    
+    Args:
+        target_records: Number of new events in this delta
+        output_dir: Output directory holding the deltas and the watermark state file
+        output_format: 'ndjson' or 'parquet'
+        seed: Optional seed for reproducible output
+        row_group_size: Rows per Parquet row group (parquet format only)
+        compression: Parquet compression codec (parquet format only)
+        serializer: NDJSON serializer (ndjson format only)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+        chunk_compression: 'gzip' or 'zstd' to write the delta as stage-ready compressed
+            chunks (ndjson format only); None writes a single uncompressed file
+        target_chunk_mb: Compressed size at which each chunk is closed
+    
+    Returns:
+        The delta file (a ``<prefix>_*`` pattern for chunks), or None when target_records is 0
+    """
+    _validate_output_options(output_format, "vectorized", chunk_compression)
+    if output_format == "json":
+        raise ValueError("Append mode writes ndjson or parquet deltas")
+    
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    watermark = load_watermark(output_path)
+    window_end = datetime.now().replace(microsecond=0)
+    if watermark is None:
+        # First run seeds the full 2-year history and creates the watermark
+        start_index, window_start = 0, window_end - timedelta(days=730)
+        logger.info(f"🚀 Append mode: no watermark yet - seeding {target_records:,} events")
+    else:
+        start_index, window_start = watermark.last_event_id, watermark.last_event_datetime
+        logger.info(f"🚀 Append mode: {target_records:,} events after EVT-{start_index:010d} "
+                    f"({watermark.last_event_timestamp})")
+    if target_records <= 0:
+        return None
+    
+    start = time.perf_counter()
+    metrics = StepMetrics("marketing_events_generator", "generate_marketing_events_delta")
+    last_batch: List[EventBatch] = []
+    
+    def tracked_batches() -> Iterator[EventBatch]:
+        for batch in generate_append_batches(target_records, start_index, window_start, window_end,
+                                             rng=np.random.default_rng(seed), patient_keys=patient_keys):
+            last_batch[:] = [batch]
+            yield batch
+    
+    delta_name = f"marketing_events_delta_{start_index + 1:010d}"
+    output_file = output_path / f"{delta_name}.{output_format}"
+    if output_format == "parquet":
+        events_written, bytes_written = write_parquet(tracked_batches(), output_file, row_group_size, compression)
+    elif chunk_compression:
+        output_file = output_path / f"{delta_name}_*"
+        writer = ChunkedCompressedWriter(output_path, chunk_compression, target_chunk_mb * 1024 * 1024,
+                                         prefix=delta_name)
+        blocks = get_serializer(serializer).iter_batch_blocks(tracked_batches())
+        events_written, _ = write_ndjson_chunks(blocks, writer)
+        bytes_written = sum(chunk.compressed_bytes for chunk in writer.chunks)
+    else:
+        blocks = get_serializer(serializer).iter_batch_blocks(tracked_batches())
+        events_written, bytes_written = write_ndjson_stream(blocks, output_file)
+    
+    final_timestamp = last_batch[0].event_timestamps()[-1]
+    state_path = save_watermark(output_path, Watermark(start_index + events_written, str(final_timestamp)))
+    duration = time.perf_counter() - start
+    
+    logger.info(f"✅ Delta written: EVT-{start_index + 1:010d} .. EVT-{start_index + events_written:010d}")
+    logger.info(f"   💾 {output_file} ({bytes_written / (1024 * 1024):.2f} MB in {duration:.2f}s)")
+    logger.info(f"   🔖 Watermark: {final_timestamp} -> {state_path}")
+    
+    metrics.rows = events_written
+    metrics.extra.update(output_bytes=bytes_written, output_format=output_format,
+                         first_event_id=start_index + 1, last_event_id=start_index + events_written)
+    metrics.emit()
+    return output_file
+
+
+def generate_and_upload_marketing_events(
+    target_records: int,
+    output_dir: str,
+    uploader: StageUploader,
+    compression: str = "gzip",
+    target_chunk_mb: int = DEFAULT_TARGET_CHUNK_MB,
+    upload_workers: int = 4,
+    queue_size: int = 8,
+    max_retries: int = 3,
+    engine: str = "vectorized",
+    seed: Optional[int] = None,
+    serializer: str = DEFAULT_SERIALIZER,
+    patient_keys: Optional[KeyDistribution] = None
+) -> PipelineResult:
+    """
+    Generate compressed chunks and upload them while generation continues
+    
+    Each chunk the writer closes goes onto a bounded queue drained by an
+    uploader thread pool, so wall time approaches max(generation, upload)
+    instead of their sum. A manifest of uploaded chunks is written next to them.
+    
+    Args:
+        target_records: Number of events to generate
+        output_dir: Local directory the chunks are written to before upload
+        uploader: Upload backend (``SnowflakeStageUploader`` or ``DirectoryStageUploader``)
+        compression: Chunk codec, 'gzip' or 'zstd'
+        target_chunk_mb: Compressed size at which a chunk is closed and queued
+        upload_workers: Concurrent uploader threads
+        queue_size: Closed chunks allowed to wait before generation blocks
+        max_retries: Retries per chunk after the first failed attempt
+        engine: 'vectorized' (NumPy column batches) or 'loop' (original per-event loop)
+        seed: Optional seed for reproducible output
+        serializer: NDJSON serializer, 'fragments', 'orjson' or 'json'
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    
+    Returns:
+        PipelineResult with manifest entries and generation/upload/wall timings
+    """
+    _validate_output_options("ndjson", engine, compression)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    
+    pipeline = UploadPipeline(uploader, output_path, upload_workers, queue_size, max_retries,
+                              manifest_path=output_path / MANIFEST_FILE)
+    writer = ChunkedCompressedWriter(output_path, compression, target_chunk_mb * 1024 * 1024,
+                                     on_chunk_closed=pipeline.submit)
+    
+    logger.info(f"🔀 Pipeline: {target_records:,} events as {compression} chunks of ~{target_chunk_mb} MB -> "
+                f"{upload_workers} uploader(s) to {uploader.name}")
+    with metrics_step("marketing_events_generator", "generate_and_upload_marketing_events") as metrics:
+        wall_start = time.perf_counter()
+        pipeline.start()
+        try:
+            write_ndjson_chunks(iter_engine_blocks(target_records, engine, seed=seed, serializer=serializer,
+                                                   patient_keys=patient_keys), writer)
+            generation_seconds = time.perf_counter() - wall_start
+        finally:
+            # Always release the uploader threads and write the manifest, even when generation fails
+            result = pipeline.finish()
+        result.generation_seconds = generation_seconds
+        result.wall_seconds = time.perf_counter() - wall_start
+        
+        logger.info(f"✅ Pipeline completed: {len(result.entries)} chunks uploaded, {len(result.failed)} failed")
+        logger.info(f"   ⏱️  Generation {result.generation_seconds:.2f}s | upload busy {result.upload_seconds:.2f}s "
+                    f"across {upload_workers} worker(s) | wall {result.wall_seconds:.2f}s")
+        log_chunk_summary(writer.chunks)
+        logger.info(f"   🧾 Manifest: {output_path / MANIFEST_FILE}")
+        
+        metrics.rows = sum(chunk.events for chunk in writer.chunks)
+        metrics.status = "ok" if not result.failed else "partial"
+        metrics.extra.update(output_bytes=sum(chunk.compressed_bytes for chunk in writer.chunks),
+                             chunks=len(writer.chunks), failed_chunks=len(result.failed),
+                             generation_seconds=round(result.generation_seconds, 3),
+                             upload_seconds=round(result.upload_seconds, 3))
+    return result
+
+
+def benchmark_engines(sample_size: int = 200000) -> Dict[str, Dict[str, float]]:
+    """
+    Compare the per-event loop against the vectorized engine
+    
+    Each engine is timed twice: generation only, and end-to-end through the
+    NDJSON writer (which includes row materialisation and serialization).
+    
+    Args:
+        sample_size: Events generated per engine and measurement
+    
+    Returns:
+        Events/second per engine for the 'generate' and 'ndjson' measurements
+    """
+    logger.info(f"⏱️  Benchmarking generation engines on {sample_size:,} events...")
+    results: Dict[str, Dict[str, float]] = {}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in ("loop", "vectorized"):
+            start = time.perf_counter()
+            if engine == "loop":
+                for _ in iter_marketing_events(sample_size):
+                    pass
+            else:
+                for _ in generate_event_batches(sample_size):
+                    pass
+            generate_seconds = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            write_ndjson_stream(iter_engine_blocks(sample_size, engine), Path(tmp_dir) / f"{engine}.ndjson",
+                                progress_interval=sample_size + 1)
+            ndjson_seconds = time.perf_counter() - start
+            
+            results[engine] = {
+                "generate": sample_size / generate_seconds if generate_seconds > 0 else 0,
+                "ndjson": sample_size / ndjson_seconds if ndjson_seconds > 0 else 0,
+            }
+    
+    for measurement in ("generate", "ndjson"):
+        loop_rate = results["loop"][measurement]
+        vectorized_rate = results["vectorized"][measurement]
+        speedup = vectorized_rate / loop_rate if loop_rate > 0 else 0
+        logger.info(
+            f"   {measurement:>8}: loop {loop_rate:,.0f} events/s | "
+            f"vectorized {vectorized_rate:,.0f} events/s | speedup {speedup:.1f}x"
+        )
+    
+    return results
+
+
+def benchmark_compression(sample_size: int = 200000, target_chunk_mb: int = 2) -> Dict[str, Dict[str, Any]]:
+    """
+    Measure compression throughput and chunk-size distribution per codec
+    
+    The same vectorized events are rolled into chunks with every available
+    codec (zstd is skipped when the zstandard package is not installed).
+    
+    Args:
+        sample_size: Events compressed per codec
+        target_chunk_mb: Chunk target size (small by default so a local sample rolls several chunks)
+    
+    Returns:
+        ``summarize_chunks`` output per codec
+    """
+    logger.info(f"⏱️  Benchmarking chunk compression on {sample_size:,} events "
+                f"(target chunk {target_chunk_mb} MB)...")
+    results: Dict[str, Dict[str, Any]] = {}
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in CHUNK_COMPRESSIONS:
+            try:
+                writer = ChunkedCompressedWriter(Path(tmp_dir) / codec, codec, target_chunk_mb * 1024 * 1024)
+            except ImportError as e:
+                logger.warning(f"   ⚠️  Skipping {codec}: {e}")
+                continue
+            write_ndjson_chunks(iter_engine_blocks(sample_size, seed=0), writer, progress_interval=sample_size + 1)
+            logger.info(f"   {codec}:")
+            log_chunk_summary(writer.chunks)
+            results[codec] = summarize_chunks(writer.chunks)
+    
+    return results
+
+
+def benchmark_serializers(sample_size: int = 200000) -> Dict[str, Dict[str, float]]:
+    """
+    Compare NDJSON serializer throughput on the same pre-drawn batches
+    
+    Only serialization is timed (generation happens up front), and every
+    serializer's output is checked to be byte-identical to stdlib json.
+    orjson is skipped when the package is not installed.
+    
+    Args:
+        sample_size: Events serialized per serializer
+    
+    Returns:
+        MB/second and events/second per serializer
+    """
+    logger.info(f"⏱️  Benchmarking serializers on {sample_size:,} events...")
+    batches = list(generate_event_batches(sample_size, rng=np.random.default_rng(0)))
+    results: Dict[str, Dict[str, float]] = {}
+    reference: Optional[bytes] = None
+    
+    for name in reversed(SERIALIZERS):
+        encoder = get_serializer(name)
+        if encoder.name != name:
+            logger.warning(f"   ⚠️  Skipping {name}: not installed")
+            continue
+        start = time.perf_counter()
+        output = b''.join(data for data, _ in encoder.iter_batch_blocks(batches))
+        seconds = time.perf_counter() - start
+        
+        if reference is None:
+            reference = output
+        elif output != reference:
+            raise AssertionError(f"{name} serializer output differs from json")
+        results[name] = {
+            "mb_per_second": len(output) / (1024 * 1024) / seconds if seconds > 0 else 0,
+            "events_per_second": sample_size / seconds if seconds > 0 else 0,
+        }
+    
+    baseline = results["json"]["mb_per_second"]
+    for name, result in results.items():
+        speedup = result["mb_per_second"] / baseline if baseline > 0 else 0
+        logger.info(f"   {name:>9}: {result['mb_per_second']:,.1f} MB/s | "
+                    f"{result['events_per_second']:,.0f} events/s | {speedup:.1f}x json")
+    
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse CLI arguments
+    
+    Positional usage is kept compatible with the deployer, which calls
+    ``marketing_events_generator.py <connection_name> <target_records>``.
+    The connection name is optional and ignored for local generation.
+    """
+    parser = argparse.ArgumentParser(description="Generate Pharmacy2U marketing events")
+    parser.add_argument("positional", nargs="*",
+                        help="[connection_name] [target_records] [output_dir]")
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="ndjson",
+                        help="ndjson streams with flat memory; json writes the legacy array; "
+                             "parquet writes dictionary-encoded columnar files")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="Rows per Parquet row group (--format parquet)")
+    parser.add_argument("--compression", choices=PARQUET_COMPRESSIONS, default="snappy",
+                        help="Parquet compression codec (--format parquet)")
+    parser.add_argument("--engine", choices=ENGINES, default="vectorized",
+                        help="vectorized draws NumPy column batches; loop is the original per-event loop")
+    parser.add_argument("--serializer", choices=SERIALIZERS, default=DEFAULT_SERIALIZER,
+                        help="NDJSON serializer: fragments assembles rows from pre-encoded JSON; "
+                             "orjson needs the orjson package; json is the stdlib baseline")
+    parser.add_argument("--chunk-compression", choices=CHUNK_COMPRESSIONS, default=None,
+                        help="Roll NDJSON output into stage-ready gzip/zstd chunks (--format ndjson)")
+    parser.add_argument("--chunk-size-mb", type=int, default=DEFAULT_TARGET_CHUNK_MB,
+                        help="Target compressed size per chunk in MB (100-250 MB keeps COPY threads busy)")
+    parser.add_argument("--append", action="store_true",
+                        help=f"Emit only events after the watermark in <output_dir>/{STATE_FILE} "
+                             "as a new delta file, then advance the watermark")
+    parser.add_argument("--upload-dir", default=None,
+                        help="Run the overlapped generate/compress/upload pipeline against a "
+                             "directory-backed fake stage (implies --chunk-compression gzip)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Run a continuous rate-controlled stream, flushing micro-batches to "
+                             "--upload-dir (default: <output_dir>/stream_stage)")
+    parser.add_argument("--rate", type=float, default=5000,
+                        help="Mean events per second for --stream")
+    parser.add_argument("--profile", choices=STREAM_PROFILES, default="steady",
+                        help="steady holds --rate; bursty alternates bursts with quieter periods at the same mean")
+    parser.add_argument("--burst-multiplier", type=float, default=4.0,
+                        help="Burst rate as a multiple of the base rate (--profile bursty)")
+    parser.add_argument("--flush-seconds", type=float, default=10.0,
+                        help="Micro-batch flush interval for --stream")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Seconds to stream for (default: until interrupted)")
+    parser.add_argument("--upload-workers", type=int, default=4,
+                        help="Concurrent uploader threads for --upload-dir")
+    parser.add_argument("--upload-bandwidth-mb", type=float, default=None,
+                        help="Simulated upload bandwidth per worker in MB/s for --upload-dir")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Master seed for reproducible output (random if omitted)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Generate NDJSON shards (marketing_events_part_XXXX) on N worker processes")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="Events per shard in --workers mode; fixes EVT- ranges independently of N")
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=None,
+                        help="End of the 2-year event window (ISO date); pin it for byte-identical reruns")
+    add_key_distribution_arguments(parser)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark engines, serializers and chunk compression on target_records events and exit")
+    args = parser.parse_args(argv)
+    if args.append and args.engine != "vectorized":
+        parser.error("--append draws time-ordered column batches and requires --engine vectorized")
+    
+    # Handle optional connection name argument (skip it for local generation)
+    positional = list(args.positional)
+    if positional and not positional[0].isdigit():
+        positional = positional[1:]
+    
+    args.target_records = int(positional[0]) if len(positional) > 0 else 1000000
+    args.output_dir = positional[1] if len(positional) > 1 else "data/synthetic"
+    return args
 
 
 def main():
     """Main execution function"""
     try:
-        # Handle optional connection name argument (skip it for local generation)
-        arg_offset = 0
-        if len(sys.argv) > 1 and not sys.argv[1].isdigit():
-            # First arg is connection name, skip it
-            arg_offset = 1
+        args = parse_args()
+        
+        if args.benchmark:
+            benchmark_engines(args.target_records)
+            benchmark_serializers(args.target_records)
+            benchmark_compression(args.target_records)
+            return
         
-        target_records = int(sys.argv[1 + arg_offset]) if len(sys.argv) > (1 + arg_offset) else 1000000
-        output_dir = sys.argv[2 + arg_offset] if len(sys.argv) > (2 + arg_offset) else "data/synthetic"
+        patient_keys = key_distribution_from_args(args)
+        logger.info(f"🔑 Patient keys: {patient_keys.describe()}")
         
-        generate_marketing_events(target_records, output_dir)
+        if args.stream:
+            stage_dir = Path(args.upload_dir or Path(args.output_dir) / "stream_stage")
+            rate = RateProfile(args.rate, args.profile, args.burst_multiplier)
+            stream = MarketingEventStream(DirectoryStageUploader(stage_dir, bandwidth_mb_per_second=args.upload_bandwidth_mb),
+                                          Path(args.output_dir), rate, args.flush_seconds,
+                                          args.chunk_compression or "gzip", seed=args.seed,
+                                          serializer=args.serializer, patient_keys=patient_keys)
+            stats = stream.run(args.duration)
+            if stats.files_failed:
+                raise RuntimeError(f"{stats.files_failed} micro-batch file(s) failed to reach the stage")
+        elif args.append:
+            generate_marketing_events_delta(args.target_records, args.output_dir, args.output_format,
+                                            args.seed, args.row_group_size, args.compression, args.serializer,
+                                            patient_keys, args.chunk_compression, args.chunk_size_mb)
+        elif args.upload_dir is not None:
+            uploader = DirectoryStageUploader(Path(args.upload_dir), bandwidth_mb_per_second=args.upload_bandwidth_mb)
+            result = generate_and_upload_marketing_events(
+                args.target_records, args.output_dir, uploader, args.chunk_compression or "gzip",
+                args.chunk_size_mb, args.upload_workers, engine=args.engine, seed=args.seed,
+                serializer=args.serializer, patient_keys=patient_keys)
+            if result.failed:
+                raise RuntimeError(f"{len(result.failed)} chunk(s) failed to upload")
+        elif args.workers is not None:
+            parquet_options = {"row_group_size": args.row_group_size, "compression": args.compression}
+            chunk_options = None
+            if args.chunk_compression:
+                chunk_options = {"compression": args.chunk_compression,
+                                 "target_chunk_bytes": args.chunk_size_mb * 1024 * 1024}
+            generate_sharded_marketing_events(args.target_records, args.output_dir, args.workers,
+                                              args.seed, args.shard_size, args.end_date, args.engine,
+                                              args.output_format, parquet_options, chunk_options, args.serializer,
+                                              patient_keys)
+        else:
+            generate_marketing_events(args.target_records, args.output_dir, args.output_format,
+                                      args.engine, args.seed, args.row_group_size, args.compression,
+                                      args.chunk_compression, args.chunk_size_mb, args.serializer, patient_keys)
         logger.info("🎉 Marketing events generation workflow completed successfully!")
         
     except Exception as e:
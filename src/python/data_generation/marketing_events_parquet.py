@@ -0,0 +1,147 @@
+"""
+Pharmacy2U Demo - Marketing Events Parquet Writer
+Purpose: Write vectorized event batches straight to columnar Parquet
+Method: Tier 3 - Local Python generation, Arrow record batches -> Parquet row groups
+
+Low-cardinality columns (campaign, event type, channel, metadata) are built as
+Arrow dictionary arrays directly from the engine's index columns, so they are
+never expanded to per-row strings. Files land in the typed
+RAW_MARKETING_EVENTS_TYPED table via COPY ... MATCH_BY_COLUMN_NAME, which
+spares the silver dynamic table from path-extracting a VARIANT on every refresh.
+"""
+
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+from marketing_events_schema import BROWSERS, CAMPAIGNS, DEVICE_TYPES, EVENT_TYPES, LOCATIONS
+from marketing_events_vectorized import EventBatch
+
+PARQUET_COMPRESSIONS = ("snappy", "zstd")
+DEFAULT_ROW_GROUP_SIZE = 1000000
+
+# Columns written as dictionary pages (all low-cardinality vocabularies)
+DICTIONARY_COLUMNS = [
+    "campaign_id", "campaign_name", "event_type", "channel",
+    "device_type", "browser", "location",
+]
+
+# Channel vocabulary and the campaign -> channel index lookup
+CHANNELS = sorted({campaign["channel"] for campaign in CAMPAIGNS})
+_CHANNEL_IDX_BY_CAMPAIGN = np.array(
+    [CHANNELS.index(campaign["channel"]) for campaign in CAMPAIGNS], dtype=np.int8
+)
+
+
+def _require_pyarrow() -> None:
+    """Fail with an actionable message when pyarrow is not installed"""
+    if pa is None:
+        raise ImportError("Parquet output requires pyarrow - install it with: pip install pyarrow")
+
+
+def _dictionary(indices: np.ndarray, values: List[str]) -> "pa.DictionaryArray":
+    """Build a dictionary-encoded string column from vocabulary indices"""
+    return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int8()), pa.array(values, type=pa.string()))
+
+
+def _prefixed_ids(prefix: str, numbers: np.ndarray, width: int) -> "pa.Array":
+    """Format zero-padded IDs such as EVT-0000000001 without a per-row Python loop"""
+    return pa.array(np.char.add(prefix, np.char.zfill(numbers.astype(str), width)), type=pa.string())
+
+
+def batch_to_record_batch(batch: EventBatch) -> "pa.RecordBatch":
+    """
+    Convert an engine batch into an Arrow record batch with the flattened event schema
+
+    Column names match RAW_MARKETING_EVENTS_TYPED (case-insensitively), with the
+    metadata object flattened into device_type, browser and location.
+    """
+    _require_pyarrow()
+    event_numbers = np.arange(batch.start_index + 1, batch.start_index + len(batch) + 1, dtype=np.int64)
+
+    return pa.RecordBatch.from_arrays(
+        [
+            _prefixed_ids("EVT-", event_numbers, 10),
+            _prefixed_ids("PT-", batch.patient_number, 8),
+            _dictionary(batch.campaign_idx, [campaign["id"] for campaign in CAMPAIGNS]),
+            _dictionary(batch.campaign_idx, [campaign["name"] for campaign in CAMPAIGNS]),
+            _dictionary(batch.event_type_idx, EVENT_TYPES),
+            pa.array(batch.event_epoch_seconds * 1000000, type=pa.timestamp("us")),
+            _dictionary(_CHANNEL_IDX_BY_CAMPAIGN[batch.campaign_idx], CHANNELS),
+            pa.array(batch.conversion_flag, type=pa.bool_()),
+            _dictionary(batch.device_idx, DEVICE_TYPES),
+            _dictionary(batch.browser_idx, BROWSERS),
+            _dictionary(batch.location_idx, LOCATIONS),
+        ],
+        names=[
+            "event_id", "patient_id", "campaign_id", "campaign_name", "event_type",
+            "event_timestamp", "channel", "conversion_flag",
+            "device_type", "browser", "location",
+        ],
+    )
+
+
+def write_parquet(
+    batches: Iterable[EventBatch],
+    output_file: Path,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    compression: str = "snappy"
+) -> Tuple[int, int]:
+    """
+    Stream engine batches into a single Parquet file
+
+    Record batches are buffered only until a full row group is available, so
+    peak memory is bounded by ``row_group_size`` rather than the file size.
+
+    Args:
+        batches: Column batches from ``generate_event_batches``
+        output_file: Destination .parquet path
+        row_group_size: Rows per Parquet row group
+        compression: 'snappy' (fast) or 'zstd' (smaller)
+
+    Returns:
+        Tuple of (events written, bytes written)
+    """
+    _require_pyarrow()
+    if compression not in PARQUET_COMPRESSIONS:
+        raise ValueError(f"Unsupported compression '{compression}' - expected one of {PARQUET_COMPRESSIONS}")
+
+    events_written = 0
+    pending: List["pa.RecordBatch"] = []
+    pending_rows = 0
+    writer = None
+
+    try:
+        for batch in batches:
+            record_batch = batch_to_record_batch(batch)
+            if writer is None:
+                writer = pq.ParquetWriter(str(output_file), record_batch.schema,
+                                          compression=compression, use_dictionary=DICTIONARY_COLUMNS)
+            pending.append(record_batch)
+            pending_rows += record_batch.num_rows
+
+            while pending_rows >= row_group_size:
+                table = pa.Table.from_batches(pending)
+                writer.write_table(table.slice(0, row_group_size), row_group_size=row_group_size)
+                remainder = table.slice(row_group_size)
+                pending = remainder.to_batches()
+                pending_rows = remainder.num_rows
+                events_written += row_group_size
+
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_size)
+            events_written += pending_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    bytes_written = output_file.stat().st_size if output_file.exists() else 0
+    return events_written, bytes_written
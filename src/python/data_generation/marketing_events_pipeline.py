@@ -0,0 +1,267 @@
+"""
+Pharmacy2U Demo - Overlapped Marketing Events Upload Pipeline
+Purpose: Generate, compress and upload marketing event chunks concurrently
+Method: Tier 3 - Local Python generation feeding a bounded producer/consumer queue
+
+The generator thread rolls compressed NDJSON chunks; each closed chunk is put
+on a bounded queue and picked up by an uploader thread pool while generation
+continues. End-to-end wall time approaches max(generation, upload) rather
+than their sum, and the bounded queue keeps local disk usage in check when
+uploads fall behind. Uploaders are pluggable so the pipeline can run against
+a directory-backed fake stage with no Snowflake account.
+"""
+
+import json
+import logging
+import queue
+import random
+import shutil
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional
+
+from marketing_events_chunks import ChunkInfo
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "marketing_events_manifest.json"
+
+
+class StageUploader(ABC):
+    """Interface for the upload side of the pipeline"""
+
+    name = "stage"
+
+    @abstractmethod
+    def upload(self, path: Path) -> None:
+        """Upload one chunk file; raise on failure so the pipeline can retry"""
+
+
+class DirectoryStageUploader(StageUploader):
+    """
+    Fake stage backed by a local directory
+
+    Used to exercise the pipeline (including retries) without a warehouse.
+    ``failure_rate`` injects random upload failures and ``bandwidth_mb_per_second``
+    simulates network transfer time.
+    """
+
+    def __init__(
+        self,
+        stage_dir: Path,
+        failure_rate: float = 0.0,
+        bandwidth_mb_per_second: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        self.stage_dir = Path(stage_dir)
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        self.failure_rate = failure_rate
+        self.bandwidth_mb_per_second = bandwidth_mb_per_second
+        self.name = f"dir://{self.stage_dir}"
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def upload(self, path: Path) -> None:
+        with self._lock:
+            fail = self._rng.random() < self.failure_rate
+        if fail:
+            raise IOError(f"Injected upload failure for {path.name}")
+        if self.bandwidth_mb_per_second:
+            time.sleep(path.stat().st_size / (1024 * 1024) / self.bandwidth_mb_per_second)
+        # Copy under a hidden name and rename so stage watchers never see a partial file
+        tmp_path = self.stage_dir / f".{path.name}.tmp"
+        shutil.copyfile(path, tmp_path)
+        tmp_path.replace(self.stage_dir / path.name)
+
+
+class SnowflakeStageUploader(StageUploader):
+    """
+    Upload chunks to a Snowflake internal stage with PUT
+
+    With a deployer SQL backend (``sql``), PUT runs through its ``query``:
+    on the pooled connector that is one in-process statement per chunk on an
+    already open connection. Without one, or with the ``snow sql`` fallback
+    backend, each PUT is a ``snow sql`` subprocess.
+    """
+
+    def __init__(
+        self,
+        connection_name: str,
+        stage: str = "@PHARMACY2U_BRONZE.RAW_DATA.MARKETING_STAGE/chunks/",
+        sql: Optional[Any] = None
+    ):
+        self.connection_name = connection_name
+        self.stage = stage
+        self.sql = sql
+        self.name = stage
+
+    def upload(self, path: Path) -> None:
+        # Chunks are already compressed by the generator, so PUT uploads them as-is
+        put_sql = (f"PUT file://{Path(path).resolve()} {self.stage} AUTO_COMPRESS=FALSE "
+                   f"SOURCE_COMPRESSION=AUTO_DETECT OVERWRITE=TRUE")
+        if self.sql is not None:
+            try:
+                rows = self.sql.query(put_sql)
+            except Exception as e:
+                raise IOError(f"PUT failed for {path.name}: {str(e)}") from e
+            failed = [row for row in rows if str(row.get("status", "")).upper() == "ERROR"]
+            if failed:
+                raise IOError(f"PUT failed for {path.name}: {failed[0].get('message', 'status ERROR')}")
+            return
+        cmd = ['snow', 'sql', '--query', put_sql, '--connection', self.connection_name]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise IOError(f"PUT failed for {path.name}: {result.stderr.strip()}")
+
+
+@dataclass
+class ManifestEntry:
+    """Upload record for one chunk"""
+    file: str
+    events: int
+    raw_bytes: int
+    compressed_bytes: int
+    status: str = "pending"
+    attempts: int = 0
+    upload_seconds: float = 0.0
+    uploaded_at: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class PipelineResult:
+    """Outcome and timings of a pipeline run"""
+    entries: List[ManifestEntry] = field(default_factory=list)
+    events: int = 0
+    generation_seconds: float = 0.0
+    upload_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    @property
+    def failed(self) -> List[ManifestEntry]:
+        return [entry for entry in self.entries if entry.status != "uploaded"]
+
+
+class UploadPipeline:
+    """
+    Bounded producer/consumer pipeline from chunk writer to stage uploader
+
+    ``submit`` is the chunk writer's ``on_chunk_closed`` callback; it blocks
+    when ``queue_size`` chunks are already waiting, applying backpressure to
+    generation instead of filling the disk. Failed uploads are retried with
+    exponential backoff, and the manifest is rewritten after every chunk.
+    """
+
+    def __init__(
+        self,
+        uploader: StageUploader,
+        chunk_dir: Path,
+        upload_workers: int = 4,
+        queue_size: int = 8,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 1.0,
+        manifest_path: Optional[Path] = None
+    ):
+        self.uploader = uploader
+        self.chunk_dir = Path(chunk_dir)
+        self.upload_workers = upload_workers
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.manifest_path = manifest_path
+        self.entries: List[ManifestEntry] = []
+
+        self._queue: "queue.Queue[Optional[ManifestEntry]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._upload_seconds = 0.0
+        self._threads = [
+            threading.Thread(target=self._upload_worker, name=f"uploader-{i}", daemon=True)
+            for i in range(upload_workers)
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, chunk: ChunkInfo) -> None:
+        """Queue a closed chunk for upload (blocks while the queue is full)"""
+        entry = ManifestEntry(
+            file=chunk.path.name,
+            events=chunk.events,
+            raw_bytes=chunk.raw_bytes,
+            compressed_bytes=chunk.compressed_bytes,
+        )
+        with self._lock:
+            self.entries.append(entry)
+        self._queue.put(entry)
+
+    def finish(self) -> PipelineResult:
+        """Wait for every queued chunk, write the manifest and return the upload outcome"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self.write_manifest()
+        return PipelineResult(
+            entries=self.entries,
+            events=sum(entry.events for entry in self.entries),
+            upload_seconds=self._upload_seconds,
+        )
+
+    def _upload_worker(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            self._upload_with_retry(entry)
+
+    def _upload_with_retry(self, entry: ManifestEntry) -> None:
+        path = self.chunk_dir / entry.file
+        for attempt in range(1, self.max_retries + 2):
+            entry.attempts = attempt
+            start = time.perf_counter()
+            try:
+                self.uploader.upload(path)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                entry.error = str(e)
+                with self._lock:
+                    self._upload_seconds += elapsed
+                if attempt <= self.max_retries:
+                    logger.warning(f"   ⚠️  Upload attempt {attempt} failed for {entry.file}: {e} - retrying")
+                    time.sleep(self.retry_backoff_seconds * (2 ** (attempt - 1)))
+                    continue
+                entry.status = "failed"
+                logger.error(f"   ❌ Upload failed for {entry.file} after {attempt} attempts")
+                break
+            else:
+                elapsed = time.perf_counter() - start
+                entry.status = "uploaded"
+                entry.error = None
+                entry.upload_seconds = round(elapsed, 3)
+                entry.uploaded_at = datetime.now().isoformat()
+                with self._lock:
+                    self._upload_seconds += elapsed
+                logger.info(f"   📤 Uploaded {entry.file} ({entry.compressed_bytes / (1024 * 1024):.1f} MB, "
+                            f"attempt {attempt})")
+                break
+        self.write_manifest()
+
+    def write_manifest(self) -> None:
+        """Persist the manifest so partial progress survives a crash"""
+        if self.manifest_path is None:
+            return
+        with self._lock:
+            manifest = {
+                "stage": self.uploader.name,
+                "updated_at": datetime.now().isoformat(),
+                "chunks": [asdict(entry) for entry in self.entries],
+            }
+            tmp_path = self.manifest_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(manifest, indent=2))
+            tmp_path.replace(self.manifest_path)
+
@@ -0,0 +1,33 @@
+"""
+Pharmacy2U Demo - Marketing Events Schema
+Purpose: Shared campaign and metadata vocabularies for the marketing events generators
+"""
+
+# Marketing campaign configurations
+CAMPAIGNS = [
+    {"id": "CAMP-001", "name": "Heart Health Month", "channel": "email"},
+    {"id": "CAMP-002", "name": "Flu Season Reminder", "channel": "sms"},
+    {"id": "CAMP-003", "name": "Prescription Refill Alert", "channel": "push"},
+    {"id": "CAMP-004", "name": "Diabetes Awareness", "channel": "email"},
+    {"id": "CAMP-005", "name": "Summer Allergy Relief", "channel": "sms"},
+    {"id": "CAMP-006", "name": "Winter Wellness", "channel": "email"},
+    {"id": "CAMP-007", "name": "Mental Health Support", "channel": "push"},
+    {"id": "CAMP-008", "name": "NHS Prescription Savings", "channel": "email"},
+]
+
+EVENT_TYPES = ["email_open", "click", "conversion", "app_open", "sms_delivered", "push_notification"]
+
+# Conversion probability by event type (higher for conversion-oriented events)
+CONVERSION_PROBABILITIES = {
+    "email_open": 0.02,
+    "click": 0.08,
+    "conversion": 0.15,
+    "app_open": 0.02,
+    "sms_delivered": 0.02,
+    "push_notification": 0.02,
+}
+
+# Event metadata vocabularies
+DEVICE_TYPES = ["mobile", "desktop", "tablet"]
+BROWSERS = ["Chrome", "Safari", "Firefox", "Edge"]
+LOCATIONS = ["London", "Manchester", "Birmingham", "Leeds", "Glasgow"]
@@ -0,0 +1,143 @@
+"""
+Pharmacy2U Demo - Marketing Event NDJSON Serializers
+Purpose: Pluggable serializers that turn event batches into NDJSON bytes
+Method: Tier 3 - Local Python generation, pre-encoded JSON fragments per vocabulary
+
+Most of every event is constant per campaign (id, name, channel) or drawn
+from tiny vocabularies (event type, device, browser, location), yet
+``json.dumps`` re-encodes all of it for every row. The fragment serializer
+encodes each combination once up front and assembles rows from those
+fragments plus the few variable fields (IDs, timestamp). All serializers emit
+byte-identical output, so the choice only affects throughput.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from marketing_events_schema import BROWSERS, CAMPAIGNS, DEVICE_TYPES, EVENT_TYPES, LOCATIONS
+from marketing_events_vectorized import EventBatch
+
+logger = logging.getLogger(__name__)
+
+SERIALIZERS = ("fragments", "orjson", "json")
+DEFAULT_SERIALIZER = "fragments"
+
+
+class JsonSerializer:
+    """Stdlib ``json.dumps`` per event (the original encoding)"""
+
+    name = "json"
+
+    def encode_records(self, records: Iterable[Dict[str, Any]]) -> bytes:
+        """Encode event dicts as newline-terminated NDJSON lines"""
+        lines = [json.dumps(record, separators=(',', ':')) for record in records]
+        return ('\n'.join(lines) + '\n').encode('utf-8') if lines else b''
+
+    def encode_batch(self, batch: EventBatch) -> bytes:
+        """Encode an engine batch as newline-terminated NDJSON lines"""
+        return self.encode_records(batch.iter_records())
+
+    def iter_record_blocks(
+        self,
+        records: Iterable[Dict[str, Any]],
+        chunk_events: int = 10000
+    ) -> Iterator[Tuple[bytes, int]]:
+        """Yield (encoded lines, event count) blocks of up to ``chunk_events`` event dicts"""
+        buffer: List[Dict[str, Any]] = []
+        for record in records:
+            buffer.append(record)
+            if len(buffer) >= chunk_events:
+                yield self.encode_records(buffer), len(buffer)
+                buffer.clear()
+        if buffer:
+            yield self.encode_records(buffer), len(buffer)
+
+    def iter_batch_blocks(self, batches: Iterable[EventBatch], chunk_events: int = 10000) -> Iterator[Tuple[bytes, int]]:
+        """Yield (encoded lines, event count) blocks of up to ``chunk_events`` rows from engine batches"""
+        for batch in batches:
+            for start in range(0, len(batch), chunk_events):
+                block = batch.slice(start, start + chunk_events)
+                yield self.encode_batch(block), len(block)
+
+
+class OrjsonSerializer(JsonSerializer):
+    """``orjson.dumps`` per event (requires the orjson package)"""
+
+    name = "orjson"
+
+    def encode_records(self, records: Iterable[Dict[str, Any]]) -> bytes:
+        lines = [orjson.dumps(record) for record in records]
+        return b'\n'.join(lines) + b'\n' if lines else b''
+
+
+class FragmentSerializer(JsonSerializer):
+    """
+    Assemble rows from JSON fragments pre-encoded once per vocabulary combination
+
+    Each row is five lookups plus the formatted event ID, patient ID and
+    timestamp; no per-row dicts are built and nothing constant is re-escaped.
+    Event dicts (the loop engine) fall back to ``json.dumps``.
+    """
+
+    name = "fragments"
+
+    def __init__(self):
+        quote = json.dumps
+        # Fragments follow the event key order: ids, campaign + event type, timestamp,
+        # channel + conversion flag, metadata
+        self._campaign_type = [
+            f',"campaign_id":{quote(campaign["id"])},"campaign_name":{quote(campaign["name"])},'
+            f'"event_type":{quote(event_type)},"event_timestamp":"'
+            for campaign in CAMPAIGNS for event_type in EVENT_TYPES
+        ]
+        self._channel_flag = [
+            f'","channel":{quote(campaign["channel"])},"conversion_flag":{"true" if converted else "false"}'
+            for campaign in CAMPAIGNS for converted in (False, True)
+        ]
+        self._metadata = [
+            f',"metadata":{{"device_type":{quote(device)},"browser":{quote(browser)},'
+            f'"location":{quote(location)}}}}}\n'
+            for device in DEVICE_TYPES for browser in BROWSERS for location in LOCATIONS
+        ]
+
+    def encode_batch(self, batch: EventBatch) -> bytes:
+        campaign_idx = batch.campaign_idx.astype(np.int64)
+        campaign_type = (campaign_idx * len(EVENT_TYPES) + batch.event_type_idx).tolist()
+        channel_flag = (campaign_idx * 2 + batch.conversion_flag).tolist()
+        metadata = ((batch.device_idx.astype(np.int64) * len(BROWSERS) + batch.browser_idx) * len(LOCATIONS)
+                    + batch.location_idx).tolist()
+        campaign_type_fragments = self._campaign_type
+        channel_flag_fragments = self._channel_flag
+        metadata_fragments = self._metadata
+
+        columns = zip(batch.patient_number.tolist(), campaign_type, batch.event_timestamps().tolist(),
+                      channel_flag, metadata)
+        lines = [
+            f'{{"event_id":"EVT-{event_number:010d}","patient_id":"PT-{patient:08d}"'
+            f'{campaign_type_fragments[ct]}{timestamp}{channel_flag_fragments[cf]}{metadata_fragments[md]}'
+            for event_number, (patient, ct, timestamp, cf, md) in enumerate(columns, start=batch.start_index + 1)
+        ]
+        return ''.join(lines).encode('utf-8')
+
+
+def get_serializer(name: str = DEFAULT_SERIALIZER) -> JsonSerializer:
+    """
+    Build the named serializer
+
+    ``orjson`` falls back to the stdlib fragment serializer (with a warning)
+    when the package is not installed.
+    """
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unsupported serializer '{name}' - expected one of {SERIALIZERS}")
+    if name == "orjson" and orjson is None:
+        logger.warning("⚠️  orjson is not installed - falling back to the fragments serializer")
+        name = "fragments"
+    return {"fragments": FragmentSerializer, "orjson": OrjsonSerializer, "json": JsonSerializer}[name]()
@@ -0,0 +1,287 @@
+"""
+Pharmacy2U Demo - Rate-Controlled Marketing Event Stream
+Purpose: Emit a continuous event stream to check dynamic tables hold their TARGET_LAG
+Method: Tier 3 - Local Python generation, micro-batch files flushed to a stage on a timer
+
+Events are drawn at a steady or bursty rate (e.g. 5k events/s) with their
+timestamp set to the moment they are emitted, buffered, and flushed as one
+compressed NDJSON micro-batch every N seconds through a ``StageUploader``.
+Against a ``DirectoryStageUploader`` this load-tests the ingest path with no
+warehouse; against the real stage, silver lag can be read off as
+``CURRENT_TIMESTAMP() - MAX(event_timestamp)`` while the stream runs.
+
+Two counters describe whether the source keeps up:
+- flush latency: time from the oldest event in a micro-batch being emitted to
+  the file landing on the stage
+- backlog: events emitted but not yet on the stage, plus events the schedule
+  says are due but the generator has not produced yet
+"""
+
+import logging
+import math
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from key_distribution import KeyDistribution
+from marketing_events_chunks import ChunkedCompressedWriter, ChunkInfo
+from marketing_events_pipeline import StageUploader
+from marketing_events_serializers import DEFAULT_SERIALIZER, get_serializer
+from marketing_events_vectorized import EPOCH, EventBatch, draw_event_batch
+from marketing_events_watermark import Watermark, load_watermark, save_watermark
+
+logger = logging.getLogger(__name__)
+
+STREAM_PROFILES = ("steady", "bursty")
+
+
+@dataclass
+class RateProfile:
+    """
+    Target emission rate over time
+
+    ``bursty`` alternates ``burst_seconds`` at ``burst_multiplier`` times the
+    base rate with a quieter remainder of each period. The base rate is scaled
+    so the mean over a period still equals ``events_per_second``, which keeps
+    steady and bursty runs comparable on total volume.
+    """
+    events_per_second: float
+    profile: str = "steady"
+    burst_multiplier: float = 4.0
+    burst_period_seconds: float = 60.0
+    burst_seconds: float = 10.0
+
+    def __post_init__(self):
+        if self.profile not in STREAM_PROFILES:
+            raise ValueError(f"Unsupported profile '{self.profile}' - expected one of {STREAM_PROFILES}")
+        if not 0 < self.burst_seconds < self.burst_period_seconds:
+            raise ValueError("burst_seconds must be between 0 and burst_period_seconds")
+
+    @property
+    def base_rate(self) -> float:
+        """Rate outside bursts (equal to events_per_second for the steady profile)"""
+        if self.profile == "steady":
+            return self.events_per_second
+        weighted_seconds = (self.burst_period_seconds - self.burst_seconds
+                            + self.burst_multiplier * self.burst_seconds)
+        return self.events_per_second * self.burst_period_seconds / weighted_seconds
+
+    def rate_at(self, elapsed: float) -> float:
+        """Instantaneous target rate (events/s) at ``elapsed`` seconds into the run"""
+        if self.profile == "steady":
+            return self.events_per_second
+        in_burst = elapsed % self.burst_period_seconds < self.burst_seconds
+        return self.base_rate * (self.burst_multiplier if in_burst else 1.0)
+
+    def expected_events(self, elapsed: float) -> float:
+        """Events the schedule calls for in the first ``elapsed`` seconds"""
+        if self.profile == "steady":
+            return self.events_per_second * elapsed
+        periods, remainder = divmod(elapsed, self.burst_period_seconds)
+        burst_part = min(remainder, self.burst_seconds)
+        return (periods * self.events_per_second * self.burst_period_seconds
+                + self.base_rate * (self.burst_multiplier * burst_part + remainder - burst_part))
+
+
+@dataclass
+class StreamStats:
+    """Running counters for a stream run"""
+    events_emitted: int = 0
+    events_flushed: int = 0
+    files_flushed: int = 0
+    files_failed: int = 0
+    bytes_flushed: int = 0
+    buffered_events: int = 0
+    behind_schedule_events: int = 0
+    max_backlog_events: int = 0
+    elapsed_seconds: float = 0.0
+    flush_latencies: List[float] = field(default_factory=list)
+
+    @property
+    def backlog_events(self) -> int:
+        return self.buffered_events + self.behind_schedule_events
+
+    def summary(self) -> Dict[str, Any]:
+        """Achieved rate plus flush latency percentiles and backlog peaks"""
+        latencies = sorted(self.flush_latencies)
+        return {
+            "events_emitted": self.events_emitted,
+            "events_flushed": self.events_flushed,
+            "files_flushed": self.files_flushed,
+            "files_failed": self.files_failed,
+            "mb_flushed": self.bytes_flushed / (1024 * 1024),
+            "achieved_events_per_second": self.events_emitted / self.elapsed_seconds if self.elapsed_seconds else 0,
+            "latency_p50_seconds": statistics.median(latencies) if latencies else 0,
+            "latency_p95_seconds": latencies[math.ceil(0.95 * len(latencies)) - 1] if latencies else 0,
+            "latency_max_seconds": latencies[-1] if latencies else 0,
+            "backlog_events": self.backlog_events,
+            "max_backlog_events": self.max_backlog_events,
+        }
+
+
+class MarketingEventStream:
+    """
+    Long-running generator that flushes timed micro-batches to a stage
+
+    Event IDs continue from the watermark in ``spool_dir`` (shared with
+    ``--append`` runs), and the watermark advances after every successful
+    flush, so a stopped stream can be resumed without duplicate IDs.
+    """
+
+    def __init__(
+        self,
+        uploader: StageUploader,
+        spool_dir: Path,
+        rate: RateProfile,
+        flush_seconds: float = 10.0,
+        compression: str = "gzip",
+        tick_seconds: float = 0.1,
+        seed: Optional[int] = None,
+        serializer: str = DEFAULT_SERIALIZER,
+        patient_keys: Optional[KeyDistribution] = None
+    ):
+        """
+        Args:
+            uploader: Stage the micro-batch files are delivered to
+            spool_dir: Local directory for micro-batch files and the watermark
+            rate: Target emission rate profile
+            flush_seconds: Interval between micro-batch flushes
+            compression: 'gzip' or 'zstd' micro-batch compression
+            tick_seconds: Scheduler resolution; due events are drawn once per tick
+            seed: Optional seed for reproducible event content
+            serializer: NDJSON serializer, 'fragments', 'orjson' or 'json'
+            patient_keys: Patient key distribution (default: uniform over 100K patients)
+        """
+        self.uploader = uploader
+        self.spool_dir = Path(spool_dir)
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.rate = rate
+        self.flush_seconds = flush_seconds
+        self.compression = compression
+        self.tick_seconds = tick_seconds
+        self.stats = StreamStats()
+        self.serializer = get_serializer(serializer)
+        self.patient_keys = patient_keys
+
+        self._rng = np.random.default_rng(seed)
+        watermark = load_watermark(self.spool_dir)
+        self._next_index = watermark.last_event_id if watermark else 0
+        self._pending: List[EventBatch] = []
+        self._oldest_emitted: Optional[float] = None
+
+    def _emit(self, size: int) -> None:
+        """Draw ``size`` events stamped with the current time into the buffer"""
+        batch = draw_event_batch(self._rng, size, self._next_index, 0, self.patient_keys)
+        now_epoch_seconds = int((datetime.now() - EPOCH).total_seconds())
+        batch.event_epoch_seconds = np.full(size, now_epoch_seconds, dtype=np.int64)
+        self._pending.append(batch)
+        self._next_index += size
+        if self._oldest_emitted is None:
+            self._oldest_emitted = time.monotonic()
+        self.stats.events_emitted += size
+        self.stats.buffered_events += size
+
+    def _flush(self) -> Optional[ChunkInfo]:
+        """Write the buffered events as one micro-batch and deliver it to the stage"""
+        if not self._pending:
+            return None
+        batches, self._pending = self._pending, []
+        events = sum(len(batch) for batch in batches)
+        first_id = batches[0].start_index + 1
+
+        prefix = f"marketing_events_stream_{first_id:010d}"
+        with ChunkedCompressedWriter(self.spool_dir, self.compression, math.inf, prefix) as writer:
+            for batch in batches:
+                writer.write(self.serializer.encode_batch(batch), len(batch))
+        chunk = writer.chunks[0]
+
+        try:
+            self.uploader.upload(chunk.path)
+        except Exception as e:
+            # Keep the file for a manual retry; the events still count as emitted
+            self.stats.files_failed += 1
+            logger.error(f"   ❌ Stream flush failed for {chunk.path.name}: {e}")
+        else:
+            latency = time.monotonic() - self._oldest_emitted
+            chunk.path.unlink()
+            self.stats.files_flushed += 1
+            self.stats.events_flushed += events
+            self.stats.bytes_flushed += chunk.compressed_bytes
+            self.stats.flush_latencies.append(latency)
+            last_timestamp = str(batches[-1].event_timestamps()[-1])
+            save_watermark(self.spool_dir, Watermark(first_id - 1 + events, last_timestamp))
+
+        self.stats.buffered_events -= events
+        self._oldest_emitted = None
+        return chunk
+
+    def _log_progress(self, chunk: ChunkInfo, elapsed: float) -> None:
+        stats = self.stats
+        latency = stats.flush_latencies[-1] if stats.flush_latencies else 0
+        logger.info(f"   🌊 {chunk.path.name}: {chunk.events:,} events | "
+                    f"rate {self.rate.rate_at(elapsed):,.0f}/s target, "
+                    f"{stats.events_emitted / elapsed:,.0f}/s achieved | "
+                    f"latency {latency:.2f}s | backlog {stats.backlog_events:,}")
+
+    def run(self, duration_seconds: Optional[float] = None) -> StreamStats:
+        """
+        Stream until ``duration_seconds`` elapse (or Ctrl+C), then flush what is left
+
+        Returns:
+            The run's counters
+        """
+        logger.info(f"🌊 Streaming {self.rate.profile} {self.rate.events_per_second:,.0f} events/s to "
+                    f"{self.uploader.name}, flushing every {self.flush_seconds:g}s "
+                    f"({'until interrupted' if duration_seconds is None else f'for {duration_seconds:g}s'})")
+        # Cap each draw so a stalled tick cannot produce one huge catch-up batch
+        max_draw = max(int(self.rate.events_per_second * self.rate.burst_multiplier * self.tick_seconds), 1) * 10
+        start = time.monotonic()
+        next_flush = start + self.flush_seconds
+
+        try:
+            while True:
+                now = time.monotonic()
+                elapsed = now - start
+                if duration_seconds is not None and elapsed >= duration_seconds:
+                    break
+
+                due = int(self.rate.expected_events(elapsed)) - self.stats.events_emitted
+                if due > 0:
+                    self._emit(min(due, max_draw))
+                self.stats.behind_schedule_events = max(
+                    int(self.rate.expected_events(time.monotonic() - start)) - self.stats.events_emitted, 0)
+                self.stats.max_backlog_events = max(self.stats.max_backlog_events, self.stats.backlog_events)
+
+                if now >= next_flush:
+                    chunk = self._flush()
+                    next_flush += self.flush_seconds
+                    if chunk is not None:
+                        self._log_progress(chunk, time.monotonic() - start)
+
+                time.sleep(max(min(self.tick_seconds, next_flush - time.monotonic()), 0))
+        except KeyboardInterrupt:
+            logger.info("⏹️  Stream interrupted - flushing buffered events")
+
+        self._flush()
+        self.stats.elapsed_seconds = time.monotonic() - start
+        log_stream_summary(self.stats)
+        return self.stats
+
+
+def log_stream_summary(stats: StreamStats) -> None:
+    """Log achieved rate, flush latency percentiles and backlog peaks"""
+    summary = stats.summary()
+    logger.info("✅ Stream finished")
+    logger.info(f"   📊 Events: {summary['events_emitted']:,} emitted, {summary['events_flushed']:,} flushed "
+                f"in {summary['files_flushed']:,} files ({summary['mb_flushed']:.2f} MB)")
+    logger.info(f"   ⚡ Achieved rate: {summary['achieved_events_per_second']:,.0f} events/s")
+    logger.info(f"   ⏱️  Flush latency: p50 {summary['latency_p50_seconds']:.2f}s, "
+                f"p95 {summary['latency_p95_seconds']:.2f}s, max {summary['latency_max_seconds']:.2f}s")
+    logger.info(f"   📦 Backlog: {summary['backlog_events']:,} at exit, peak {summary['max_backlog_events']:,}")
+    if summary["files_failed"]:
+        logger.warning(f"   ⚠️  {summary['files_failed']} micro-batch file(s) failed to reach the stage")
@@ -0,0 +1,220 @@
+"""
+Pharmacy2U Demo - Vectorized Marketing Events Engine
+Purpose: Draw marketing events column-by-column with NumPy for 100M-event runs
+Method: Tier 3 - Local Python generation, batched numpy.random.Generator draws
+
+Each batch holds whole columns (campaign/event-type/metadata indices, int64
+epoch-second timestamps, conversion flags). Rows are only materialised when a
+batch is serialized, so the hot path never touches per-event Python objects.
+Schema and distributions match ``iter_marketing_events`` in
+``marketing_events_generator.py``.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from key_distribution import DEFAULT_PATIENT_KEYS, KeyDistribution
+from marketing_events_schema import (
+    BROWSERS,
+    CAMPAIGNS,
+    CONVERSION_PROBABILITIES,
+    DEVICE_TYPES,
+    EVENT_TYPES,
+    LOCATIONS,
+)
+
+EPOCH = datetime(1970, 1, 1)
+EVENT_WINDOW_DAYS = 730  # 2 years of data
+
+# Per-event-type conversion probabilities aligned with EVENT_TYPES indices
+_CONVERSION_PROBABILITY_BY_TYPE = np.array(
+    [CONVERSION_PROBABILITIES[event_type] for event_type in EVENT_TYPES]
+)
+
+
+@dataclass
+class EventBatch:
+    """
+    Column-oriented batch of marketing events
+
+    Index columns point into the module vocabularies (CAMPAIGNS, EVENT_TYPES,
+    DEVICE_TYPES, BROWSERS, LOCATIONS). ``start_index`` is the zero-based
+    position of the first event, so event IDs are ``EVT-{start_index + row + 1}``.
+    """
+    start_index: int
+    campaign_idx: np.ndarray
+    event_type_idx: np.ndarray
+    event_epoch_seconds: np.ndarray
+    patient_number: np.ndarray
+    conversion_flag: np.ndarray
+    device_idx: np.ndarray
+    browser_idx: np.ndarray
+    location_idx: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.campaign_idx)
+
+    def slice(self, start: int, stop: int) -> "EventBatch":
+        """Rows [start, stop) as a batch (column views, no copy)"""
+        return EventBatch(
+            start_index=self.start_index + start,
+            campaign_idx=self.campaign_idx[start:stop],
+            event_type_idx=self.event_type_idx[start:stop],
+            event_epoch_seconds=self.event_epoch_seconds[start:stop],
+            patient_number=self.patient_number[start:stop],
+            conversion_flag=self.conversion_flag[start:stop],
+            device_idx=self.device_idx[start:stop],
+            browser_idx=self.browser_idx[start:stop],
+            location_idx=self.location_idx[start:stop],
+        )
+
+    def event_timestamps(self) -> np.ndarray:
+        """ISO-8601 timestamp strings (second precision) for every event"""
+        return np.datetime_as_string(self.event_epoch_seconds.astype('datetime64[s]'), unit='s')
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Materialise rows as event dicts (same schema as the per-event loop)"""
+        first_id = self.start_index + 1
+        timestamps = self.event_timestamps().tolist()
+        columns = zip(
+            self.campaign_idx.tolist(),
+            self.event_type_idx.tolist(),
+            timestamps,
+            self.patient_number.tolist(),
+            self.conversion_flag.tolist(),
+            self.device_idx.tolist(),
+            self.browser_idx.tolist(),
+            self.location_idx.tolist(),
+        )
+        for row, (campaign_i, type_i, timestamp, patient, converted, device_i, browser_i, location_i) in enumerate(columns):
+            campaign = CAMPAIGNS[campaign_i]
+            yield {
+                "event_id": f"EVT-{first_id + row:010d}",
+                "patient_id": f"PT-{patient:08d}",
+                "campaign_id": campaign["id"],
+                "campaign_name": campaign["name"],
+                "event_type": EVENT_TYPES[type_i],
+                "event_timestamp": timestamp,
+                "channel": campaign["channel"],
+                "conversion_flag": converted,
+                "metadata": {
+                    "device_type": DEVICE_TYPES[device_i],
+                    "browser": BROWSERS[browser_i],
+                    "location": LOCATIONS[location_i]
+                }
+            }
+
+
+def draw_event_batch(
+    rng: np.random.Generator,
+    size: int,
+    start_index: int,
+    start_epoch_seconds: int,
+    patient_keys: Optional[KeyDistribution] = None
+) -> EventBatch:
+    """
+    Draw one batch of events as whole columns
+
+    Args:
+        rng: NumPy random generator
+        size: Number of events in the batch
+        start_index: Zero-based index of the first event (for EVT- numbering)
+        start_epoch_seconds: Start of the event window as naive epoch seconds
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    # Same window as the loop: 0-730 whole days plus 0-86400 seconds
+    day_offsets = rng.integers(0, EVENT_WINDOW_DAYS, size=size, endpoint=True, dtype=np.int64)
+    second_offsets = rng.integers(0, 86400, size=size, endpoint=True, dtype=np.int64)
+    event_type_idx = rng.integers(0, len(EVENT_TYPES), size=size, dtype=np.int8)
+
+    return EventBatch(
+        start_index=start_index,
+        campaign_idx=rng.integers(0, len(CAMPAIGNS), size=size, dtype=np.int8),
+        event_type_idx=event_type_idx,
+        event_epoch_seconds=start_epoch_seconds + day_offsets * 86400 + second_offsets,
+        patient_number=(patient_keys or DEFAULT_PATIENT_KEYS).draw(rng, size),
+        conversion_flag=rng.random(size) < _CONVERSION_PROBABILITY_BY_TYPE[event_type_idx],
+        device_idx=rng.integers(0, len(DEVICE_TYPES), size=size, dtype=np.int8),
+        browser_idx=rng.integers(0, len(BROWSERS), size=size, dtype=np.int8),
+        location_idx=rng.integers(0, len(LOCATIONS), size=size, dtype=np.int8),
+    )
+
+
+def generate_event_batches(
+    target_records: int,
+    batch_size: int = 100000,
+    start_date: Optional[datetime] = None,
+    start_index: int = 0,
+    rng: Optional[np.random.Generator] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Iterator[EventBatch]:
+    """
+    Yield column batches covering ``target_records`` events
+
+    Args:
+        target_records: Total number of events to generate
+        batch_size: Events drawn per batch (bounds peak memory)
+        start_date: Start of the 2-year event window (default: 730 days before now)
+        start_index: Zero-based offset of the first event, used for EVT- numbering
+        rng: NumPy random generator (default: freshly seeded from OS entropy)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    rng = rng or np.random.default_rng()
+    if start_date is None:
+        start_date = datetime.now() - timedelta(days=EVENT_WINDOW_DAYS)
+    start_epoch_seconds = int((start_date.replace(microsecond=0) - EPOCH).total_seconds())
+
+    generated = 0
+    while generated < target_records:
+        size = min(batch_size, target_records - generated)
+        yield draw_event_batch(rng, size, start_index + generated, start_epoch_seconds, patient_keys)
+        generated += size
+
+
+def generate_append_batches(
+    target_records: int,
+    start_index: int,
+    window_start: datetime,
+    window_end: datetime,
+    batch_size: int = 100000,
+    rng: Optional[np.random.Generator] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Iterator[EventBatch]:
+    """
+    Yield batches for an incremental delta ordered by event time
+
+    Timestamps fall in (window_start, window_end] and are sorted, with each
+    batch covering its own contiguous slice of the window, so event IDs increase and
+    event timestamps are non-decreasing across the whole delta.
+
+    Args:
+        target_records: Number of new events
+        start_index: Zero-based index of the first new event (the previous watermark)
+        window_start: Watermark timestamp; every new event is strictly later
+        window_end: Latest allowed event timestamp (typically now)
+        batch_size: Events drawn per batch
+        rng: NumPy random generator (default: freshly seeded from OS entropy)
+        patient_keys: Patient key distribution (default: uniform over 100K patients)
+    """
+    rng = rng or np.random.default_rng()
+    start_epoch_seconds = int((window_start.replace(microsecond=0) - EPOCH).total_seconds())
+    end_epoch_seconds = int((window_end.replace(microsecond=0) - EPOCH).total_seconds())
+    # Keep the window non-empty so every event lands strictly after the watermark
+    window_seconds = max(end_epoch_seconds - start_epoch_seconds, 1)
+
+    generated = 0
+    while generated < target_records:
+        size = min(batch_size, target_records - generated)
+        batch = draw_event_batch(rng, size, start_index + generated, start_epoch_seconds, patient_keys)
+
+        # This batch owns the slice (slice_start, slice_end] of the window
+        slice_start = start_epoch_seconds + window_seconds * generated // target_records
+        slice_end = start_epoch_seconds + window_seconds * (generated + size) // target_records
+        offsets = rng.integers(1, max(slice_end - slice_start, 1), size=size, endpoint=True, dtype=np.int64)
+        batch.event_epoch_seconds = slice_start + np.sort(offsets)
+
+        yield batch
+        generated += size
@@ -0,0 +1,48 @@
+"""
+Pharmacy2U Demo - Marketing Events Watermark
+Purpose: Persist the last emitted event so append runs only produce new events
+Method: Small JSON state file next to the generated output
+
+Each ``--append`` run resumes EVT- numbering and event timestamps after the
+stored watermark, letting us drip-feed deltas into bronze and measure
+incremental dynamic table refreshes instead of paying for full reloads.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+STATE_FILE = ".marketing_events_state.json"
+
+
+@dataclass
+class Watermark:
+    """Last event emitted by the generator"""
+    last_event_id: int
+    last_event_timestamp: str
+    updated_at: Optional[str] = None
+
+    @property
+    def last_event_datetime(self) -> datetime:
+        return datetime.fromisoformat(self.last_event_timestamp)
+
+
+def load_watermark(output_dir: Path) -> Optional[Watermark]:
+    """Read the watermark for an output directory (None before the first run)"""
+    state_path = Path(output_dir) / STATE_FILE
+    if not state_path.exists():
+        return None
+    state = json.loads(state_path.read_text())
+    return Watermark(**state)
+
+
+def save_watermark(output_dir: Path, watermark: Watermark) -> Path:
+    """Atomically persist the watermark once a delta has been fully written"""
+    state_path = Path(output_dir) / STATE_FILE
+    watermark.updated_at = datetime.now().isoformat()
+    tmp_path = state_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(asdict(watermark), indent=2))
+    tmp_path.replace(state_path)
+    return state_path
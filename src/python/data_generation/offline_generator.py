@@ -0,0 +1,358 @@
+"""
+Pharmacy2U Demo - Offline Patient & Prescription Generator
+Purpose: Generate RAW_PATIENTS / RAW_PRESCRIPTIONS locally as stage-ready shards
+Target: 100K+ records/second per worker (gzip CSV), no warehouse or session required
+Method: Tier 3 - Local Python generation, NumPy draws -> Arrow tables -> gzip CSV / Parquet
+
+Mirrors the columns and distributions of the Snowpark ``INSERT ... SELECT FROM
+TABLE(GENERATOR(...))`` statements in ``patient_generator.py`` and
+``prescription_generator.py``, drawing from the same ``reference_data`` lists.
+Output is split into fixed-size shards generated on worker processes; each
+shard's seed derives from the master seed and shard index, so a pinned
+``--seed`` and ``--as-of`` date give identical files for any worker count and
+the output can be cached as a build artifact. Shards load with:
+
+    PUT file://data/synthetic/offline/patients_part_*.csv.gz @PATIENT_STAGE/offline/;
+    COPY INTO RAW_PATIENTS FROM @PATIENT_STAGE/offline/ FILE_FORMAT = CSV_FORMAT;
+
+(see ``sql/data_generation/05_load_offline_shards.sql``).
+"""
+
+import argparse
+import gzip
+import logging
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+from drug_selection import DrugSelector
+from key_distribution import (
+    DEFAULT_PATIENT_KEYS,
+    KeyDistribution,
+    add_key_distribution_arguments,
+    key_distribution_from_args,
+)
+from reference_data import (
+    EMAIL_FIRST_PARTS,
+    EMAIL_LAST_PARTS,
+    FIRST_NAMES,
+    LAST_NAMES,
+    UK_POSTCODES,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TABLES = ("patients", "prescriptions")
+OFFLINE_FORMATS = ("csv", "parquet")
+DEFAULT_SHARD_SIZE = 1000000
+DEFAULT_BATCH_SIZE = 250000
+EPOCH_DATE = date(1970, 1, 1)
+
+# Built once per process; same slot table as the Snowpark prescription SQL
+_DRUG_SELECTOR = DrugSelector()
+
+
+def _require_pyarrow() -> None:
+    """Fail with an actionable message when pyarrow is not installed"""
+    if pa is None:
+        raise ImportError("Offline generation requires pyarrow - install it with: pip install pyarrow")
+
+
+def _padded(prefix: str, numbers: np.ndarray, width: int) -> "pa.Array":
+    """Vectorized ``prefix || LPAD(number, width, '0')``"""
+    return pc.binary_join_element_wise(prefix, pc.utf8_lpad(pa.array(numbers).cast(pa.string()), width, "0"), "")
+
+
+def _choice(values: List[Any], rng: np.random.Generator, size: int) -> "pa.Array":
+    """Vectorized ``CASE UNIFORM(1, len(values), RANDOM()) ...`` over a reference list"""
+    return pc.take(pa.array(values), pa.array(rng.integers(0, len(values), size=size)))
+
+
+def _days_before(today_days: int, offsets: np.ndarray) -> "pa.Array":
+    """Vectorized ``DATEADD(DAY, -offset, CURRENT_DATE())``"""
+    return pa.array((today_days - offsets).astype(np.int32), type=pa.date32())
+
+
+def draw_patients(
+    rng: np.random.Generator,
+    size: int,
+    start_index: int,
+    as_of: date,
+    ingested_at: datetime
+) -> "pa.Table":
+    """
+    Draw a batch of RAW_PATIENTS rows
+
+    Args:
+        rng: NumPy random generator
+        size: Number of rows
+        start_index: Zero-based index of the first row (PT- numbering, as the warehouse generator)
+        as_of: Date treated as CURRENT_DATE() for birth and registration dates
+        ingested_at: INGESTION_TIMESTAMP for every row
+    """
+    today_days = (as_of - EPOCH_DATE).days
+    email = pc.binary_join_element_wise(
+        _choice(EMAIL_FIRST_PARTS, rng, size), ".", _choice(EMAIL_LAST_PARTS, rng, size),
+        pa.array(rng.integers(100, 9999, size=size, endpoint=True)).cast(pa.string()), "@email.com", "")
+
+    return pa.table({
+        "PATIENT_ID": _padded("PT-", np.arange(start_index, start_index + size), 8),
+        "FIRST_NAME": _choice(FIRST_NAMES, rng, size),
+        "LAST_NAME": _choice(LAST_NAMES, rng, size),
+        "DATE_OF_BIRTH": _days_before(today_days, rng.integers(18 * 365, 90 * 365, size=size, endpoint=True)),
+        "GENDER": pc.if_else(pa.array(rng.integers(1, 100, size=size, endpoint=True) <= 51), "Female", "Male"),
+        "NHS_NUMBER": _padded("", rng.integers(100000000, 999999999, size=size, endpoint=True), 10),
+        "POSTCODE": _choice(UK_POSTCODES, rng, size),
+        "EMAIL": email,
+        "PHONE": _padded("07", rng.integers(100000000, 999999999, size=size, endpoint=True), 9),
+        "REGISTRATION_DATE": _days_before(today_days, rng.integers(0, 1825, size=size, endpoint=True)),
+        "INGESTION_TIMESTAMP": pa.array(np.full(size, np.datetime64(ingested_at, 's'))),
+        "SOURCE_SYSTEM": pa.array(np.full(size, "POSTGRESQL")),
+    })
+
+
+def draw_prescriptions(
+    rng: np.random.Generator,
+    size: int,
+    start_index: int,
+    as_of: date,
+    ingested_at: datetime,
+    patient_keys: Optional[KeyDistribution] = None
+) -> "pa.Table":
+    """
+    Draw a batch of RAW_PRESCRIPTIONS rows
+
+    Args:
+        rng: NumPy random generator
+        size: Number of rows
+        start_index: Zero-based index of the first row (RX- numbering, as the warehouse generator)
+        as_of: Date treated as CURRENT_DATE() for prescription dates
+        ingested_at: INGESTION_TIMESTAMP for every row
+        patient_keys: PATIENT_ID distribution (default: uniform over 100K patients)
+    """
+    today_days = (as_of - EPOCH_DATE).days
+    patient_keys = patient_keys or DEFAULT_PATIENT_KEYS
+    selector = _DRUG_SELECTOR
+    drug_idx = selector.draw_indices(rng, size)
+
+    # Two independent draws, as in the SQL CASE: 60% 28 days, then 85% of the rest 56, else 84
+    days_supply = np.where(rng.integers(1, 100, size=size, endpoint=True) <= 60, 28,
+                           np.where(rng.integers(1, 100, size=size, endpoint=True) <= 85, 56, 84))
+    cost_jitter = 1 + rng.integers(-20, 30, size=size, endpoint=True) / 100.0
+
+    return pa.table({
+        "PRESCRIPTION_ID": _padded("RX-", np.arange(start_index, start_index + size), 10),
+        "PATIENT_ID": _padded("PT-", patient_keys.draw(rng, size), 8),
+        "DRUG_CODE": pa.array(selector.codes[drug_idx]),
+        "DRUG_NAME": pa.array(selector.names[drug_idx]),
+        "QUANTITY": pa.array(selector.typical_qty[drug_idx] + rng.integers(-5, 10, size=size, endpoint=True)),
+        "DAYS_SUPPLY": pa.array(days_supply),
+        "PRESCRIPTION_DATE": _days_before(today_days, rng.integers(0, 730, size=size, endpoint=True)),
+        "PRESCRIBER_ID": _padded("DR-", rng.integers(1, 500, size=size, endpoint=True), 5),
+        "PHARMACY_ID": _padded("PH-", rng.integers(1, 50, size=size, endpoint=True), 3),
+        "COST_GBP": pa.array(np.round(selector.avg_cost[drug_idx] * cost_jitter, 2)),
+        "INGESTION_TIMESTAMP": pa.array(np.full(size, np.datetime64(ingested_at, 's'))),
+        "SOURCE_SYSTEM": pa.array(np.full(size, "SQL_SERVER")),
+    })
+
+
+DRAW_FUNCTIONS = {"patients": draw_patients, "prescriptions": draw_prescriptions}
+
+
+def shard_file_name(table_name: str, shard_index: int, output_format: str) -> str:
+    """File name for a shard, e.g. patients_part_0003.csv.gz"""
+    extension = "csv.gz" if output_format == "csv" else "parquet"
+    return f"{table_name}_part_{shard_index:04d}.{extension}"
+
+
+def _generate_shard(
+    table_name: str,
+    shard_index: int,
+    shard_start: int,
+    shard_records: int,
+    master_seed: int,
+    as_of: date,
+    ingested_at: datetime,
+    output_dir: str,
+    output_format: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    patient_keys: Optional[KeyDistribution] = None
+) -> Dict[str, Any]:
+    """
+    Generate one shard in a worker process
+
+    The shard is written in ``batch_size`` slices (one CSV block or Parquet row
+    group each), so worker memory stays bounded for any shard size.
+
+    Returns:
+        Dict with the shard 'file', 'records' and 'bytes' written
+    """
+    _require_pyarrow()
+    rng = np.random.default_rng(np.random.SeedSequence([master_seed, TABLES.index(table_name), shard_index]))
+    draw = DRAW_FUNCTIONS[table_name]
+    draw_options = {"patient_keys": patient_keys} if table_name == "prescriptions" else {}
+    output_file = Path(output_dir) / shard_file_name(table_name, shard_index, output_format)
+
+    writer = None
+    sink = None
+    try:
+        for offset in range(0, shard_records, batch_size):
+            size = min(batch_size, shard_records - offset)
+            table = draw(rng, size, shard_start + offset, as_of, ingested_at, **draw_options)
+            if writer is None:
+                if output_format == "csv":
+                    # CSV_FORMAT has no FIELD_OPTIONALLY_ENCLOSED_BY, so values are written unquoted.
+                    # Level 6 matches the chunk writer; Arrow's gzip stream defaults to a much slower 9
+                    sink = gzip.open(output_file, 'wb', compresslevel=6)
+                    writer = pacsv.CSVWriter(sink, table.schema,
+                                             write_options=pacsv.WriteOptions(quoting_style="none"))
+                else:
+                    writer = pq.ParquetWriter(str(output_file), table.schema, compression="snappy")
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+
+    return {"file": str(output_file), "records": shard_records, "bytes": output_file.stat().st_size}
+
+
+def generate_offline_data(
+    table_name: str,
+    target_records: int,
+    output_dir: str = "data/synthetic/offline",
+    output_format: str = "csv",
+    workers: int = 1,
+    master_seed: Optional[int] = None,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    as_of: Optional[date] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> List[Path]:
+    """
+    Generate patients or prescriptions as compressed shards across worker processes
+
+    Args:
+        table_name: 'patients' (RAW_PATIENTS) or 'prescriptions' (RAW_PRESCRIPTIONS)
+        target_records: Number of rows to generate
+        output_dir: Directory the shards are written to
+        output_format: 'csv' (gzip, loads with CSV_FORMAT) or 'parquet' (snappy)
+        workers: Number of worker processes
+        master_seed: Seed all shard seeds derive from (default: random, logged for reruns)
+        shard_size: Rows per shard (the last shard may be smaller)
+        as_of: Date used as CURRENT_DATE(); pin it with the seed for identical reruns
+        patient_keys: PATIENT_ID distribution for prescriptions (default: uniform over 100K patients)
+
+    Returns:
+        Shard files in shard order
+    """
+    _require_pyarrow()
+    if table_name not in TABLES:
+        raise ValueError(f"Unsupported table '{table_name}' - expected one of {TABLES}")
+    if output_format not in OFFLINE_FORMATS:
+        raise ValueError(f"Unsupported format '{output_format}' - expected one of {OFFLINE_FORMATS}")
+    if workers < 1 or shard_size < 1:
+        raise ValueError("workers and shard_size must be >= 1")
+
+    if master_seed is None:
+        master_seed = secrets.randbits(32)
+    # A pinned as-of date also pins INGESTION_TIMESTAMP, keeping reruns byte-identical
+    ingested_at = datetime.combine(as_of, datetime.min.time()) if as_of else datetime.now()
+    as_of = as_of or date.today()
+    shard_count = (target_records + shard_size - 1) // shard_size
+
+    logger.info(f"🚀 Starting offline {table_name} generation - Target: {target_records:,} records")
+    logger.info(f"   🧩 {shard_count:,} {output_format} shards of up to {shard_size:,} rows on {workers} worker(s)")
+    logger.info(f"   🎲 Master seed: {master_seed} | As of: {as_of.isoformat()}")
+    if table_name == "prescriptions":
+        logger.info(f"   🔑 Patient keys: {(patient_keys or DEFAULT_PATIENT_KEYS).describe()}")
+    start = time.perf_counter()
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    shard_args = [
+        (table_name, shard_index, shard_index * shard_size, min(shard_size, target_records - shard_index * shard_size),
+         master_seed, as_of, ingested_at, str(output_path), output_format, DEFAULT_BATCH_SIZE, patient_keys)
+        for shard_index in range(shard_count)
+    ]
+    results: List[Optional[Dict[str, Any]]] = [None] * shard_count
+    if workers == 1:
+        # No pool for a single worker: skips process start-up, which dominates small runs
+        results = [_generate_shard(*args) for args in shard_args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_generate_shard, *args): args[1] for args in shard_args}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+    duration = time.perf_counter() - start
+    records = sum(result["records"] for result in results)
+    bytes_written = sum(result["bytes"] for result in results)
+    records_per_second = records / duration if duration > 0 else 0
+
+    logger.info(f"✅ Offline {table_name} generation completed!")
+    logger.info(f"   📊 Records generated: {records:,} across {shard_count:,} shards")
+    logger.info(f"   💾 Total size: {bytes_written / (1024 * 1024):.2f} MB")
+    logger.info(f"   ⏱️  Duration: {duration:.2f} seconds")
+    logger.info(f"   🚀 Performance: {records_per_second:,.0f} records/second")
+    logger.info(f"   📁 Output directory: {output_path}")
+
+    return [Path(result["file"]) for result in results]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse CLI arguments"""
+    parser = argparse.ArgumentParser(description="Generate Pharmacy2U patients/prescriptions offline")
+    parser.add_argument("table", choices=TABLES + ("all",), help="Table to generate ('all' for both)")
+    parser.add_argument("target_records", type=int, nargs="?", default=None,
+                        help="Rows to generate (default: 100K patients, 500K prescriptions)")
+    parser.add_argument("output_dir", nargs="?", default="data/synthetic/offline")
+    parser.add_argument("--format", dest="output_format", choices=OFFLINE_FORMATS, default="csv",
+                        help="csv writes gzip CSV for CSV_FORMAT; parquet writes snappy Parquet")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Rows per shard")
+    parser.add_argument("--seed", type=int, default=None, help="Master seed for reproducible output")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="Date used as CURRENT_DATE() (ISO date); pin it for identical reruns")
+    add_key_distribution_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main execution function"""
+    try:
+        args = parse_args()
+        default_records = {"patients": 100000, "prescriptions": 500000}
+        tables = TABLES if args.table == "all" else (args.table,)
+        # With 'all', prescriptions reference exactly the patients generated alongside them
+        patient_count = (args.target_records or default_records["patients"]) if args.table == "all" else None
+        patient_keys = key_distribution_from_args(args, patient_count)
+        for table_name in tables:
+            generate_offline_data(table_name, args.target_records or default_records[table_name],
+                                  args.output_dir, args.output_format, args.workers, args.seed,
+                                  args.shard_size, args.as_of, patient_keys)
+        logger.info("🎉 Offline data generation workflow completed successfully!")
+
+    except Exception as e:
+        logger.error(f"❌ ERROR: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
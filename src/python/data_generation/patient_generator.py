@@ -9,63 +9,34 @@ from snowflake.snowpark import Session
 from snowflake.snowpark.functions import col, lit, uniform, dateadd, current_timestamp
 import sys
 from datetime import datetime
+from typing import Optional
 import logging
 
+from chunked_insert import DEFAULT_MAX_CONCURRENCY, run_chunked_insert
+from query_metrics import metrics_step
+from snowpark_session import DEFAULT_CONNECTION, apply_generation_context, close_sessions, get_session
+from reference_data import (
+    EMAIL_FIRST_PARTS,
+    EMAIL_LAST_PARTS,
+    FIRST_NAMES,
+    LAST_NAMES,
+    UK_POSTCODES,
+    sql_uniform_case,
+)
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-def create_snowpark_session(connection_name: str = 'pharmacy2u_demo_connection') -> Session:
-    """Create Snowpark session from Snowflake CLI connection"""
-    try:
-        from snowflake.cli.api.config import get_connection
-        
-        connection_config = get_connection(connection_name)
-        
-        session = Session.builder.configs({
-            "account": connection_config.get('account'),
-            "user": connection_config.get('user'),
-            "role": connection_config.get('role', 'ACCOUNTADMIN'),
-            "warehouse": connection_config.get('warehouse', 'PHARMACY2U_LOADING_WH'),
-            "database": connection_config.get('database', 'PHARMACY2U_BRONZE'),
-            "schema": connection_config.get('schema', 'RAW_DATA'),
-            "authenticator": connection_config.get('authenticator', 'externalbrowser'),
-        }).create()
-        
-        logger.info(f"✅ Snowpark session created successfully")
-        return session
-    
-    except Exception as e:
-        logger.error(f"❌ Failed to create Snowpark session: {str(e)}")
-        try:
-            from snowflake.snowpark.context import get_active_session
-            session = get_active_session()
-            logger.info("✅ Using active Snowpark session")
-            return session
-        except:
-            raise Exception(f"Could not create Snowpark session: {str(e)}")
-
-
-def generate_patient_data(session: Session, target_records: int = 100000) -> None:
+def build_patient_insert_sql(rows: int, id_offset: int = 0) -> str:
     """
-    Generate realistic UK patient data using Snowpark
+    Build the GENERATOR insert for one range of patient IDs
     
     Args:
-        session: Active Snowpark session
-        target_records: Number of patient records to generate (default 100K)
+        rows: Number of patients to insert
+        id_offset: Number of the first patient (PT-{id_offset:08d})
     """
-    logger.info(f"🚀 Starting patient data generation - Target: {target_records:,} records")
-    start_time = datetime.now()
-    
-    # Set context
-    session.sql("USE DATABASE PHARMACY2U_BRONZE").collect()
-    session.sql("USE SCHEMA RAW_DATA").collect()
-    session.sql("USE WAREHOUSE PHARMACY2U_LOADING_WH").collect()
-    
-    # Generate patient data using Snowflake's GENERATOR function
-    logger.info(f"👥 Generating {target_records:,} patient records...")
-    
-    patient_sql = f"""
+    return f"""
     INSERT INTO RAW_PATIENTS (
         PATIENT_ID,
         FIRST_NAME,
@@ -81,25 +52,10 @@ def generate_patient_data(session: Session, target_records: int = 100000) -> Non
         SOURCE_SYSTEM
     )
     SELECT
-        'PT-' || LPAD(SEQ4(), 8, '0') AS PATIENT_ID,
-        CASE UNIFORM(1, 20, RANDOM())
-            WHEN 1 THEN 'James' WHEN 2 THEN 'Mary' WHEN 3 THEN 'John'
-            WHEN 4 THEN 'Patricia' WHEN 5 THEN 'Robert' WHEN 6 THEN 'Jennifer'
-            WHEN 7 THEN 'Michael' WHEN 8 THEN 'Linda' WHEN 9 THEN 'William'
-            WHEN 10 THEN 'Elizabeth' WHEN 11 THEN 'David' WHEN 12 THEN 'Barbara'
-            WHEN 13 THEN 'Richard' WHEN 14 THEN 'Susan' WHEN 15 THEN 'Joseph'
-            WHEN 16 THEN 'Jessica' WHEN 17 THEN 'Thomas' WHEN 18 THEN 'Sarah'
-            WHEN 19 THEN 'Charles' ELSE 'Karen'
-        END AS FIRST_NAME,
-        CASE UNIFORM(1, 20, RANDOM())
-            WHEN 1 THEN 'Smith' WHEN 2 THEN 'Jones' WHEN 3 THEN 'Williams'
-            WHEN 4 THEN 'Brown' WHEN 5 THEN 'Taylor' WHEN 6 THEN 'Davies'
-            WHEN 7 THEN 'Wilson' WHEN 8 THEN 'Evans' WHEN 9 THEN 'Thomas'
-            WHEN 10 THEN 'Johnson' WHEN 11 THEN 'Roberts' WHEN 12 THEN 'Walker'
-            WHEN 13 THEN 'Wright' WHEN 14 THEN 'Robinson' WHEN 15 THEN 'Thompson'
-            WHEN 16 THEN 'White' WHEN 17 THEN 'Hughes' WHEN 18 THEN 'Edwards'
-            WHEN 19 THEN 'Green' ELSE 'Lewis'
-        END AS LAST_NAME,
+        -- SEQ4() can leave gaps; ROW_NUMBER keeps each chunk inside [id_offset, id_offset + rows)
+        'PT-' || LPAD(ROW_NUMBER() OVER (ORDER BY SEQ4()) - 1 + {id_offset}, 8, '0') AS PATIENT_ID,
+        {sql_uniform_case(FIRST_NAMES)} AS FIRST_NAME,
+        {sql_uniform_case(LAST_NAMES)} AS LAST_NAME,
         DATEADD(
             DAY, 
             -UNIFORM(18*365, 90*365, RANDOM()),
@@ -107,22 +63,10 @@ def generate_patient_data(session: Session, target_records: int = 100000) -> Non
         ) AS DATE_OF_BIRTH,
         CASE WHEN UNIFORM(1, 100, RANDOM()) <= 51 THEN 'Female' ELSE 'Male' END AS GENDER,
         LPAD(UNIFORM(100000000, 999999999, RANDOM()), 10, '0') AS NHS_NUMBER,
-        CASE UNIFORM(1, 10, RANDOM())
-            WHEN 1 THEN 'SW1A 1AA' WHEN 2 THEN 'M1 1AD' WHEN 3 THEN 'B2 4QA'
-            WHEN 4 THEN 'LS1 1BA' WHEN 5 THEN 'NE1 1EE' WHEN 6 THEN 'G1 1AA'
-            WHEN 7 THEN 'CF10 1DD' WHEN 8 THEN 'EH1 1YZ' WHEN 9 THEN 'BS1 1AA'
-            ELSE 'L1 1AA'
-        END AS POSTCODE,
+        {sql_uniform_case(UK_POSTCODES)} AS POSTCODE,
         LOWER(
-            CASE UNIFORM(1, 20, RANDOM())
-                WHEN 1 THEN 'james' WHEN 2 THEN 'mary' WHEN 3 THEN 'john'
-                WHEN 4 THEN 'patricia' WHEN 5 THEN 'robert' WHEN 6 THEN 'jennifer'
-                ELSE 'patient'
-            END || '.' || 
-            CASE UNIFORM(1, 10, RANDOM())
-                WHEN 1 THEN 'smith' WHEN 2 THEN 'jones' WHEN 3 THEN 'williams'
-                ELSE 'user'
-            END || 
+            {sql_uniform_case(EMAIL_FIRST_PARTS, '            ')} || '.' || 
+            {sql_uniform_case(EMAIL_LAST_PARTS, '            ')} || 
             UNIFORM(100, 9999, RANDOM()) || '@email.com'
         ) AS EMAIL,
         '07' || LPAD(UNIFORM(100000000, 999999999, RANDOM()), 9, '0') AS PHONE,
@@ -133,14 +77,49 @@ def generate_patient_data(session: Session, target_records: int = 100000) -> Non
         ) AS REGISTRATION_DATE,
         CURRENT_TIMESTAMP() AS INGESTION_TIMESTAMP,
         'POSTGRESQL' AS SOURCE_SYSTEM
-    FROM TABLE(GENERATOR(ROWCOUNT => {target_records}))
+    FROM TABLE(GENERATOR(ROWCOUNT => {rows}))
+    """
+
+
+def generate_patient_data(
+    session: Session,
+    target_records: int = 100000,
+    chunk_size: Optional[int] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> None:
     """
+    Generate realistic UK patient data using Snowpark
+    
+    Args:
+        session: Active Snowpark session
+        target_records: Number of patient records to generate (default 100K)
+        chunk_size: Split targets larger than this into concurrent ID-range chunks
+        max_concurrency: Maximum chunks running at once in chunked mode
+    """
+    logger.info(f"🚀 Starting patient data generation - Target: {target_records:,} records")
+    start_time = datetime.now()
+    
+    # Set context (once per session)
+    apply_generation_context(session)
+    
+    # Generate patient data using Snowflake's GENERATOR function
+    logger.info(f"👥 Generating {target_records:,} patient records...")
     
-    session.sql(patient_sql).collect()
+    with metrics_step("patient_generator", "generate_patient_data", session) as metrics:
+        metrics.extra["target_records"] = target_records
+        if chunk_size and target_records > chunk_size:
+            result = run_chunked_insert(session, build_patient_insert_sql, target_records, chunk_size,
+                                        max_concurrency, label="patients")
+            for chunk in result.chunks:
+                metrics.add_statement(chunk.statement_metrics())
+            if result.failed_chunks:
+                raise Exception(f"{len(result.failed_chunks)} patient chunks failed - "
+                                f"first error: {result.failed_chunks[0].error}")
+        else:
+            metrics.execute(build_patient_insert_sql(target_records), label="insert")
     
-    # Validate data generation
-    count_result = session.sql("SELECT COUNT(*) as COUNT FROM RAW_PATIENTS").collect()
-    actual_count = count_result[0]['COUNT']
+    # Rows come from the INSERT results rather than a COUNT(*) over the whole table
+    actual_count = metrics.statement_rows
     
     # Calculate performance metrics
     end_time = datetime.now()
@@ -167,12 +146,14 @@ def generate_patient_data(session: Session, target_records: int = 100000) -> Non
 def main():
     """Main execution function"""
     try:
-        connection_name = sys.argv[1] if len(sys.argv) > 1 else 'pharmacy2u_demo_connection'
+        connection_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CONNECTION
         target_records = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+        chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        max_concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_MAX_CONCURRENCY
         
-        session = create_snowpark_session(connection_name)
-        generate_patient_data(session, target_records)
-        session.close()
+        session = get_session(connection_name)
+        generate_patient_data(session, target_records, chunk_size, max_concurrency)
+        close_sessions()
         
         logger.info("🎉 Patient data generation workflow completed successfully!")
         
@@ -10,108 +10,49 @@ from snowflake.snowpark.functions import (
     col, lit, uniform, dateadd, current_timestamp, 
     to_date, seq4, concat, floor
 )
-from snowflake.snowpark.types import (
-    StructType, StructField, StringType, IntegerType, 
-    DoubleType, DateType, TimestampType
-)
+from snowflake.snowpark.types import DateType, TimestampType
+import argparse
 import sys
 from datetime import datetime, timedelta
+from typing import Optional
 import logging
 
+from chunked_insert import DEFAULT_MAX_CONCURRENCY, run_chunked_insert
+from drug_selection import DrugSelector
+from key_distribution import (
+    DEFAULT_PATIENT_COUNT,
+    DEFAULT_PATIENT_KEYS,
+    KeyDistribution,
+    add_key_distribution_arguments,
+    key_distribution_from_args,
+)
+from query_metrics import metrics_step
+from snowpark_session import DEFAULT_CONNECTION, apply_generation_context, close_sessions, get_session
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-# UK BNF drug codes and common prescriptions
-UK_DRUGS = [
-    ('0212000B0', 'Atorvastatin', 28, 14.50),
-    ('0601023Z0', 'Metformin', 56, 8.20),
-    ('0205051R0', 'Ramipril', 28, 6.30),
-    ('0604011L0', 'Levothyroxine', 28, 4.80),
-    ('0501130R0', 'Omeprazole', 28, 5.90),
-    ('0407010H0', 'Salbutamol Inhaler', 1, 12.50),
-    ('0407020A0', 'Fluticasone Inhaler', 1, 18.90),
-    ('0101010T0', 'Gaviscon', 12, 9.40),
-    ('0403010A0', 'Aspirin', 28, 3.20),
-    ('0304010G0', 'Chlorphenamine', 28, 2.80),
-    ('0106070A0', 'Bisacodyl', 20, 3.50),
-    ('0402010N0', 'Amlodipine', 28, 5.60),
-    ('0410010N0', 'Citalopram', 28, 7.80),
-    ('0602010Y0', 'Insulin Glargine', 5, 32.50),
-    ('0301011R0', 'Amoxicillin', 21, 6.90),
-]
-
-
-def create_snowpark_session(connection_name: str = 'pharmacy2u_demo_connection') -> Session:
-    """Create Snowpark session from Snowflake CLI connection"""
-    try:
-        from snowflake.cli.api.secure_path import SecurePath
-        from snowflake.cli.api.config import get_connection
-        
-        connection_config = get_connection(connection_name)
-        
-        session = Session.builder.configs({
-            "account": connection_config.get('account'),
-            "user": connection_config.get('user'),
-            "role": connection_config.get('role', 'ACCOUNTADMIN'),
-            "warehouse": connection_config.get('warehouse', 'PHARMACY2U_LOADING_WH'),
-            "database": connection_config.get('database', 'PHARMACY2U_BRONZE'),
-            "schema": connection_config.get('schema', 'RAW_DATA'),
-            "authenticator": connection_config.get('authenticator', 'externalbrowser'),
-        }).create()
-        
-        logger.info(f"✅ Snowpark session created successfully using connection: {connection_name}")
-        return session
-    
-    except Exception as e:
-        logger.error(f"❌ Failed to create Snowpark session: {str(e)}")
-        logger.info("💡 Attempting to use get_active_session() as fallback...")
-        try:
-            from snowflake.snowpark.context import get_active_session
-            session = get_active_session()
-            logger.info("✅ Using active Snowpark session")
-            return session
-        except:
-            raise Exception(f"Could not create Snowpark session: {str(e)}")
-
-
-def generate_prescription_data(session: Session, target_records: int = 500000) -> None:
+def build_prescription_insert_sql(
+    rows: int,
+    id_offset: int = 0,
+    selector: Optional[DrugSelector] = None,
+    patient_keys: Optional[KeyDistribution] = None
+) -> str:
     """
-    Generate realistic UK prescription data using Snowpark
+    Build the GENERATOR insert for one range of prescription IDs
     
     Args:
-        session: Active Snowpark session
-        target_records: Number of prescription records to generate (default 500K)
+        rows: Number of prescriptions to insert
+        id_offset: Number of the first prescription (RX-{id_offset:010d})
+        selector: Drug sampler (default: prescribing-frequency weights)
+        patient_keys: PATIENT_ID distribution (default: uniform over 100K patients)
     """
-    logger.info(f"🚀 Starting prescription data generation - Target: {target_records:,} records")
-    start_time = datetime.now()
-    
-    # Set context
-    session.sql("USE DATABASE PHARMACY2U_BRONZE").collect()
-    session.sql("USE SCHEMA RAW_DATA").collect()
-    session.sql("USE WAREHOUSE PHARMACY2U_LOADING_WH").collect()
-    
-    # Create temporary drug reference table
-    logger.info("📋 Creating drug reference data...")
-    drug_data = []
-    for drug_code, drug_name, typical_qty, avg_cost in UK_DRUGS:
-        drug_data.append((drug_code, drug_name, typical_qty, avg_cost))
-    
-    drug_schema = StructType([
-        StructField("DRUG_CODE", StringType()),
-        StructField("DRUG_NAME", StringType()),
-        StructField("TYPICAL_QTY", IntegerType()),
-        StructField("AVG_COST", DoubleType())
-    ])
-    
-    drug_df = session.create_dataframe(drug_data, schema=drug_schema)
-    drug_df.write.mode("overwrite").save_as_table("TEMP_DRUG_REFERENCE", mode="overwrite")
-    
-    # Generate prescription data using Snowflake's GENERATOR function
-    logger.info(f"💊 Generating {target_records:,} prescription records...")
+    selector = selector or DrugSelector()
+    patient_keys = patient_keys or DEFAULT_PATIENT_KEYS
     
-    prescription_sql = f"""
+    return f"""
     INSERT INTO RAW_PRESCRIPTIONS (
         PRESCRIPTION_ID,
         PATIENT_ID,
@@ -126,12 +67,15 @@ def generate_prescription_data(session: Session, target_records: int = 500000) -
         INGESTION_TIMESTAMP,
         SOURCE_SYSTEM
     )
+    WITH drug_lookup AS (
+        {selector.sql_lookup_select()}
+    )
     SELECT
-        'RX-' || LPAD(SEQ4(), 10, '0') AS PRESCRIPTION_ID,
-        'PT-' || LPAD(UNIFORM(1, 100000, RANDOM()), 8, '0') AS PATIENT_ID,
-        drugs.DRUG_CODE,
-        drugs.DRUG_NAME,
-        drugs.TYPICAL_QTY + UNIFORM(-5, 10, RANDOM()) AS QUANTITY,
+        'RX-' || LPAD(rx.SEQ + {id_offset}, 10, '0') AS PRESCRIPTION_ID,
+        'PT-' || LPAD({patient_keys.sql_expression()}, 8, '0') AS PATIENT_ID,
+        drug_lookup.CODES[rx.DRUG_IDX]::STRING AS DRUG_CODE,
+        drug_lookup.NAMES[rx.DRUG_IDX]::STRING AS DRUG_NAME,
+        drug_lookup.TYPICAL_QTY[rx.DRUG_IDX]::NUMBER + UNIFORM(-5, 10, RANDOM()) AS QUANTITY,
         CASE 
             WHEN UNIFORM(1, 100, RANDOM()) <= 60 THEN 28
             WHEN UNIFORM(1, 100, RANDOM()) <= 85 THEN 56
@@ -145,27 +89,99 @@ def generate_prescription_data(session: Session, target_records: int = 500000) -
         'DR-' || LPAD(UNIFORM(1, 500, RANDOM()), 5, '0') AS PRESCRIBER_ID,
         'PH-' || LPAD(UNIFORM(1, 50, RANDOM()), 3, '0') AS PHARMACY_ID,
         ROUND(
-            drugs.AVG_COST * (1 + (UNIFORM(-20, 30, RANDOM()) / 100.0)), 
+            drug_lookup.AVG_COST[rx.DRUG_IDX]::FLOAT * (1 + (UNIFORM(-20, 30, RANDOM()) / 100.0)), 
             2
         ) AS COST_GBP,
         CURRENT_TIMESTAMP() AS INGESTION_TIMESTAMP,
         'SQL_SERVER' AS SOURCE_SYSTEM
-    FROM 
-        TABLE(GENERATOR(ROWCOUNT => {target_records})) gen
-    CROSS JOIN (
-        SELECT * FROM TEMP_DRUG_REFERENCE 
-        QUALIFY ROW_NUMBER() OVER (ORDER BY RANDOM()) = UNIFORM(1, 15, RANDOM())
-    ) drugs
+    FROM (
+        -- Drug index drawn once per row so code, name, quantity and cost stay consistent;
+        -- ROW_NUMBER (not the gappy SEQ4) keeps each chunk inside [id_offset, id_offset + rows)
+        SELECT ROW_NUMBER() OVER (ORDER BY SEQ4()) - 1 AS SEQ, {selector.sql_index_expression()} AS DRUG_IDX
+        FROM TABLE(GENERATOR(ROWCOUNT => {rows})) gen
+        CROSS JOIN drug_lookup
+    ) rx
+    CROSS JOIN drug_lookup
+    """
+
+
+def count_patients(session: Session) -> int:
+    """
+    Number of rows in RAW_PATIENTS (a metadata-only COUNT)
+    
+    Returns:
+        The patient count, or DEFAULT_PATIENT_COUNT when the table is empty or missing
+    """
+    try:
+        patient_count = session.sql("SELECT COUNT(*) AS PATIENT_COUNT FROM RAW_PATIENTS").collect()[0]["PATIENT_COUNT"]
+    except Exception as e:
+        logger.warning(f"⚠️  Could not count RAW_PATIENTS: {str(e)}")
+        patient_count = 0
+    if not patient_count:
+        logger.warning(f"⚠️  RAW_PATIENTS is empty - drawing PATIENT_IDs over {DEFAULT_PATIENT_COUNT:,} keys; "
+                       f"generate patients first so prescriptions join")
+        return DEFAULT_PATIENT_COUNT
+    return int(patient_count)
+
+
+def generate_prescription_data(
+    session: Session,
+    target_records: int = 500000,
+    chunk_size: Optional[int] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    patient_keys: Optional[KeyDistribution] = None,
+    patient_count: Optional[int] = None
+) -> None:
+    """
+    Generate realistic UK prescription data using Snowpark
+    
+    Args:
+        session: Active Snowpark session
+        target_records: Number of prescription records to generate (default 500K)
+        chunk_size: Split targets larger than this into concurrent ID-range chunks
+        max_concurrency: Maximum chunks running at once in chunked mode
+        patient_keys: PATIENT_ID distribution; its key count defaults to the rows in RAW_PATIENTS
+        patient_count: Known patient key space; skips counting RAW_PATIENTS, so this can run
+            while the patients are still being generated
     """
+    logger.info(f"🚀 Starting prescription data generation - Target: {target_records:,} records")
+    start_time = datetime.now()
+    
+    # Set context (once per session)
+    apply_generation_context(session)
+    
+    # Key space = the patients actually loaded, so every PATIENT_ID joins to RAW_PATIENTS
+    patient_keys = (patient_keys or DEFAULT_PATIENT_KEYS).with_key_count(patient_count or count_patients(session))
+    logger.info(f"🔑 Patient keys: {patient_keys.describe()}")
     
-    session.sql(prescription_sql).collect()
+    # Weighted drug assignment: one slot-table lookup per row, no temp table or per-row sort
+    selector = DrugSelector()
+    top_drugs = sorted(selector.shares.items(), key=lambda item: -item[1])[:3]
+    logger.info("📋 Drug mix (top 3): " + ", ".join(f"{name} {share:.1%}" for name, share in top_drugs))
+    
+    # Generate prescription data using Snowflake's GENERATOR function
+    logger.info(f"💊 Generating {target_records:,} prescription records...")
     
-    # Validate data generation
-    count_result = session.sql("SELECT COUNT(*) as COUNT FROM RAW_PRESCRIPTIONS").collect()
-    actual_count = count_result[0]['COUNT']
+    with metrics_step("prescription_generator", "generate_prescription_data", session) as metrics:
+        metrics.extra["target_records"] = target_records
+        metrics.extra["key_distribution"] = patient_keys.kind
+        if chunk_size and target_records > chunk_size:
+            result = run_chunked_insert(
+                session,
+                lambda rows, id_offset: build_prescription_insert_sql(rows, id_offset, selector, patient_keys),
+                target_records, chunk_size, max_concurrency, label="prescriptions"
+            )
+            for chunk in result.chunks:
+                metrics.add_statement(chunk.statement_metrics())
+            if result.failed_chunks:
+                raise Exception(f"{len(result.failed_chunks)} prescription chunks failed - "
+                                f"first error: {result.failed_chunks[0].error}")
+        else:
+            metrics.execute(build_prescription_insert_sql(target_records, selector=selector,
+                                                          patient_keys=patient_keys), label="insert")
     
-    # Cleanup temporary table
-    session.sql("DROP TABLE IF EXISTS TEMP_DRUG_REFERENCE").collect()
+    # Rows come from the INSERT results rather than a COUNT(*) over the whole table
+    actual_count = metrics.statement_rows
     
     # Calculate performance metrics
     end_time = datetime.now()
@@ -192,18 +208,25 @@ def generate_prescription_data(session: Session, target_records: int = 500000) -
 def main():
     """Main execution function"""
     try:
-        # Get connection name from command line or use default
-        connection_name = sys.argv[1] if len(sys.argv) > 1 else 'pharmacy2u_demo_connection'
-        target_records = int(sys.argv[2]) if len(sys.argv) > 2 else 500000
+        # Positional arguments as before; key distribution flags are optional
+        parser = argparse.ArgumentParser(description="Generate Pharmacy2U prescriptions with Snowpark")
+        parser.add_argument("connection_name", nargs="?", default=DEFAULT_CONNECTION)
+        parser.add_argument("target_records", type=int, nargs="?", default=500000)
+        parser.add_argument("chunk_size", type=int, nargs="?", default=None)
+        parser.add_argument("max_concurrency", type=int, nargs="?", default=DEFAULT_MAX_CONCURRENCY)
+        # The key count comes from RAW_PATIENTS, so there is no --patient-count here
+        add_key_distribution_arguments(parser, patient_count=False)
+        args = parser.parse_args()
         
         # Create Snowpark session
-        session = create_snowpark_session(connection_name)
+        session = get_session(args.connection_name)
         
         # Generate prescription data
-        generate_prescription_data(session, target_records)
+        generate_prescription_data(session, args.target_records, args.chunk_size, args.max_concurrency,
+                                   key_distribution_from_args(args))
         
         # Close session
-        session.close()
+        close_sessions()
         logger.info("🎉 Prescription data generation workflow completed successfully!")
         
     except Exception as e:
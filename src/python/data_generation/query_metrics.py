@@ -0,0 +1,213 @@
+"""
+Pharmacy2U Demo - Query-Level Metrics
+Purpose: One structured JSON line per generator / deploy step, with per-statement detail
+Method: Query IDs from Snowpark async jobs, row counts from DML results, optional query history
+
+Throughput used to be ``SELECT COUNT(*)`` over the whole target table divided
+by wall time, which counted rows from earlier runs and cost an extra scan.
+Steps now time their own statements and take row counts from the DML result
+(``number of rows inserted``, ``rows_loaded``). Bytes scanned and warehouse size
+come from one ``QUERY_HISTORY_BY_SESSION`` lookup per step when the session
+can see it.
+
+Lines are appended to ``PHARMACY2U_METRICS_FILE`` (default
+``data/metrics/query_metrics.jsonl``; set it empty to only log) and share a
+``run_id`` per process (``PHARMACY2U_RUN_ID`` to pin it), so two runs can be
+compared with ``jq`` or a plain diff. Listeners added with
+``add_step_listener`` see every emitted step (the deployer turns statements
+into trace spans).
+"""
+
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE_ENV = "PHARMACY2U_METRICS_FILE"
+RUN_ID_ENV = "PHARMACY2U_RUN_ID"
+DEFAULT_METRICS_FILE = "data/metrics/query_metrics.jsonl"
+
+# DML result columns that carry affected row counts
+_ROW_COUNT_KEYS = (
+    "number of rows inserted", "number of rows updated", "number of rows deleted", "rows_loaded",
+)
+
+_RUN_ID = os.environ.get(RUN_ID_ENV) or f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+@dataclass
+class StatementMetrics:
+    """Metrics for one executed statement"""
+    query_id: Optional[str]
+    rows: Optional[int]
+    elapsed_seconds: float
+    bytes_scanned: Optional[int] = None
+    warehouse_size: Optional[str] = None
+    label: Optional[str] = None
+    # time.perf_counter() when the statement started; for tracing, not written to the metrics line
+    started_at: Optional[float] = None
+
+
+# Called with each StepMetrics after its line is emitted
+_step_listeners: List[Callable[["StepMetrics"], None]] = []
+
+
+def add_step_listener(listener: Callable[["StepMetrics"], None]) -> None:
+    _step_listeners.append(listener)
+
+
+def remove_step_listener(listener: Callable[["StepMetrics"], None]) -> None:
+    if listener in _step_listeners:
+        _step_listeners.remove(listener)
+
+
+def rows_affected(result: List[Any]) -> Optional[int]:
+    """
+    Sum the row counts in a DML / COPY result
+
+    Returns:
+        Rows inserted/updated/deleted/loaded, or None for statements without a count
+    """
+    total = None
+    for row in result or []:
+        values = row.as_dict() if hasattr(row, "as_dict") else dict(row)
+        for key, value in values.items():
+            if str(key).lower() in _ROW_COUNT_KEYS and value is not None:
+                total = (total or 0) + int(value)
+    return total
+
+
+def _statement_record(statement: StatementMetrics) -> Dict[str, Any]:
+    record = asdict(statement)
+    del record["started_at"]
+    record["elapsed_seconds"] = round(statement.elapsed_seconds, 3)
+    return record
+
+
+def metrics_file() -> Optional[Path]:
+    """Where metric lines are appended (None when file output is disabled)"""
+    path = os.environ.get(METRICS_FILE_ENV, DEFAULT_METRICS_FILE)
+    return Path(path) if path else None
+
+
+class StepMetrics:
+    """Statements and outcome of one step; emitted as a single JSON line"""
+
+    def __init__(self, component: str, step: str, session: Any = None):
+        self.component = component
+        self.step = step
+        self.session = session
+        self.statements: List[StatementMetrics] = []
+        self.rows: Optional[int] = None
+        self.status = "ok"
+        self.extra: Dict[str, Any] = {}
+        self._start = time.perf_counter()
+
+    def execute(self, sql: str, label: Optional[str] = None) -> List[Any]:
+        """Run a statement on the step's session, recording its query ID, rows and time"""
+        start = time.perf_counter()
+        job = self.session.sql(sql).collect_nowait()
+        result = job.result()
+        self.add_statement(StatementMetrics(
+            query_id=getattr(job, "query_id", None),
+            rows=rows_affected(result),
+            elapsed_seconds=time.perf_counter() - start,
+            label=label,
+            started_at=start,
+        ))
+        return result
+
+    def add_statement(self, statement: StatementMetrics) -> None:
+        self.statements.append(statement)
+
+    @property
+    def statement_rows(self) -> int:
+        return sum(statement.rows or 0 for statement in self.statements)
+
+    def _fill_query_details(self) -> None:
+        """Bytes scanned and warehouse size from this session's query history (best effort)"""
+        query_ids = [statement.query_id for statement in self.statements if statement.query_id]
+        if self.session is None or not query_ids:
+            return
+        id_list = ", ".join(f"'{query_id}'" for query_id in query_ids)
+        try:
+            history = self.session.sql(
+                "SELECT QUERY_ID, BYTES_SCANNED, WAREHOUSE_SIZE "
+                "FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 10000)) "
+                f"WHERE QUERY_ID IN ({id_list})"
+            ).collect()
+        except Exception as e:
+            logger.debug(f"Query history unavailable: {str(e)}")
+            return
+        details = {}
+        for row in history:
+            values = row.as_dict() if hasattr(row, "as_dict") else dict(row)
+            if "QUERY_ID" in values:
+                details[values["QUERY_ID"]] = values
+        for statement in self.statements:
+            found = details.get(statement.query_id)
+            if found:
+                statement.bytes_scanned = found.get("BYTES_SCANNED")
+                statement.warehouse_size = found.get("WAREHOUSE_SIZE")
+
+    def emit(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """Write the step's JSON line (file and log) and return it as a dict"""
+        status = status or self.status
+        elapsed = time.perf_counter() - self._start
+        self._fill_query_details()
+        rows = self.rows if self.rows is not None else (self.statement_rows if self.statements else None)
+        record = {
+            "run_id": _RUN_ID,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "component": self.component,
+            "step": self.step,
+            "status": status,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows": rows,
+            "rows_per_second": round(rows / elapsed, 1) if rows and elapsed > 0 else None,
+            **self.extra,
+            "statements": [_statement_record(statement) for statement in self.statements],
+        }
+        line = json.dumps(record, default=str)
+        path = metrics_file()
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as metrics_out:
+                metrics_out.write(line + "\n")
+        logger.info(f"📈 METRICS {line}")
+        for listener in list(_step_listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                logger.debug(f"Metrics listener failed: {str(e)}")
+        return record
+
+
+@contextmanager
+def metrics_step(component: str, step: str, session: Any = None) -> Iterator[StepMetrics]:
+    """
+    Record one step and emit its JSON line on exit
+
+    ``status`` is "error" when the block raises, otherwise ``metrics.status``
+    (default "ok"; steps that report failure by return value set it themselves).
+
+    Args:
+        component: Script or class the step belongs to (e.g. ``patient_generator``)
+        step: Step name within the component
+        session: Snowpark session used by ``StepMetrics.execute`` and the history lookup
+    """
+    metrics = StepMetrics(component, step, session)
+    try:
+        yield metrics
+    except BaseException:
+        metrics.emit(status="error")
+        raise
+    metrics.emit()
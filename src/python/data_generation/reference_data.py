@@ -0,0 +1,86 @@
+"""
+Pharmacy2U Demo - Shared Reference Data for Patients and Prescriptions
+Purpose: Single source of the vocabularies used by the Snowpark and offline generators
+Method: Plain Python lists, rendered into SQL CASE expressions or indexed by NumPy draws
+
+Each list is a lookup table for one ``UNIFORM(1, len(list), RANDOM())`` draw,
+so repeated entries carry proportionally more weight (e.g. 14 of the 20 email
+first parts are 'patient'). ``sql_uniform_case`` turns a list into the CASE
+expression the Snowpark generators embed, and the offline generator indexes
+the same list with a NumPy draw, so both paths share one distribution.
+"""
+
+from typing import List
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William', 'Elizabeth',
+    'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+]
+
+LAST_NAMES = [
+    'Smith', 'Jones', 'Williams', 'Brown', 'Taylor', 'Davies', 'Wilson', 'Evans', 'Thomas', 'Johnson',
+    'Roberts', 'Walker', 'Wright', 'Robinson', 'Thompson', 'White', 'Hughes', 'Edwards', 'Green', 'Lewis',
+]
+
+UK_POSTCODES = [
+    'SW1A 1AA', 'M1 1AD', 'B2 4QA', 'LS1 1BA', 'NE1 1EE', 'G1 1AA', 'CF10 1DD', 'EH1 1YZ', 'BS1 1AA', 'L1 1AA',
+]
+
+EMAIL_FIRST_PARTS = ['james', 'mary', 'john', 'patricia', 'robert', 'jennifer'] + ['patient'] * 14
+
+EMAIL_LAST_PARTS = ['smith', 'jones', 'williams'] + ['user'] * 7
+
+# UK BNF drug codes and common prescriptions: (code, name, typical quantity, average cost GBP)
+UK_DRUGS = [
+    ('0212000B0', 'Atorvastatin', 28, 14.50),
+    ('0601023Z0', 'Metformin', 56, 8.20),
+    ('0205051R0', 'Ramipril', 28, 6.30),
+    ('0604011L0', 'Levothyroxine', 28, 4.80),
+    ('0501130R0', 'Omeprazole', 28, 5.90),
+    ('0407010H0', 'Salbutamol Inhaler', 1, 12.50),
+    ('0407020A0', 'Fluticasone Inhaler', 1, 18.90),
+    ('0101010T0', 'Gaviscon', 12, 9.40),
+    ('0403010A0', 'Aspirin', 28, 3.20),
+    ('0304010G0', 'Chlorphenamine', 28, 2.80),
+    ('0106070A0', 'Bisacodyl', 20, 3.50),
+    ('0402010N0', 'Amlodipine', 28, 5.60),
+    ('0410010N0', 'Citalopram', 28, 7.80),
+    ('0602010Y0', 'Insulin Glargine', 5, 32.50),
+    ('0301011R0', 'Amoxicillin', 21, 6.90),
+]
+
+# Relative prescribing frequency per BNF code (approximate annual NHS England items,
+# millions), so generated volumes show the real skew towards statins and PPIs
+DRUG_PRESCRIBING_WEIGHTS = {
+    '0212000B0': 57.0,  # Atorvastatin
+    '0601023Z0': 24.0,  # Metformin
+    '0205051R0': 17.0,  # Ramipril
+    '0604011L0': 33.0,  # Levothyroxine
+    '0501130R0': 33.0,  # Omeprazole
+    '0407010H0': 24.0,  # Salbutamol Inhaler
+    '0407020A0': 5.0,   # Fluticasone Inhaler
+    '0101010T0': 4.0,   # Gaviscon
+    '0403010A0': 12.0,  # Aspirin
+    '0304010G0': 3.0,   # Chlorphenamine
+    '0106070A0': 1.5,   # Bisacodyl
+    '0402010N0': 30.0,  # Amlodipine
+    '0410010N0': 11.0,  # Citalopram
+    '0602010Y0': 3.0,   # Insulin Glargine
+    '0301011R0': 13.0,  # Amoxicillin
+}
+
+
+def sql_uniform_case(values: List[str], indent: str = "        ", per_line: int = 3) -> str:
+    """
+    Render a lookup list as ``CASE UNIFORM(1, n, RANDOM()) WHEN 1 THEN ... ELSE ... END``
+
+    A trailing run of identical values collapses into the ELSE branch, so
+    weighted lists stay as short as the hand-written CASE expressions.
+    """
+    last = len(values) - 1
+    while last > 0 and values[last - 1] == values[-1]:
+        last -= 1
+    branches = [f"WHEN {i + 1} THEN '{value}'" for i, value in enumerate(values[:last])]
+    lines = [" ".join(branches[i:i + per_line]) for i in range(0, len(branches), per_line)]
+    body = "".join(f"\n{indent}    {line}" for line in lines)
+    return f"CASE UNIFORM(1, {len(values)}, RANDOM()){body}\n{indent}    ELSE '{values[-1]}'\n{indent}END"
@@ -0,0 +1,128 @@
+"""
+Pharmacy2U Demo - Shared Snowpark Session Factory
+Purpose: One authenticated Snowpark session per connection name per process
+Method: Cached factory used by the generators and the in-process deployer
+
+Creating a session costs an authentication round trip (an SSO browser hop for
+``externalbrowser`` connections) plus the TLS handshake, and every generator
+used to pay it again in its own interpreter. ``get_session`` caches sessions by
+connection name, and ``apply_generation_context`` issues the
+``USE DATABASE/SCHEMA/WAREHOUSE`` statements only the first time a session is
+used for generation. Both hold a module lock, so generators started on
+parallel deployment workers wait for the first login instead of each opening
+(and leaking) a session of their own.
+"""
+
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTION = 'pharmacy2u_demo_connection'
+
+# Bronze generation context, applied once per session
+GENERATION_DATABASE = 'PHARMACY2U_BRONZE'
+GENERATION_SCHEMA = 'RAW_DATA'
+GENERATION_WAREHOUSE = 'PHARMACY2U_LOADING_WH'
+
+# Connection keys that mean the connection authenticates without a browser
+_NON_BROWSER_AUTH_KEYS = ('password', 'private_key_file', 'private_key_path', 'token', 'authenticator')
+
+_sessions: Dict[str, Any] = {}
+_setup_seconds: Dict[str, float] = {}
+_context_applied = weakref.WeakSet()  # sessions whose generation context is set
+_lock = threading.Lock()  # guards session creation and context setup
+
+
+def _session_configs(connection_name: str) -> Dict[str, Any]:
+    """Snowpark configs from a Snowflake CLI connection, with the demo defaults filled in"""
+    from snowflake.cli.api.config import get_connection
+
+    connection_config = {key: value for key, value in get_connection(connection_name).items() if value is not None}
+    configs = {
+        "role": 'ACCOUNTADMIN',
+        "warehouse": GENERATION_WAREHOUSE,
+        "database": GENERATION_DATABASE,
+        "schema": GENERATION_SCHEMA,
+        **connection_config,
+    }
+    # Only fall back to browser SSO when the connection carries no other credentials
+    if not any(key in connection_config for key in _NON_BROWSER_AUTH_KEYS):
+        configs["authenticator"] = 'externalbrowser'
+    return configs
+
+
+def _create_session(connection_name: str) -> Any:
+    """Create a Snowpark session, falling back to the active session inside Snowflake"""
+    from snowflake.snowpark import Session
+
+    try:
+        return Session.builder.configs(_session_configs(connection_name)).create()
+    except Exception as e:
+        logger.error(f"❌ Failed to create Snowpark session: {str(e)}")
+        logger.info("💡 Attempting to use get_active_session() as fallback...")
+        try:
+            from snowflake.snowpark.context import get_active_session
+            return get_active_session()
+        except Exception:
+            raise Exception(f"Could not create Snowpark session: {str(e)}")
+
+
+def get_session(connection_name: str = DEFAULT_CONNECTION) -> Any:
+    """
+    Return the process-wide Snowpark session for a Snowflake CLI connection
+
+    The first call authenticates and logs the setup time; later calls with the
+    same connection name reuse that session.
+
+    Args:
+        connection_name: Snowflake CLI connection name
+
+    Returns:
+        Snowpark Session
+    """
+    with _lock:
+        session = _sessions.get(connection_name)
+        if session is not None:
+            logger.info(f"♻️  Reusing Snowpark session for connection: {connection_name}")
+            return session
+
+        start = time.perf_counter()
+        session = _create_session(connection_name)
+        _setup_seconds[connection_name] = time.perf_counter() - start
+        _sessions[connection_name] = session
+    logger.info(f"✅ Snowpark session created using connection: {connection_name}")
+    logger.info(f"   ⏱️  Session setup: {_setup_seconds[connection_name]:.2f} seconds")
+    return session
+
+
+def session_setup_seconds(connection_name: str = DEFAULT_CONNECTION) -> Optional[float]:
+    """Seconds spent creating the cached session for a connection (None if not created)"""
+    return _setup_seconds.get(connection_name)
+
+
+def apply_generation_context(session: Any) -> None:
+    """Point a session at the bronze generation database, schema and warehouse (once per session)"""
+    with _lock:
+        if session in _context_applied:
+            return
+        session.sql(f"USE DATABASE {GENERATION_DATABASE}").collect()
+        session.sql(f"USE SCHEMA {GENERATION_SCHEMA}").collect()
+        session.sql(f"USE WAREHOUSE {GENERATION_WAREHOUSE}").collect()
+        _context_applied.add(session)
+
+
+def close_sessions() -> None:
+    """Close every cached session (call once at process exit)"""
+    with _lock:
+        sessions = list(_sessions.items())
+        _sessions.clear()
+    for connection_name, session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            logger.warning(f"⚠️  Failed to close session for {connection_name}: {str(e)}")
+        _context_applied.discard(session)
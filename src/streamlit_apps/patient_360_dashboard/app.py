@@ -7,8 +7,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from dataclasses import replace
 from datetime import datetime, timedelta
 
+from patient_360_cache import RefreshCache
+from patient_360_frames import DASHBOARD_COLUMNS, compact_frame, fetch_frame
+from patient_360_queries import (
+    DASHBOARD_KPIS, DETAIL_COLUMNS, PATIENTS, SORT_KEYS, TIMEFRAME_DAYS, PageCursor,
+    PatientFilters, PatientPage, compute_kpis, fetch_grouped, fetch_histogram, fetch_patient_page,
+    histogram_from_frame, kpis_from_frame
+)
+
 # CRITICAL: Use native Snowflake session for Streamlit in Snowflake
 try:
     from snowflake.snowpark.context import get_active_session
@@ -175,32 +184,78 @@ st.markdown("""
 st.sidebar.header("🔍 Filters")
 selected_timeframe = st.sidebar.selectbox(
     "Time Period",
-    ["Last 30 Days", "Last 90 Days", "Last 6 Months", "Last Year", "All Time"]
+    list(TIMEFRAME_DAYS)
 )
 
-# Map timeframe to days
-timeframe_days = {
-    "Last 30 Days": 30,
-    "Last 90 Days": 90,
-    "Last 6 Months": 180,
-    "Last Year": 365,
-    "All Time": 99999
-}
-days = timeframe_days[selected_timeframe]
+# Every filter value is part of the cache key
+filters = PatientFilters(days=TIMEFRAME_DAYS[selected_timeframe])
+
+
+def load_patient_360_rows(_session, filters):
+    """Load Patient 360 rows for the charts and fallbacks (raises on error; not cached when it fails)"""
+    # Using PATIENT_360 dynamic table for performance (materialized); only the widgets' columns, compact dtypes
+    return fetch_frame(_session, DASHBOARD_COLUMNS, filters, limit=10000)
+
+
+def load_kpi_values(_session, filters):
+    """Exact KPIs over the filtered PATIENT_360 table (one aggregate query, scalars only)"""
+    return compute_kpis(_session, DASHBOARD_KPIS, filters)
+
+
+def load_gender_counts(_session, filters):
+    """Patients per gender, counted in the warehouse"""
+    rows = fetch_grouped(_session, 'GENDER', (PATIENTS,), filters)
+    return pd.Series({row['GENDER']: row['PATIENTS'] for row in rows})
+
+
+# Histogram binning per chart, done in the warehouse: 20 equal-width age bins; one bar per drug count
+AGE_BINS = dict(bins=20)
+DRUG_BINS = dict(width=1)
+
+
+def load_age_histogram(_session, filters):
+    """Age histogram over every filtered patient (bins and counts only)"""
+    return fetch_histogram(_session, 'AGE', filters, **AGE_BINS)
+
+
+def load_drug_histogram(_session, filters):
+    """Unique drugs per patient histogram over every filtered patient"""
+    return fetch_histogram(_session, 'UNIQUE_DRUGS', filters, **DRUG_BINS)
+
+
+def histogram_figure(bins, title, color, x_title):
+    """Bar chart of pre-aggregated histogram bins"""
+    fig = go.Figure(go.Bar(
+        x=[(b.start + b.end) / 2 for b in bins],
+        y=[b.count for b in bins],
+        width=[(b.end - b.start) * 0.95 for b in bins],
+        customdata=[b.label for b in bins],
+        hovertemplate='%{customdata}: %{y:,} patients<extra></extra>',
+        marker_color=color
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title='Patients')
+    return fig
+
+
+@st.cache_resource
+def get_result_cache():
+    """One result cache per app process, shared by all viewers; invalidated when PATIENT_360 refreshes"""
+    cache = RefreshCache(warm_filters=[PatientFilters(days=days) for days in TIMEFRAME_DAYS.values()])
+    cache.register('patient_360_rows', load_patient_360_rows)
+    cache.register('kpis', load_kpi_values)
+    cache.register('gender_counts', load_gender_counts)
+    cache.register('age_histogram', load_age_histogram)
+    cache.register('drug_histogram', load_drug_histogram)
+    return cache
+
+
+result_cache = get_result_cache()
 
 
-# Function to load patient 360 data with error handling
-@st.cache_data(ttl=300)
-def load_patient_360_data(_session):
+def load_patient_360_data(_session, filters):
     """Load Patient 360 view with comprehensive error handling"""
     try:
-        # Using PATIENT_360 dynamic table for performance (materialized)
-        sql = f"""
-        SELECT * FROM PHARMACY2U_GOLD.ANALYTICS.PATIENT_360
-        WHERE REGISTRATION_DATE >= DATEADD(DAY, -{days}, CURRENT_DATE())
-        LIMIT 10000
-        """
-        df = _session.sql(sql).to_pandas()
+        df = result_cache.get('patient_360_rows', _session, filters)
         
         if df.empty:
             st.warning("⚠️ No patient data found. Generating sample data...")
@@ -227,36 +282,31 @@ def generate_sample_data():
         'MARKETING_INTERACTIONS': np.random.randint(0, 100, 100),
         'CAMPAIGN_CONVERSIONS': np.random.randint(0, 20, 100),
     }
-    return pd.DataFrame(sample_data)
+    return compact_frame(pd.DataFrame(sample_data))
 
 
 # Load data
 try:
     with st.spinner('Loading patient data...'):
-        df = load_patient_360_data(session)
+        df = load_patient_360_data(session, filters)
 except Exception as e:
     st.error(f"Critical error: {str(e)}")
     df = generate_sample_data()
 
+if result_cache.token:
+    st.sidebar.caption(f"🔄 Data as of {result_cache.token}")
+
 # Key Metrics Row
 st.subheader("📊 Key Performance Indicators")
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    total_patients = len(df)
-    st.metric("Total Patients", f"{total_patients:,}")
-
-with col2:
-    avg_prescriptions = df['TOTAL_PRESCRIPTIONS'].mean() if 'TOTAL_PRESCRIPTIONS' in df.columns else 0
-    st.metric("Avg Prescriptions/Patient", f"{avg_prescriptions:.1f}")
-
-with col3:
-    total_revenue = df['LIFETIME_VALUE_GBP'].sum() if 'LIFETIME_VALUE_GBP' in df.columns else 0
-    st.metric("Total Revenue", f"£{total_revenue:,.0f}")
+try:
+    kpi_results = result_cache.get('kpis', session, filters)
+except Exception as e:
+    st.warning(f"⚠️ Could not compute KPIs in the warehouse ({str(e)}) - showing values for the loaded rows")
+    kpi_results = kpis_from_frame(df, DASHBOARD_KPIS)
 
-with col4:
-    conversion_rate = (df['CAMPAIGN_CONVERSIONS'].sum() / df['MARKETING_INTERACTIONS'].sum() * 100) if 'MARKETING_INTERACTIONS' in df.columns and df['MARKETING_INTERACTIONS'].sum() > 0 else 0
-    st.metric("Campaign Conversion Rate", f"{conversion_rate:.1f}%")
+for kpi_col, kpi in zip(st.columns(len(DASHBOARD_KPIS)), DASHBOARD_KPIS):
+    with kpi_col:
+        st.metric(kpi.label, kpi.display(kpi_results.get(kpi.label)))
 
 # Visualizations
 st.subheader("📈 Analytics")
@@ -267,14 +317,12 @@ col1, col2 = st.columns(2)
 with col1:
     st.markdown("**Patient Age Distribution**")
     try:
-        if 'AGE' in df.columns:
-            fig_age = px.histogram(
-                df, 
-                x='AGE', 
-                nbins=20,
-                title='Patient Age Distribution',
-                color_discrete_sequence=['#20b2aa']
-            )
+        try:
+            age_bins = result_cache.get('age_histogram', session, filters)
+        except Exception:
+            age_bins = histogram_from_frame(df, 'AGE', **AGE_BINS)
+        if age_bins:
+            fig_age = histogram_figure(age_bins, 'Patient Age Distribution', '#20b2aa', 'AGE')
             fig_age.update_layout(
                 showlegend=False, 
                 height=400,
@@ -291,8 +339,11 @@ with col1:
 with col2:
     st.markdown("**Gender Distribution**")
     try:
-        if 'GENDER' in df.columns:
-            gender_counts = df['GENDER'].value_counts()
+        try:
+            gender_counts = result_cache.get('gender_counts', session, filters)
+        except Exception:
+            gender_counts = df['GENDER'].value_counts() if 'GENDER' in df.columns else pd.Series(dtype='int64')
+        if not gender_counts.empty:
             fig_gender = px.pie(
                 values=gender_counts.values,
                 names=gender_counts.index,
@@ -342,13 +393,13 @@ with col3:
 
 with col4:
     try:
-        if 'UNIQUE_DRUGS' in df.columns:
-            fig_drugs = px.histogram(
-                df,
-                x='UNIQUE_DRUGS',
-                title='Distribution of Unique Drugs per Patient',
-                color_discrete_sequence=['#ff69b4']
-            )
+        try:
+            drug_bins = result_cache.get('drug_histogram', session, filters)
+        except Exception:
+            drug_bins = histogram_from_frame(df, 'UNIQUE_DRUGS', **DRUG_BINS)
+        if drug_bins:
+            fig_drugs = histogram_figure(drug_bins, 'Distribution of Unique Drugs per Patient', '#ff69b4',
+                                         'UNIQUE_DRUGS')
             fig_drugs.update_layout(
                 showlegend=False, 
                 height=400,
@@ -362,21 +413,62 @@ with col4:
     except Exception as e:
         st.error(f"Error creating drugs chart: {str(e)}")
 
-# Patient Data Table
+# Patient Data Table: one keyset page at a time, filtered, sorted and projected in the warehouse
 st.subheader("👥 Patient Details")
 try:
-    display_cols = ['PATIENT_ID', 'AGE', 'GENDER', 'TOTAL_PRESCRIPTIONS', 
-                    'LIFETIME_VALUE_GBP', 'MARKETING_INTERACTIONS', 'CAMPAIGN_CONVERSIONS']
-    available_cols = [col for col in display_cols if col in df.columns]
+    table_col1, table_col2, table_col3, table_col4 = st.columns(4)
+    with table_col1:
+        detail_gender = st.selectbox("Gender", ["All", "Male", "Female"], key='detail_gender')
+    with table_col2:
+        detail_tier = st.selectbox("Customer Tier", ["All", "Platinum", "Gold", "Silver", "Bronze"], key='detail_tier')
+    with table_col3:
+        detail_sort = st.selectbox("Sort by", list(SORT_KEYS), key='detail_sort')
+        detail_descending = st.checkbox("Descending", key='detail_descending')
+    with table_col4:
+        detail_page_size = st.selectbox("Rows per page", [25, 50, 100], index=1, key='detail_page_size')
+        jump_to = st.text_input("Go to Patient ID", key='detail_jump_to').strip()
+    detail_cols = st.multiselect("Columns", list(DETAIL_COLUMNS), default=list(DETAIL_COLUMNS), key='detail_cols')
+    
+    detail_filters = replace(filters,
+                             gender=None if detail_gender == "All" else detail_gender,
+                             customer_tier=None if detail_tier == "All" else detail_tier)
+    
+    # Cursor stack for Previous/Next; any change of filter, sort or jump target starts again at page 1
+    view = (detail_filters, detail_sort, detail_descending, detail_page_size, jump_to)
+    if st.session_state.get('detail_view') != view:
+        st.session_state.detail_view = view
+        start = PageCursor(jump_to, jump_to, inclusive=True) if jump_to and detail_sort == 'PATIENT_ID' else None
+        st.session_state.detail_cursors = [start]
+    cursors = st.session_state.detail_cursors
     
-    if available_cols:
+    try:
+        page = fetch_patient_page(session, detail_filters, detail_cols or ['PATIENT_ID'], detail_sort,
+                                  detail_descending, cursors[-1], detail_page_size)
+    except Exception as e:
+        st.warning(f"⚠️ Could not page patients in the warehouse ({str(e)}) - showing the loaded rows")
+        sample_cols = [col for col in ['PATIENT_ID', *detail_cols] if col in df.columns]
+        page = PatientPage(df[list(dict.fromkeys(sample_cols))].head(detail_page_size).to_dict('records'), None)
+    
+    if page.rows:
         st.dataframe(
-            df[available_cols].head(20),
+            pd.DataFrame(page.rows),
             use_container_width=True,
             height=400
         )
     else:
-        st.warning("No patient data columns available")
+        st.info("No patients match these filters")
+    
+    nav_prev, nav_page, nav_next = st.columns([1, 2, 1])
+    with nav_prev:
+        if st.button("◀ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with nav_page:
+        st.caption(f"Page {len(cursors):,} · {len(page.rows)} rows")
+    with nav_next:
+        if st.button("Next ▶", disabled=page.next_cursor is None):
+            cursors.append(page.next_cursor)
+            st.rerun()
 except Exception as e:
     st.error(f"Error displaying patient table: {str(e)}")
 
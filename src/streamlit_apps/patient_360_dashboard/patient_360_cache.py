@@ -0,0 +1,186 @@
+"""
+Pharmacy2U Patient 360 Dashboard - Refresh-Aware Result Cache
+Purpose: Serve dashboard queries from memory until PATIENT_360 actually refreshes
+Method: Results keyed on (query, filter values), invalidated by the dynamic table's data timestamp; warm-up after each refresh
+
+``@st.cache_data(ttl=300)`` on a loader that read the module-level ``days``
+ignored the Time Period selector, so its entries could belong to the wrong
+filter. The TTL also re-ran every query every 5 minutes, whether or not the
+table had changed. ``RefreshCache`` keys each result on the query name and
+the full ``PatientFilters`` value. An entry stays valid while the refresh
+token is unchanged, and the token is PATIENT_360's last data-changing refresh
+(``DATA_TIMESTAMP``). The token is checked at most every ``check_seconds``.
+
+When the token changes, the old entries are dropped. A background thread
+then warms every registered query for the common filters (one per Time
+Period), so the first viewer after a refresh finds warm results.
+Concurrent requests for the same entry share one warehouse query. Failed
+loads are not cached.
+
+One cache per app process (``st.cache_resource``) is shared by all viewers.
+Results are returned as stored, so callers must not modify them.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from patient_360_queries import PATIENT_360_TABLE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_SECONDS = 30
+# Without a readable refresh timestamp, entries expire on this interval instead
+FALLBACK_TTL_SECONDS = 300
+
+
+def _refresh_token_queries(table: str) -> Tuple[str, ...]:
+    database, schema, name = table.split(".")
+    return (
+        # Last refresh that changed data (NO_DATA refreshes advance the timestamp without new rows)
+        f"SELECT MAX(DATA_TIMESTAMP) AS TOKEN "
+        f"FROM TABLE({database}.INFORMATION_SCHEMA.DYNAMIC_TABLE_REFRESH_HISTORY(NAME => '{table}')) "
+        f"WHERE STATE = 'SUCCEEDED' AND REFRESH_ACTION <> 'NO_DATA'",
+        # PATIENT_360 starts as a plain table until it is converted to a dynamic table
+        f"SELECT LAST_ALTERED AS TOKEN FROM {database}.INFORMATION_SCHEMA.TABLES "
+        f"WHERE TABLE_SCHEMA = '{schema}' AND TABLE_NAME = '{name}'",
+    )
+
+
+def patient_360_data_timestamp(session: Any, table: str = PATIENT_360_TABLE) -> Optional[str]:
+    """
+    When the table's data last changed
+
+    Returns:
+        The last data-changing refresh of the dynamic table, else the table's
+        LAST_ALTERED; None when neither can be read
+    """
+    for sql in _refresh_token_queries(table):
+        try:
+            rows = session.sql(sql).collect()
+        except Exception as e:
+            logger.debug(f"Refresh token query failed: {str(e)}")
+            continue
+        values = (rows[0].as_dict() if hasattr(rows[0], "as_dict") else dict(rows[0])) if rows else {}
+        token = next(iter(values.values()), None)
+        if token is not None:
+            return str(token)
+    return None
+
+
+class RefreshCache:
+    """Query results keyed on filter values, valid until the source data refreshes"""
+
+    def __init__(
+        self,
+        token_source: Callable[[Any], Optional[str]] = patient_360_data_timestamp,
+        warm_filters: Sequence[Hashable] = (),
+        check_seconds: float = DEFAULT_CHECK_SECONDS,
+        warm_in_background: bool = True
+    ):
+        """
+        Args:
+            token_source: Returns the current refresh token for a session
+            warm_filters: Filter values every registered query is warmed for after a refresh
+            check_seconds: Minimum seconds between refresh token checks
+            warm_in_background: Warm on a daemon thread (False warms before returning, e.g. in tests)
+        """
+        self.token_source = token_source
+        self.warm_filters = list(warm_filters)
+        self.check_seconds = check_seconds
+        self.warm_in_background = warm_in_background
+        self.token: Optional[str] = None
+        self.warmup_thread: Optional[threading.Thread] = None
+        self._loaders: Dict[str, Callable[[Any, Any], Any]] = {}
+        self._entries: Dict[Tuple[str, Hashable], Future] = {}
+        self._checked_at: Optional[float] = None
+        self._has_token = False
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[Any, Any], Any]) -> None:
+        """Add a query; ``loader(session, filters)`` returns its result"""
+        self._loaders[name] = loader
+
+    def _current_token(self) -> str:
+        """The refresh token, or a time bucket when there is none"""
+        return self.token or f"ttl:{int(time.time() // FALLBACK_TTL_SECONDS)}"
+
+    def check_refresh(self, session: Any, force: bool = False) -> bool:
+        """
+        Re-read the refresh token (at most every ``check_seconds``); drop entries and warm up when it changed
+
+        Returns:
+            True when the cache was invalidated
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_seconds:
+                return False
+            self._checked_at = now
+        token = self.token_source(session)
+        with self._lock:
+            if self._has_token and token == self.token:
+                return False
+            previous, self.token, self._has_token = self.token, token, True
+            self._entries.clear()
+        logger.info(f"🔄 PATIENT_360 data as of {token} (was {previous}): cache cleared")
+        self.warm(session)
+        return True
+
+    def get(self, name: str, session: Any, filters: Hashable) -> Any:
+        """
+        Cached result of a registered query for these filters
+
+        The first caller for a key runs the query; concurrent callers wait for
+        its result. A failed load raises to every waiting caller and is not cached.
+        """
+        self.check_refresh(session)
+        key = (name, filters)
+        with self._lock:
+            # Without a refresh token, entries are keyed on a time bucket as well
+            if self.token is None:
+                bucket = self._current_token()
+                key = (name, filters, bucket)
+                for stale in [k for k in self._entries if len(k) == 3 and k[2] != bucket]:
+                    del self._entries[stale]
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = self._entries[key] = Future()
+        if owner:
+            try:
+                future.set_result(self._loaders[name](session, filters))
+            except BaseException as e:
+                with self._lock:
+                    if self._entries.get(key) is future:
+                        del self._entries[key]
+                future.set_exception(e)
+        return future.result()
+
+    def warm(self, session: Any) -> None:
+        """Load every registered query for each warm filter (in the background unless disabled)"""
+        jobs = [(name, filters) for filters in self.warm_filters for name in self._loaders]
+        if not jobs:
+            return
+
+        def run() -> None:
+            start = time.perf_counter()
+            for name, filters in jobs:
+                try:
+                    self.get(name, session, filters)
+                except Exception as e:
+                    logger.warning(f"⚠️  Warm-up of {name} {filters} failed: {str(e)}")
+            logger.info(f"🔥 Warmed {len(jobs)} dashboard queries in {time.perf_counter() - start:.2f}s")
+
+        if self.warm_in_background:
+            self.warmup_thread = threading.Thread(target=run, name="patient360-warmup", daemon=True)
+            self.warmup_thread.start()
+        else:
+            run()
+
+    def cached_keys(self) -> List[Tuple[str, Hashable]]:
+        """Keys with a completed, successful result"""
+        with self._lock:
+            return [key for key, future in self._entries.items() if future.done() and future.exception() is None]
@@ -0,0 +1,150 @@
+"""
+Pharmacy2U Patient 360 Dashboard - Compact Row Fetch
+Purpose: Load the row-level PATIENT_360 data the dashboard still needs, in as few bytes as possible
+Method: Project only the columns the widgets declare, stream Arrow batches, downcast each batch to compact dtypes
+
+The row frame used to come from ``SELECT *`` and ``to_pandas()``. That
+fetched every PII column (names, NHS number, email, phone, postcode) that no
+widget displays. Each session then held them as object-dtype strings: one
+Python object per value, next to the int64/float64 columns.
+
+``fetch_frame`` selects only the columns in ``WIDGET_COLUMNS``. It reads the
+result with ``to_pandas_batches()``, so only one Arrow batch is converted at
+a time. Each batch is compacted before the next is read:
+
+- ``GENDER`` and ``CUSTOMER_TIER`` become categoricals, with one code per row
+- counts become the smallest integer type that holds them (nullable when NULLs occur)
+- values become float32
+- ``PATIENT_ID`` becomes an Arrow-backed string
+
+float32 keeps about 7 significant digits. That is enough for charts and the
+sample-data fallbacks. Exact totals come from the warehouse aggregates in
+``patient_360_queries``.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from patient_360_queries import DASHBOARD_KPIS, DETAIL_COLUMNS, PATIENT_360_TABLE, PatientFilters, unique_aggregates
+
+CATEGORY_COLUMNS = ("GENDER", "CUSTOMER_TIER")
+COUNT_COLUMNS = ("AGE", "TOTAL_PRESCRIPTIONS", "UNIQUE_DRUGS", "MARKETING_INTERACTIONS", "CAMPAIGN_CONVERSIONS")
+VALUE_COLUMNS = ("LIFETIME_VALUE_GBP",)
+ID_COLUMNS = ("PATIENT_ID",)
+# Only these columns can be fetched row by row; direct identifiers stay in the warehouse
+FRAME_COLUMNS = ID_COLUMNS + CATEGORY_COLUMNS + COUNT_COLUMNS + VALUE_COLUMNS
+
+# Columns each widget reads from the row frame (charts, plus the sample-data fallbacks of warehouse widgets)
+WIDGET_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "prescriptions_vs_value": ("TOTAL_PRESCRIPTIONS", "LIFETIME_VALUE_GBP"),
+    "kpis": tuple(a.column for a in unique_aggregates(DASHBOARD_KPIS) if a.column != "*"),
+    "age_histogram": ("AGE",),
+    "gender_counts": ("GENDER",),
+    "drug_histogram": ("UNIQUE_DRUGS",),
+    "patient_details": DETAIL_COLUMNS,
+}
+
+_INTEGER_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def projected_columns(column_sets: Iterable[Sequence[str]]) -> List[str]:
+    """Union of the widgets' columns, in FRAME_COLUMNS order"""
+    wanted = {column for columns in column_sets for column in columns}
+    unknown = wanted - set(FRAME_COLUMNS)
+    if unknown:
+        raise ValueError(f"Columns {sorted(unknown)} cannot be fetched row by row - expected a subset of {FRAME_COLUMNS}")
+    return [column for column in FRAME_COLUMNS if column in wanted]
+
+
+DASHBOARD_COLUMNS = projected_columns(WIDGET_COLUMNS.values())
+
+
+def _compact_count(values: pd.Series) -> pd.Series:
+    """Smallest integer dtype that holds the values; the nullable variant when any are NULL"""
+    numbers = pd.to_numeric(values)
+    present = numbers.dropna()
+    low, high = (present.min(), present.max()) if not present.empty else (0, 0)
+    int_type = next(t for t in _INTEGER_TYPES if np.iinfo(t).min <= low and high <= np.iinfo(t).max)
+    if len(present) < len(numbers):
+        return numbers.astype(pd.api.types.pandas_dtype(int_type.__name__.capitalize()))
+    return numbers.astype(int_type)
+
+
+def compact_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Downcast known PATIENT_360 columns to compact dtypes (other columns are left as they are)
+
+    Returns:
+        The same frame, with its columns replaced
+    """
+    for column in frame.columns:
+        values = frame[column]
+        if column in CATEGORY_COLUMNS and not isinstance(values.dtype, pd.CategoricalDtype):
+            frame[column] = values.astype("category")
+        elif column in COUNT_COLUMNS:
+            frame[column] = _compact_count(values)
+        elif column in VALUE_COLUMNS:
+            frame[column] = pd.to_numeric(values).astype(np.float32)
+        elif column in ID_COLUMNS:
+            frame[column] = values.astype("string[pyarrow]")
+    return frame
+
+
+def _align_categories(frames: List[pd.DataFrame]) -> None:
+    """Give every batch the same categories, so concatenation keeps them categorical"""
+    for column in CATEGORY_COLUMNS:
+        present = [frame for frame in frames if column in frame.columns]
+        categories = sorted(set().union(*(frame[column].cat.categories for frame in present)))
+        for frame in present:
+            frame[column] = frame[column].cat.set_categories(categories)
+
+
+def build_frame_query(
+    columns: Sequence[str],
+    filters: PatientFilters,
+    limit: Optional[int] = None,
+    table: str = PATIENT_360_TABLE
+) -> Tuple[str, List[Any]]:
+    """Projected row query; returns (sql, bind parameters)"""
+    select = ", ".join(projected_columns([columns]))
+    if not select:
+        raise ValueError("At least one column is required")
+    where, params = filters.where_sql()
+    sql = f"SELECT {select}\nFROM {table}" + (f"\n{where}" if where else "")
+    if limit is not None:
+        sql += "\nLIMIT ?"
+        params.append(int(limit))
+    return sql, params
+
+
+def fetch_frame(
+    session: Any,
+    columns: Sequence[str] = DASHBOARD_COLUMNS,
+    filters: PatientFilters = PatientFilters(),
+    limit: Optional[int] = None,
+    table: str = PATIENT_360_TABLE
+) -> pd.DataFrame:
+    """
+    Row-level PATIENT_360 data for the given columns, fetched batch by batch into compact dtypes
+
+    Args:
+        session: Snowpark session
+        columns: Columns to fetch (a subset of FRAME_COLUMNS)
+        filters: Dashboard filters, applied in the warehouse
+        limit: Maximum rows (None for all)
+        table: Table to read
+
+    Returns:
+        DataFrame with categorical, small-integer, float32 and Arrow string columns
+    """
+    sql, params = build_frame_query(columns, filters, limit, table)
+    result = session.sql(sql, params=params)
+    batches = result.to_pandas_batches() if hasattr(result, "to_pandas_batches") else [result.to_pandas()]
+    frames = [compact_frame(batch) for batch in batches]
+    if not frames:
+        return compact_frame(pd.DataFrame(columns=projected_columns([columns])))
+    _align_categories(frames)
+    # Batches can differ in integer width or NULLs; compacting the result settles one dtype per column
+    return compact_frame(pd.concat(frames, ignore_index=True))
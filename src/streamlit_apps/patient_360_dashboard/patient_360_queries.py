@@ -0,0 +1,432 @@
+"""
+Pharmacy2U Patient 360 Dashboard - Warehouse Query Layer
+Purpose: Exact KPIs and chart aggregates over the whole PATIENT_360 table
+Method: Widgets declare their aggregates; COUNT/SUM/AVG run in the warehouse as one query returning scalars
+
+The dashboard used to pull ``SELECT * ... LIMIT 10000`` into pandas and
+compute its headline numbers from those rows. Those numbers came from an
+arbitrary sample, and every column crossed the wire. Instead, each KPI
+declares the aggregates it needs. ``compute_kpis`` collects the aggregates
+of all KPIs, removes duplicates, and runs them as one ``SELECT`` with the
+filters in the ``WHERE`` clause. The KPI values are then derived from the
+returned scalars, so page load no longer depends on table size. Charts
+that only need counts per group use ``fetch_grouped`` the same way.
+Histograms use ``fetch_histogram``: the warehouse bins the values with
+``WIDTH_BUCKET`` (equal-width bins between MIN and MAX) or ``FLOOR``
+(fixed-width bins), and only the (bin, count) pairs come back.
+The Patient Details table is read one page at a time with
+``fetch_patient_page``. Pages use keyset pagination on (sort key,
+``PATIENT_ID``), and only the displayed columns are selected, so page
+1,000,000 costs the same as page 1.
+
+Filter values are passed as bind parameters, never formatted into the SQL.
+"""
+
+import re
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PATIENT_360_TABLE = "PHARMACY2U_GOLD.ANALYTICS.PATIENT_360"
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+
+# Time Period choices (days since registration); the result cache warms each of them
+TIMEFRAME_DAYS = {
+    "Last 30 Days": 30,
+    "Last 90 Days": 90,
+    "Last 6 Months": 180,
+    "Last Year": 365,
+    "All Time": None,
+}
+
+_IDENTIFIER = re.compile(r"^[A-Z_][A-Z0-9_]*$")
+
+
+def _check_identifier(name: str) -> str:
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Not a plain column identifier: {name!r}")
+    return name
+
+
+def _plain(value: Any) -> Any:
+    """Snowflake NUMBER results arrive as Decimal; charts and formatting want floats"""
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _row_dict(row: Any) -> Dict[str, Any]:
+    values = row.as_dict() if hasattr(row, "as_dict") else dict(row)
+    return {str(key).upper(): _plain(value) for key, value in values.items()}
+
+
+@dataclass(frozen=True)
+class PatientFilters:
+    """Dashboard filter values, applied in the warehouse"""
+    days: Optional[int] = None  # registered within the last N days; None for all time
+    gender: Optional[str] = None
+    customer_tier: Optional[str] = None
+
+    def clauses(self) -> Tuple[List[str], List[Any]]:
+        """Filter conditions and their bind parameters"""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if self.days is not None:
+            clauses.append("REGISTRATION_DATE >= DATEADD(DAY, -?, CURRENT_DATE())")
+            params.append(int(self.days))
+        if self.gender is not None:
+            clauses.append("GENDER = ?")
+            params.append(self.gender)
+        if self.customer_tier is not None:
+            clauses.append("CUSTOMER_TIER = ?")
+            params.append(self.customer_tier)
+        return clauses, params
+
+    def where_sql(self) -> Tuple[str, List[Any]]:
+        """WHERE clause (empty without filters) and its bind parameters"""
+        clauses, params = self.clauses()
+        return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """One warehouse-side aggregate, returned under ``alias``"""
+    alias: str
+    function: str
+    column: str = "*"
+
+    def __post_init__(self):
+        if self.function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unsupported aggregate '{self.function}' - expected one of {AGGREGATE_FUNCTIONS}")
+        _check_identifier(self.alias)
+        if self.column != "*":
+            _check_identifier(self.column)
+        elif self.function != "COUNT":
+            raise ValueError(f"{self.function} needs a column")
+
+    def sql(self) -> str:
+        return f"{self.function}({self.column}) AS {self.alias}"
+
+    def apply(self, frame: Any) -> Any:
+        """The same aggregate over a local pandas frame (sample-data fallback)"""
+        if self.column == "*":
+            return len(frame)
+        if self.column not in frame.columns:
+            return None
+        values = frame[self.column].dropna()
+        if self.function == "COUNT":
+            return int(values.count())
+        if values.empty:
+            return None
+        return float({"SUM": values.sum, "AVG": values.mean, "MIN": values.min, "MAX": values.max}[self.function]())
+
+
+@dataclass(frozen=True)
+class Kpi:
+    """A headline number: the aggregates it needs and how its value follows from them"""
+    label: str
+    aggregates: Tuple[Aggregate, ...]
+    value: Callable[[Dict[str, Any]], Optional[float]]
+    format: str = "{:,.0f}"
+
+    def display(self, value: Optional[float]) -> str:
+        return "–" if value is None else self.format.format(value)
+
+
+def _ratio(numerator: Optional[float], denominator: Optional[float], scale: float = 1.0) -> Optional[float]:
+    return numerator * scale / denominator if numerator is not None and denominator else None
+
+
+PATIENTS = Aggregate("PATIENTS", "COUNT")
+AVG_PRESCRIPTIONS = Aggregate("AVG_PRESCRIPTIONS", "AVG", "TOTAL_PRESCRIPTIONS")
+TOTAL_REVENUE = Aggregate("TOTAL_REVENUE", "SUM", "LIFETIME_VALUE_GBP")
+CONVERSIONS = Aggregate("CONVERSIONS", "SUM", "CAMPAIGN_CONVERSIONS")
+INTERACTIONS = Aggregate("INTERACTIONS", "SUM", "MARKETING_INTERACTIONS")
+
+DASHBOARD_KPIS = (
+    Kpi("Total Patients", (PATIENTS,), lambda r: r["PATIENTS"]),
+    Kpi("Avg Prescriptions/Patient", (AVG_PRESCRIPTIONS,), lambda r: r["AVG_PRESCRIPTIONS"], "{:.1f}"),
+    Kpi("Total Revenue", (TOTAL_REVENUE,), lambda r: r["TOTAL_REVENUE"], "£{:,.0f}"),
+    Kpi("Campaign Conversion Rate", (CONVERSIONS, INTERACTIONS),
+        lambda r: _ratio(r["CONVERSIONS"], r["INTERACTIONS"], 100), "{:.1f}%"),
+)
+
+
+def unique_aggregates(kpis: Iterable[Kpi]) -> List[Aggregate]:
+    """Aggregates of all KPIs, each once (an alias must always mean the same aggregate)"""
+    by_alias: Dict[str, Aggregate] = {}
+    for kpi in kpis:
+        for aggregate in kpi.aggregates:
+            existing = by_alias.setdefault(aggregate.alias, aggregate)
+            if existing != aggregate:
+                raise ValueError(f"Aggregate alias {aggregate.alias} is defined twice: {existing} and {aggregate}")
+    return list(by_alias.values())
+
+
+def build_aggregate_query(aggregates: Sequence[Aggregate], filters: PatientFilters,
+                          table: str = PATIENT_360_TABLE) -> Tuple[str, List[Any]]:
+    """One SELECT computing every aggregate; returns (sql, bind parameters)"""
+    if not aggregates:
+        raise ValueError("No aggregates to compute")
+    where, params = filters.where_sql()
+    columns = ",\n    ".join(aggregate.sql() for aggregate in aggregates)
+    return f"SELECT\n    {columns}\nFROM {table}\n{where}".rstrip(), params
+
+
+def fetch_aggregates(session: Any, aggregates: Sequence[Aggregate], filters: PatientFilters,
+                     table: str = PATIENT_360_TABLE) -> Dict[str, Any]:
+    """
+    Run the aggregates as one warehouse query
+
+    Args:
+        session: Snowpark session
+        aggregates: Aggregates to compute
+        filters: Dashboard filters, applied in the WHERE clause
+        table: Table to aggregate
+
+    Returns:
+        Alias to scalar value (None where the aggregate is NULL)
+    """
+    sql, params = build_aggregate_query(aggregates, filters, table)
+    rows = session.sql(sql, params=params).collect()
+    values = _row_dict(rows[0]) if rows else {}
+    return {aggregate.alias: values.get(aggregate.alias) for aggregate in aggregates}
+
+
+def kpi_values(kpis: Sequence[Kpi], results: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """KPI label to value, from the aggregate results"""
+    return {kpi.label: kpi.value(results) for kpi in kpis}
+
+
+def compute_kpis(session: Any, kpis: Sequence[Kpi] = DASHBOARD_KPIS,
+                 filters: PatientFilters = PatientFilters()) -> Dict[str, Optional[float]]:
+    """Exact KPI values over the whole filtered table, from one aggregate query"""
+    return kpi_values(kpis, fetch_aggregates(session, unique_aggregates(kpis), filters))
+
+
+def kpis_from_frame(frame: Any, kpis: Sequence[Kpi] = DASHBOARD_KPIS) -> Dict[str, Optional[float]]:
+    """The same KPIs over a local frame (used with the sample data when the warehouse is unavailable)"""
+    return kpi_values(kpis, {aggregate.alias: aggregate.apply(frame) for aggregate in unique_aggregates(kpis)})
+
+
+def build_grouped_query(group_by: str, aggregates: Sequence[Aggregate], filters: PatientFilters,
+                        table: str = PATIENT_360_TABLE) -> Tuple[str, List[Any]]:
+    """Aggregates per value of one column, largest first by the first aggregate"""
+    _check_identifier(group_by)
+    sql, params = build_aggregate_query(aggregates, filters, table)
+    select, rest = sql.split("\n", 1)
+    return (f"{select}\n    {group_by},\n{rest}\nGROUP BY {group_by}\n"
+            f"ORDER BY {aggregates[0].alias} DESC"), params
+
+
+def fetch_grouped(session: Any, group_by: str, aggregates: Sequence[Aggregate], filters: PatientFilters,
+                  table: str = PATIENT_360_TABLE) -> List[Dict[str, Any]]:
+    """
+    Aggregates per group, computed in the warehouse (one small row per group)
+
+    Returns:
+        One dict per group with ``group_by`` and each aggregate alias
+    """
+    sql, params = build_grouped_query(group_by, aggregates, filters, table)
+    return [_row_dict(row) for row in session.sql(sql, params=params).collect()]
+
+
+@dataclass(frozen=True)
+class HistogramBin:
+    """Patients with ``start <= value < end`` (the last WIDTH_BUCKET bin also includes the maximum)"""
+    start: float
+    end: float
+    count: int
+
+    @property
+    def label(self) -> str:
+        return f"{self.start:g}–{self.end:g}"
+
+
+def build_histogram_query(column: str, filters: PatientFilters, bins: int = 20, width: Optional[float] = None,
+                          table: str = PATIENT_360_TABLE) -> Tuple[str, List[Any]]:
+    """
+    Bin one column in the warehouse; returns (sql, bind parameters)
+
+    With ``width``, bins are ``FLOOR(value / width) * width`` (one bar per value
+    for counts with width 1). Otherwise ``bins`` equal-width buckets span the
+    filtered MIN..MAX, and the maximum is folded into the last bucket.
+    """
+    _check_identifier(column)
+    where, params = filters.where_sql()
+    where = f"{where} AND {column} IS NOT NULL" if where else f"WHERE {column} IS NOT NULL"
+    values = f"WITH VALS AS (\n    SELECT {column} AS VALUE FROM {table}\n    {where}\n)"
+    if width is not None:
+        if width <= 0:
+            raise ValueError("Histogram bin width must be positive")
+        return (f"{values}\nSELECT FLOOR(VALUE / ?) * ? AS BIN_START, COUNT(*) AS PATIENTS\n"
+                f"FROM VALS\nGROUP BY BIN_START\nORDER BY BIN_START"), params + [width, width]
+    if bins < 1:
+        raise ValueError("Histogram needs at least one bin")
+    return (f"{values},\nBOUNDS AS (SELECT MIN(VALUE) AS LO, MAX(VALUE) AS HI FROM VALS)\n"
+            f"SELECT IFF(HI = LO, 1, LEAST(WIDTH_BUCKET(VALUE, LO, HI, ?), ?)) AS BIN, COUNT(*) AS PATIENTS,\n"
+            f"    ANY_VALUE(LO) AS LO, ANY_VALUE(HI) AS HI\n"
+            f"FROM VALS, BOUNDS\nGROUP BY BIN\nORDER BY BIN"), params + [bins, bins]
+
+
+def _bins_from_rows(rows: List[Dict[str, Any]], bins: int, width: Optional[float]) -> List[HistogramBin]:
+    if width is not None:
+        return [HistogramBin(row["BIN_START"], row["BIN_START"] + width, int(row["PATIENTS"])) for row in rows]
+    result = []
+    for row in rows:
+        low, high = row["LO"], row["HI"]
+        step = (high - low) / bins if high > low else 1
+        start = low + (row["BIN"] - 1) * step
+        result.append(HistogramBin(start, start + step, int(row["PATIENTS"])))
+    return result
+
+
+def fetch_histogram(session: Any, column: str, filters: PatientFilters, bins: int = 20,
+                    width: Optional[float] = None, table: str = PATIENT_360_TABLE) -> List[HistogramBin]:
+    """
+    Histogram of one column over the whole filtered table, binned in the warehouse
+
+    Args:
+        session: Snowpark session
+        column: Numeric column to bin
+        filters: Dashboard filters
+        bins: Number of equal-width bins between the column's MIN and MAX
+        width: Fixed bin width instead (``FLOOR`` binning)
+        table: Table to read
+
+    Returns:
+        Non-empty bins in value order (empty bins are not returned)
+    """
+    sql, params = build_histogram_query(column, filters, bins, width, table)
+    rows = [_row_dict(row) for row in session.sql(sql, params=params).collect()]
+    return _bins_from_rows(rows, bins, width)
+
+
+def histogram_from_frame(frame: Any, column: str, bins: int = 20, width: Optional[float] = None) -> List[HistogramBin]:
+    """The same binning over a local frame (sample-data fallback)"""
+    if column not in frame.columns:
+        return []
+    values = frame[column].dropna().astype(float)
+    if values.empty:
+        return []
+    if width is not None:
+        starts = (values // width) * width
+        rows = [{"BIN_START": start, "PATIENTS": count} for start, count in sorted(starts.value_counts().items())]
+        return _bins_from_rows(rows, bins, width)
+    low, high = float(values.min()), float(values.max())
+    if high > low:
+        buckets = ((values - low) / (high - low) * bins).astype(int).clip(upper=bins - 1) + 1
+    else:
+        buckets = values * 0 + 1
+    rows = [{"BIN": int(bucket), "PATIENTS": count, "LO": low, "HI": high}
+            for bucket, count in sorted(buckets.value_counts().items())]
+    return _bins_from_rows(rows, bins, width)
+
+
+# Patient Details columns (no direct identifiers beyond PATIENT_ID) and how each sorts;
+# nullable sums sort as 0 so the keyset comparison never meets a NULL
+DETAIL_COLUMNS = ("PATIENT_ID", "AGE", "GENDER", "CUSTOMER_TIER", "TOTAL_PRESCRIPTIONS", "LIFETIME_VALUE_GBP",
+                  "MARKETING_INTERACTIONS", "CAMPAIGN_CONVERSIONS")
+SORT_KEYS = {
+    "PATIENT_ID": "PATIENT_ID",
+    "AGE": "COALESCE(AGE, -1)",
+    "TOTAL_PRESCRIPTIONS": "TOTAL_PRESCRIPTIONS",
+    "LIFETIME_VALUE_GBP": "COALESCE(LIFETIME_VALUE_GBP, 0)",
+    "MARKETING_INTERACTIONS": "MARKETING_INTERACTIONS",
+    "CAMPAIGN_CONVERSIONS": "COALESCE(CAMPAIGN_CONVERSIONS, 0)",
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Position after the last row of a page: its sort key and PATIENT_ID (``inclusive`` to start at a key)"""
+    sort_value: Any
+    patient_id: str
+    inclusive: bool = False
+
+
+@dataclass
+class PatientPage:
+    """One page of the Patient Details table"""
+    rows: List[Dict[str, Any]]
+    next_cursor: Optional[PageCursor]  # None on the last page
+
+
+def build_page_query(
+    filters: PatientFilters,
+    columns: Sequence[str] = DETAIL_COLUMNS,
+    sort: str = "PATIENT_ID",
+    descending: bool = False,
+    after: Optional[PageCursor] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    table: str = PATIENT_360_TABLE
+) -> Tuple[str, List[Any]]:
+    """
+    Keyset page query: ``WHERE (key, PATIENT_ID) > cursor ORDER BY key, PATIENT_ID LIMIT page_size + 1``
+
+    The extra row only tells whether another page follows. Returns (sql, bind parameters).
+    """
+    unknown = [column for column in columns if column not in DETAIL_COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Columns must be a subset of {DETAIL_COLUMNS}: {unknown or 'none given'}")
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unsupported sort '{sort}' - expected one of {tuple(SORT_KEYS)}")
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+
+    key = SORT_KEYS[sort]
+    clauses, params = filters.clauses()
+    if after is not None:
+        op = "<" if descending else ">"
+        if sort == "PATIENT_ID":
+            clauses.append(f"PATIENT_ID {op}{'=' if after.inclusive else ''} ?")
+            params.append(after.patient_id)
+        else:
+            id_op = op + ("=" if after.inclusive else "")
+            clauses.append(f"({key} {op} ? OR ({key} = ? AND PATIENT_ID {id_op} ?))")
+            params.extend([after.sort_value, after.sort_value, after.patient_id])
+    where = f"\nWHERE {' AND '.join(clauses)}" if clauses else ""
+    direction = " DESC" if descending else ""
+    select = ", ".join(dict.fromkeys(["PATIENT_ID", *columns]))
+    return (f"SELECT {select}, {key} AS SORT_KEY\nFROM {table}{where}\n"
+            f"ORDER BY SORT_KEY{direction}, PATIENT_ID{direction}\nLIMIT ?"), params + [page_size + 1]
+
+
+def fetch_patient_page(
+    session: Any,
+    filters: PatientFilters,
+    columns: Sequence[str] = DETAIL_COLUMNS,
+    sort: str = "PATIENT_ID",
+    descending: bool = False,
+    after: Optional[PageCursor] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    table: str = PATIENT_360_TABLE
+) -> PatientPage:
+    """
+    One page of patients, filtered, sorted and projected in the warehouse
+
+    Args:
+        session: Snowpark session
+        filters: Dashboard and table filters
+        columns: Columns to display (PATIENT_ID is always included for the cursor)
+        sort: Key from SORT_KEYS; PATIENT_ID breaks ties
+        descending: Sort direction
+        after: Cursor from the previous page (None for the first page)
+        page_size: Rows per page
+        table: Table to read
+
+    Returns:
+        PatientPage with at most ``page_size`` rows and the cursor for the next page
+    """
+    sql, params = build_page_query(filters, columns, sort, descending, after, page_size, table)
+    rows = session.sql(sql, params=params).collect()
+    page, more = [_row_dict(row) for row in rows[:page_size]], len(rows) > page_size
+    next_cursor = None
+    if more:
+        # The cursor keeps the key exactly as returned (Decimal, not float) so the equality test holds
+        last = rows[page_size - 1]
+        last = last.as_dict() if hasattr(last, "as_dict") else dict(last)
+        next_cursor = PageCursor(last["SORT_KEY"], last["PATIENT_ID"])
+    for row in page:
+        del row["SORT_KEY"]
+    return PatientPage(page, next_cursor)
@@ -0,0 +1,87 @@
+"""
+Options and fixtures for the generator benchmark suite
+
+    pytest tests/benchmarks --benchmark-sizes 10000,100000 --benchmark-threshold 15
+    pytest tests/benchmarks --benchmark-save-baseline
+
+The command-line options are registered in ``tests/conftest.py`` so they are
+accepted whether pytest is pointed at ``tests`` or ``tests/benchmarks``.
+Cases without a baseline entry cannot be checked for regressions; they are
+listed in a warning block at the end of the run, or fail with
+``--benchmark-require-baseline``.
+"""
+
+import warnings
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from harness import find_regressions, load_results, write_results
+
+# Result keys that ran without a baseline entry, reported in the terminal summary
+_MISSING_BASELINE = pytest.StashKey[List[str]]()
+
+
+def pytest_generate_tests(metafunc):
+    if "benchmark_size" in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption("benchmark_sizes").split(",") if size]
+        metafunc.parametrize("benchmark_size", sizes, ids=[f"{size:,}".replace(",", "_") for size in sizes])
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request) -> Dict[str, Dict[str, Any]]:
+    """Collects every case's result; written to the results (and optionally baseline) file at the end"""
+    results: Dict[str, Dict[str, Any]] = {}
+    yield results
+    if results:
+        write_results(Path(request.config.getoption("benchmark_results")), results)
+        if request.config.getoption("benchmark_save_baseline"):
+            baseline_path = Path(request.config.getoption("benchmark_baseline"))
+            write_results(baseline_path, {**load_results(baseline_path), **results})
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline(request) -> Dict[str, Dict[str, Any]]:
+    return load_results(Path(request.config.getoption("benchmark_baseline")))
+
+
+@pytest.fixture(scope="session")
+def benchmark_threshold(request) -> float:
+    return request.config.getoption("benchmark_threshold")
+
+
+@pytest.fixture(scope="session")
+def check_baseline(request, benchmark_baseline, benchmark_threshold) -> Callable[[str, Dict[str, Any]], List[str]]:
+    """
+    Compare one result with its baseline entry
+
+    Returns:
+        Function of (result key, result) returning regression messages; a missing
+        baseline entry is recorded and warned about (failed with --benchmark-require-baseline)
+    """
+    missing = request.config.stash.setdefault(_MISSING_BASELINE, [])
+    baseline_path = request.config.getoption("benchmark_baseline")
+
+    def check(key: str, result: Dict[str, Any]) -> List[str]:
+        baseline = benchmark_baseline.get(key)
+        if baseline is None:
+            message = f"{key} has no entry in {baseline_path}; regressions were not checked"
+            if request.config.getoption("benchmark_require_baseline"):
+                pytest.fail(message)
+            missing.append(key)
+            warnings.warn(message)
+            return []
+        return find_regressions(result, baseline, benchmark_threshold)
+
+    return check
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    missing = config.stash.get(_MISSING_BASELINE, [])
+    if not missing:
+        return
+    terminalreporter.section("benchmark baseline missing", sep="!", red=True, bold=True)
+    terminalreporter.write_line(f"{len(missing)} case(s) had no entry in {config.getoption('benchmark_baseline')}, "
+                                f"so regressions were NOT checked: {', '.join(missing)}")
+    terminalreporter.write_line("Record a baseline on this machine with --benchmark-save-baseline")
@@ -0,0 +1,315 @@
+"""
+Benchmark harness for the data generators and the dashboard row fetch
+
+Every measurement runs in a fresh spawned process, so peak RSS reflects that
+case alone rather than whatever ran before it. Timing and tracemalloc are
+measured in separate runs because tracemalloc slows allocation-heavy code
+enough to distort throughput.
+"""
+
+import importlib
+import json
+import logging
+import multiprocessing
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DATA_GENERATION_DIR = Path(__file__).resolve().parents[2] / "src" / "python" / "data_generation"
+TESTS_DIR = Path(__file__).resolve().parents[1]
+PATIENT_360_APP_DIR = Path(__file__).resolve().parents[2] / "src" / "streamlit_apps" / "patient_360_dashboard"
+
+# Metrics compared against the baseline, and whether a higher value is better
+TRACKED_METRICS = {
+    "events_per_second": True,
+    "peak_rss_mb": False,
+    "run_rss_mb": False,
+    "tracemalloc_peak_mb": False,
+    "output_bytes": False,
+}
+
+
+def _run_marketing_events(size: int, output_dir: Path) -> int:
+    from marketing_events_generator import generate_marketing_events
+
+    generate_marketing_events(size, str(output_dir), seed=0)
+    return (output_dir / "marketing_events.ndjson").stat().st_size
+
+
+def _run_patients(size: int, output_dir: Path) -> int:
+    from fake_snowpark import FakeSession
+    from patient_generator import generate_patient_data
+
+    session = FakeSession()
+    generate_patient_data(session, size)
+    return session.sql_bytes
+
+
+def _run_prescriptions(size: int, output_dir: Path) -> int:
+    from fake_snowpark import FakeSession
+    from prescription_generator import generate_prescription_data
+
+    session = FakeSession()
+    generate_prescription_data(session, size)
+    return session.sql_bytes
+
+
+def _run_offline(table_name: str, size: int, output_dir: Path) -> int:
+    from offline_generator import generate_offline_data
+
+    files = generate_offline_data(table_name, size, str(output_dir), "csv", workers=1, master_seed=0)
+    return sum(path.stat().st_size for path in files)
+
+
+def _run_patients_offline(size: int, output_dir: Path) -> int:
+    return _run_offline("patients", size, output_dir)
+
+
+def _run_prescriptions_offline(size: int, output_dir: Path) -> int:
+    return _run_offline("prescriptions", size, output_dir)
+
+
+# Case name -> (generator module, runner returning output bytes, requires Snowpark)
+CASES: Dict[str, Tuple[str, Callable[[int, Path], int], bool]] = {
+    "marketing_events": ("marketing_events_generator", _run_marketing_events, False),
+    "patients": ("patient_generator", _run_patients, True),
+    "prescriptions": ("prescription_generator", _run_prescriptions, True),
+    "patients_offline": ("offline_generator", _run_patients_offline, False),
+    "prescriptions_offline": ("offline_generator", _run_prescriptions_offline, False),
+}
+
+
+# PATIENT_360 columns (sql/features/dynamic_tables/convert_gold_to_dynamic_tables.sql)
+PATIENT_360_COLUMNS = (
+    "PATIENT_ID", "FIRST_NAME", "LAST_NAME", "DATE_OF_BIRTH", "AGE", "GENDER", "NHS_NUMBER", "POSTCODE", "EMAIL",
+    "PHONE", "REGISTRATION_DATE", "TOTAL_PRESCRIPTIONS", "UNIQUE_DRUGS", "LIFETIME_VALUE_GBP",
+    "LAST_PRESCRIPTION_DATE", "MARKETING_INTERACTIONS", "CAMPAIGN_CONVERSIONS", "CUSTOMER_TIER",
+)
+# Rows per Arrow result batch handed to to_pandas_batches()
+RESULT_BATCH_ROWS = 50_000
+
+
+def _patient_360_batch(start: int, count: int, columns: List[str]) -> Any:
+    """PATIENT_360 rows as the connector's to_pandas() returns them: object strings and dates, float64 sums"""
+    from datetime import date, timedelta
+
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(start)
+    ids = range(start + 1, start + count + 1)
+
+    def dates(first_year: int, days: int) -> List[Any]:
+        return [date(first_year, 1, 1) + timedelta(days=int(d)) for d in rng.integers(0, days, count)]
+
+    generators: Dict[str, Callable[[], Any]] = {
+        "PATIENT_ID": lambda: [f"PT-{i:08d}" for i in ids],
+        "FIRST_NAME": lambda: rng.choice(["Olivia", "Oliver", "Amelia", "George", "Isla", "Harry"], count),
+        "LAST_NAME": lambda: rng.choice(["Smith", "Jones", "Taylor", "Brown", "Williams", "Wilson"], count),
+        "DATE_OF_BIRTH": lambda: dates(1935, 25000),
+        "AGE": lambda: rng.integers(18, 90, count),
+        "GENDER": lambda: rng.choice(["Male", "Female"], count),
+        "NHS_NUMBER": lambda: [f"{n:010d}" for n in rng.integers(4000000000, 4999999999, count)],
+        "POSTCODE": lambda: [f"M{n % 99 + 1} {n % 9}AB" for n in rng.integers(0, 10 ** 6, count)],
+        "EMAIL": lambda: [f"patient{i}@example.co.uk" for i in ids],
+        "PHONE": lambda: [f"07{n:09d}" for n in rng.integers(0, 10 ** 9, count)],
+        "REGISTRATION_DATE": lambda: dates(2015, 3650),
+        "TOTAL_PRESCRIPTIONS": lambda: rng.integers(0, 50, count),
+        "UNIQUE_DRUGS": lambda: rng.integers(0, 12, count),
+        "LIFETIME_VALUE_GBP": lambda: rng.uniform(0, 6000, count).round(2),
+        "LAST_PRESCRIPTION_DATE": lambda: dates(2023, 700),
+        "MARKETING_INTERACTIONS": lambda: rng.integers(0, 100, count),
+        "CAMPAIGN_CONVERSIONS": lambda: np.where(rng.random(count) < 0.1, np.nan, rng.integers(0, 20, count)),
+        "CUSTOMER_TIER": lambda: rng.choice(["Bronze", "Silver", "Gold", "Platinum"], count, p=[.5, .3, .15, .05]),
+    }
+    frame = pd.DataFrame({column: generators[column]() for column in columns})
+    for column in frame.columns:
+        if frame[column].dtype.kind in "OUT" or str(frame[column].dtype) == "str":
+            frame[column] = frame[column].astype(object)
+    return frame
+
+
+class _Patient360Result:
+    """Query result over synthetic PATIENT_360 rows; only the selected columns are materialised"""
+
+    def __init__(self, size: int, columns: List[str]):
+        self.size = size
+        self.columns = columns
+
+    def to_pandas(self) -> Any:
+        return _patient_360_batch(0, self.size, self.columns)
+
+    def to_pandas_batches(self) -> Any:
+        for start in range(0, self.size, RESULT_BATCH_ROWS):
+            yield _patient_360_batch(start, min(RESULT_BATCH_ROWS, self.size - start), self.columns)
+
+
+class _Patient360Session:
+    """Answers ``SELECT <columns> FROM PATIENT_360`` with ``size`` synthetic rows"""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def sql(self, query: str, params: Optional[List[Any]] = None) -> _Patient360Result:
+        select = re.match(r"\s*SELECT\s+(.*?)\s+FROM\s", query, re.IGNORECASE | re.DOTALL).group(1).strip()
+        columns = list(PATIENT_360_COLUMNS) if select == "*" else [c.strip() for c in select.split(",")]
+        return _Patient360Result(self.size, columns)
+
+
+def _frame_bytes(frame: Any) -> int:
+    return int(frame.memory_usage(deep=True).sum())
+
+
+def _run_dashboard_rows_select_star(size: int, output_dir: Path) -> int:
+    from patient_360_queries import PATIENT_360_TABLE
+
+    # The dashboard's original load: every column, one to_pandas() call
+    return _frame_bytes(_Patient360Session(size).sql(f"SELECT * FROM {PATIENT_360_TABLE}").to_pandas())
+
+
+def _run_dashboard_rows_projected(size: int, output_dir: Path) -> int:
+    from patient_360_frames import DASHBOARD_COLUMNS, fetch_frame
+
+    return _frame_bytes(fetch_frame(_Patient360Session(size), DASHBOARD_COLUMNS))
+
+
+# Dashboard row fetch before/after projection and dtype compaction; output_bytes is the frame a session keeps
+DASHBOARD_CASES: Dict[str, Tuple[str, Callable[[int, Path], int], bool]] = {
+    "dashboard_rows_select_star": ("patient_360_frames", _run_dashboard_rows_select_star, False),
+    "dashboard_rows_projected": ("patient_360_frames", _run_dashboard_rows_projected, False),
+}
+ALL_CASES = {**CASES, **DASHBOARD_CASES}
+
+
+def _measure_in_child(case: str, size: int, trace_memory: bool) -> Dict[str, Any]:
+    """Run one case in the current (fresh) process and return its raw measurements"""
+    for path in (str(DATA_GENERATION_DIR), str(PATIENT_360_APP_DIR), str(TESTS_DIR),
+                 str(Path(__file__).resolve().parent)):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    module, runner, _ = ALL_CASES[case]
+    # Import up front so module import time and allocations are not measured
+    importlib.import_module(module)
+    importlib.import_module("fake_snowpark")
+    if case in DASHBOARD_CASES:
+        # Snowpark reads results through pyarrow, so both fetch paths start with it loaded
+        importlib.import_module("pyarrow")
+    logging.disable(logging.INFO)
+    # ru_maxrss is KB on Linux and bytes on macOS
+    rss_divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_divisor
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        output_bytes = runner(size, Path(tmp_dir))
+        seconds = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        if trace_memory:
+            tracemalloc.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / rss_divisor
+    return {
+        "seconds": seconds,
+        "output_bytes": output_bytes,
+        "peak_rss_mb": peak_rss,
+        "run_rss_mb": peak_rss - rss_before,
+        "tracemalloc_peak_mb": traced_peak / (1024 * 1024),
+    }
+
+
+def _child_entry(queue: "multiprocessing.Queue", case: str, size: int, trace_memory: bool) -> None:
+    try:
+        queue.put(("ok", _measure_in_child(case, size, trace_memory)))
+    except BaseException as e:  # report failures to the parent instead of dying silently
+        queue.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _run_isolated(case: str, size: int, trace_memory: bool) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child_entry, args=(queue, case, size, trace_memory))
+    process.start()
+    status, payload = queue.get()
+    process.join()
+    if status != "ok":
+        raise RuntimeError(f"Benchmark {case} ({size:,}) failed: {payload}")
+    return payload
+
+
+def measure_case(case: str, size: int) -> Dict[str, Any]:
+    """
+    Benchmark one case at one size
+
+    Returns:
+        Dict with events_per_second, seconds, peak_rss_mb and run_rss_mb (timing run),
+        tracemalloc_peak_mb (traced run) and output_bytes
+    """
+    timed = _run_isolated(case, size, trace_memory=False)
+    traced = _run_isolated(case, size, trace_memory=True)
+    return {
+        "case": case,
+        "size": size,
+        "seconds": round(timed["seconds"], 4),
+        "events_per_second": round(size / timed["seconds"], 1) if timed["seconds"] > 0 else 0,
+        "peak_rss_mb": round(timed["peak_rss_mb"], 2),
+        "run_rss_mb": round(timed["run_rss_mb"], 2),
+        "tracemalloc_peak_mb": round(traced["tracemalloc_peak_mb"], 2),
+        "output_bytes": timed["output_bytes"],
+    }
+
+
+def result_key(case: str, size: int) -> str:
+    return f"{case}-{size}"
+
+
+def find_regressions(result: Dict[str, Any], baseline: Optional[Dict[str, Any]], threshold_pct: float) -> List[str]:
+    """
+    Compare a result with its baseline entry
+
+    Returns:
+        One message per metric that is more than ``threshold_pct`` percent worse
+        (throughput lower, or memory / output bytes higher); empty when within budget
+        or when there is no baseline entry
+    """
+    if not baseline:
+        return []
+    regressions = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        previous, current = baseline.get(metric), result.get(metric)
+        if not previous or current is None:
+            continue
+        change_pct = (current - previous) / previous * 100
+        worse_pct = -change_pct if higher_is_better else change_pct
+        if worse_pct > threshold_pct:
+            regressions.append(f"{metric}: {previous:,.2f} -> {current:,.2f} "
+                               f"({change_pct:+.1f}%, limit {threshold_pct:g}%)")
+    return regressions
+
+
+def load_results(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Load the per-case entries of a results or baseline file (empty if missing)"""
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text()).get("results", {})
+
+
+def write_results(path: Path, results: Dict[str, Dict[str, Any]]) -> None:
+    """Write results with enough environment detail to judge comparability"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "results": dict(sorted(results.items())),
+    }
+    path.write_text(json.dumps(payload, indent=2))
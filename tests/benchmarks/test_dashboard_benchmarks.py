@@ -0,0 +1,21 @@
+"""Memory of the dashboard's row fetch: SELECT * with to_pandas() against the projected, compacted fetch"""
+
+import pytest
+
+from harness import DASHBOARD_CASES, measure_case, result_key
+
+
+def test_dashboard_row_fetch_benchmark(benchmark_size, benchmark_results, check_baseline):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+
+    results = {case: measure_case(case, benchmark_size) for case in sorted(DASHBOARD_CASES)}
+    regressions = []
+    for case, result in results.items():
+        key = result_key(case, benchmark_size)
+        benchmark_results[key] = result
+        regressions += [f"{key} {message}" for message in check_baseline(key, result)]
+
+    before, after = results["dashboard_rows_select_star"], results["dashboard_rows_projected"]
+    assert after["output_bytes"] < before["output_bytes"] / 4
+    assert not regressions, "Dashboard row fetch regressed against the baseline:\n" + "\n".join(regressions)
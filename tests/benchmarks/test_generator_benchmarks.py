@@ -0,0 +1,19 @@
+"""Throughput, memory and output-size benchmarks for the three data generators"""
+
+import pytest
+
+from harness import CASES, measure_case, result_key
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_generator_benchmark(case, benchmark_size, benchmark_results, check_baseline):
+    _, _, requires_snowpark = CASES[case]
+    if requires_snowpark:
+        pytest.importorskip("snowflake.snowpark", reason="Snowpark generators need snowflake-snowpark-python")
+
+    result = measure_case(case, benchmark_size)
+    key = result_key(case, benchmark_size)
+    benchmark_results[key] = result
+
+    regressions = check_baseline(key, result)
+    assert not regressions, f"{key} regressed against the baseline:\n" + "\n".join(regressions)
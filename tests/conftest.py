@@ -0,0 +1,74 @@
+"""
+Shared test setup: import paths for the data generation, deployment and dashboard modules and fakes, benchmark options
+
+Benchmarks are opt-in so a plain ``pytest`` stays a fast unit run. They run
+with ``-m benchmark``, ``--benchmark-sizes`` or when ``tests/benchmarks`` is
+named on the command line; otherwise they are skipped.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+TESTS_DIR = Path(__file__).resolve().parent
+DATA_GENERATION_DIR = TESTS_DIR.parent / "src" / "python" / "data_generation"
+DEPLOYMENT_SCRIPTS_DIR = TESTS_DIR.parent / "deployment" / "scripts"
+PATIENT_360_APP_DIR = TESTS_DIR.parent / "src" / "streamlit_apps" / "patient_360_dashboard"
+BENCHMARK_DIR = TESTS_DIR / "benchmarks"
+DEFAULT_SIZES = "10000,100000,1000000"
+
+for path in (str(DATA_GENERATION_DIR), str(DEPLOYMENT_SCRIPTS_DIR), str(PATIENT_360_APP_DIR), str(TESTS_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Step metrics are logged only; tests and benchmarks must not append to data/metrics
+os.environ["PHARMACY2U_METRICS_FILE"] = ""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks", "Data generator benchmarks")
+    group.addoption("--benchmark-sizes", default=DEFAULT_SIZES,
+                    help="Comma-separated event/record counts to benchmark; giving it runs the benchmarks "
+                         "(default: %(default)s)")
+    group.addoption("--benchmark-threshold", type=float, default=20.0,
+                    help="Fail when a metric is more than this percent worse than the baseline")
+    group.addoption("--benchmark-baseline", default=str(BENCHMARK_DIR / "baseline.json"),
+                    help="Baseline results file to compare against")
+    group.addoption("--benchmark-results", default=str(BENCHMARK_DIR / "results" / "latest.json"),
+                    help="Where this run's results are written")
+    group.addoption("--benchmark-save-baseline", action="store_true",
+                    help="Also write this run's results as the new baseline")
+    group.addoption("--benchmark-require-baseline", action="store_true",
+                    help="Fail cases that have no baseline entry instead of warning")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: slow generator/dashboard benchmark (opt-in)")
+
+
+def _benchmarks_requested(config) -> bool:
+    """Benchmarks were asked for by marker expression, sizes, or by naming the benchmark directory"""
+    invocation = config.invocation_params.args
+    if any(arg.startswith("--benchmark-sizes") for arg in invocation):
+        return True
+    if "benchmark" in (config.getoption("markexpr") or ""):
+        return True
+    for arg in config.args:
+        path = (config.invocation_params.dir / arg.split("::")[0]).resolve()
+        if path == BENCHMARK_DIR or BENCHMARK_DIR in path.parents:
+            return True
+    return False
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    # Runs before -m filtering, so "-m benchmark" sees the marker
+    requested = _benchmarks_requested(config)
+    skip = pytest.mark.skip(reason="benchmarks are opt-in: use -m benchmark, --benchmark-sizes or tests/benchmarks")
+    for item in items:
+        if BENCHMARK_DIR in Path(str(item.fspath)).resolve().parents:
+            item.add_marker(pytest.mark.benchmark)
+            if not requested:
+                item.add_marker(skip)
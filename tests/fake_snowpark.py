@@ -0,0 +1,157 @@
+"""
+Local stand-in for a Snowpark ``Session`` used by the benchmarks and unit tests
+
+Implements only the calls the Snowpark-backed generators make. Statements are
+recorded rather than executed; ``INSERT ... GENERATOR(ROWCOUNT => n)`` adds n
+rows to the target table so the generators' ``COUNT(*)`` validation sees the
+expected row count. Benchmarks against this session therefore measure the
+client-side cost of a generator (SQL building, reference data, round trips),
+not warehouse execution time.
+
+``collect_nowait()`` returns a job that completes after a configurable number
+of polls, and ``fail_queries`` makes matching statements fail a given number of
+times, so chunking, concurrency and retry logic can be exercised locally.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+_INSERT_TABLE = re.compile(r"INSERT\s+INTO\s+([\w.]+)", re.IGNORECASE)
+_GENERATOR_ROWCOUNT = re.compile(r"GENERATOR\s*\(\s*ROWCOUNT\s*=>\s*(\d+)", re.IGNORECASE)
+_COUNT_FROM = re.compile(r"SELECT\s+COUNT\(\*\)\s+(?:AS\s+)?(\w+)\s+FROM\s+([\w.]+)", re.IGNORECASE)
+
+
+class FakeDataFrame:
+    """Minimal DataFrame: rows in memory plus the writer/show calls the generators use"""
+
+    def __init__(self, session: "FakeSession", table_name: Optional[str] = None, rows: Optional[List[Any]] = None):
+        self.session = session
+        self.table_name = table_name
+        self.rows = rows or []
+
+    @property
+    def write(self) -> "FakeDataFrame":
+        return self
+
+    def mode(self, _mode: str) -> "FakeDataFrame":
+        return self
+
+    def save_as_table(self, table_name: str, mode: str = "overwrite", **_kwargs: Any) -> None:
+        self.session.row_counts[table_name.upper()] = len(self.rows)
+
+    def limit(self, _n: int) -> "FakeDataFrame":
+        return self
+
+    def show(self, *_args: Any, **_kwargs: Any) -> None:
+        pass
+
+    def collect(self) -> List[Any]:
+        return self.rows
+
+
+class FakeQueryError(Exception):
+    """Injected statement failure"""
+
+
+class FakeAsyncJob:
+    """Result of ``collect_nowait``; runs the statement once it reports done"""
+
+    def __init__(self, session: "FakeSession", query: str):
+        self.session = session
+        self.query = query
+        self.query_id = f"fake-query-{len(session.async_jobs) + 1:04d}"
+        self._polls_left = session.polls_until_done
+        self._outcome: Optional[Any] = None
+        self._error: Optional[Exception] = None
+        self._finished = False
+        session.async_jobs.append(self)
+        session.in_flight += 1
+        session.max_in_flight = max(session.max_in_flight, session.in_flight)
+
+    def _finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        self.session.in_flight -= 1
+        try:
+            self._outcome = self.session.execute(self.query)
+        except FakeQueryError as e:
+            self._error = e
+
+    def is_done(self) -> bool:
+        self._polls_left -= 1
+        if self._polls_left <= 0:
+            self._finish()
+        return self._finished
+
+    def result(self) -> List[Dict[str, Any]]:
+        self._finish()
+        if self._error:
+            raise self._error
+        return self._outcome
+
+
+class FakeQuery:
+    """Result of ``session.sql``; the statement runs when collected"""
+
+    def __init__(self, session: "FakeSession", query: str):
+        self.session = session
+        self.query = query
+
+    def collect(self) -> List[Dict[str, Any]]:
+        return self.session.execute(self.query)
+
+    def collect_nowait(self) -> FakeAsyncJob:
+        return FakeAsyncJob(self.session, self.query)
+
+
+class FakeSession:
+    """Record-only Snowpark session"""
+
+    def __init__(self, polls_until_done: int = 1):
+        self.statements: List[str] = []
+        self.row_counts: Dict[str, int] = {}
+        self.closed = False
+        self.polls_until_done = polls_until_done
+        self.async_jobs: List[FakeAsyncJob] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures: List[List[Any]] = []  # [substring, remaining failures]
+
+    @property
+    def sql_bytes(self) -> int:
+        """Total SQL text shipped to the 'warehouse'"""
+        return sum(len(statement.encode('utf-8')) for statement in self.statements)
+
+    def sql(self, query: str) -> FakeQuery:
+        return FakeQuery(self, query)
+
+    def fail_queries(self, substring: str, times: int = 1) -> None:
+        """Make the next ``times`` statements containing ``substring`` fail"""
+        self._failures.append([substring, times])
+
+    def execute(self, query: str) -> List[Dict[str, Any]]:
+        for failure in self._failures:
+            if failure[1] > 0 and failure[0] in query:
+                failure[1] -= 1
+                raise FakeQueryError(f"Injected failure for statement containing {failure[0]!r}")
+        self.statements.append(query)
+        insert = _INSERT_TABLE.search(query)
+        rowcount = _GENERATOR_ROWCOUNT.search(query)
+        if insert and rowcount:
+            table = insert.group(1).upper()
+            self.row_counts[table] = self.row_counts.get(table, 0) + int(rowcount.group(1))
+            return [{"number of rows inserted": int(rowcount.group(1))}]
+        count = _COUNT_FROM.search(query)
+        if count:
+            return [{count.group(1).upper(): self.row_counts.get(count.group(2).upper(), 0)}]
+        return [{"status": "Statement executed successfully."}]
+
+    def create_dataframe(self, data: List[Any], schema: Any = None) -> FakeDataFrame:
+        return FakeDataFrame(self, rows=list(data))
+
+    def table(self, name: str) -> FakeDataFrame:
+        return FakeDataFrame(self, table_name=name)
+
+    def close(self) -> None:
+        self.closed = True
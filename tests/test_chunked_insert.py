@@ -0,0 +1,75 @@
+"""Chunk planning, concurrency and retry behaviour of ``chunked_insert`` against the fake session"""
+
+import re
+
+import pytest
+
+from chunked_insert import plan_chunks, run_chunked_insert
+from fake_snowpark import FakeSession
+
+OFFSET = re.compile(r"OFFSET (\d+)")
+
+
+def build_sql(rows, id_offset):
+    return f"INSERT INTO RAW_TEST SELECT SEQ4() + OFFSET {id_offset} FROM TABLE(GENERATOR(ROWCOUNT => {rows}))"
+
+
+def test_plan_chunks_covers_target_without_overlap():
+    chunks = plan_chunks(1050, 250)
+
+    assert [(chunk.offset, chunk.rows) for chunk in chunks] == [
+        (0, 250), (250, 250), (500, 250), (750, 250), (1000, 50)
+    ]
+
+
+def test_plan_chunks_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        plan_chunks(100, 0)
+
+
+def test_chunks_respect_concurrency_limit():
+    session = FakeSession(polls_until_done=3)
+
+    result = run_chunked_insert(session, build_sql, 1000, chunk_size=100, max_concurrency=3, poll_seconds=0)
+
+    assert result.rows_inserted == 1000
+    assert session.row_counts["RAW_TEST"] == 1000
+    assert session.max_in_flight == 3
+    assert sorted(int(OFFSET.search(s).group(1)) for s in session.statements) == list(range(0, 1000, 100))
+
+
+def test_only_failed_chunks_are_retried():
+    session = FakeSession()
+    session.fail_queries("OFFSET 300 ", times=2)
+
+    result = run_chunked_insert(session, build_sql, 500, chunk_size=100, max_retries=2, poll_seconds=0)
+
+    assert not result.failed_chunks
+    assert result.retries == 2
+    assert [chunk.attempts for chunk in result.chunks] == [1, 1, 1, 3, 1]
+    assert session.row_counts["RAW_TEST"] == 500
+
+
+def test_chunk_failing_past_retry_budget_is_reported():
+    session = FakeSession()
+    session.fail_queries("OFFSET 100 ", times=5)
+
+    result = run_chunked_insert(session, build_sql, 300, chunk_size=100, max_retries=1, poll_seconds=0)
+
+    assert [chunk.index for chunk in result.failed_chunks] == [1]
+    assert result.failed_chunks[0].attempts == 2
+    assert "Injected failure" in result.failed_chunks[0].error
+    assert result.rows_inserted == 200
+    assert session.row_counts["RAW_TEST"] == 200
+
+
+def test_generators_use_disjoint_id_ranges():
+    pytest.importorskip("snowflake.snowpark", reason="Snowpark generators need snowflake-snowpark-python")
+    from patient_generator import generate_patient_data
+
+    session = FakeSession()
+    generate_patient_data(session, 2500, chunk_size=1000)
+
+    inserts = [s for s in session.statements if "INSERT INTO RAW_PATIENTS" in s]
+    assert [re.search(r"ROW_NUMBER\(\) OVER \(ORDER BY SEQ4\(\)\) - 1 \+ (\d+)", s).group(1) for s in inserts] == ["0", "1000", "2000"]
+    assert session.row_counts["RAW_PATIENTS"] == 2500
@@ -0,0 +1,105 @@
+"""Dependency-graph execution in ``deploy_dag``"""
+
+import threading
+import time
+
+import pytest
+
+from deploy_dag import DeployNode, run_dag, topological_order
+
+
+def sleeper(seconds, calls=None, name=None, result=True):
+    def action():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(seconds)
+        return result
+    return action
+
+
+def test_independent_steps_overlap():
+    nodes = [DeployNode("setup", sleeper(0.05))] + [
+        DeployNode(f"generate_{i}", sleeper(0.3), ("setup",)) for i in range(3)
+    ]
+
+    result = run_dag(nodes, max_workers=3)
+
+    assert result.succeeded
+    assert result.wall_seconds < 0.75
+    assert result.summed_seconds > 0.9
+
+
+def test_worker_limit_is_respected():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def action():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return True
+
+    run_dag([DeployNode(f"step_{i}", action) for i in range(6)], max_workers=2)
+
+    assert peak[0] == 2
+
+
+def test_failure_skips_downstream_only():
+    calls = []
+    nodes = [
+        DeployNode("patients", sleeper(0, calls, "patients", result=False), required=False),
+        DeployNode("prescriptions", sleeper(0, calls, "prescriptions"), required=False),
+        DeployNode("silver_patients", sleeper(0, calls, "silver_patients"), ("patients",), required=False),
+        DeployNode("patient_360", sleeper(0, calls, "patient_360"), ("silver_patients",), required=False),
+        DeployNode("silver_prescriptions", sleeper(0, calls, "silver_prescriptions"), ("prescriptions",),
+                   required=False),
+        DeployNode("validate", sleeper(0, calls, "validate"), ("patient_360", "silver_prescriptions"),
+                   required=False, runs_after_failures=True),
+    ]
+
+    result = run_dag(nodes)
+
+    assert result.status_of("patients") == "failed"
+    assert result.status_of("silver_patients") == "skipped"
+    assert result.status_of("patient_360") == "skipped"
+    assert result.results["patient_360"].reason == "dependency silver_patients skipped"
+    assert result.status_of("silver_prescriptions") == "ok"
+    assert result.status_of("validate") == "ok"
+    assert "silver_patients" not in calls and "patient_360" not in calls
+    assert result.succeeded
+
+
+def test_raising_required_step_fails_the_run():
+    def boom():
+        raise RuntimeError("connection refused")
+
+    result = run_dag([DeployNode("connect", boom), DeployNode("setup", sleeper(0), ("connect",))])
+
+    assert result.status_of("connect") == "error"
+    assert result.results["connect"].reason == "connection refused"
+    assert result.status_of("setup") == "skipped"
+    assert not result.succeeded
+
+
+def test_critical_path_follows_the_longest_chain():
+    nodes = [
+        DeployNode("setup", sleeper(0.02)),
+        DeployNode("short", sleeper(0.02), ("setup",)),
+        DeployNode("long", sleeper(0.2), ("setup",)),
+        DeployNode("validate", sleeper(0.02), ("short", "long")),
+    ]
+
+    path, seconds = run_dag(nodes, max_workers=2).critical_path()
+
+    assert path == ["setup", "long", "validate"]
+    assert seconds == pytest.approx(0.24, abs=0.1)
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        topological_order([DeployNode("a", sleeper(0), ("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        topological_order([DeployNode("a", sleeper(0), ("b",)), DeployNode("b", sleeper(0), ("a",))])
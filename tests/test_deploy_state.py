@@ -0,0 +1,83 @@
+"""Incremental deployment planning in ``deploy_state``"""
+
+import pytest
+
+from deploy_dag import DeployNode, run_dag
+from deploy_state import DeployState, apply_plan, fingerprint, plan_steps
+
+
+def graph(schema_sql="CREATE TABLE T (A INT)", generator_rows=100):
+    return [
+        DeployNode("validate_connection", lambda: True),
+        DeployNode("sql:schema", lambda: True, ("validate_connection",), fingerprint=fingerprint(schema_sql)),
+        DeployNode("generate", lambda: True, ("sql:schema",), fingerprint=fingerprint({"rows": generator_rows})),
+        DeployNode("dynamic_table", lambda: True, ("generate",), fingerprint=fingerprint("CREATE DYNAMIC TABLE")),
+        DeployNode("policies", lambda: True, ("sql:schema",), fingerprint=fingerprint("CREATE POLICY")),
+        DeployNode("validate", lambda: True, ("dynamic_table", "policies"), runs_after_failures=True),
+    ]
+
+
+def deploy(state, nodes, force=()):
+    """Plan, run and record like DemoDeployer.deploy; returns {step: planned reason}"""
+    plans = plan_steps(nodes, state, force)
+    apply_plan(nodes, plans)
+    by_name = {node.name: node for node in nodes}
+    run_dag(nodes, on_result=lambda result: state.record_result(by_name[result.name], result))
+    return {plan.name: plan.reason for plan in plans if plan.runs}
+
+
+@pytest.fixture
+def state(tmp_path):
+    return DeployState(tmp_path / "state.json")
+
+
+def test_second_run_only_runs_unfingerprinted_steps(state, tmp_path):
+    deploy(state, graph())
+
+    reloaded = DeployState(tmp_path / "state.json")
+    assert deploy(reloaded, graph()) == {"validate_connection": "always runs", "validate": "always runs"}
+
+
+def test_changed_step_reruns_with_its_dependents_only(state):
+    deploy(state, graph())
+
+    ran = deploy(state, graph(generator_rows=200))
+
+    assert ran["generate"] == "inputs changed"
+    assert ran["dynamic_table"] == "upstream generate runs"
+    assert "sql:schema" not in ran and "policies" not in ran
+
+
+def test_force_reruns_step_and_downstream(state):
+    deploy(state, graph())
+
+    ran = deploy(state, graph(), force=["sql:schema"])
+
+    assert ran["sql:schema"] == "forced"
+    assert {"generate", "dynamic_table", "policies"} <= set(ran)
+
+
+def test_failed_step_reruns_next_time(state):
+    nodes = graph()
+    nodes[2].action = lambda: False
+    deploy(state, nodes)
+
+    ran = deploy(state, graph())
+
+    assert ran["generate"] == "previous run failed"
+    assert ran["dynamic_table"] == "no previous run"
+
+
+def test_unknown_force_step_is_rejected(state):
+    with pytest.raises(ValueError, match="Unknown step"):
+        plan_steps(graph(), state, ["sql:typo"])
+
+
+def test_fingerprint_covers_file_contents(tmp_path):
+    script = tmp_path / "setup.sql"
+    script.write_text("CREATE DATABASE A;")
+    before = fingerprint(script)
+    script.write_text("CREATE DATABASE B;")
+
+    assert fingerprint(script) != before
+    assert fingerprint(tmp_path / "missing.sql") != fingerprint(script)
@@ -0,0 +1,114 @@
+"""Span recording, Chrome trace export and regression comparison in ``deploy_trace``"""
+
+import json
+import time
+
+import pytest
+
+import deploy_trace
+from deploy_dag import DeployNode, run_dag
+from deploy_trace import Span, Tracer, compare_traces, format_top_spans, load_trace, set_tracer, top_spans
+from query_metrics import StatementMetrics, StepMetrics, add_step_listener, remove_step_listener
+from sql_backend import ConnectorSqlBackend
+from test_sql_backend import FakeConnection
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer("test")
+    set_tracer(tracer)
+    yield tracer
+    set_tracer(None)
+
+
+def test_dag_steps_sql_files_and_statements_are_nested_spans(tracer):
+    backend = ConnectorSqlBackend("demo", connect=FakeConnection)
+    run_dag([
+        DeployNode("setup", lambda: backend.run_script("USE ROLE SYSADMIN;\n\nSELECT 1;", "setup.sql").ok),
+        DeployNode("after", lambda: True, ("setup",)),
+    ])
+
+    spans = {span.name: span for span in tracer.spans}
+    assert {"setup", "after", "setup.sql", "setup.sql:1", "setup.sql:3"} <= set(spans)
+    assert spans["setup"].category == "step" and spans["setup"].args["status"] == "ok"
+    assert spans["setup.sql:3"].args["sql"] == "SELECT 1"
+    # Statement inside file inside step, all on the worker thread's track
+    step, script, statement = spans["setup"], spans["setup.sql"], spans["setup.sql:3"]
+    assert step.track == script.track == statement.track
+    assert step.start <= script.start <= statement.start and statement.end <= script.end <= step.end
+
+
+def test_failed_statement_is_recorded_on_its_span(tracer):
+    backend = ConnectorSqlBackend("demo", connect=lambda: FakeConnection(fail_on="MISSING"))
+
+    backend.run_script("SELECT * FROM MISSING;", "load.sql")
+
+    spans = {span.name: span for span in tracer.spans}
+    assert "does not exist" in spans["load.sql:1"].args["error"]
+    assert spans["load.sql"].args["error_line"] == 1
+
+
+def test_overlapping_chunk_statements_get_separate_tracks(tracer):
+    now = time.perf_counter()
+    metrics = StepMetrics("prescription_generator", "generate_prescription_data")
+    for index, offset in enumerate((0.0, 0.1, 1.5)):
+        metrics.add_statement(StatementMetrics(f"q{index}", 10, 1.0, label=f"chunk {index + 1}",
+                                               started_at=now + offset))
+    metrics.add_statement(StatementMetrics("q-untimed", 10, 1.0))
+
+    add_step_listener(tracer.record_step_metrics)
+    try:
+        record = metrics.emit()
+    finally:
+        remove_step_listener(tracer.record_step_metrics)
+
+    tracks = {span.name: span.track for span in tracer.spans}
+    assert len(tracks) == 3
+    assert tracks["generate_prescription_data chunk 1"] != tracks["generate_prescription_data chunk 2"]
+    # Chunk 3 starts after chunk 1 ended, so it reuses the first track
+    assert tracks["generate_prescription_data chunk 3"] == tracks["generate_prescription_data chunk 1"]
+    assert "started_at" not in record["statements"][0]
+
+
+def test_chrome_trace_round_trip(tracer, tmp_path):
+    with deploy_trace.trace_span("outer", "step"):
+        with deploy_trace.trace_span("inner", "statement", query_id="q1"):
+            time.sleep(0.01)
+
+    path = tracer.export_chrome_trace(tmp_path / "trace.json")
+
+    events = json.loads(path.read_text())["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in complete} == {"outer", "inner"}
+    assert all(isinstance(event["ts"], int) and isinstance(event["tid"], int) for event in complete)
+    loaded = {span.name: span for span in load_trace(path)}
+    assert loaded["inner"].args == {"query_id": "q1"}
+    assert loaded["inner"].duration == pytest.approx(tracer.spans[0].duration, abs=1e-5)
+
+
+def test_self_time_excludes_nested_spans():
+    spans = [Span("step", "step", 0.0, 10.0), Span("file.sql", "sql_file", 1.0, 6.0),
+             Span("file.sql:3", "statement", 2.0, 4.0), Span("other", "step", 0.0, 3.0, track="worker")]
+
+    slowest = top_spans(spans, 2)
+
+    assert [span.name for span in slowest] == ["step", "file.sql"]
+    assert [span.self_seconds for span in slowest] == [4.0, 2.0]
+    assert format_top_spans(spans, 2)[-1].startswith("self time by category: step 7.00s")
+
+
+def test_regressions_match_spans_by_name_and_ignore_noise():
+    previous = [Span("generate", "step", 0, 10.0), Span("setup.sql", "sql_file", 0, 1.0),
+                Span("tiny.sql", "sql_file", 0, 0.1), Span("unchanged", "step", 0, 5.0)]
+    current = [Span("generate", "step", 0, 15.0), Span("setup.sql", "sql_file", 0, 1.1),
+               Span("tiny.sql", "sql_file", 0, 0.3), Span("new_step", "step", 0, 30.0)]
+
+    regressions = compare_traces(previous, current)
+
+    assert [(change.name, change.delta_seconds) for change in regressions] == [("generate", 5.0)]
+
+
+def test_trace_span_without_tracer_is_a_no_op():
+    set_tracer(None)
+    with deploy_trace.trace_span("untraced", "step") as args:
+        args["status"] = "ok"
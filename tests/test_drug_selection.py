@@ -0,0 +1,67 @@
+"""Largest-remainder slot table shared by the SQL and NumPy paths of ``drug_selection``"""
+
+import re
+
+import numpy as np
+import pytest
+
+from drug_selection import DEFAULT_SLOTS, DrugSelector
+from reference_data import DRUG_PRESCRIBING_WEIGHTS, UK_DRUGS
+
+DRUGS = [("A", "Alpha", 28, 1.0), ("B", "Beta", 56, 2.0), ("C", "Gamma", 30, 3.0), ("D", "Delta", 7, 4.0)]
+
+
+def slot_counts(selector):
+    return np.bincount(selector.slot_table, minlength=len(selector.drugs)).tolist()
+
+
+def test_default_table_has_exactly_1000_slots_for_the_weighted_drugs():
+    selector = DrugSelector()
+
+    counts = slot_counts(selector)
+    assert len(selector.slot_table) == DEFAULT_SLOTS == sum(counts)
+    for (code, *_), count in zip(UK_DRUGS, counts):
+        assert (count > 0) == (DRUG_PRESCRIBING_WEIGHTS.get(code, 0) > 0)
+    # Each drug owns one contiguous run of slots
+    assert (np.diff(selector.slot_table) >= 0).all()
+
+
+def test_largest_remainders_get_the_leftover_slots():
+    # Exact shares 333.33 / 333.33 / 333.33 / 0: the first largest remainder takes the spare slot
+    selector = DrugSelector(DRUGS, {"A": 1, "B": 1, "C": 1})
+
+    assert slot_counts(selector) == [334, 333, 333, 0]
+    assert selector.shares["Delta"] == 0
+
+
+def test_tiny_weights_keep_one_slot_and_the_total_stays_exact():
+    selector = DrugSelector(DRUGS, {"A": 10000, "B": 1, "C": 1, "D": 0.5}, slots=100)
+
+    counts = slot_counts(selector)
+    assert sum(counts) == 100 and counts[1:] == [1, 1, 1]
+
+
+def test_sql_arrays_match_the_slot_table():
+    selector = DrugSelector()
+
+    sql = selector.sql_lookup_select()
+
+    slots = re.search(r"ARRAY_CONSTRUCT\(([^)]*)\) AS SLOTS", sql).group(1)
+    assert [int(value) for value in slots.split(", ")] == selector.slot_table.tolist()
+    codes = re.search(r"ARRAY_CONSTRUCT\(([^)]*)\) AS CODES", sql).group(1)
+    assert codes.split(", ") == [f"'{code}'" for code, *_ in UK_DRUGS]
+    assert "UNIFORM(0, 999, RANDOM())" in selector.sql_index_expression()
+
+
+def test_offline_draws_follow_the_slot_shares():
+    selector = DrugSelector(DRUGS, {"A": 6, "B": 3, "C": 1})
+
+    draws = selector.draw_indices(np.random.default_rng(0), 200000)
+
+    realised = np.bincount(draws, minlength=4) / len(draws)
+    assert realised == pytest.approx([0.6, 0.3, 0.1, 0.0], abs=0.005)
+
+
+def test_all_zero_weights_are_rejected():
+    with pytest.raises(ValueError):
+        DrugSelector(DRUGS, {})
@@ -0,0 +1,69 @@
+"""Patient key draws from ``key_distribution``"""
+
+import random
+
+import numpy as np
+import pytest
+
+from key_distribution import KeyDistribution
+
+
+def top_share(keys, key_count, fraction=0.01):
+    counts = np.bincount(keys, minlength=key_count)
+    return np.sort(counts)[::-1][:max(1, int(key_count * fraction))].sum() / len(keys)
+
+
+@pytest.mark.parametrize("kind", ["uniform", "zipf", "hotset"])
+def test_keys_stay_in_the_patient_key_space(kind):
+    keys = KeyDistribution(kind, key_count=1000).draw(np.random.default_rng(1), 50000)
+
+    assert keys.dtype == np.int64
+    assert keys.min() >= 0 and keys.max() < 1000
+
+
+def test_skewed_distributions_concentrate_rows():
+    rng = np.random.default_rng(7)
+    uniform = KeyDistribution("uniform", key_count=10000).draw(rng, 200000)
+    zipf = KeyDistribution("zipf", key_count=10000, zipf_exponent=1.1).draw(rng, 200000)
+    hotset = KeyDistribution("hotset", key_count=10000, hot_fraction=0.01, hot_share=0.5).draw(rng, 200000)
+
+    assert top_share(uniform, 10000) < 0.05
+    assert top_share(zipf, 10000) > 0.5
+    assert top_share(hotset, 10000) == pytest.approx(0.5, abs=0.02)
+
+
+def test_hot_keys_are_scattered_not_contiguous():
+    keys = KeyDistribution("zipf", key_count=10000).draw(np.random.default_rng(3), 100000)
+    hottest = np.argsort(np.bincount(keys, minlength=10000))[::-1][:10]
+
+    assert np.ptp(hottest) > 1000
+
+
+def test_per_event_draws_match_the_vectorized_distribution():
+    keys = KeyDistribution("zipf", key_count=5000)
+    rng = random.Random(11)
+    per_event = np.array([keys.draw_one(rng) for _ in range(50000)])
+    vectorized = keys.draw(np.random.default_rng(11), 50000)
+
+    assert per_event.min() >= 0 and per_event.max() < 5000
+    assert top_share(per_event, 5000) == pytest.approx(top_share(vectorized, 5000), abs=0.03)
+
+
+def test_seeded_draws_are_reproducible():
+    keys = KeyDistribution("hotset", key_count=100)
+
+    assert (keys.draw(np.random.default_rng(5), 1000) == keys.draw(np.random.default_rng(5), 1000)).all()
+
+
+def test_sql_expression_uses_the_key_count():
+    assert KeyDistribution("uniform", key_count=250).sql_expression() == "UNIFORM(0, 249, RANDOM())"
+    zipf_sql = KeyDistribution("zipf", key_count=250).sql_expression()
+    assert zipf_sql.startswith("MOD((LEAST(") and zipf_sql.endswith(", 250)")
+    assert "IFF(" in KeyDistribution("hotset").with_key_count(250).sql_expression()
+
+
+def test_invalid_distribution_is_rejected():
+    with pytest.raises(ValueError):
+        KeyDistribution("normal")
+    with pytest.raises(ValueError):
+        KeyDistribution("zipf", key_count=0)
@@ -0,0 +1,63 @@
+"""Rolling, compressed NDJSON chunks in ``marketing_events_chunks``"""
+
+import gzip
+import os
+
+import pytest
+
+from marketing_events_chunks import ChunkedCompressedWriter, chunk_file_name, summarize_chunks
+
+
+def ndjson_blocks(blocks, lines_per_block=50):
+    """Blocks of whole, poorly compressible NDJSON lines"""
+    return [b"".join(b'{"event_id": "%s"}\n' % os.urandom(48).hex().encode() for _ in range(lines_per_block))
+            for _ in range(blocks)]
+
+
+def test_chunks_roll_at_the_target_size_on_line_boundaries(tmp_path):
+    blocks = ndjson_blocks(60)
+    closed = []
+
+    with ChunkedCompressedWriter(tmp_path, "gzip", target_chunk_bytes=32 * 1024,
+                                 on_chunk_closed=closed.append) as writer:
+        for block in blocks:
+            writer.write(block, 50)
+
+    chunks = writer.chunks
+    assert len(chunks) > 2 and closed == chunks
+    assert [chunk.path.name for chunk in chunks] == [chunk_file_name(i, "gzip") for i in range(len(chunks))]
+    # Every chunk is whole lines on its own, and together they hold the input in order
+    contents = [gzip.decompress(chunk.path.read_bytes()) for chunk in chunks]
+    assert all(content.endswith(b"\n") for content in contents)
+    assert b"".join(contents) == b"".join(blocks)
+    assert [chunk.events for chunk in chunks] == [content.count(b"\n") for content in contents]
+    assert all(chunk.compressed_bytes == chunk.path.stat().st_size for chunk in chunks)
+    # Only the last chunk may close below the target
+    assert all(chunk.compressed_bytes >= 32 * 1024 for chunk in chunks[:-1])
+
+
+def test_nothing_written_creates_no_chunk(tmp_path):
+    writer = ChunkedCompressedWriter(tmp_path, "gzip")
+
+    assert writer.close() == [] and list(tmp_path.iterdir()) == []
+    assert summarize_chunks([]) == {"chunks": 0}
+
+
+def test_zstd_chunks_round_trip(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    blocks = ndjson_blocks(4)
+
+    with ChunkedCompressedWriter(tmp_path, "zstd") as writer:
+        for block in blocks:
+            writer.write(block, 50)
+
+    [chunk] = writer.chunks
+    assert chunk.path.name.endswith(".ndjson.zst")
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(chunk.path.read_bytes()) == b"".join(blocks)
+    summary = summarize_chunks(writer.chunks)
+    assert summary["events"] == 200 and summary["compression_ratio"] > 1
+
+
+def test_unknown_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ChunkedCompressedWriter(tmp_path, "lz4")
@@ -0,0 +1,85 @@
+"""Output modes of ``marketing_events_generator``"""
+
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+import marketing_events_generator
+from marketing_events_generator import generate_marketing_events, generate_marketing_events_delta, parse_args
+from marketing_events_watermark import STATE_FILE, load_watermark
+
+
+def test_empty_parquet_run_reports_zero_bytes_without_a_file(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    generate_marketing_events(0, str(tmp_path), output_format="parquet")
+
+    assert not (tmp_path / "marketing_events.parquet").exists()
+
+
+def read_delta(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_append_runs_continue_ids_and_timestamps(tmp_path):
+    first = generate_marketing_events_delta(500, str(tmp_path), seed=1)
+    second = generate_marketing_events_delta(300, str(tmp_path), seed=2)
+
+    events = read_delta(first) + read_delta(second)
+    assert second.name == "marketing_events_delta_0000000501.ndjson"
+    assert [event["event_id"] for event in events] == [f"EVT-{i:010d}" for i in range(1, 801)]
+    timestamps = [event["event_timestamp"] for event in events]
+    assert timestamps == sorted(timestamps)
+    assert min(timestamps[500:]) > max(timestamps[:500])
+    watermark = load_watermark(tmp_path)
+    assert (watermark.last_event_id, watermark.last_event_timestamp) == (800, timestamps[-1])
+
+
+def test_watermark_is_replaced_atomically(tmp_path, monkeypatch):
+    generate_marketing_events_delta(100, str(tmp_path), seed=1)
+    replaced = []
+    original_replace = Path.replace
+
+    def record_replace(self, target):
+        # The live state file still holds the previous watermark until the rename
+        replaced.append((self.name, Path(target).name, json.loads(Path(target).read_text())["last_event_id"]))
+        return original_replace(self, target)
+
+    monkeypatch.setattr(Path, "replace", record_replace)
+    generate_marketing_events_delta(100, str(tmp_path), seed=2)
+
+    assert replaced == [(Path(STATE_FILE).with_suffix(".tmp").name, STATE_FILE, 100)]
+    assert load_watermark(tmp_path).last_event_id == 200
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_failed_delta_leaves_the_watermark_unchanged(tmp_path, monkeypatch):
+    generate_marketing_events_delta(100, str(tmp_path), seed=1)
+    before = (tmp_path / STATE_FILE).read_text()
+
+    def failing_stream(blocks, output_file, *args, **kwargs):
+        next(iter(blocks))
+        raise OSError("disk full")
+
+    monkeypatch.setattr(marketing_events_generator, "write_ndjson_stream", failing_stream)
+    with pytest.raises(OSError):
+        generate_marketing_events_delta(100, str(tmp_path), seed=2)
+
+    assert (tmp_path / STATE_FILE).read_text() == before
+
+
+def test_append_writes_compressed_chunks(tmp_path):
+    pattern = generate_marketing_events_delta(200, str(tmp_path), seed=1, chunk_compression="gzip")
+    generate_marketing_events_delta(50, str(tmp_path), seed=2, chunk_compression="gzip")
+
+    assert pattern.name == "marketing_events_delta_0000000001_*"
+    chunks = sorted(tmp_path.glob("marketing_events_delta_*.ndjson.gz"))
+    ids = [json.loads(line)["event_id"] for chunk in chunks for line in gzip.decompress(chunk.read_bytes()).splitlines()]
+    assert ids == [f"EVT-{i:010d}" for i in range(1, 251)]
+
+
+def test_append_rejects_the_loop_engine():
+    with pytest.raises(SystemExit):
+        parse_args(["100", "--append", "--engine", "loop"])
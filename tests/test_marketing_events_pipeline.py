@@ -0,0 +1,145 @@
+"""Overlapped chunk upload, retries and the manifest in ``marketing_events_pipeline``"""
+
+import json
+import threading
+
+import pytest
+
+import marketing_events_generator
+from marketing_events_chunks import ChunkedCompressedWriter
+from marketing_events_generator import generate_and_upload_marketing_events
+from marketing_events_pipeline import (
+    MANIFEST_FILE, DirectoryStageUploader, SnowflakeStageUploader, StageUploader, UploadPipeline
+)
+
+
+class FlakyUploader(StageUploader):
+    """Fails the first ``failures`` attempts per file, then copies to the directory stage"""
+
+    def __init__(self, stage, failures):
+        self.stage = stage
+        self.failures = failures
+        self.name = stage.name
+        self.attempts = {}
+
+    def upload(self, path):
+        self.attempts[path.name] = self.attempts.get(path.name, 0) + 1
+        if self.attempts[path.name] <= self.failures:
+            raise IOError(f"stage unavailable for {path.name}")
+        self.stage.upload(path)
+
+
+def write_chunks(tmp_path, pipeline, chunks=3):
+    writer = ChunkedCompressedWriter(tmp_path / "chunks", "gzip", target_chunk_bytes=1,
+                                     on_chunk_closed=pipeline.submit)
+    with writer:
+        for index in range(chunks):
+            writer.write(b'{"event_id": "EVT-%010d"}\n' % index, 1)
+    return writer.chunks
+
+
+def make_pipeline(tmp_path, uploader, **options):
+    (tmp_path / "chunks").mkdir(exist_ok=True)
+    return UploadPipeline(uploader, tmp_path / "chunks", upload_workers=2, queue_size=1, retry_backoff_seconds=0,
+                          manifest_path=tmp_path / MANIFEST_FILE, **options)
+
+
+def test_every_chunk_reaches_the_stage_and_the_manifest(tmp_path):
+    stage = DirectoryStageUploader(tmp_path / "stage")
+    pipeline = make_pipeline(tmp_path, stage)
+
+    pipeline.start()
+    chunks = write_chunks(tmp_path, pipeline)
+    result = pipeline.finish()
+
+    assert not result.failed and result.events == 3
+    assert sorted(path.name for path in (tmp_path / "stage").iterdir()) == sorted(c.path.name for c in chunks)
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert manifest["stage"] == stage.name
+    assert {entry["status"] for entry in manifest["chunks"]} == {"uploaded"}
+
+
+def test_failed_uploads_are_retried(tmp_path):
+    uploader = FlakyUploader(DirectoryStageUploader(tmp_path / "stage"), failures=2)
+    pipeline = make_pipeline(tmp_path, uploader, max_retries=3)
+
+    pipeline.start()
+    write_chunks(tmp_path, pipeline)
+    result = pipeline.finish()
+
+    assert not result.failed
+    assert [entry.attempts for entry in result.entries] == [3, 3, 3]
+    assert all(entry.error is None for entry in result.entries)
+
+
+def test_chunks_out_of_retries_are_marked_failed(tmp_path):
+    uploader = FlakyUploader(DirectoryStageUploader(tmp_path / "stage"), failures=10)
+    pipeline = make_pipeline(tmp_path, uploader, max_retries=1)
+
+    pipeline.start()
+    write_chunks(tmp_path, pipeline, chunks=2)
+    result = pipeline.finish()
+
+    assert len(result.failed) == 2
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert [(entry["status"], entry["attempts"]) for entry in manifest["chunks"]] == [("failed", 2)] * 2
+    assert "stage unavailable" in manifest["chunks"][0]["error"]
+
+
+def test_generation_failure_still_finishes_the_pipeline(tmp_path, monkeypatch):
+    def failing_blocks(*args, **kwargs):
+        yield b'{"event_id": "EVT-0000000001"}\n', 1
+        raise RuntimeError("generator crashed")
+
+    monkeypatch.setattr(marketing_events_generator, "iter_engine_blocks", failing_blocks)
+    monkeypatch.setenv("PHARMACY2U_METRICS_FILE", str(tmp_path / "metrics.jsonl"))
+
+    with pytest.raises(RuntimeError, match="generator crashed"):
+        generate_and_upload_marketing_events(10, str(tmp_path), DirectoryStageUploader(tmp_path / "stage"),
+                                             upload_workers=2)
+
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("uploader-")]
+    manifest = json.loads((tmp_path / MANIFEST_FILE).read_text())
+    assert [entry["status"] for entry in manifest["chunks"]] == ["uploaded"]
+    [line] = (tmp_path / "metrics.jsonl").read_text().splitlines()
+    assert json.loads(line)["status"] == "error"
+
+
+class RecordingSqlBackend:
+    """SQL backend double: records queries and returns PUT rows with the given status"""
+
+    name = "connector"
+
+    def __init__(self, status="UPLOADED"):
+        self.status = status
+        self.queries = []
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return [{"source": "chunk", "status": self.status, "message": "stage full" if self.status == "ERROR" else ""}]
+
+
+def test_snowflake_uploader_puts_through_the_sql_backend(tmp_path, monkeypatch):
+    import marketing_events_pipeline
+
+    def no_subprocess(*args, **kwargs):
+        raise AssertionError("PUT must not start a snow sql subprocess when a SQL backend is given")
+    monkeypatch.setattr(marketing_events_pipeline.subprocess, "run", no_subprocess)
+    sql = RecordingSqlBackend()
+    chunk = tmp_path / "marketing_events_00001.ndjson.gz"
+    chunk.write_bytes(b"")
+
+    SnowflakeStageUploader("demo", sql=sql).upload(chunk)
+
+    [put_sql] = sql.queries
+    assert put_sql.startswith(f"PUT file://{chunk.resolve()} @PHARMACY2U_BRONZE.RAW_DATA.MARKETING_STAGE/chunks/")
+    with pytest.raises(IOError, match="stage full"):
+        SnowflakeStageUploader("demo", sql=RecordingSqlBackend("ERROR")).upload(chunk)
+
+
+def test_uploader_without_upload_cannot_be_constructed():
+    class NoUpload(StageUploader):
+        pass
+
+    with pytest.raises(TypeError):
+        NoUpload()
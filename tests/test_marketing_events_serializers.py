@@ -0,0 +1,56 @@
+"""Byte-identical NDJSON from the ``marketing_events_serializers`` serializers"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from marketing_events_generator import iter_engine_blocks, iter_engine_events
+from marketing_events_serializers import SERIALIZERS, get_serializer
+
+START = datetime(2024, 1, 1)
+
+
+def ndjson(serializer, engine="vectorized", events=5000, seed=7):
+    return b"".join(data for data, _ in iter_engine_blocks(events, engine, start_date=START, seed=seed,
+                                                           serializer=serializer, chunk_events=1024))
+
+
+def reject_constant(name):
+    raise ValueError(f"non-standard JSON constant {name}")
+
+
+@pytest.fixture(params=SERIALIZERS)
+def serializer(request):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    return request.param
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "loop"])
+def test_serializers_emit_identical_bytes(serializer, engine):
+    assert ndjson(serializer, engine) == ndjson("json", engine)
+
+
+def test_output_is_strict_json_in_the_event_key_order(serializer):
+    output = ndjson(serializer, events=2000)
+    lines = output.decode("utf-8").splitlines()
+
+    assert len(lines) == 2000
+    events = [json.loads(line, parse_constant=reject_constant) for line in lines]
+    assert list(events[0]) == ["event_id", "patient_id", "campaign_id", "campaign_name", "event_type",
+                               "event_timestamp", "channel", "conversion_flag", "metadata"]
+    assert all(isinstance(event["conversion_flag"], bool) for event in events)
+    assert b"NaN" not in output and b"Infinity" not in output
+
+
+def test_blocks_match_the_event_path_for_the_same_seed():
+    # Blocks and event dicts share one seeding path, so the same seed gives the same events
+    events = list(iter_engine_events(3000, "vectorized", start_date=START, seed=11))
+
+    assert get_serializer("json").encode_records(events) == ndjson("fragments", events=3000, seed=11)
+
+
+def test_unknown_serializer_is_rejected():
+    with pytest.raises(ValueError):
+        get_serializer("pickle")
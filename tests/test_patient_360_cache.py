@@ -0,0 +1,159 @@
+"""Filter-keyed, refresh-invalidated caching and warm-up in ``patient_360_cache``"""
+
+import threading
+
+import pytest
+
+from patient_360_cache import RefreshCache, patient_360_data_timestamp
+from patient_360_queries import TIMEFRAME_DAYS, PatientFilters
+
+
+class Source:
+    """Refresh token the test can advance, and loaders that count their calls"""
+
+    def __init__(self):
+        self.token = "2026-10-17 09:00:00"
+        self.calls = []
+
+    def loader(self, name):
+        def load(session, filters):
+            self.calls.append((name, filters, self.token))
+            return f"{name} {filters.days} @ {self.token}"
+        return load
+
+
+def make_cache(source, warm_filters=(), **options):
+    cache = RefreshCache(lambda session: source.token, warm_filters, check_seconds=0, warm_in_background=False,
+                         **options)
+    cache.register("kpis", source.loader("kpis"))
+    return cache
+
+
+def test_entries_are_keyed_on_filter_values():
+    source = Source()
+    cache = make_cache(source)
+
+    assert cache.get("kpis", None, PatientFilters(days=30)) == "kpis 30 @ 2026-10-17 09:00:00"
+    assert cache.get("kpis", None, PatientFilters(days=90)) == "kpis 90 @ 2026-10-17 09:00:00"
+    cache.get("kpis", None, PatientFilters(days=30))
+
+    assert len(source.calls) == 2
+
+
+def test_refresh_token_change_invalidates():
+    source = Source()
+    cache = make_cache(source)
+    cache.get("kpis", None, PatientFilters(days=30))
+
+    source.token = "2026-10-17 09:05:00"
+
+    assert cache.get("kpis", None, PatientFilters(days=30)).endswith("09:05:00")
+    assert len(source.calls) == 2
+
+
+def test_token_is_checked_at_most_every_check_seconds():
+    source = Source()
+    cache = RefreshCache(lambda session: source.token, check_seconds=3600, warm_in_background=False)
+    cache.register("kpis", source.loader("kpis"))
+    cache.get("kpis", None, PatientFilters())
+
+    source.token = "later"
+
+    assert cache.get("kpis", None, PatientFilters()).endswith("09:00:00")
+    assert cache.check_refresh(None, force=True)
+
+
+def test_refresh_warms_every_timeframe():
+    source = Source()
+    warm = [PatientFilters(days=days) for days in TIMEFRAME_DAYS.values()]
+    cache = make_cache(source, warm)
+    cache.register("gender_counts", source.loader("gender_counts"))
+
+    cache.check_refresh(None)
+
+    assert len(cache.cached_keys()) == 2 * len(TIMEFRAME_DAYS)
+    calls = len(source.calls)
+    cache.get("gender_counts", None, PatientFilters(days=365))
+    assert len(source.calls) == calls
+
+
+def test_failed_loads_are_not_cached():
+    source = Source()
+    cache = make_cache(source)
+    attempts = []
+
+    def flaky(session, filters):
+        attempts.append(filters)
+        if len(attempts) == 1:
+            raise RuntimeError("warehouse suspended")
+        return "ok"
+    cache.register("flaky", flaky)
+
+    with pytest.raises(RuntimeError):
+        cache.get("flaky", None, PatientFilters())
+    assert cache.get("flaky", None, PatientFilters()) == "ok"
+
+
+def test_concurrent_requests_share_one_query():
+    source = Source()
+    cache = make_cache(source)
+    release = threading.Event()
+    loads = []
+
+    def slow(session, filters):
+        loads.append(filters)
+        release.wait(5)
+        return "rows"
+    cache.register("slow", slow)
+    cache.check_refresh(None)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("slow", None, PatientFilters())))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["rows"] * 4
+    assert len(loads) == 1
+
+
+def test_timestamp_falls_back_from_refresh_history_to_last_altered():
+    class Session:
+        def __init__(self):
+            self.queries = []
+
+        def sql(self, query):
+            self.queries.append(query)
+            return self
+
+        def collect(self):
+            if "DYNAMIC_TABLE_REFRESH_HISTORY" in self.queries[-1]:
+                raise RuntimeError("not a dynamic table")
+            return [{"TOKEN": "2026-10-01 12:00:00"}]
+
+    session = Session()
+
+    assert patient_360_data_timestamp(session) == "2026-10-01 12:00:00"
+    assert "REFRESH_ACTION <> 'NO_DATA'" in session.queries[0]
+    assert "INFORMATION_SCHEMA.TABLES" in session.queries[1]
+
+
+def test_without_a_token_entries_expire_on_the_fallback_interval(monkeypatch):
+    import patient_360_cache
+
+    clock = [1000.0]
+    monkeypatch.setattr(patient_360_cache.time, "time", lambda: clock[0])
+    source = Source()
+    source.token = None
+    cache = make_cache(source)
+
+    cache.get("kpis", None, PatientFilters())
+    cache.get("kpis", None, PatientFilters())
+    clock[0] += patient_360_cache.FALLBACK_TTL_SECONDS
+    cache.get("kpis", None, PatientFilters())
+
+    assert len(source.calls) == 2
+    assert len(cache.cached_keys()) == 1
@@ -0,0 +1,103 @@
+"""Projected, batch-streamed, dtype-compacted row fetch in ``patient_360_frames``"""
+
+from decimal import Decimal
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from patient_360_frames import (  # noqa: E402
+    DASHBOARD_COLUMNS, WIDGET_COLUMNS, build_frame_query, compact_frame, fetch_frame, projected_columns
+)
+from patient_360_queries import PatientFilters  # noqa: E402
+
+
+class BatchSession:
+    """Returns the given pandas batches from ``to_pandas_batches()`` and records (sql, params)"""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.queries = []
+
+    def sql(self, query, params=None):
+        self.queries.append((query, params))
+        return self
+
+    def to_pandas_batches(self):
+        yield from self.batches
+
+
+def connector_batch(start, genders, ages, conversions):
+    """A batch shaped like the connector's output: object strings and Decimals, float64 for nullable counts"""
+    count = len(genders)
+    return pd.DataFrame({
+        "PATIENT_ID": pd.Series([f"PT-{start + i:08d}" for i in range(count)], dtype=object),
+        "GENDER": pd.Series(genders, dtype=object),
+        "AGE": ages,
+        "CAMPAIGN_CONVERSIONS": pd.Series(conversions, dtype="float64"),
+        "LIFETIME_VALUE_GBP": pd.Series([Decimal("120.55")] * count, dtype=object),
+    })
+
+
+def test_dashboard_projection_excludes_direct_identifiers():
+    sql, params = build_frame_query(DASHBOARD_COLUMNS, PatientFilters(days=30), limit=10000)
+
+    assert "SELECT *" not in sql
+    for pii in ("NHS_NUMBER", "EMAIL", "PHONE", "FIRST_NAME", "POSTCODE", "DATE_OF_BIRTH"):
+        assert pii not in sql
+    assert set(DASHBOARD_COLUMNS) == {column for columns in WIDGET_COLUMNS.values() for column in columns}
+    assert sql.endswith("LIMIT ?") and params == [30, 10000]
+
+
+@pytest.mark.parametrize("columns", [("NHS_NUMBER",), ("AGE", "EMAIL"), ()])
+def test_unlisted_or_missing_columns_are_rejected(columns):
+    with pytest.raises(ValueError):
+        build_frame_query(columns, PatientFilters())
+
+
+def test_projection_order_is_stable_and_deduplicated():
+    assert projected_columns([("LIFETIME_VALUE_GBP", "AGE"), ("AGE", "PATIENT_ID")]) == \
+        ["PATIENT_ID", "AGE", "LIFETIME_VALUE_GBP"]
+
+
+def test_batches_are_compacted_and_concatenated():
+    session = BatchSession([
+        connector_batch(1, ["Male", "Female"], [34, 71], [1.0, None]),
+        connector_batch(3, ["Other"], [300], [2.0]),
+    ])
+
+    frame = fetch_frame(session, ("PATIENT_ID", "GENDER", "AGE", "CAMPAIGN_CONVERSIONS", "LIFETIME_VALUE_GBP"))
+
+    [(sql, params)] = session.queries
+    assert sql.startswith("SELECT PATIENT_ID, GENDER, AGE, CAMPAIGN_CONVERSIONS, LIFETIME_VALUE_GBP\nFROM")
+    assert params == []
+    assert isinstance(frame["GENDER"].dtype, pd.CategoricalDtype)
+    assert list(frame["GENDER"].cat.categories) == ["Female", "Male", "Other"]
+    # 300 does not fit int8, so the concatenated column settles on int16
+    assert str(frame["AGE"].dtype) == "int16"
+    assert str(frame["CAMPAIGN_CONVERSIONS"].dtype) == "Int8" and frame["CAMPAIGN_CONVERSIONS"].isna().sum() == 1
+    assert str(frame["LIFETIME_VALUE_GBP"].dtype) == "float32"
+    assert frame["LIFETIME_VALUE_GBP"].iloc[0] == pytest.approx(120.55, rel=1e-6)
+    assert list(frame["PATIENT_ID"]) == ["PT-00000001", "PT-00000002", "PT-00000003"]
+
+
+def test_compact_frame_uses_less_memory():
+    size = 5000
+    frame = pd.DataFrame({
+        "GENDER": pd.Series(["Male", "Female"] * (size // 2), dtype=object),
+        "CUSTOMER_TIER": pd.Series(["Bronze", "Silver", "Gold", "Platinum", "Bronze"] * (size // 5), dtype=object),
+        "TOTAL_PRESCRIPTIONS": pd.Series(range(size), dtype="int64") % 60,
+        "LIFETIME_VALUE_GBP": pd.Series(range(size), dtype="float64") * 1.5,
+    })
+    before = frame.memory_usage(deep=True).sum()
+
+    after = compact_frame(frame).memory_usage(deep=True).sum()
+
+    assert after < before / 10
+
+
+def test_empty_result_has_the_projected_columns():
+    frame = fetch_frame(BatchSession([]), ("GENDER", "AGE"))
+
+    assert list(frame.columns) == ["GENDER", "AGE"] and frame.empty
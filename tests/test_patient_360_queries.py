@@ -0,0 +1,182 @@
+"""Warehouse-side KPI and chart aggregates in the Patient 360 dashboard's ``patient_360_queries``"""
+
+from decimal import Decimal
+
+import pytest
+
+from patient_360_queries import (
+    DASHBOARD_KPIS, PATIENTS, Aggregate, HistogramBin, Kpi, PageCursor, PatientFilters, build_aggregate_query,
+    build_page_query, compute_kpis, fetch_grouped, fetch_histogram, fetch_patient_page, histogram_from_frame,
+    kpis_from_frame, unique_aggregates
+)
+
+
+class RecordingSession:
+    """Returns canned rows for every query and records (sql, params)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def sql(self, query, params=None):
+        self.queries.append((query, params))
+        return self
+
+    def collect(self):
+        return self.rows
+
+
+def test_kpis_come_from_one_aggregate_query():
+    session = RecordingSession([{"PATIENTS": 100000000, "AVG_PRESCRIPTIONS": Decimal("4.25"),
+                                 "TOTAL_REVENUE": Decimal("123456789.50"), "CONVERSIONS": 250, "INTERACTIONS": 1000}])
+
+    values = compute_kpis(session, DASHBOARD_KPIS, PatientFilters(days=30))
+
+    [(sql, params)] = session.queries
+    assert params == [30]
+    assert "DATEADD(DAY, -?, CURRENT_DATE())" in sql
+    assert "LIMIT" not in sql and "SELECT *" not in sql
+    assert sql.count("SUM(") == 3 and "COUNT(*) AS PATIENTS" in sql and "AVG(TOTAL_PRESCRIPTIONS)" in sql
+    assert values == {"Total Patients": 100000000, "Avg Prescriptions/Patient": 4.25,
+                      "Total Revenue": 123456789.5, "Campaign Conversion Rate": 25.0}
+    assert [kpi.display(values[kpi.label]) for kpi in DASHBOARD_KPIS] == [
+        "100,000,000", "4.2", "£123,456,790", "25.0%"]
+
+
+def test_empty_result_gives_blank_kpis_not_errors():
+    values = compute_kpis(RecordingSession([{"PATIENTS": 0, "AVG_PRESCRIPTIONS": None, "TOTAL_REVENUE": None,
+                                             "CONVERSIONS": None, "INTERACTIONS": None}]))
+
+    assert values["Total Patients"] == 0
+    assert values["Campaign Conversion Rate"] is None
+    assert DASHBOARD_KPIS[3].display(None) == "–"
+
+
+def test_no_filter_has_no_where_clause():
+    sql, params = build_aggregate_query([PATIENTS], PatientFilters())
+
+    assert "WHERE" not in sql and params == []
+
+
+def test_shared_aggregates_are_computed_once_and_must_agree():
+    revenue = Aggregate("REVENUE", "SUM", "LIFETIME_VALUE_GBP")
+    kpis = [Kpi("Revenue", (revenue,), lambda r: r["REVENUE"]),
+            Kpi("Revenue per patient", (revenue, PATIENTS), lambda r: r["REVENUE"] / r["PATIENTS"])]
+
+    assert unique_aggregates(kpis) == [revenue, PATIENTS]
+    with pytest.raises(ValueError, match="defined twice"):
+        unique_aggregates(kpis + [Kpi("Bad", (Aggregate("REVENUE", "AVG", "LIFETIME_VALUE_GBP"),), lambda r: 0)])
+
+
+@pytest.mark.parametrize("bad", [lambda: Aggregate("X", "MEDIAN", "AGE"), lambda: Aggregate("X", "SUM"),
+                                 lambda: Aggregate("X", "SUM", "AGE); DROP TABLE T; --")])
+def test_aggregates_reject_unsupported_sql(bad):
+    with pytest.raises(ValueError):
+        bad()
+
+
+def test_grouped_counts_are_computed_in_the_warehouse():
+    session = RecordingSession([{"GENDER": "Female", "PATIENTS": 51}, {"GENDER": "Male", "PATIENTS": 49}])
+
+    rows = fetch_grouped(session, "GENDER", (PATIENTS,), PatientFilters(days=90))
+
+    [(sql, params)] = session.queries
+    assert sql.startswith("SELECT\n    GENDER,\n    COUNT(*) AS PATIENTS\n")
+    assert sql.endswith("GROUP BY GENDER\nORDER BY PATIENTS DESC") and params == [90]
+    assert rows[0] == {"GENDER": "Female", "PATIENTS": 51}
+
+
+def test_frame_fallback_matches_the_warehouse_definitions():
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame({"TOTAL_PRESCRIPTIONS": [2, 4], "LIFETIME_VALUE_GBP": [10.0, 30.0],
+                          "CAMPAIGN_CONVERSIONS": [1, 1], "MARKETING_INTERACTIONS": [4, 6]})
+
+    assert kpis_from_frame(frame) == {"Total Patients": 2, "Avg Prescriptions/Patient": 3.0,
+                                      "Total Revenue": 40.0, "Campaign Conversion Rate": 20.0}
+
+
+def test_width_bucket_histogram_returns_only_bins_and_counts():
+    session = RecordingSession([{"BIN": 1, "PATIENTS": 5, "LO": 18, "HI": 98},
+                                {"BIN": 20, "PATIENTS": 2, "LO": 18, "HI": 98}])
+
+    bins = fetch_histogram(session, "AGE", PatientFilters(days=30), bins=20)
+
+    [(sql, params)] = session.queries
+    assert "WHERE REGISTRATION_DATE >= DATEADD(DAY, -?, CURRENT_DATE()) AND AGE IS NOT NULL" in sql
+    assert "LEAST(WIDTH_BUCKET(VALUE, LO, HI, ?), ?)" in sql and "GROUP BY BIN" in sql
+    assert params == [30, 20, 20]
+    assert bins == [HistogramBin(18, 22, 5), HistogramBin(94, 98, 2)]
+
+
+def test_floor_histogram_uses_fixed_width_bins():
+    session = RecordingSession([{"BIN_START": 0, "PATIENTS": 3}, {"BIN_START": 1, "PATIENTS": 7}])
+
+    bins = fetch_histogram(session, "UNIQUE_DRUGS", PatientFilters(), width=1)
+
+    [(sql, params)] = session.queries
+    assert "WHERE UNIQUE_DRUGS IS NOT NULL" in sql and "FLOOR(VALUE / ?) * ?" in sql
+    assert params == [1, 1]
+    assert [(b.start, b.end, b.count) for b in bins] == [(0, 1, 3), (1, 2, 7)]
+    assert bins[1].label == "1–2"
+
+
+def test_histogram_frame_fallback_matches_warehouse_binning():
+    pd = pytest.importorskip("pandas")
+    frame = pd.DataFrame({"AGE": [18, 19, 58, 98, None], "UNIQUE_DRUGS": [0, 1, 1, 3, 2]})
+
+    ages = histogram_from_frame(frame, "AGE", bins=20)
+    drugs = histogram_from_frame(frame, "UNIQUE_DRUGS", width=1)
+
+    assert [(b.start, b.count) for b in ages] == [(18, 2), (58, 1), (94, 1)]
+    assert [(b.start, b.count) for b in drugs] == [(0, 1), (1, 2), (2, 1), (3, 1)]
+
+
+def test_first_page_is_projected_filtered_and_limited_in_the_warehouse():
+    sql, params = build_page_query(PatientFilters(days=30, gender="Female", customer_tier="Gold"),
+                                   ("AGE", "GENDER"), "AGE", page_size=25)
+
+    assert sql.startswith("SELECT PATIENT_ID, AGE, GENDER, COALESCE(AGE, -1) AS SORT_KEY")
+    assert "SELECT *" not in sql and "OFFSET" not in sql
+    assert "GENDER = ? AND CUSTOMER_TIER = ?" in sql
+    assert sql.endswith("ORDER BY SORT_KEY, PATIENT_ID\nLIMIT ?")
+    assert params == [30, "Female", "Gold", 26]
+
+
+def test_next_page_seeks_past_the_cursor():
+    cursor = PageCursor(Decimal("120.50"), "PT-00000042")
+
+    sql, params = build_page_query(PatientFilters(), ("LIFETIME_VALUE_GBP",), "LIFETIME_VALUE_GBP",
+                                   descending=True, after=cursor)
+
+    key = "COALESCE(LIFETIME_VALUE_GBP, 0)"
+    assert f"WHERE ({key} < ? OR ({key} = ? AND PATIENT_ID < ?))" in sql
+    assert "ORDER BY SORT_KEY DESC, PATIENT_ID DESC" in sql
+    assert params == [Decimal("120.50"), Decimal("120.50"), "PT-00000042", 51]
+
+
+def test_jump_to_patient_id_includes_that_patient():
+    sql, params = build_page_query(PatientFilters(), after=PageCursor("PT-00001000", "PT-00001000", inclusive=True))
+
+    assert "WHERE PATIENT_ID >= ?" in sql
+    assert params == ["PT-00001000", 51]
+
+
+def test_page_sets_next_cursor_only_when_more_rows_exist():
+    rows = [{"PATIENT_ID": f"PT-{i:08d}", "LIFETIME_VALUE_GBP": Decimal("10.10"), "SORT_KEY": Decimal("10.10")}
+            for i in range(1, 4)]
+
+    page = fetch_patient_page(RecordingSession(rows), PatientFilters(), ("LIFETIME_VALUE_GBP",),
+                              "LIFETIME_VALUE_GBP", page_size=2)
+    last = fetch_patient_page(RecordingSession(rows[:2]), PatientFilters(), page_size=2)
+
+    assert page.rows == [{"PATIENT_ID": "PT-00000001", "LIFETIME_VALUE_GBP": 10.1},
+                         {"PATIENT_ID": "PT-00000002", "LIFETIME_VALUE_GBP": 10.1}]
+    assert page.next_cursor == PageCursor(Decimal("10.10"), "PT-00000002")
+    assert last.next_cursor is None and len(last.rows) == 2
+
+
+@pytest.mark.parametrize("kwargs", [dict(columns=("NHS_NUMBER",)), dict(columns=()), dict(sort="EMAIL"),
+                                    dict(page_size=0), dict(page_size=10000)])
+def test_page_query_rejects_unlisted_columns_sorts_and_sizes(kwargs):
+    with pytest.raises(ValueError):
+        build_page_query(PatientFilters(), **kwargs)
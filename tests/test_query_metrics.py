@@ -0,0 +1,59 @@
+"""Step metrics lines from ``query_metrics`` against the fake session"""
+
+import json
+
+import pytest
+
+from fake_snowpark import FakeSession
+from query_metrics import METRICS_FILE_ENV, StepMetrics, metrics_step, rows_affected
+
+
+@pytest.fixture
+def metrics_path(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv(METRICS_FILE_ENV, str(path))
+    return path
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_rows_affected_sums_dml_and_copy_counts():
+    assert rows_affected([{"number of rows inserted": 5}]) == 5
+    assert rows_affected([{"file": "a", "rows_loaded": 3}, {"file": "b", "rows_loaded": 4}]) == 7
+    assert rows_affected([{"status": "Statement executed successfully."}]) is None
+
+
+def test_step_records_rows_from_dml_result(metrics_path):
+    session = FakeSession()
+
+    with metrics_step("patient_generator", "generate_patient_data", session) as metrics:
+        metrics.execute("INSERT INTO RAW_TEST SELECT 1 FROM TABLE(GENERATOR(ROWCOUNT => 250))", label="insert")
+
+    [line] = read_lines(metrics_path)
+    assert line["component"] == "patient_generator"
+    assert line["status"] == "ok"
+    assert line["rows"] == 250
+    assert line["statements"][0]["query_id"] == "fake-query-0001"
+    assert line["statements"][0]["rows"] == 250
+    assert not any("COUNT(*)" in statement for statement in session.statements)
+
+
+def test_failed_step_is_emitted_with_error_status(metrics_path):
+    with pytest.raises(RuntimeError):
+        with metrics_step("DemoDeployer", "deploy_features"):
+            raise RuntimeError("boom")
+
+    [line] = read_lines(metrics_path)
+    assert line["status"] == "error"
+
+
+def test_empty_metrics_file_only_logs(monkeypatch, tmp_path):
+    monkeypatch.setenv(METRICS_FILE_ENV, "")
+    monkeypatch.chdir(tmp_path)
+
+    record = StepMetrics("marketing_events_generator", "generate_marketing_events").emit()
+
+    assert record["rows"] is None
+    assert not any(tmp_path.iterdir())
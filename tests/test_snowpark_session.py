@@ -0,0 +1,83 @@
+"""Session caching and one-time context setup in ``snowpark_session``"""
+
+import threading
+import time
+
+import pytest
+
+import snowpark_session
+from fake_snowpark import FakeSession
+
+
+@pytest.fixture
+def fake_sessions(monkeypatch):
+    created = []
+
+    def create(connection_name):
+        created.append(connection_name)
+        return FakeSession()
+
+    monkeypatch.setattr(snowpark_session, "_create_session", create)
+    yield created
+    snowpark_session.close_sessions()
+
+
+def test_one_session_per_connection(fake_sessions):
+    first = snowpark_session.get_session("demo")
+
+    assert snowpark_session.get_session("demo") is first
+    assert snowpark_session.get_session("other") is not first
+    assert fake_sessions == ["demo", "other"]
+    assert snowpark_session.session_setup_seconds("demo") >= 0
+
+
+def test_concurrent_callers_share_one_session(monkeypatch):
+    created = []
+
+    def slow_create(connection_name):
+        created.append(connection_name)
+        time.sleep(0.05)  # a login long enough for every worker to arrive
+        return FakeSession()
+
+    monkeypatch.setattr(snowpark_session, "_create_session", slow_create)
+    barrier = threading.Barrier(4)
+    sessions = []
+
+    def worker():
+        barrier.wait()
+        session = snowpark_session.get_session("demo")
+        snowpark_session.apply_generation_context(session)
+        sessions.append(session)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        snowpark_session.close_sessions()
+
+    assert created == ["demo"]
+    assert len(sessions) == 4 and all(session is sessions[0] for session in sessions)
+    assert [s for s in sessions[0].statements if s.startswith("USE DATABASE")] == ["USE DATABASE PHARMACY2U_BRONZE"]
+
+
+def test_context_applied_once_per_session(fake_sessions):
+    session = snowpark_session.get_session("demo")
+
+    snowpark_session.apply_generation_context(session)
+    snowpark_session.apply_generation_context(session)
+
+    assert [s for s in session.statements if s.startswith("USE ")] == [
+        "USE DATABASE PHARMACY2U_BRONZE", "USE SCHEMA RAW_DATA", "USE WAREHOUSE PHARMACY2U_LOADING_WH"
+    ]
+
+
+def test_close_sessions_closes_and_forgets(fake_sessions):
+    session = snowpark_session.get_session("demo")
+
+    snowpark_session.close_sessions()
+
+    assert session.closed
+    assert snowpark_session.get_session("demo") is not session
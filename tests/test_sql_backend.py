@@ -0,0 +1,192 @@
+"""Statement splitting and in-process execution in ``sql_backend``"""
+
+import pytest
+
+from sql_backend import ConnectorSqlBackend, split_sql_statements
+
+SCRIPT = """-- ============================================================================
+-- Setup; with a semicolon in the banner
+-- ============================================================================
+
+USE ROLE ACCOUNTADMIN;
+USE WAREHOUSE PHARMACY2U_DEMO_WH;
+
+/* block comment; still a comment */
+CREATE TABLE T (NOTE VARCHAR DEFAULT 'a;b', "odd;name" INT);
+
+INSERT INTO T (NOTE) VALUES ('it''s; fine'),
+    ('escaped \\' quote;');
+CREATE TASK REFRESH_T AS EXECUTE IMMEDIATE $$
+BEGIN
+    SELECT 1;
+END;
+$$;
+SELECT COUNT(*) FROM T
+"""
+
+
+class FakeCursor:
+    def __init__(self, query_id):
+        self.sfqid = query_id
+        self.rowcount = 1
+        self.closed = False
+
+    def execute(self, sql):
+        self.connection.statements.append(sql)
+        return self
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Records statements; fails any statement containing ``fail_on``"""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.statements = []
+        self.role = "ACCOUNTADMIN"
+        self.warehouse = "PHARMACY2U_LOADING_WH"
+        self.database = None
+        self.schema = None
+
+    def cursor(self):
+        cursor = FakeCursor(f"q{len(self.statements) + 1}")
+        cursor.connection = self
+        return cursor
+
+    def execute_stream(self, stream, remove_comments=False):
+        sql = stream.read()
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError(f"SQL compilation error: object '{self.fail_on}' does not exist")
+        self.statements.append(sql)
+        yield FakeCursor(f"q{len(self.statements)}")
+
+    def close(self):
+        self.closed = True
+
+
+class UnrestorableConnection(FakeConnection):
+    """Starts with a full context but fails the USE statements that restore it"""
+
+    def __init__(self):
+        super().__init__()
+        self.database = "PHARMACY2U_BRONZE"
+        self.schema = "RAW_DATA"
+
+    def cursor(self):
+        raise RuntimeError("Object does not exist, or operation cannot be performed")
+
+
+def backend_with(connections):
+    return ConnectorSqlBackend("demo", connect=lambda: connections.append(FakeConnection()) or connections[-1])
+
+
+def test_split_keeps_quoted_commented_and_dollar_semicolons():
+    statements = split_sql_statements(SCRIPT)
+
+    assert [statement.line for statement in statements] == [5, 6, 9, 11, 13, 18]
+    assert statements[2].text == "CREATE TABLE T (NOTE VARCHAR DEFAULT 'a;b', \"odd;name\" INT)"
+    assert statements[3].text.endswith("('escaped \\' quote;')")
+    assert statements[4].text.startswith("CREATE TASK") and statements[4].text.endswith("END;\n$$")
+    assert statements[5].text == "SELECT COUNT(*) FROM T"
+
+
+def test_comment_only_script_has_no_statements():
+    assert split_sql_statements("-- nothing to run;\n/* ; */\n") == []
+
+
+def test_script_runs_every_statement_on_one_pooled_connection():
+    connections = []
+    backend = backend_with(connections)
+
+    first = backend.run_script(SCRIPT, "setup.sql")
+    second = backend.run_script("SELECT 1;", "check.sql")
+
+    assert first.ok and second.ok
+    assert len(connections) == 1
+    assert [statement.line for statement in first.statements] == [5, 6, 9, 11, 13, 18]
+    # USE statements in the first script are undone before the connection is reused
+    assert "USE ROLE ACCOUNTADMIN" in connections[0].statements
+    assert "USE WAREHOUSE PHARMACY2U_LOADING_WH" in connections[0].statements
+
+
+def test_failure_reports_file_line_and_stops():
+    backend = ConnectorSqlBackend("demo", connect=lambda: FakeConnection(fail_on="MISSING_TABLE"))
+
+    result = backend.run_script("USE ROLE ACCOUNTADMIN;\n\nSELECT * FROM MISSING_TABLE;\nSELECT 2;", "load.sql")
+
+    assert not result.ok
+    assert result.error_line == 3
+    assert result.error.startswith("load.sql:3: SELECT * FROM MISSING_TABLE: SQL compilation error")
+    assert len(result.statements) == 1
+
+
+def test_concurrent_scripts_get_separate_connections():
+    connections = []
+    backend = backend_with(connections)
+    held = backend._acquire()
+
+    assert backend.run_script("SELECT 1", "other.sql").ok
+    assert len(connections) == 2
+    backend._release(held)
+
+
+def test_context_without_a_default_closes_the_connection():
+    connections = []
+    backend = backend_with(connections)
+
+    # The fake connection starts with no database or schema, so USE DATABASE cannot be undone
+    assert backend.run_script("USE DATABASE PHARMACY2U_GOLD;\nSELECT 1;", "gold.sql").ok
+    assert backend.run_script("SELECT 2;", "next.sql").ok
+
+    assert len(connections) == 2
+    assert getattr(connections[0], "closed", False)
+    assert connections[0] not in backend._all
+    assert not any(statement.startswith("USE DATABASE") for statement in connections[1].statements)
+
+
+def test_failed_context_restore_closes_the_connection(caplog):
+    connections = []
+    backend = ConnectorSqlBackend("demo", connect=lambda: connections.append(UnrestorableConnection())
+                                  or connections[-1])
+
+    assert backend.run_script("USE SCHEMA ANALYTICS;", "schema.sql").ok
+    assert backend.run_script("SELECT 1;", "next.sql").ok
+
+    assert len(connections) == 2 and connections[0].closed
+    assert "Could not restore database PHARMACY2U_BRONZE" in caplog.text
+
+
+def test_only_changed_context_is_restored():
+    connections = []
+    backend = backend_with(connections)
+
+    assert backend.run_script("USE WAREHOUSE PHARMACY2U_DEMO_WH;", "wh.sql").ok
+    assert backend.run_script("SELECT 1;", "next.sql").ok
+
+    assert len(connections) == 1
+    assert connections[0].statements == ["USE WAREHOUSE PHARMACY2U_DEMO_WH", "USE WAREHOUSE PHARMACY2U_LOADING_WH",
+                                         "SELECT 1"]
+
+
+def test_unconnectable_backend_returns_an_error_result():
+    def refuse():
+        raise ConnectionError("login failed")
+
+    result = ConnectorSqlBackend("demo", connect=refuse).run_script("SELECT 1", "check.sql")
+
+    assert result.error == "check.sql: could not connect: login failed"
+
+
+@pytest.mark.parametrize("backend", ["cli", "auto", "connector"])
+def test_open_sql_backend_choices(backend, monkeypatch):
+    import sql_backend
+
+    monkeypatch.setattr(sql_backend.ConnectorSqlBackend, "connect",
+                        lambda self: (_ for _ in ()).throw(ImportError("no connector")))
+    if backend == "connector":
+        with pytest.raises(ImportError):
+            sql_backend.open_sql_backend("demo", backend)
+    else:
+        assert sql_backend.open_sql_backend("demo", backend).name == "cli"